@@ -0,0 +1,112 @@
+"""
+Append-only activity log for the admin dashboard feed.
+
+Writers call log_activity() at the point the activity happens (registration,
+event creation, payment completion, RSVP, send completion). Each row is also
+published on the ACTIVITY_CHANNEL so the admin SSE stream can push it live.
+"""
+import json
+from typing import List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from db import get_db_connection
+from pg_events import notify
+
+ACTIVITY_CHANNEL = "activity_log"
+
+USER_REGISTERED = "user_registered"
+EVENT_CREATED = "event_created"
+PACKAGE_PURCHASED = "package_purchased"
+RSVP_RECEIVED = "rsvp_received"
+MESSAGES_SENT = "messages_sent"
+
+
+def serialize_activity(row) -> dict:
+    """(id, activity_type, details, user_id, event_id, created_at) -> API dict"""
+    return {
+        "id": row[0],
+        "type": row[1],
+        "details": row[2],
+        "user_id": row[3],
+        "event_id": row[4],
+        "timestamp": row[5].isoformat() if row[5] else None
+    }
+
+
+def _insert(cur, activity_type: str, details: Optional[str], user_id: Optional[int], event_id: Optional[int]):
+    cur.execute("""
+        INSERT INTO activity_log (activity_type, details, user_id, event_id)
+        VALUES (%s, %s, %s, %s)
+        RETURNING id, activity_type, details, user_id, event_id, created_at
+    """, (activity_type, details, user_id, event_id))
+    notify(cur, ACTIVITY_CHANNEL, serialize_activity(cur.fetchone()))
+
+
+def log_activity(activity_type: str, details: Optional[str] = None,
+                 user_id: Optional[int] = None, event_id: Optional[int] = None, cur=None):
+    """
+    Record an activity. Never raises - the feed must not break the action it describes.
+
+    When `cur` is given the row is written inside the caller's transaction (under a
+    savepoint) so it commits - and is streamed - together with the action itself.
+    Otherwise a short-lived connection is used.
+    """
+    if cur is not None:
+        try:
+            cur.execute("SAVEPOINT activity_log")
+            _insert(cur, activity_type, details, user_id, event_id)
+            cur.execute("RELEASE SAVEPOINT activity_log")
+        except Exception as e:
+            print(f"⚠️ Failed to log activity '{activity_type}': {e}")
+            try:
+                cur.execute("ROLLBACK TO SAVEPOINT activity_log")
+            except Exception:
+                pass
+        return
+
+    conn = None
+    own_cur = None
+    try:
+        conn = get_db_connection()
+        own_cur = conn.cursor()
+        _insert(own_cur, activity_type, details, user_id, event_id)
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ Failed to log activity '{activity_type}': {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if own_cur:
+            own_cur.close()
+        if conn:
+            conn.close()
+
+
+def log_activities(entries: List[Tuple[str, Optional[str], Optional[int], Optional[int]]], cur):
+    """
+    Bulk variant of log_activity for batched writers (e.g. the RSVP coalescer).
+
+    entries are (activity_type, details, user_id, event_id). Rows are inserted and
+    published with one statement each, inside the caller's transaction. Never raises.
+    """
+    if not entries:
+        return
+    try:
+        cur.execute("SAVEPOINT activity_log")
+        rows = execute_values(cur, """
+            INSERT INTO activity_log (activity_type, details, user_id, event_id)
+            VALUES %s
+            RETURNING id, activity_type, details, user_id, event_id, created_at
+        """, entries, fetch=True)
+        cur.execute(
+            "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload",
+            (ACTIVITY_CHANNEL, [json.dumps(serialize_activity(row), default=str) for row in rows])
+        )
+        cur.execute("RELEASE SAVEPOINT activity_log")
+    except Exception as e:
+        print(f"⚠️ Failed to log {len(entries)} activities: {e}")
+        try:
+            cur.execute("ROLLBACK TO SAVEPOINT activity_log")
+        except Exception:
+            pass
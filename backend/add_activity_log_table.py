@@ -0,0 +1,77 @@
+"""
+Migration script to create the append-only activity_log table.
+Replaces the users/events/package_purchases merge in the admin activity feed
+with a single indexed descending scan (ORDER BY id DESC).
+On first creation the table is backfilled from the existing source tables.
+"""
+from db import get_db_connection
+
+
+def create_activity_log_table():
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT FROM information_schema.tables
+                WHERE table_name = 'activity_log'
+            );
+        """)
+        if cur.fetchone()[0]:
+            print("activity_log table already exists.")
+            return
+
+        print("Creating activity_log table...")
+        cur.execute("""
+            CREATE TABLE activity_log (
+                id BIGSERIAL PRIMARY KEY,
+                activity_type VARCHAR(50) NOT NULL,
+                details TEXT,
+                user_id INTEGER,
+                event_id INTEGER,
+                created_at TIMESTAMP NOT NULL DEFAULT NOW()
+            );
+        """)
+
+        # Backfill history in chronological order so ids follow created_at
+        cur.execute("""
+            INSERT INTO activity_log (activity_type, details, user_id, event_id, created_at)
+            SELECT type, details, user_id, event_id, ts
+            FROM (
+                SELECT 'user_registered' AS type, email AS details, id AS user_id,
+                       NULL::INTEGER AS event_id, created_at AS ts
+                FROM users
+                WHERE is_admin = FALSE AND created_at IS NOT NULL
+                UNION ALL
+                SELECT 'event_created', event_title, user_id, id, created_at
+                FROM events
+                WHERE created_at IS NOT NULL
+                UNION ALL
+                SELECT 'package_purchased', package_name, user_id, event_id, purchased_at
+                FROM package_purchases
+                WHERE payment_status = 'completed' AND purchased_at IS NOT NULL
+            ) history
+            ORDER BY ts
+        """)
+        backfilled = cur.rowcount
+
+        conn.commit()
+        print(f"activity_log table created successfully! ({backfilled} rows backfilled)")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error creating activity_log table: {e}")
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    create_activity_log_table()
@@ -0,0 +1,65 @@
+"""
+Migration script to create the email_outbox table.
+Auth and notification emails are enqueued here and sent in Gmail batches by
+the background sender in email_outbox.py, so requests don't wait on Google.
+"""
+from db import get_db_connection
+
+
+def create_email_outbox_table():
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT FROM information_schema.tables
+                WHERE table_name = 'email_outbox'
+            );
+        """)
+        if cur.fetchone()[0]:
+            print("email_outbox table already exists.")
+            return
+
+        print("Creating email_outbox table...")
+        cur.execute("""
+            CREATE TABLE email_outbox (
+                id BIGSERIAL PRIMARY KEY,
+                to_email VARCHAR(255) NOT NULL,
+                subject TEXT NOT NULL,
+                html_content TEXT NOT NULL,
+                logo_path TEXT,
+                from_email VARCHAR(255),
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                sent_at TIMESTAMP
+            );
+        """)
+        # Only pending rows are ever scanned by the sender
+        cur.execute("""
+            CREATE INDEX idx_email_outbox_pending
+            ON email_outbox (next_attempt_at, id)
+            WHERE status = 'pending';
+        """)
+        conn.commit()
+        print("email_outbox table created successfully!")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error creating email_outbox table: {e}")
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    create_email_outbox_table()
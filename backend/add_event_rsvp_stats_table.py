@@ -0,0 +1,79 @@
+"""
+Migration script to create the event_rsvp_stats table.
+Per-event RSVP counters, recomputed (rsvp_coalescer.refresh_event_stats) in the
+same transaction as every write to guests. The event list reads its counts from here.
+"""
+from db import get_db_connection
+
+# Columns added after the table was first created: name -> definition
+ADDED_COLUMNS = {
+    "total_people": "INTEGER NOT NULL DEFAULT 0",
+    "confirmed_quantity": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def create_event_rsvp_stats_table():
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT FROM information_schema.tables
+                WHERE table_name = 'event_rsvp_stats'
+            );
+        """)
+        if cur.fetchone()[0]:
+            cur.execute("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_name = 'event_rsvp_stats'
+            """)
+            existing = {row[0] for row in cur.fetchall()}
+            missing = [name for name in ADDED_COLUMNS if name not in existing]
+            if not missing:
+                print("event_rsvp_stats table already exists.")
+                return
+            print(f"Adding {', '.join(missing)} to event_rsvp_stats...")
+            for name in missing:
+                cur.execute(f"ALTER TABLE event_rsvp_stats ADD COLUMN IF NOT EXISTS {name} {ADDED_COLUMNS[name]}")
+        else:
+            print("Creating event_rsvp_stats table...")
+            cur.execute("""
+                CREATE TABLE event_rsvp_stats (
+                    event_id INTEGER PRIMARY KEY REFERENCES events(id) ON DELETE CASCADE,
+                    total_guests INTEGER NOT NULL DEFAULT 0,
+                    confirmed_guests INTEGER NOT NULL DEFAULT 0,
+                    declined_guests INTEGER NOT NULL DEFAULT 0,
+                    maybe_guests INTEGER NOT NULL DEFAULT 0,
+                    pending_guests INTEGER NOT NULL DEFAULT 0,
+                    confirmed_people INTEGER NOT NULL DEFAULT 0,
+                    total_people INTEGER NOT NULL DEFAULT 0,
+                    confirmed_quantity INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+                );
+            """)
+
+        # Backfill every event (events without guests get a zero row)
+        from rsvp_coalescer import refresh_event_stats
+        cur.execute("SELECT id FROM events")
+        event_ids = [row[0] for row in cur.fetchall()]
+        refresh_event_stats(cur, event_ids)
+        conn.commit()
+        print(f"event_rsvp_stats table ready! ({len(event_ids)} events backfilled)")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error creating event_rsvp_stats table: {e}")
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    create_event_rsvp_stats_table()
@@ -0,0 +1,62 @@
+"""
+Migration script to create the jobs table.
+Persists state and progress of long-running admin jobs (bulk sends) so
+/api/admin/jobs/{id} can report on them from any worker process.
+"""
+from db import get_db_connection
+
+
+def create_jobs_table():
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT FROM information_schema.tables
+                WHERE table_name = 'jobs'
+            );
+        """)
+        if cur.fetchone()[0]:
+            print("jobs table already exists.")
+            return
+
+        print("Creating jobs table...")
+        cur.execute("""
+            CREATE TABLE jobs (
+                id VARCHAR(32) PRIMARY KEY,
+                job_type VARCHAR(50) NOT NULL,
+                event_id INTEGER,
+                status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                total INTEGER NOT NULL DEFAULT 0,
+                processed INTEGER NOT NULL DEFAULT 0,
+                succeeded INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                error_message TEXT,
+                cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+                created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+            );
+        """)
+        cur.execute("CREATE INDEX idx_jobs_created_at ON jobs (created_at DESC);")
+        conn.commit()
+        print("jobs table created successfully!")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error creating jobs table: {e}")
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    create_jobs_table()
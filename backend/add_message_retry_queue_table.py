@@ -0,0 +1,65 @@
+"""
+Migration script to create the message_retry_queue table.
+Scheduled-message sends that failed transiently (provider timeout, 5xx, rate
+limit, open circuit breaker) are parked here and re-driven with backoff by the
+background worker in message_retry_queue.py.
+"""
+from db import get_db_connection
+
+
+def create_message_retry_queue_table():
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT FROM information_schema.tables
+                WHERE table_name = 'message_retry_queue'
+            );
+        """)
+        if cur.fetchone()[0]:
+            print("message_retry_queue table already exists.")
+            return
+
+        print("Creating message_retry_queue table...")
+        cur.execute("""
+            CREATE TABLE message_retry_queue (
+                id BIGSERIAL PRIMARY KEY,
+                scheduled_message_id INTEGER NOT NULL REFERENCES scheduled_messages(id) ON DELETE CASCADE,
+                guest_id INTEGER NOT NULL REFERENCES guests(id) ON DELETE CASCADE,
+                kind VARCHAR(20) NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                sent_at TIMESTAMP,
+                UNIQUE (scheduled_message_id, guest_id)
+            );
+        """)
+        # Only pending rows are ever scanned by the worker
+        cur.execute("""
+            CREATE INDEX idx_message_retry_queue_pending
+            ON message_retry_queue (next_attempt_at, id)
+            WHERE status = 'pending';
+        """)
+        conn.commit()
+        print("message_retry_queue table created successfully!")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error creating message_retry_queue table: {e}")
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    create_message_retry_queue_table()
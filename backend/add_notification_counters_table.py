@@ -0,0 +1,58 @@
+"""
+Migration script to create the notification_counters table.
+Holds the per-user unread count, maintained by notifications.py on insert and
+mark-read, so the unread badge no longer needs a COUNT(*) per poll.
+"""
+from db import get_db_connection
+
+
+def create_notification_counters_table():
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT FROM information_schema.tables
+                WHERE table_name = 'notification_counters'
+            );
+        """)
+        if cur.fetchone()[0]:
+            print("notification_counters table already exists.")
+            return
+
+        print("Creating notification_counters table...")
+        cur.execute("""
+            CREATE TABLE notification_counters (
+                user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+                unread_count INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+            );
+        """)
+        cur.execute("""
+            INSERT INTO notification_counters (user_id, unread_count)
+            SELECT user_id, COUNT(*)
+            FROM notifications
+            WHERE is_read = FALSE
+            GROUP BY user_id
+        """)
+        backfilled = cur.rowcount
+        conn.commit()
+        print(f"notification_counters table created successfully! ({backfilled} users backfilled)")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error creating notification_counters table: {e}")
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    create_notification_counters_table()
@@ -0,0 +1,56 @@
+"""
+Migration script to add a NOTIFY trigger on the packages table.
+Any insert/update/delete on packages (seed scripts, manual SQL) publishes on the
+package_catalog channel so every worker reloads its cached catalog
+(package_catalog.py).
+"""
+from db import get_db_connection
+
+
+def add_package_catalog_trigger():
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT FROM pg_trigger WHERE tgname = 'packages_catalog_notify'
+            );
+        """)
+        if cur.fetchone()[0]:
+            print("packages_catalog_notify trigger already exists.")
+            return
+
+        print("Creating packages_catalog_notify trigger...")
+        cur.execute("""
+            CREATE OR REPLACE FUNCTION notify_package_catalog() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('package_catalog', '{}');
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        cur.execute("""
+            CREATE TRIGGER packages_catalog_notify
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON packages
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_package_catalog();
+        """)
+        conn.commit()
+        print("packages_catalog_notify trigger created successfully!")
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error creating packages_catalog_notify trigger: {e}")
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    add_package_catalog_trigger()
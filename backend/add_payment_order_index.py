@@ -0,0 +1,75 @@
+"""
+Migration script to index package_purchases.tranzila_transaction_id.
+Payment status polls and Tranzila callbacks look purchases up by order id; the
+column had no index. Adds a unique constraint backed by a unique index (built
+CONCURRENTLY so payments are not blocked while it builds).
+"""
+from db import get_db_connection
+
+INDEX_NAME = "idx_package_purchases_tranzila_txn"
+CONSTRAINT_NAME = "uq_package_purchases_tranzila_txn"
+
+
+def add_payment_order_index():
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT FROM pg_constraint WHERE conname = %s
+            );
+        """, (CONSTRAINT_NAME,))
+        if cur.fetchone()[0]:
+            print("tranzila_transaction_id unique constraint already exists.")
+            return
+
+        cur.execute("""
+            SELECT tranzila_transaction_id, COUNT(*)
+            FROM package_purchases
+            WHERE tranzila_transaction_id IS NOT NULL
+            GROUP BY tranzila_transaction_id
+            HAVING COUNT(*) > 1
+            LIMIT 10
+        """)
+        duplicates = cur.fetchall()
+        if duplicates:
+            # Still index the lookups; the constraint waits for manual cleanup
+            print(f"⚠️ Duplicate tranzila_transaction_id values, skipping unique constraint: {duplicates}")
+            cur.execute(f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME}_lookup
+                ON package_purchases (tranzila_transaction_id);
+            """)
+            return
+
+        print("Creating unique index on package_purchases.tranzila_transaction_id...")
+        # A failed CONCURRENTLY build leaves an INVALID index behind - drop it first
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME};")
+        cur.execute(f"""
+            CREATE UNIQUE INDEX CONCURRENTLY {INDEX_NAME}
+            ON package_purchases (tranzila_transaction_id);
+        """)
+        cur.execute(f"""
+            ALTER TABLE package_purchases
+            ADD CONSTRAINT {CONSTRAINT_NAME} UNIQUE USING INDEX {INDEX_NAME};
+        """)
+        # The fallback lookup index is redundant now
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}_lookup;")
+        print("tranzila_transaction_id unique constraint created successfully!")
+
+    except Exception as e:
+        print(f"Error adding tranzila_transaction_id index: {e}")
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    add_payment_order_index()
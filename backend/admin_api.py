@@ -1,17 +1,91 @@
-from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
+import asyncio
+import json
 import psycopg2
-import os
+from collections import deque
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 
-load_dotenv()
+from activity_log import (
+    log_activity, serialize_activity, ACTIVITY_CHANNEL, MESSAGES_SENT
+)
+from pg_events import hub, POLL_TIMEOUT_SECONDS
+from jobs import job_registry
+from settings import settings
+from metrics import InstrumentedConnection
+from package_catalog import package_catalog, SEND_METHOD_SMS
+from db import json_keys_sql
+from invitation_images import image_keys_sql
+from rsvp_coalescer import refresh_event_stats
 
 router = APIRouter()
 
+# Activity SSE stream
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 3000
+SSE_REPLAY_LIMIT = 500
+# activity_log ids come from a sequence and can commit out of order, so a replay
+# re-reads this many ids below the cursor; ids already sent on the connection are dropped
+SSE_REPLAY_OVERLAP = 100
+SSE_SEEN_IDS = 1000
+
 def get_db_connection():
-    return psycopg2.connect(os.getenv("DATABASE_URL"))
+    return psycopg2.connect(settings.database_url, connection_factory=InstrumentedConnection)
+
+
+# ============================================================================
+# LIST FILTERS (shared with admin_export)
+# ============================================================================
+
+def build_purchases_filter(status: Optional[str] = None, package_name: Optional[str] = None):
+    """WHERE clause + params for package_purchases pp JOIN packages p - excludes pending/failed by default"""
+    where_parts = ["pp.status NOT IN ('pending', 'failed')"]
+    params = []
+
+    if status:
+        where_parts = ["pp.status = %s"]
+        params = [status]
+
+    if package_name:
+        where_parts.append("p.name = %s")
+        params.append(package_name)
+
+    return "WHERE " + " AND ".join(where_parts), params
+
+
+def build_guests_filter(status: Optional[str] = None, search: Optional[str] = None):
+    """WHERE clause + params for guests g"""
+    where_parts = []
+    params = []
+
+    if status:
+        where_parts.append("g.attendance_status = %s")
+        params.append(status)
+
+    if search:
+        where_parts.append("(LOWER(g.full_name) LIKE %s OR g.phone LIKE %s)")
+        search_pattern = f"%{search.lower()}%"
+        params.extend([search_pattern, search_pattern])
+
+    where_clause = "WHERE " + " AND ".join(where_parts) if where_parts else ""
+    return where_clause, params
+
+
+def build_gifts_filter(search: Optional[str] = None):
+    """WHERE clause + params for gifts gf LEFT JOIN guests g / events e"""
+    where_parts = []
+    params = []
+
+    if search:
+        where_parts.append("(LOWER(g.full_name) LIKE %s OR LOWER(e.event_title) LIKE %s)")
+        search_pattern = f"%{search.lower()}%"
+        params.extend([search_pattern, search_pattern])
+
+    where_clause = "WHERE " + " AND ".join(where_parts) if where_parts else ""
+    return where_clause, params
 
 
 # ============================================================================
@@ -72,16 +146,12 @@ async def get_dashboard_stats():
         """)
         active_packages = cursor.fetchone()[0]
 
-        # סך כל אורחים
-        cursor.execute("SELECT COUNT(*) FROM guests")
-        total_guests = cursor.fetchone()[0]
-
-        # אישורי הגעה
+        # סך כל אורחים ואישורי הגעה - מהמונים של event_rsvp_stats
         cursor.execute("""
-            SELECT COUNT(*) FROM guests
-            WHERE attendance_status = 'confirmed'
+            SELECT COALESCE(SUM(total_guests), 0)::bigint, COALESCE(SUM(confirmed_guests), 0)::bigint
+            FROM event_rsvp_stats
         """)
-        confirmed_guests = cursor.fetchone()[0]
+        total_guests, confirmed_guests = cursor.fetchone()
 
         # סך כל מתנות כספיות
         cursor.execute("SELECT COALESCE(SUM(amount), 0) FROM gifts")
@@ -417,13 +487,11 @@ async def get_all_events(
             SELECT
                 e.id, e.event_type, e.event_title, e.event_date, e.event_location,
                 e.status, e.created_at, u.email, u.full_name,
-                COUNT(DISTINCT g.id) as guest_count
+                COALESCE(s.total_guests, 0) as guest_count
             FROM events e
             LEFT JOIN users u ON e.user_id = u.id
-            LEFT JOIN guests g ON e.id = g.event_id
+            LEFT JOIN event_rsvp_stats s ON s.event_id = e.id
             {where_clause}
-            GROUP BY e.id, e.event_type, e.event_title, e.event_date,
-                     e.event_location, e.status, e.created_at, u.email, u.full_name
             ORDER BY e.created_at DESC
             LIMIT %s OFFSET %s
         """
@@ -548,19 +616,7 @@ async def get_package_purchases(
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        # Build WHERE clause - exclude pending/failed by default
-        where_parts = ["pp.status NOT IN ('pending', 'failed')"]
-        params = []
-
-        if status:
-            where_parts = ["pp.status = %s"]
-            params = [status]
-
-        if package_name:
-            where_parts.append("p.name = %s")
-            params.append(package_name)
-
-        where_clause = "WHERE " + " AND ".join(where_parts) if where_parts else ""
+        where_clause, params = build_purchases_filter(status, package_name)
 
         # Count total
         cursor.execute(f"""
@@ -901,20 +957,7 @@ async def get_all_guests(
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        # Build WHERE clause
-        where_parts = []
-        params = []
-
-        if status:
-            where_parts.append("g.attendance_status = %s")
-            params.append(status)
-
-        if search:
-            where_parts.append("(LOWER(g.full_name) LIKE %s OR g.phone LIKE %s)")
-            search_pattern = f"%{search.lower()}%"
-            params.extend([search_pattern, search_pattern])
-
-        where_clause = "WHERE " + " AND ".join(where_parts) if where_parts else ""
+        where_clause, params = build_guests_filter(status, search)
 
         # Count total
         cursor.execute(f"""
@@ -1014,15 +1057,14 @@ async def get_events_with_guest_counts(
             SELECT
                 e.id, e.event_title, e.event_type, e.event_date, e.event_location, e.status,
                 u.full_name as user_name,
-                COUNT(DISTINCT g.id) as total_guests,
-                COUNT(DISTINCT CASE WHEN g.status = 'confirmed' THEN g.id END) as confirmed,
-                COUNT(DISTINCT CASE WHEN g.status = 'pending' OR g.status IS NULL THEN g.id END) as pending,
-                COUNT(DISTINCT CASE WHEN g.status = 'declined' THEN g.id END) as declined
+                COALESCE(s.total_guests, 0) as total_guests,
+                COALESCE(s.confirmed_guests, 0) as confirmed,
+                COALESCE(s.pending_guests, 0) as pending,
+                COALESCE(s.declined_guests, 0) as declined
             FROM events e
             LEFT JOIN users u ON e.user_id = u.id
-            LEFT JOIN guests g ON e.id = g.event_id
+            LEFT JOIN event_rsvp_stats s ON s.event_id = e.id
             {where_clause}
-            GROUP BY e.id, e.event_title, e.event_type, e.event_date, e.event_location, e.status, u.full_name
             ORDER BY e.created_at DESC
             LIMIT %s OFFSET %s
         """
@@ -1146,13 +1188,14 @@ async def update_guest_status_admin(guest_id: int, body: dict):
             UPDATE guests
             SET status = %s, attendance_status = %s, updated_at = NOW()
             WHERE id = %s
-            RETURNING id, full_name, status
+            RETURNING id, full_name, status, event_id
         """, (new_status, new_status, guest_id))
 
         result = cursor.fetchone()
         if not result:
             raise HTTPException(status_code=404, detail="Guest not found")
 
+        refresh_event_stats(cursor, [result[3]])
         conn.commit()
         cursor.close()
 
@@ -1191,13 +1234,14 @@ async def update_guest_count_admin(guest_id: int, body: dict):
             UPDATE guests
             SET guests_count = %s, attending_count = %s, updated_at = NOW()
             WHERE id = %s
-            RETURNING id, full_name, guests_count
+            RETURNING id, full_name, guests_count, event_id
         """, (guests_count, guests_count, guest_id))
 
         result = cursor.fetchone()
         if not result:
             raise HTTPException(status_code=404, detail="Guest not found")
 
+        refresh_event_stats(cursor, [result[3]])
         conn.commit()
         cursor.close()
 
@@ -1238,16 +1282,7 @@ async def get_all_gifts(
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        # Build WHERE clause
-        where_parts = []
-        params = []
-
-        if search:
-            where_parts.append("(LOWER(g.full_name) LIKE %s OR LOWER(e.event_title) LIKE %s)")
-            search_pattern = f"%{search.lower()}%"
-            params.extend([search_pattern, search_pattern])
-
-        where_clause = "WHERE " + " AND ".join(where_parts) if where_parts else ""
+        where_clause, params = build_gifts_filter(search)
 
         # Count total
         cursor.execute(f"""
@@ -1375,13 +1410,12 @@ async def get_events_with_scheduled_messages(
                 COUNT(CASE WHEN sm.status = 'failed' THEN 1 END) as failed_count,
                 COALESCE(SUM(sm.guests_sent_count), 0) as total_sent,
                 COALESCE(SUM(sm.guests_failed_count), 0) as total_failed,
-                p.name as package_name
+                pp.package_id
             FROM scheduled_messages sm
             LEFT JOIN events e ON sm.event_id = e.id
             LEFT JOIN package_purchases pp ON e.package_purchase_id = pp.id
-            LEFT JOIN packages p ON pp.package_id = p.id
             {where_clause}
-            GROUP BY e.id, e.event_title, e.event_type, e.event_date, e.event_location, p.name
+            GROUP BY e.id, e.event_title, e.event_type, e.event_date, e.event_location, pp.package_id
             ORDER BY MAX(sm.scheduled_date) DESC
             LIMIT %s OFFSET %s
         """
@@ -1390,16 +1424,6 @@ async def get_events_with_scheduled_messages(
         cursor.execute(query, params)
         events = cursor.fetchall()
 
-        def send_method_from_package(pkg_name):
-            if not pkg_name:
-                return "WhatsApp"
-            name_lower = pkg_name.lower()
-            if "בסיס" in name_lower or "ידני" in name_lower:
-                return "ידני"
-            if "sms" in name_lower:
-                return "SMS"
-            return "WhatsApp"
-
         events_list = []
         for ev in events:
             events_list.append({
@@ -1408,8 +1432,8 @@ async def get_events_with_scheduled_messages(
                 "event_type": ev[2],
                 "event_date": ev[3].isoformat() if ev[3] else None,
                 "event_location": ev[4],
-                "send_method": send_method_from_package(ev[11]),
-                "package_name": ev[11],
+                "send_method": package_catalog.send_method_for(ev[11]),
+                "package_name": package_catalog.name_for(ev[11]),
                 "total_messages": ev[5],
                 "pending_count": ev[6],
                 "sent_count": ev[7],
@@ -1454,26 +1478,15 @@ async def get_event_scheduled_messages(event_id: int):
                 sm.status, sm.sent_at, sm.guests_sent_count, sm.guests_failed_count,
                 sm.error_message, sm.created_at,
                 e.event_title,
-                p.name as package_name
+                pp.package_id
             FROM scheduled_messages sm
             LEFT JOIN events e ON sm.event_id = e.id
             LEFT JOIN package_purchases pp ON e.package_purchase_id = pp.id
-            LEFT JOIN packages p ON pp.package_id = p.id
             WHERE sm.event_id = %s
             ORDER BY sm.message_number ASC
         """, (event_id,))
         messages = cursor.fetchall()
 
-        def send_method_from_package(pkg_name):
-            if not pkg_name:
-                return "WhatsApp"
-            name_lower = pkg_name.lower()
-            if "בסיס" in name_lower or "ידני" in name_lower:
-                return "ידני"
-            if "sms" in name_lower:
-                return "SMS"
-            return "WhatsApp"
-
         messages_list = []
         for msg in messages:
             messages_list.append({
@@ -1487,7 +1500,7 @@ async def get_event_scheduled_messages(event_id: int):
                 "error_message": msg[7],
                 "created_at": msg[8].isoformat() if msg[8] else None,
                 "event_title": msg[9],
-                "send_method": send_method_from_package(msg[10])
+                "send_method": package_catalog.send_method_for(msg[10])
             })
 
         cursor.close()
@@ -1570,35 +1583,43 @@ async def update_scheduled_message_admin(msg_id: int, body: dict):
 # MANUAL SEND - ADMIN TRIGGERED
 # ============================================================================
 
-def _bg_send_invitation(event_id: int, event_data: dict, use_sms: bool):
-    """Background task: שולח הזמנות לכל האורחים שלא הגיבו."""
-    from scheduler_service import get_guests_for_event, send_whatsapp_invitation, send_sms_invitation
+def _job_send_invitation(job, event_id: int, event_data: dict, use_sms: bool, guests: list):
+    """Job: שולח הזמנות לכל האורחים שלא הגיבו."""
+    from scheduler_service import send_whatsapp_invitation, send_sms_invitation
+    from event_render_context import EventRenderContext
     import time
-    guests = get_guests_for_event(event_id, exclude_responded=True)
-    print(f"[BG] send-invitation event={event_id}, guests={len(guests)}, sms={use_sms}")
+    print(f"[JOB {job.id}] send-invitation event={event_id}, guests={len(guests)}, sms={use_sms}")
+    ctx = EventRenderContext.build(event_data)
+    send_one = send_sms_invitation if use_sms else send_whatsapp_invitation
     for guest in guests:
-        result = send_sms_invitation(guest, event_data) if use_sms else send_whatsapp_invitation(guest, event_data)
-        print(f"[BG] {'✓' if result['success'] else '✗'} {guest['name']}")
+        if job.cancelled:
+            break
+        result = send_one(guest, ctx)
+        job.advance(result['success'])
         time.sleep(0.1)
+    log_activity(MESSAGES_SENT, f"Invitation ({'SMS' if use_sms else 'WhatsApp'}): {job.succeeded}/{len(guests)}", event_id=event_id)
 
 
-def _bg_send_day_sms(event_id: int, event_title: str, template: str, waze_link: str, no_table_template: str = None):
-    """Background task: שולח SMS יום האירוע לכל האורחים המאושרים."""
-    from scheduler_service import get_guests_with_table_for_event, send_day_of_event_sms
+def _job_send_day_sms(job, event_id: int, event_title: str, template: str, waze_link: str,
+                      no_table_template: str, guests: list):
+    """Job: שולח SMS יום האירוע לכל האורחים המאושרים."""
+    from scheduler_service import send_day_of_event_sms
     import time
-    guests = get_guests_with_table_for_event(event_id)
-    print(f"[BG] send-day-sms event={event_id}, guests={len(guests)}")
+    print(f"[JOB {job.id}] send-day-sms event={event_id}, guests={len(guests)}")
     for guest in guests:
+        if job.cancelled:
+            break
         result = send_day_of_event_sms(guest, event_title, template, waze_link, no_table_template)
-        print(f"[BG] {'✓' if result['success'] else '✗'} {guest['name']}")
+        job.advance(result['success'])
         time.sleep(0.1)
+    log_activity(MESSAGES_SENT, f"Day-of-event SMS: {job.succeeded}/{len(guests)}", event_id=event_id)
 
 
 @router.post("/api/admin/events/{event_id}/send-invitation")
-async def admin_send_invitation(event_id: int, background_tasks: BackgroundTasks):
+async def admin_send_invitation(event_id: int):
     """
     שליחה ידנית של הזמנה לכל האורחים שלא אישרו/דחו.
-    רצה ברקע כדי לא לחסום את השרת.
+    רצה כ-job ברקע - מחזיר job_id למעקב ב-/api/admin/jobs/{job_id}.
     """
     conn = None
     try:
@@ -1606,9 +1627,9 @@ async def admin_send_invitation(event_id: int, background_tasks: BackgroundTasks
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT e.id, e.event_title, e.event_date, e.event_time, e.event_location,
-                   e.invitation_data, pp.package_id
+                   {image_keys_sql()}, pp.package_id
             FROM events e
             LEFT JOIN package_purchases pp ON e.package_purchase_id = pp.id
             WHERE e.id = %s
@@ -1622,14 +1643,15 @@ async def admin_send_invitation(event_id: int, background_tasks: BackgroundTasks
             'event_time': row[3], 'event_location': row[4],
             'invitation_data': row[5], 'package_id': row[6]
         }
-        use_sms = row[6] == 2
+        use_sms = package_catalog.send_method_for(row[6]) == SEND_METHOD_SMS
 
         guests = get_guests_for_event(event_id, exclude_responded=True)
         if not guests:
             return {'message': 'אין אורחים לשליחה (כולם כבר הגיבו)', 'total_guests': 0}
 
-        background_tasks.add_task(_bg_send_invitation, event_id, event_data, use_sms)
-        return {'message': f'השליחה התחילה ברקע ל-{len(guests)} אורחים', 'total_guests': len(guests)}
+        job = job_registry.submit('send_invitation', len(guests), _job_send_invitation,
+                                  event_id, event_data, use_sms, guests, event_id=event_id)
+        return {'message': f'השליחה התחילה ברקע ל-{len(guests)} אורחים', 'total_guests': len(guests), 'job_id': job.id}
 
     except HTTPException:
         raise
@@ -1641,19 +1663,23 @@ async def admin_send_invitation(event_id: int, background_tasks: BackgroundTasks
 
 
 @router.post("/api/admin/events/{event_id}/send-day-sms")
-async def admin_send_day_sms(event_id: int, background_tasks: BackgroundTasks):
+async def admin_send_day_sms(event_id: int):
     """
     שליחה ידנית של SMS יום האירוע עם מספר שולחן.
-    רצה ברקע כדי לא לחסום את השרת.
+    רצה כ-job ברקע - מחזיר job_id למעקב ב-/api/admin/jobs/{job_id}.
     """
     conn = None
     try:
-        from scheduler_service import get_guests_with_table_for_event, DEFAULT_DAY_OF_EVENT_SMS, DEFAULT_DAY_OF_EVENT_SMS_NO_TABLE
+        from scheduler_service import (
+            get_guests_with_table_for_event, DEFAULT_DAY_OF_EVENT_SMS, DEFAULT_DAY_OF_EVENT_SMS_NO_TABLE,
+            DAY_OF_EVENT_SETTINGS_KEYS
+        )
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT e.event_title, e.message_settings, e.bit_payment_link
+        cursor.execute(f"""
+            SELECT e.event_title, {json_keys_sql('e.message_settings', DAY_OF_EVENT_SETTINGS_KEYS)},
+                   e.bit_payment_link
             FROM events e WHERE e.id = %s
         """, (event_id,))
         row = cursor.fetchone()
@@ -1670,8 +1696,10 @@ async def admin_send_day_sms(event_id: int, background_tasks: BackgroundTasks):
         if not guests:
             return {'message': 'אין אורחים מאושרים לשליחה', 'total_guests': 0}
 
-        background_tasks.add_task(_bg_send_day_sms, event_id, event_title, template, waze_link, no_table_template)
-        return {'message': f'השליחה התחילה ברקע ל-{len(guests)} אורחים', 'total_guests': len(guests)}
+        job = job_registry.submit('send_day_sms', len(guests), _job_send_day_sms,
+                                  event_id, event_title, template, waze_link, no_table_template, guests,
+                                  event_id=event_id)
+        return {'message': f'השליחה התחילה ברקע ל-{len(guests)} אורחים', 'total_guests': len(guests), 'job_id': job.id}
 
     except HTTPException:
         raise
@@ -1683,11 +1711,12 @@ async def admin_send_day_sms(event_id: int, background_tasks: BackgroundTasks):
 
 
 @router.post("/api/admin/scheduled-messages/{msg_id}/send-now")
-async def admin_send_scheduled_message_now(msg_id: int, background_tasks: BackgroundTasks):
+async def admin_send_scheduled_message_now(msg_id: int):
     """
     שליחה ידנית של הודעה מתוזמנת ספציפית.
     הודעה 1 = הזמנה, הודעות 2+ = תזכורת.
     מעדכן סטטוס ל-completed כדי שלא תישלח שוב אוטומטית.
+    רצה כ-job ברקע - מחזיר job_id למעקב ב-/api/admin/jobs/{job_id}.
     """
     conn = None
     try:
@@ -1695,10 +1724,10 @@ async def admin_send_scheduled_message_now(msg_id: int, background_tasks: Backgr
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT sm.id, sm.event_id, sm.message_number, sm.status,
                    e.event_title, e.event_date, e.event_time, e.event_location,
-                   e.invitation_data, pp.package_id
+                   {image_keys_sql()}, pp.package_id
             FROM scheduled_messages sm
             JOIN events e ON sm.event_id = e.id
             LEFT JOIN package_purchases pp ON e.package_purchase_id = pp.id
@@ -1721,7 +1750,7 @@ async def admin_send_scheduled_message_now(msg_id: int, background_tasks: Backgr
         }
 
         is_reminder = row[2] >= 2
-        use_sms = row[9] == 2
+        use_sms = package_catalog.send_method_for(row[9]) == SEND_METHOD_SMS
 
         guests = get_guests_for_event(row[1], exclude_responded=is_reminder)
         if not guests:
@@ -1743,24 +1772,28 @@ async def admin_send_scheduled_message_now(msg_id: int, background_tasks: Backgr
         """, (msg_id,))
         conn.commit()
 
-        def _bg_send(scheduled_msg, guests, use_sms, is_reminder, msg_id):
+        def _job_send(job, scheduled_msg, guests, use_sms, is_reminder, msg_id):
             import time
             from db import get_db_connection as _get_db
-            sent = 0
-            failed = 0
+            from event_render_context import EventRenderContext
+            ctx = EventRenderContext.build(scheduled_msg, is_reminder=is_reminder)
+            if use_sms:
+                send_one = send_sms_invitation
+            elif is_reminder:
+                send_one = send_whatsapp_reminder
+            else:
+                send_one = send_whatsapp_invitation
             for guest in guests:
-                if use_sms:
-                    result = send_sms_invitation(guest, scheduled_msg)
-                elif is_reminder:
-                    result = send_whatsapp_reminder(guest, scheduled_msg)
-                else:
-                    result = send_whatsapp_invitation(guest, scheduled_msg)
-                if result['success']:
-                    sent += 1
-                else:
-                    failed += 1
+                if job.cancelled:
+                    break
+                result = send_one(guest, ctx)
+                job.advance(result['success'])
                 time.sleep(0.1)
+            sent = job.succeeded
+            failed = job.failed
             # Update counts
+            _conn = None
+            _cur = None
             try:
                 _conn = _get_db()
                 _cur = _conn.cursor()
@@ -1769,15 +1802,23 @@ async def admin_send_scheduled_message_now(msg_id: int, background_tasks: Backgr
                     SET guests_sent_count = %s, guests_failed_count = %s
                     WHERE id = %s
                 """, (sent, failed, msg_id))
+                log_activity(MESSAGES_SENT, f"Message #{scheduled_msg['message_number']}: {sent} sent, {failed} failed",
+                             event_id=scheduled_msg['event_id'], cur=_cur)
                 _conn.commit()
-                _cur.close()
-                _conn.close()
             except Exception as e:
                 print(f"⚠️ Failed to update sent counts: {e}")
-
-        background_tasks.add_task(_bg_send, scheduled_msg, guests, use_sms, is_reminder, msg_id)
+                if _conn:
+                    _conn.rollback()
+            finally:
+                if _cur:
+                    _cur.close()
+                if _conn:
+                    _conn.close()
+
+        job = job_registry.submit('send_scheduled_message', len(guests), _job_send,
+                                  scheduled_msg, guests, use_sms, is_reminder, msg_id, event_id=row[1])
         msg_type = 'תזכורת' if is_reminder else 'הזמנה'
-        return {'message': f'שליחת {msg_type} התחילה ברקע ל-{len(guests)} אורחים', 'total_guests': len(guests)}
+        return {'message': f'שליחת {msg_type} התחילה ברקע ל-{len(guests)} אורחים', 'total_guests': len(guests), 'job_id': job.id}
 
     except HTTPException:
         raise
@@ -1788,6 +1829,40 @@ async def admin_send_scheduled_message_now(msg_id: int, background_tasks: Backgr
             conn.close()
 
 
+# ============================================================================
+# BACKGROUND JOBS
+# ============================================================================
+
+@router.get("/api/admin/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    סטטוס job ברקע - מצב, התקדמות, קצב ו-ETA
+    """
+    try:
+        job = await run_in_threadpool(job_registry.get, job_id)
+    except Exception as e:
+        print(f"Error fetching job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job לא נמצא")
+    return job
+
+
+@router.post("/api/admin/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    ביטול job - job בתור לא יתחיל, job רץ ייעצר אחרי ההודעה הנוכחית
+    """
+    try:
+        job = await run_in_threadpool(job_registry.cancel, job_id)
+    except Exception as e:
+        print(f"Error cancelling job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job לא נמצא")
+    return job
+
+
 # ============================================================================
 # CONTACT MESSAGE UPDATE
 # ============================================================================
@@ -1848,60 +1923,33 @@ async def update_contact_message(message_id: int, status: str = None):
 # ============================================================================
 
 @router.get("/api/admin/activity/recent")
-async def get_recent_activity(limit: int = Query(20, ge=1, le=100)):
+async def get_recent_activity(
+    limit: int = Query(20, ge=1, le=100),
+    before_id: Optional[int] = Query(None, description="Cursor - return activities older than this id")
+):
     """
-    פעילות אחרונה במערכת
+    פעילות אחרונה במערכת (מטבלת activity_log, עם דפדוף לפי cursor)
     """
     conn = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        activities = []
-
-        # Recent users
-        cursor.execute("""
-            SELECT 'user_registered' as type, email as details, created_at as timestamp
-            FROM users
-            WHERE is_admin = FALSE
-            ORDER BY created_at DESC
-            LIMIT 5
-        """)
-        activities.extend(cursor.fetchall())
-
-        # Recent events
-        cursor.execute("""
-            SELECT 'event_created' as type, event_title as details, created_at as timestamp
-            FROM events
-            ORDER BY created_at DESC
-            LIMIT 5
-        """)
-        activities.extend(cursor.fetchall())
-
-        # Recent packages - only completed payments
+        # Single backward scan on the primary key
         cursor.execute("""
-            SELECT 'package_purchased' as type, package_name as details, purchased_at as timestamp
-            FROM package_purchases
-            WHERE payment_status = 'completed'
-            ORDER BY purchased_at DESC
-            LIMIT 5
-        """)
-        activities.extend(cursor.fetchall())
-
-        # Sort all by timestamp
-        activities.sort(key=lambda x: x[2], reverse=True)
-        activities = activities[:limit]
+            SELECT id, activity_type, details, user_id, event_id, created_at
+            FROM activity_log
+            WHERE (%s::BIGINT IS NULL OR id < %s)
+            ORDER BY id DESC
+            LIMIT %s
+        """, (before_id, before_id, limit))
+        activities = cursor.fetchall()
 
         cursor.close()
 
         return {
-            "activities": [
-                {
-                    "type": a[0],
-                    "details": a[1],
-                    "timestamp": a[2].isoformat() if a[2] else None
-                } for a in activities
-            ]
+            "activities": [serialize_activity(a) for a in activities],
+            "next_cursor": activities[-1][0] if len(activities) == limit else None
         }
 
     except Exception as e:
@@ -1912,6 +1960,109 @@ async def get_recent_activity(limit: int = Query(20, ge=1, le=100)):
             conn.close()
 
 
+def _fetch_activities_after(after_id: int, limit: int):
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, activity_type, details, user_id, event_id, created_at
+            FROM activity_log
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+        """, (after_id, limit))
+        rows = cursor.fetchall()
+        cursor.close()
+        return [serialize_activity(r) for r in rows]
+    finally:
+        if conn:
+            conn.close()
+
+
+def _sse_activity(activity: dict) -> str:
+    return f"id: {activity['id']}\nevent: activity\ndata: {json.dumps(activity, ensure_ascii=False)}\n\n"
+
+
+@router.get("/api/admin/activity/stream")
+async def stream_activity(request: Request, after_id: Optional[int] = Query(None)):
+    """
+    זרם פעילות בזמן אמת (Server-Sent Events) - מחליף polling של /activity/recent.
+    בחיבור מחדש הדפדפן שולח Last-Event-ID ומקבל את מה שהוחמץ.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        after_id = int(last_event_id)
+
+    async def event_stream():
+        # The hub thread issues LISTEN up to POLL_TIMEOUT_SECONDS after subscribe(), so
+        # rows committed in that gap reach neither the queue nor an immediate replay.
+        # The replay therefore runs again once LISTEN is surely active.
+        queue = hub.subscribe(ACTIVITY_CHANNEL)
+        sent_order = deque()
+        sent_ids = set()
+        cursor = after_id
+
+        def mark_sent(activity_id: int) -> bool:
+            """False if this id was already sent on the connection"""
+            if activity_id in sent_ids:
+                return False
+            sent_ids.add(activity_id)
+            sent_order.append(activity_id)
+            if len(sent_order) > SSE_SEEN_IDS:
+                sent_ids.discard(sent_order.popleft())
+            return True
+
+        async def replay():
+            nonlocal cursor
+            missed = await run_in_threadpool(
+                _fetch_activities_after, max(cursor - SSE_REPLAY_OVERLAP, 0), SSE_REPLAY_LIMIT
+            )
+            for activity in missed:
+                cursor = max(cursor, activity["id"])
+                if mark_sent(activity["id"]):
+                    yield _sse_activity(activity)
+
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+
+            catch_up_at = None
+            if after_id is not None:
+                # Ids just below Last-Event-ID may have committed after the client saw it;
+                # clients dedupe redelivered events by their SSE id
+                async for chunk in replay():
+                    yield chunk
+                catch_up_at = asyncio.get_running_loop().time() + POLL_TIMEOUT_SECONDS * 2
+
+            while True:
+                if await request.is_disconnected():
+                    break
+                timeout = SSE_HEARTBEAT_SECONDS
+                if catch_up_at is not None:
+                    timeout = max(catch_up_at - asyncio.get_running_loop().time(), 0)
+                try:
+                    activity = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    if catch_up_at is not None:
+                        catch_up_at = None
+                        async for chunk in replay():
+                            yield chunk
+                    else:
+                        yield ": keep-alive\n\n"
+                    continue
+                if "id" not in activity or not mark_sent(activity["id"]):
+                    continue
+                yield _sse_activity(activity)
+        finally:
+            hub.unsubscribe(ACTIVITY_CHANNEL, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # ============================================================================
 # ADMIN - ASSIGN PACKAGE TO USER
 # ============================================================================
@@ -1943,11 +2094,7 @@ async def admin_assign_package(data: AdminAssignPackage):
             raise HTTPException(status_code=404, detail="המשתמש לא נמצא")
 
         # בדיקה שהחבילה קיימת
-        cursor.execute(
-            "SELECT id, name FROM packages WHERE id = %s",
-            (data.package_id,)
-        )
-        package = cursor.fetchone()
+        package = package_catalog.get(data.package_id)
         if not package:
             raise HTTPException(status_code=404, detail="החבילה לא נמצאה")
 
@@ -2,19 +2,16 @@ from fastapi import APIRouter, HTTPException, Request, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 import psycopg2
-import os
-import bcrypt
 from datetime import datetime, timedelta
 import random
 import string
-from dotenv import load_dotenv
 from email_service import send_admin_verification_code_email
-from jose import JWTError, jwt
-
-load_dotenv()
+from password_hashing import verify_password_async, hash_password_async, needs_rehash
+from settings import settings
+from metrics import InstrumentedConnection
 
 # הגדרות JWT
-SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
+SECRET_KEY = settings.jwt_secret_key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 24
 
@@ -23,7 +20,7 @@ security = HTTPBearer()
 router = APIRouter()
 
 def get_db_connection():
-    return psycopg2.connect(os.getenv("DATABASE_URL"))
+    return psycopg2.connect(settings.database_url, connection_factory=InstrumentedConnection)
 
 # מודלים
 class AdminLoginRequest(BaseModel):
@@ -49,12 +46,15 @@ def create_admin_token(admin_id: int, email: str, role: str):
         "is_admin": True,
         "exp": expire
     }
+    from jose import jwt  # נטען בשימוש הראשון, לא בעליית השרת
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 # פונקציה לאימות JWT token
 async def verify_admin_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """אימות JWT token של מנהל"""
+    from jose import JWTError, jwt
+
     try:
         token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -127,10 +127,20 @@ async def admin_login(request: AdminLoginRequest, req: Request):
         if not is_active:
             raise HTTPException(status_code=403, detail="Admin account is disabled")
 
-        # בדיקת סיסמה
-        if not bcrypt.checkpw(request.password.encode('utf-8'), hashed_password.encode('utf-8')):
+        # בדיקת סיסמה (ב-process pool, בלי לחסום את ה-event loop)
+        if not await verify_password_async(request.password, hashed_password):
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
+        # שדרוג שקוף של ה-hash אם ה-work factor השתנה
+        if needs_rehash(hashed_password):
+            try:
+                cursor.execute(
+                    "UPDATE admins SET password = %s WHERE id = %s",
+                    (await hash_password_async(request.password), admin_id)
+                )
+            except Exception as e:
+                print(f"Admin password rehash skipped: {e}")
+
         # יצירת קוד אימות חדש
         verification_code = generate_verification_code()
         expiry_time = datetime.now() + timedelta(minutes=15)
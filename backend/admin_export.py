@@ -0,0 +1,205 @@
+"""
+Admin exports - guests / gifts / purchases as CSV or XLSX.
+
+Rows are read from a named (server-side) cursor in EXPORT_FETCH_SIZE batches,
+so memory stays constant regardless of table size:
+- CSV is streamed to the client while the cursor is being read.
+- XLSX is written with openpyxl write-only mode to a temp file, then streamed.
+
+Filters are the same as the JSON list endpoints in admin_api.
+"""
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
+from typing import Optional
+from datetime import datetime
+import csv
+import io
+import os
+import tempfile
+
+from admin_api import get_db_connection, build_guests_filter, build_gifts_filter, build_purchases_filter
+
+router = APIRouter()
+
+# Rows per round trip from the server-side cursor
+EXPORT_FETCH_SIZE = 5000
+# Rows buffered before a CSV chunk is yielded
+CSV_CHUNK_ROWS = 1000
+# Excel sheet hard limit (including header row)
+XLSX_MAX_ROWS = 1048575
+
+
+EXPORTS = {
+    "guests": {
+        "headers": ["id", "full_name", "phone", "email", "guests_count", "attendance_status",
+                    "group_name", "invitation_sent", "created_at", "event_title"],
+        "query": """
+            SELECT
+                g.id, g.full_name, g.phone, g.email, g.guests_count,
+                g.attendance_status, g.group_name, g.invitation_sent, g.created_at,
+                e.event_title
+            FROM guests g
+            LEFT JOIN events e ON g.event_id = e.id
+            {where_clause}
+            ORDER BY g.created_at DESC
+        """,
+    },
+    "gifts": {
+        "headers": ["id", "amount", "currency", "gift_date", "payment_method", "notes",
+                    "created_at", "guest_name", "event_title"],
+        "query": """
+            SELECT
+                gf.id, gf.amount, COALESCE(gf.currency, 'ILS'), gf.gift_date, gf.payment_method,
+                gf.notes, gf.created_at, g.full_name, e.event_title
+            FROM gifts gf
+            LEFT JOIN guests g ON gf.guest_id = g.id
+            LEFT JOIN events e ON gf.event_id = e.id
+            {where_clause}
+            ORDER BY gf.created_at DESC
+        """,
+    },
+    "purchases": {
+        "headers": ["id", "package_name", "price", "purchase_date", "expiry_date", "status",
+                    "user_email", "user_name", "event_title", "guest_count", "payment_amount"],
+        "query": """
+            SELECT
+                pp.id, COALESCE(pp.package_name, p.name), p.price, pp.purchase_date, pp.expiry_date,
+                pp.status, u.email, u.full_name,
+                e.event_title, pp.guest_count, pp.payment_amount
+            FROM package_purchases pp
+            JOIN packages p ON pp.package_id = p.id
+            JOIN users u ON pp.user_id = u.id
+            LEFT JOIN events e ON pp.event_id = e.id
+            {where_clause}
+            ORDER BY pp.purchase_date DESC
+        """,
+    },
+}
+
+
+def build_export_query(entity: str, status: Optional[str] = None, search: Optional[str] = None,
+                       package_name: Optional[str] = None):
+    """SQL + params for an export, using the same filters as the list endpoints"""
+    if entity == "guests":
+        where_clause, params = build_guests_filter(status, search)
+    elif entity == "gifts":
+        where_clause, params = build_gifts_filter(search)
+    else:
+        where_clause, params = build_purchases_filter(status, package_name)
+    return EXPORTS[entity]["query"].format(where_clause=where_clause), params
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_export_rows(query: str, params: list):
+    """Yield rows from a named server-side cursor (constant memory)"""
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(name="admin_export")
+        cursor.itersize = EXPORT_FETCH_SIZE
+        cursor.execute(query, params)
+        for row in cursor:
+            yield row
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.rollback()
+            conn.close()
+
+
+def iter_csv(entity: str, query: str, params: list):
+    """Yield CSV text chunks (UTF-8 BOM first so Excel shows Hebrew correctly)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(EXPORTS[entity]["headers"])
+
+    pending = 0
+    for row in iter_export_rows(query, params):
+        writer.writerow([_cell(v) for v in row])
+        pending += 1
+        if pending >= CSV_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+
+    yield buffer.getvalue()
+
+
+def write_xlsx(entity: str, query: str, params: list, path: str) -> int:
+    """Write an XLSX export with openpyxl write-only mode. Returns the number of data rows."""
+    import openpyxl  # only needed for XLSX exports
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=entity)
+    sheet.append(EXPORTS[entity]["headers"])
+
+    count = 0
+    for row in iter_export_rows(query, params):
+        if count >= XLSX_MAX_ROWS:
+            print(f"⚠️ XLSX export of {entity} truncated at {XLSX_MAX_ROWS} rows (Excel limit)")
+            break
+        sheet.append([_cell(v) for v in row])
+        count += 1
+
+    workbook.save(path)
+    return count
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+@router.get("/api/admin/export/{entity}")
+async def export_entity(
+    entity: str,
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    status: Optional[str] = None,
+    search: Optional[str] = None,
+    package_name: Optional[str] = None
+):
+    """
+    ייצוא אורחים / מתנות / רכישות לקובץ CSV או XLSX (עם אותם פילטרים של רשימות הניהול)
+    """
+    if entity not in EXPORTS:
+        raise HTTPException(status_code=404, detail="סוג ייצוא לא קיים")
+
+    query, params = build_export_query(entity, status, search, package_name)
+    filename = f"{entity}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+
+    if format == "csv":
+        # Sync generator - Starlette iterates it in the threadpool
+        return StreamingResponse(
+            iter_csv(entity, query, params),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx", prefix=f"export_{entity}_")
+    os.close(fd)
+    try:
+        await run_in_threadpool(write_xlsx, entity, query, params, path)
+    except Exception as e:
+        _remove_file(path)
+        print(f"Error exporting {entity}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return FileResponse(
+        path,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=filename,
+        background=BackgroundTask(_remove_file, path)
+    )
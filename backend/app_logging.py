@@ -0,0 +1,256 @@
+"""
+Structured logging for the hot send / webhook paths.
+
+The provider clients used to print full request payloads and response bodies
+for every message, synchronously, from the request thread (or the event loop).
+Loggers from get_logger() instead:
+- check the level first, so disabled debug lines cost one comparison
+- hand the record to a bounded in-memory queue; formatting, redaction and the
+  stdout write happen on a background writer thread (QueueListener). When the
+  queue is full the record is dropped and counted, the caller never blocks
+- sample high-volume categories: LOG_SAMPLE="gupshup=0.01,webhook=0.1" keeps
+  that share of debug/info records (warnings and errors are always kept)
+- redact secrets (apikey / token / password / authorization fields, bearer
+  tokens) and phone numbers (last 3 digits kept) in both messages and fields
+- log.success(...) marks a routine successful send; with LOG_SUCCESS_MODE=counters
+  it only bumps log_events_total{category,event} in /metrics and the writer prints
+  a per-category summary every LOG_SUMMARY_INTERVAL seconds
+
+Other settings: LOG_LEVEL (INFO), LOG_LEVELS="sms=DEBUG,webhook=WARNING",
+LOG_FORMAT (text | json), LOG_QUEUE_SIZE (10000). With SLOW_LOG_PATH set, the
+slow_request category (query_trace) is appended there as JSON lines instead of stdout.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from metrics import log_events, log_records_dropped
+from settings import settings
+
+LOG_LEVEL = settings.log_level
+LOG_FORMAT = settings.log_format
+LOG_SUCCESS_MODE = settings.log_success_mode  # log | counters
+LOG_QUEUE_SIZE = settings.log_queue_size
+LOG_SUMMARY_INTERVAL = settings.log_summary_interval
+ROOT_LOGGER = "saveday"
+SLOW_LOG_PATH = settings.slow_log_path
+SLOW_LOG_CATEGORY = "slow_request"
+
+
+def _parse_pairs(raw: str) -> Dict[str, str]:
+    pairs = {}
+    for item in (raw or "").split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            pairs[key.strip()] = value.strip()
+    return pairs
+
+
+CATEGORY_LEVELS = {k: v.upper() for k, v in _parse_pairs(settings.log_levels).items()}
+SAMPLE_RATES = {k: float(v) for k, v in _parse_pairs(settings.log_sample).items()}
+
+# ============================================================================
+# Redaction (runs on the writer thread)
+# ============================================================================
+
+_SECRET_KEY = re.compile(r"(api[_-]?key|token|secret|password|authorization|auth)", re.IGNORECASE)
+_BEARER = re.compile(r"(Bearer\s+)[A-Za-z0-9._\-]+", re.IGNORECASE)
+_PHONE = re.compile(r"(?<!\d)(\+?972[\- ]?|0)(\d[\d\-]{6,10})(?!\d)")
+
+
+def _mask_phone(match) -> str:
+    digits = match.group(2)
+    return f"{match.group(1)}{'*' * (len(digits) - 3)}{digits[-3:]}"
+
+
+def redact_text(text: str) -> str:
+    text = _BEARER.sub(r"\1***", text)
+    return _PHONE.sub(_mask_phone, text)
+
+
+def redact(value: Any, key: Optional[str] = None) -> Any:
+    if key and _SECRET_KEY.search(key):
+        return "***"
+    if isinstance(value, dict):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return redact_text(value)
+    return value
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats `message key=value ...` (text) or one JSON object per line (json)"""
+
+    def __init__(self, fmt: str = LOG_FORMAT):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = redact_text(record.getMessage())
+        fields = redact(getattr(record, "fields", None) or {})
+        category = record.name[len(ROOT_LOGGER) + 1:] or ROOT_LOGGER
+        if self.json:
+            entry = {
+                "ts": round(record.created, 3),
+                "level": record.levelname.lower(),
+                "cat": category,
+                "msg": message,
+            }
+            entry.update(fields)
+            if record.exc_info:
+                entry["exc"] = redact_text(self.formatException(record.exc_info))
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        line = message
+        if fields:
+            line += " " + " ".join(
+                f"{k}={json.dumps(v, ensure_ascii=False, default=str) if isinstance(v, (dict, list)) else v}"
+                for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + redact_text(self.formatException(record.exc_info))
+        return line
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that defers formatting to the listener and drops instead of blocking"""
+
+    def prepare(self, record):
+        # The stock prepare() formats in the calling thread - that is the work we move off it
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc()
+
+
+class _CategoryFilter(logging.Filter):
+    """Passes only one category's records (keep=True) or everything but them"""
+
+    def __init__(self, category: str, keep: bool):
+        super().__init__()
+        self.logger_name = f"{ROOT_LOGGER}.{category}"
+        self.keep = keep
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return (record.name == self.logger_name) == self.keep
+
+
+# ============================================================================
+# Loggers
+# ============================================================================
+
+class StructuredLogger:
+    """Thin wrapper over a stdlib logger that takes keyword fields"""
+
+    __slots__ = ("category", "_logger", "_sample")
+
+    def __init__(self, category: str):
+        self.category = category
+        self._logger = logging.getLogger(f"{ROOT_LOGGER}.{category}")
+        level = CATEGORY_LEVELS.get(category)
+        if level:
+            self._logger.setLevel(level)
+        self._sample = SAMPLE_RATES.get(category, 1.0)
+
+    def _log(self, level: int, message: str, fields: Dict[str, Any], exc_info=None):
+        if not self._logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING and self._sample < 1.0 and random.random() >= self._sample:
+            return
+        self._logger.log(level, message, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, message: str, **fields):
+        self._log(logging.DEBUG, message, fields)
+
+    def info(self, message: str, **fields):
+        self._log(logging.INFO, message, fields)
+
+    def warning(self, message: str, **fields):
+        self._log(logging.WARNING, message, fields)
+
+    def error(self, message: str, **fields):
+        self._log(logging.ERROR, message, fields)
+
+    def exception(self, message: str, **fields):
+        self._log(logging.ERROR, message, fields, exc_info=True)
+
+    def success(self, event: str, message: str, **fields):
+        """A routine successful operation - counted always, logged unless LOG_SUCCESS_MODE=counters"""
+        log_events.inc(self.category, event)
+        if LOG_SUCCESS_MODE != "counters":
+            self._log(logging.INFO, message, fields)
+
+
+class _SummaryThread(threading.Thread):
+    """In counters mode, periodically logs how many successes each category had"""
+
+    def __init__(self, logger: logging.Logger, interval: float):
+        super().__init__(name="log-summary", daemon=True)
+        self.logger = logger
+        self.interval = interval
+        self._last: Dict = {}
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            current = log_events.snapshot()
+            delta = {f"{cat}.{event}": count - self._last.get((cat, event), 0)
+                     for (cat, event), count in current.items()
+                     if count != self._last.get((cat, event), 0)}
+            self._last = current
+            if delta:
+                self.logger.info("📊 success counters", extra={"fields": {
+                    "interval_s": self.interval, **{k: int(v) for k, v in sorted(delta.items())}}})
+
+
+_configure_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_loggers: Dict[str, StructuredLogger] = {}
+
+
+def configure():
+    """Install the queue handler + background writer once per process"""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        log_queue: "queue.Queue" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        root.addHandler(_DroppingQueueHandler(log_queue))
+
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(StructuredFormatter())
+        handlers = [stream]
+        if SLOW_LOG_PATH:
+            slow_log = logging.FileHandler(SLOW_LOG_PATH, encoding="utf-8", delay=True)
+            slow_log.setFormatter(StructuredFormatter("json"))
+            slow_log.addFilter(_CategoryFilter(SLOW_LOG_CATEGORY, keep=True))
+            stream.addFilter(_CategoryFilter(SLOW_LOG_CATEGORY, keep=False))
+            handlers.append(slow_log)
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)  # drains what is still queued
+
+        if LOG_SUCCESS_MODE == "counters" and LOG_SUMMARY_INTERVAL > 0:
+            _SummaryThread(root, LOG_SUMMARY_INTERVAL).start()
+
+
+def get_logger(category: str) -> StructuredLogger:
+    logger = _loggers.get(category)
+    if logger is None:
+        configure()
+        logger = _loggers.setdefault(category, StructuredLogger(category))
+    return logger
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
 from pydantic import BaseModel, EmailStr, constr
 from typing import Optional
 from datetime import datetime, timedelta
@@ -6,111 +6,61 @@ import random
 import string
 
 import psycopg2
-import bcrypt
 
 from db import get_db_connection  # מייבאים את החיבור מהקובץ החדש
 from email_service import send_welcome_email, send_reset_code_email, send_password_reset_success_email, send_verification_code_email
 from security_email import send_security_alert_email
+from activity_log import log_activity, USER_REGISTERED
+# bcrypt רץ ב-process pool ייעודי (hash_password מיובא גם ב-auth_google)
+from password_hashing import hash_password, verify_password, needs_rehash
+from login_limiter import FailedLoginLimiter
 
 router = APIRouter(
     prefix="/api/auth",
     tags=["auth"]
 )
 
-# הצפנת סיסמאות
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-
 # הגדרות אבטחה
 MAX_FAILED_ATTEMPTS = 5  # מספר ניסיונות כושלים מקסימלי
 LOCKOUT_DURATION_MINUTES = 15  # זמן נעילה בדקות
 FAILED_ATTEMPTS_WINDOW_MINUTES = 30  # חלון זמן לספירת ניסיונות
 
-def record_failed_login(email: str, ip_address: str = None, user_agent: str = None):
+MAX_FAILED_ATTEMPTS_PER_IP = 20  # ניסיונות כושלים מאותה כתובת IP בחלון הזמן
+
+# מונים משותפים לכל ה-workers (login_failure_counters) + כתיבה מושהית ל-failed_login_attempts
+login_limiter = FailedLoginLimiter(FAILED_ATTEMPTS_WINDOW_MINUTES)
+
+
+def get_client_ip(request: Request) -> str:
     """
-    רושם ניסיון התחברות כושל
+    כתובת ה-IP של הלקוח (מאחורי ה-proxy של Render - X-Forwarded-For)
+    הרשומה הימנית היא זו שה-proxy הוסיף; את השמאליות הלקוח יכול לזייף
     """
-    conn = None
-    cur = None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else None
 
-        cur.execute("""
-            INSERT INTO failed_login_attempts (email, ip_address, user_agent)
-            VALUES (%s, %s, %s)
-        """, (email, ip_address, user_agent))
-
-        conn.commit()
-    except Exception as e:
-        print(f"Error recording failed login: {e}")
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+def record_failed_login(email: str, ip_address: str = None, user_agent: str = None) -> int:
+    """
+    רושם ניסיון התחברות כושל (מונה משותף ב-DB, פירוט הניסיון נשמר ברקע)
+    מחזיר את מספר הניסיונות הכושלים בחלון הזמן - מכל ה-workers
+    """
+    return login_limiter.record_failure(email, ip_address, user_agent)
 
 def get_recent_failed_attempts(email: str) -> int:
     """
     מחזיר את מספר הניסיונות הכושלים ב-X דקות האחרונות
     """
-    conn = None
-    cur = None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        time_threshold = datetime.now() - timedelta(minutes=FAILED_ATTEMPTS_WINDOW_MINUTES)
-
-        cur.execute("""
-            SELECT COUNT(*)
-            FROM failed_login_attempts
-            WHERE email = %s AND attempt_time > %s
-        """, (email, time_threshold))
-
-        count = cur.fetchone()[0]
-        return count
-    except Exception as e:
-        print(f"Error getting failed attempts: {e}")
-        return 0
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+    return login_limiter.failures_for_email(email)
 
 def check_account_lock(email: str) -> tuple:
     """
-    בודק אם החשבון נעול
+    בודק אם החשבון נעול (מטמון בזיכרון, מסונכרן מול account_locks)
     מחזיר: (is_locked: bool, locked_until: datetime or None)
     """
-    conn = None
-    cur = None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute("""
-            SELECT locked_until
-            FROM account_locks
-            WHERE email = %s AND locked_until > NOW()
-        """, (email,))
-
-        result = cur.fetchone()
-        if result:
-            return (True, result[0])
-        return (False, None)
-    except Exception as e:
-        print(f"Error checking account lock: {e}")
-        return (False, None)
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+    locked_until = login_limiter.locked_until(email)
+    return (locked_until is not None, locked_until)
 
 def lock_account(email: str, full_name: str, ip_address: str = None):
     """
@@ -136,6 +86,7 @@ def lock_account(email: str, full_name: str, ip_address: str = None):
         """, (email, locked_until, f"חריגת מספר ניסיונות התחברות כושלים ({MAX_FAILED_ATTEMPTS})"))
 
         conn.commit()
+        login_limiter.set_lock(email, locked_until)
 
         # שליחת מייל התראה
         send_security_alert_email(email, full_name or email, locked_until, ip_address)
@@ -154,33 +105,9 @@ def lock_account(email: str, full_name: str, ip_address: str = None):
 
 def clear_failed_attempts(email: str):
     """
-    מנקה את הניסיונות הכושלים לאחר התחברות מוצלחת
+    מנקה את הניסיונות הכושלים והנעילה לאחר התחברות מוצלחת
     """
-    conn = None
-    cur = None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute("""
-            DELETE FROM failed_login_attempts
-            WHERE email = %s
-        """, (email,))
-
-        # גם מסיר נעילה אם קיימת
-        cur.execute("""
-            DELETE FROM account_locks
-            WHERE email = %s
-        """, (email,))
-
-        conn.commit()
-    except Exception as e:
-        print(f"Error clearing failed attempts: {e}")
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+    login_limiter.clear(email)
 
 # מודל נתוני הרשמה
 class UserCreate(BaseModel):
@@ -281,6 +208,7 @@ def register(user: UserCreate):
             """,
             (verification_code, expires_at, new_id)
         )
+        log_activity(USER_REGISTERED, user.email, user_id=new_id, cur=cur)
         conn.commit()
 
         # שליחת מייל עם קוד האימות
@@ -303,6 +231,10 @@ def register(user: UserCreate):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="האימייל כבר קיים במערכת"
         )
+    except HTTPException:
+        if conn:
+            conn.rollback()
+        raise
     except Exception:
         if conn:
             conn.rollback()
@@ -318,7 +250,7 @@ def register(user: UserCreate):
 
 
 @router.post("/login")
-def login(user: UserLogin):
+def login(user: UserLogin, request: Request):
     """
     התחברות משתמש:
     - בודק שהאימייל קיים במערכת
@@ -329,7 +261,17 @@ def login(user: UserLogin):
     conn = None
     cur = None
 
+    ip_address = get_client_ip(request)
+    user_agent = request.headers.get("user-agent")
+
     try:
+        # חסימת IP שמבצע ניסיונות רבים (credential stuffing) - לפני bcrypt
+        if login_limiter.failures_for_ip(ip_address) >= MAX_FAILED_ATTEMPTS_PER_IP:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="יותר מדי ניסיונות התחברות. נסה שוב מאוחר יותר"
+            )
+
         # בדיקה אם החשבון נעול
         is_locked, locked_until = check_account_lock(user.email)
         if is_locked:
@@ -356,7 +298,7 @@ def login(user: UserLogin):
 
         # אם המשתמש לא נמצא - רשום ניסיון כושל
         if not user_record:
-            record_failed_login(user.email)
+            record_failed_login(user.email, ip_address, user_agent)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="אימייל או סיסמה שגויים"
@@ -366,15 +308,12 @@ def login(user: UserLogin):
 
         # בדיקת הסיסמה
         if not verify_password(user.password, hashed_password):
-            # רישום ניסיון כושל
-            record_failed_login(user.email)
-
-            # בדיקה אם עברנו את מספר הניסיונות המקסימלי
-            failed_attempts = get_recent_failed_attempts(user.email)
+            # רישום ניסיון כושל + ספירת הניסיונות בחלון הזמן
+            failed_attempts = record_failed_login(user.email, ip_address, user_agent)
 
             if failed_attempts >= MAX_FAILED_ATTEMPTS:
                 # נעילת החשבון
-                locked_until = lock_account(user.email, full_name)
+                locked_until = lock_account(user.email, full_name, ip_address)
                 if locked_until:
                     minutes_left = LOCKOUT_DURATION_MINUTES
                     raise HTTPException(
@@ -405,6 +344,18 @@ def login(user: UserLogin):
         # התחברות מוצלחת - ניקוי ניסיונות כושלים
         clear_failed_attempts(user.email)
 
+        # שדרוג שקוף של ה-hash אם ה-work factor השתנה
+        if needs_rehash(hashed_password):
+            try:
+                cur.execute(
+                    "UPDATE users SET password = %s WHERE id = %s;",
+                    (hash_password(user.password), user_id)
+                )
+                conn.commit()
+            except Exception as rehash_error:
+                conn.rollback()
+                print(f"Password rehash skipped for user {user_id}: {rehash_error}")
+
         # מחזירים את פרטי המשתמש
         return {
             "id": user_id,
@@ -2,7 +2,6 @@ from fastapi import APIRouter, HTTPException, status
 from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
 import os
-from dotenv import load_dotenv
 import requests
 from urllib.parse import urlencode
 import psycopg2
@@ -11,8 +10,8 @@ from datetime import datetime
 from db import get_db_connection
 from auth import hash_password
 from email_service import send_welcome_email
-
-load_dotenv()
+from activity_log import log_activity, USER_REGISTERED
+from settings import settings
 
 router = APIRouter(
     prefix="/api/auth/google",
@@ -26,12 +25,11 @@ GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
 
 
 def get_google_config():
-    """טוען את הגדרות Google OAuth מ-.env בכל קריאה"""
-    load_dotenv()  # טוען מחדש את המשתנים
+    """הגדרות Google OAuth (נטענות פעם אחת ב-settings)"""
     return {
-        "client_id": os.getenv("GOOGLE_CLIENT_ID"),
-        "client_secret": os.getenv("GOOGLE_CLIENT_SECRET"),
-        "redirect_uri": os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:5173/login-success")
+        "client_id": settings.google_client_id,
+        "client_secret": settings.google_client_secret,
+        "redirect_uri": settings.google_redirect_uri
     }
 
 
@@ -82,7 +80,7 @@ def google_callback_get(code: str):
     result = google_callback_post(GoogleTokenRequest(code=code))
 
     # בונה URL להפניה ל-Frontend עם פרטי המשתמש
-    frontend_url = os.getenv("FRONTEND_URL", "https://savedayevents.com")
+    frontend_url = settings.frontend_url
     params = {
         "userId": result["id"],
         "email": result["email"],
@@ -200,6 +198,7 @@ def google_callback_post(token_request: GoogleTokenRequest):
 
             new_user = cur.fetchone()
             user_id, created_at = new_user
+            log_activity(USER_REGISTERED, email, user_id=user_id, cur=cur)
             conn.commit()
 
             # שליחת מייל ברוכים הבאים למשתמש חדש
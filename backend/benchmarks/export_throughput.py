@@ -0,0 +1,119 @@
+"""
+Admin export throughput benchmark.
+
+Seeds N guests (default 1,000,000) into a scratch user/event, runs the CSV and/or
+XLSX export through the same code path as /api/admin/export/guests and reports
+rows/sec, output size and peak RSS. The scratch data is deleted afterwards.
+
+Run against a scratch database only:
+    DATABASE_URL=postgresql://... python benchmarks/export_throughput.py --rows 1000000
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admin_api import get_db_connection
+from admin_export import build_export_query, iter_csv, write_xlsx
+
+SCRATCH_EMAIL = "export-benchmark@example.invalid"
+
+
+def seed(rows: int) -> int:
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO users (email, password, full_name)
+        VALUES (%s, 'x', 'Export Benchmark')
+        RETURNING id
+    """, (SCRATCH_EMAIL,))
+    user_id = cur.fetchone()[0]
+    cur.execute("""
+        INSERT INTO events (user_id, event_type, event_title, status)
+        VALUES (%s, 'benchmark', 'Export Benchmark', 'active')
+        RETURNING id
+    """, (user_id,))
+    event_id = cur.fetchone()[0]
+    cur.execute("""
+        INSERT INTO guests (event_id, name, full_name, phone, attendance_status, guests_count)
+        SELECT %s, 'Guest ' || i, 'Guest ' || i, '05' || LPAD(i::TEXT, 8, '0'),
+               (ARRAY['pending', 'confirmed', 'declined'])[1 + i %% 3], 1 + i %% 4
+        FROM generate_series(1, %s) AS i
+    """, (event_id, rows))
+    conn.commit()
+    cur.close()
+    conn.close()
+    return event_id
+
+
+def cleanup():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM users WHERE email = %s", (SCRATCH_EMAIL,))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_csv(search: str):
+    query, params = build_export_query("guests", search=search)
+    start = time.perf_counter()
+    rows = -1  # header
+    size = 0
+    for chunk in iter_csv("guests", query, params):
+        rows += chunk.count("\n")
+        size += len(chunk.encode("utf-8"))
+    elapsed = time.perf_counter() - start
+    return rows, size, elapsed
+
+
+def bench_xlsx(search: str):
+    query, params = build_export_query("guests", search=search)
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        rows = write_xlsx("guests", query, params, path)
+        elapsed = time.perf_counter() - start
+        return rows, os.path.getsize(path), elapsed
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark admin export throughput")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["csv", "xlsx", "both"], default="both")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    print(f"🌱 Seeding {args.rows:,} guests...")
+    cleanup()
+    start = time.perf_counter()
+    seed(args.rows)
+    print(f"   seeded in {time.perf_counter() - start:.1f}s")
+
+    # Filter on the scratch guests only (same filter path as the list endpoint)
+    search = "guest "
+    try:
+        formats = ["csv", "xlsx"] if args.format == "both" else [args.format]
+        for fmt in formats:
+            rows, size, elapsed = bench_csv(search) if fmt == "csv" else bench_xlsx(search)
+            print(f"📊 {fmt.upper()}: {rows:,} rows in {elapsed:.1f}s "
+                  f"({rows / elapsed:,.0f} rows/s, {size / 1024 / 1024:.1f} MB), "
+                  f"peak RSS {peak_rss_mb():.0f} MB")
+    finally:
+        if not args.keep:
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+API cold-start import-time report and budget check.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter, prints the
+total import time of the app and the slowest modules, and fails (exit code 1)
+when:
+- the total exceeds --budget-ms, or
+- a module that must be imported lazily (LAZY_MODULES) was imported at boot.
+
+Use it as the regression check after touching imports:
+    python benchmarks/import_time.py --budget-ms 1500
+    python benchmarks/import_time.py --top 40 --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy dependencies that only specific code paths need
+LAZY_MODULES = ["googleapiclient", "google.oauth2", "openpyxl", "bcrypt", "jose", "PIL"]
+DEFAULT_BUDGET_MS = 1500.0
+
+
+def measure():
+    """Returns (total_us, [(cumulative_us, self_us, module)]) for one cold import of main"""
+    env = dict(os.environ)
+    # Importing must not need a reachable database
+    env.setdefault("DATABASE_URL", "postgresql://import-time@127.0.0.1:9/none")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-3000:])
+        raise SystemExit("❌ import main failed")
+
+    modules = []
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        name_stripped = name.strip()
+        modules.append((int(cumulative_us), int(self_us), name_stripped))
+        if name_stripped == "main":
+            total_us = int(cumulative_us)
+    return total_us, modules
+
+
+def check(total_ms: float, modules, budget_ms: float = DEFAULT_BUDGET_MS):
+    """Returns the budget / lazy-import failures of one measurement"""
+    failures = []
+    imported = {name for _, _, name in modules}
+    eager = [m for m in LAZY_MODULES if any(n == m or n.startswith(m + ".") for n in imported)]
+    if eager:
+        failures.append(f"imported at boot but should be lazy: {', '.join(eager)}")
+    if total_ms > budget_ms:
+        failures.append(f"{total_ms:.0f} ms exceeds the {budget_ms:.0f} ms budget")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time report for the API")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--runs", type=int, default=3, help="take the median of N cold imports")
+    args = parser.parse_args()
+
+    results = [measure() for _ in range(args.runs)]
+    totals = [total for total, _ in results]
+    total_ms = statistics.median(totals) / 1000
+    _, modules = results[totals.index(sorted(totals)[len(totals) // 2])]
+
+    print(f"⏱️  import main: {total_ms:.0f} ms (median of {args.runs}; "
+          f"min {min(totals) / 1000:.0f}, max {max(totals) / 1000:.0f})")
+    print("\nSlowest modules (cumulative / self, ms):")
+    for cumulative_us, self_us, name in sorted(modules, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+
+    failures = check(total_ms, modules, args.budget_ms)
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print(f"\n✅ within budget ({args.budget_ms:.0f} ms), no heavy modules imported eagerly")
+
+
+if __name__ == "__main__":
+    main()
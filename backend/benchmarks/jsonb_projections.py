@@ -0,0 +1,122 @@
+"""
+Bytes and latency saved by projecting JSONB keys instead of fetching the documents.
+
+For each read path that used to select events.invitation_data / message_settings
+wholesale, runs the old and the new SELECT list for a sample of rows (one row per
+query, like the app does) and reports the average result size and latency.
+
+Result size is the text form of the row, i.e. roughly what crosses the wire with
+psycopg2's text protocol. Latency includes psycopg2 decoding the JSON into dicts.
+
+Run against a scratch database filled by generate_dataset.py:
+    DATABASE_URL=postgresql://... python benchmarks/jsonb_projections.py --sample 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import get_db_connection, json_keys_sql
+from invitation_images import image_keys_sql, source_image_url_sql
+from scheduler_service import DAY_OF_EVENT_SETTINGS_KEYS
+
+# name -> (id source, query with {cols}, old select list, new select list)
+CASES = {
+    "scheduler round": (
+        "SELECT id FROM scheduled_messages",
+        """SELECT sm.id, sm.event_id, sm.message_number, sm.scheduled_date,
+                  e.event_title, e.event_date, e.event_time, e.event_location, {cols}, pp.package_id
+           FROM scheduled_messages sm
+           JOIN events e ON sm.event_id = e.id
+           LEFT JOIN package_purchases pp ON e.package_purchase_id = pp.id
+           WHERE sm.id = %s""",
+        "e.invitation_data", image_keys_sql(),
+    ),
+    "rsvp guest page": (
+        "SELECT id FROM guests",
+        """SELECT g.id, g.name, g.phone, g.status, g.attending_count,
+                  e.id, e.event_name, e.event_date, e.event_time, e.event_location, {cols}
+           FROM guests g JOIN events e ON g.event_id = e.id
+           WHERE g.id = %s""",
+        "e.invitation_data", source_image_url_sql(),
+    ),
+    "public event page": (
+        "SELECT id FROM events",
+        """SELECT e.id, e.event_name, e.event_title, e.event_date, e.event_time, e.event_location, {cols},
+                  pp.package_id, pp.package_name, e.updated_at
+           FROM events e LEFT JOIN package_purchases pp ON e.package_purchase_id = pp.id
+           WHERE e.id = %s""",
+        "e.invitation_data, e.message_settings",
+        f"{source_image_url_sql()}, e.message_settings->>'rsvp_custom_text'",
+    ),
+    "day-of-event sms": (
+        "SELECT id FROM events",
+        "SELECT e.id, e.event_title, {cols}, e.bit_payment_link FROM events e WHERE e.id = %s",
+        "e.message_settings", json_keys_sql('e.message_settings', DAY_OF_EVENT_SETTINGS_KEYS),
+    ),
+    "get_event (lean)": (
+        "SELECT id FROM events",
+        """SELECT e.id, e.user_id, e.package_purchase_id, e.event_type, e.event_title,
+                  e.event_date, e.event_time, e.event_location, {cols}, e.status, e.created_at,
+                  e.bit_payment_link, pp.package_name, pp.package_id, e.message_settings
+           FROM events e LEFT JOIN package_purchases pp ON e.package_purchase_id = pp.id
+           WHERE e.id = %s""",
+        "e.invitation_data", image_keys_sql(),
+    ),
+}
+
+
+def sample_ids(cur, source: str, sample: int):
+    cur.execute(f"{source} ORDER BY random() LIMIT %s", (sample,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def measure(cur, query: str, ids):
+    sizes = []
+    latencies = []
+    for row_id in ids:
+        cur.execute(f"SELECT octet_length(q::text) FROM ({query}) q", (row_id,))
+        sizes.append(cur.fetchone()[0] or 0)
+        start = time.perf_counter()
+        cur.execute(query, (row_id,))
+        cur.fetchall()
+        latencies.append(time.perf_counter() - start)
+    return statistics.mean(sizes), statistics.median(latencies), sorted(latencies)[int(len(latencies) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONB projection bytes/latency report")
+    parser.add_argument("--sample", type=int, default=500, help="rows per case")
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="only these cases")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    print(f"{'case':<20}{'bytes/row old':>15}{'new':>10}{'saved':>8}"
+          f"{'p50 old':>11}{'new':>9}{'p95 old':>11}{'new':>9}")
+    for name in args.case or CASES:
+        source, query, old_cols, new_cols = CASES[name]
+        ids = sample_ids(cur, source, args.sample)
+        if not ids:
+            print(f"{name:<20} (no rows)")
+            continue
+        # Warm the cache for both, then measure
+        measure(cur, query.format(cols=old_cols), ids[:20])
+        measure(cur, query.format(cols=new_cols), ids[:20])
+        old_size, old_p50, old_p95 = measure(cur, query.format(cols=old_cols), ids)
+        new_size, new_p50, new_p95 = measure(cur, query.format(cols=new_cols), ids)
+        saved = 1 - new_size / old_size if old_size else 0
+        print(f"{name:<20}{old_size:>15,.0f}{new_size:>10,.0f}{saved:>8.0%}"
+              f"{old_p50 * 1000:>9.2f}ms{new_p50 * 1000:>7.2f}ms{old_p95 * 1000:>9.2f}ms{new_p95 * 1000:>7.2f}ms")
+
+    cur.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
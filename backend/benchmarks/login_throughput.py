@@ -0,0 +1,96 @@
+"""
+Login throughput vs. endpoint latency benchmark.
+
+Fires concurrent logins at a running server while a probe thread keeps calling a
+cheap sync endpoint, then reports login throughput, how many logins were shed
+with 503, and the probe's latency percentiles. Run it once with the process pool
+and once with HASH_QUEUE_LIMIT / BCRYPT_ROUNDS variations to compare.
+
+    python benchmarks/login_throughput.py --base-url http://localhost:8000 \
+        --email user@example.com --password secret --concurrency 32 --duration 30
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark login throughput vs. endpoint latency")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--probe-path", default="/api/db-test",
+                        help="sync endpoint whose latency is tracked during the burst")
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    statuses = {}
+    login_latencies = []
+    probe_latencies = []
+
+    def login_worker():
+        session = requests.Session()
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                resp = session.post(f"{args.base_url}/api/auth/login",
+                                    json={"email": args.email, "password": args.password}, timeout=30)
+                code = resp.status_code
+            except requests.RequestException:
+                code = "error"
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[code] = statuses.get(code, 0) + 1
+                login_latencies.append(elapsed)
+
+    def probe_worker():
+        session = requests.Session()
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                session.get(f"{args.base_url}{args.probe_path}", timeout=30)
+            except requests.RequestException:
+                pass
+            probe_latencies.append(time.perf_counter() - start)
+            time.sleep(0.05)
+
+    print(f"🚀 {args.concurrency} login workers for {args.duration:.0f}s against {args.base_url}")
+    with ThreadPoolExecutor(max_workers=args.concurrency + 1) as pool:
+        pool.submit(probe_worker)
+        for _ in range(args.concurrency):
+            pool.submit(login_worker)
+        time.sleep(args.duration)
+        stop.set()
+
+    total = sum(statuses.values())
+    print(f"\n📊 Logins: {total} in {args.duration:.0f}s ({total / args.duration:.1f}/s)")
+    for code, count in sorted(statuses.items(), key=lambda kv: str(kv[0])):
+        print(f"   {code}: {count}")
+    if login_latencies:
+        print(f"   login p50={percentile(login_latencies, 50) * 1000:.0f}ms "
+              f"p95={percentile(login_latencies, 95) * 1000:.0f}ms")
+    if probe_latencies:
+        print(f"📈 Probe {args.probe_path}: n={len(probe_latencies)} "
+              f"mean={statistics.mean(probe_latencies) * 1000:.0f}ms "
+              f"p50={percentile(probe_latencies, 50) * 1000:.0f}ms "
+              f"p95={percentile(probe_latencies, 95) * 1000:.0f}ms "
+              f"p99={percentile(probe_latencies, 99) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Local stand-in for Gupshup, 019SMS and Cloudinary, for offline load tests.
+
+Implements the request/response shapes our clients parse:
+- POST /wa/api/v1/msg, /wa/api/v1/template/msg   Gupshup: 202 {"status": "submitted", "messageId": ...}
+- POST /api                                      019SMS: {"status": 0, "shipment_id": ..., "phones": [...]}
+- POST /v1_1/<cloud>/image/upload                Cloudinary: {"secure_url", "public_id", "bytes", ...}
+- GET  /images/<name>                            an image host: deterministic bytes per name
+                                                 (source images for migrate_images_to_cloudinary.py)
+- GET  /__stats                                  request counts per provider/status, receipts posted
+
+Failure injection, per provider or for all of them:
+- latency distributions: fixed:50, uniform:20-200, lognormal:80,0.6 (median ms, sigma)
+- --error-rate: share of requests answered with the provider's error shape (5xx / status != 0)
+- --rate-limit: requests/sec per provider; above it -> 429 with Retry-After
+
+Delivery receipts: with --webhook-url, every accepted Gupshup message gets
+message-event callbacks (enqueued -> sent -> delivered -> read) posted back to
+/api/whatsapp/webhook/gupshup, so send -> receipt throughput runs end to end.
+--undeliverable-rate sends "failed" (code 1002) instead, which exercises the SMS fallback.
+
+Point the app at it via env (read once at startup by settings.py; DOTENV_OVERRIDE=false
+so these win over .env):
+    DOTENV_OVERRIDE=false
+    GUPSHUP_API_BASE_URL=http://127.0.0.1:8098
+    SMS_019_API_URL=http://127.0.0.1:8098/api
+    CLOUDINARY_API_BASE_URL=http://127.0.0.1:8098
+
+    python benchmarks/provider_standin.py --port 8098 --latency lognormal:120,0.5 \
+        --error-rate 0.01 --rate-limit 80 \
+        --webhook-url http://localhost:8000/api/whatsapp/webhook/gupshup
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import random
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROVIDERS = ("gupshup", "019sms", "cloudinary")
+RECEIPT_STEPS = ("enqueued", "sent", "delivered", "read")
+
+
+def parse_latency(spec: str):
+    """'fixed:50' | 'uniform:20-200' | 'lognormal:80,0.6' -> callable(rng) returning seconds"""
+    if not spec:
+        return lambda rng: 0.0
+    kind, _, value = spec.partition(":")
+    if kind == "fixed":
+        ms = float(value)
+        return lambda rng: ms / 1000
+    if kind == "uniform":
+        low, high = (float(v) for v in value.split("-"))
+        return lambda rng: rng.uniform(low, high) / 1000
+    if kind == "lognormal":
+        median, sigma = (float(v) for v in value.split(","))
+        return lambda rng: median * rng.lognormvariate(0, sigma) / 1000
+    raise ValueError(f"unknown latency spec {spec!r}")
+
+
+class ProviderBehaviour:
+    def __init__(self, latency="", error_rate=0.0, rate_limit=0.0):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self._window_start = 0.0
+        self._window_count = 0
+        self._lock = threading.Lock()
+
+    def over_rate_limit(self) -> bool:
+        """Fixed one-second window, like the providers' per-second quotas"""
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            return self._window_count > self.rate_limit
+
+
+class ReceiptSender:
+    """Posts Gupshup message-event callbacks to the app from a background thread"""
+
+    def __init__(self, webhook_url: str, delay_ms: float, read_rate: float, undeliverable_rate: float, rng):
+        self.webhook_url = webhook_url
+        self.delay = delay_ms / 1000
+        self.read_rate = read_rate
+        self.undeliverable_rate = undeliverable_rate
+        self.rng = rng
+        self.posted = 0
+        self.failed = 0
+        self._queue = []
+        self._cond = threading.Condition()
+        self._seq = 0
+        threading.Thread(target=self._run, name="standin-receipts", daemon=True).start()
+
+    def message_accepted(self, message_id: str, destination: str):
+        with self._cond:
+            undeliverable = self.rng.random() < self.undeliverable_rate
+            steps = ["enqueued", "failed"] if undeliverable else list(RECEIPT_STEPS[:3])
+            if not undeliverable and self.rng.random() < self.read_rate:
+                steps.append("read")
+            due = time.monotonic()
+            for step in steps:
+                due += self.delay * (0.5 + self.rng.random())
+                self._seq += 1
+                heapq.heappush(self._queue, (due, self._seq, message_id, destination, step))
+            self._cond.notify()
+
+    def _payload(self, message_id, destination, step):
+        inner = {"ts": int(time.time())}
+        if step == "failed":
+            inner = {"code": 1002, "reason": "Number does not exist on WhatsApp"}
+        return {
+            "app": "standin", "timestamp": int(time.time() * 1000), "version": 2,
+            "type": "message-event",
+            "payload": {"id": message_id, "gsId": message_id, "type": step,
+                        "destination": destination, "payload": inner},
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue or self._queue[0][0] > time.monotonic():
+                    timeout = self._queue[0][0] - time.monotonic() if self._queue else None
+                    self._cond.wait(timeout)
+                _, _, message_id, destination, step = heapq.heappop(self._queue)
+            body = json.dumps(self._payload(message_id, destination, step)).encode()
+            request = urllib.request.Request(self.webhook_url, data=body,
+                                             headers={"Content-Type": "application/json"})
+            try:
+                urllib.request.urlopen(request, timeout=10).read()
+                self.posted += 1
+            except Exception:
+                self.failed += 1
+
+
+class StandinState:
+    def __init__(self, behaviours, receipts=None, seed=0):
+        self.behaviours = behaviours
+        self.receipts = receipts
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.sms_shipments = 0
+
+    def count(self, provider, status):
+        with self.lock:
+            key = f"{provider}:{status}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def roll(self):
+        with self.rng_lock:
+            return self.rng.random()
+
+    def delay_for(self, provider):
+        with self.rng_lock:
+            return self.behaviours[provider].latency(self.rng)
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    state: StandinState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, provider, status: int, payload: dict, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        if provider:
+            self.state.count(provider, status)
+
+    def do_GET(self):
+        if self.path.startswith("/__stats"):
+            receipts = self.state.receipts
+            with self.state.lock:
+                counts = dict(self.state.counts)
+            self._reply(None, 200, {
+                "requests": counts,
+                "receipts_posted": receipts.posted if receipts else 0,
+                "receipts_failed": receipts.failed if receipts else 0,
+            })
+            return
+        if self.path.startswith("/images/"):
+            # ~100 KB derived from the name, so duplicate images hash the same
+            body = hashlib.sha256(self.path.encode()).digest() * 3200
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self._reply(None, 404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/wa/api/v1/"):
+            provider = "gupshup"
+        elif path.rstrip("/").endswith("/api"):
+            provider = "019sms"
+        elif path.startswith("/v1_1/") and path.endswith("/upload"):
+            provider = "cloudinary"
+        else:
+            self._reply(None, 404, {"error": "not found"})
+            return
+
+        behaviour = self.state.behaviours[provider]
+        time.sleep(self.state.delay_for(provider))
+        if behaviour.over_rate_limit():
+            self._reply(provider, 429, self._error_shape(provider, "Rate limit exceeded"), {"Retry-After": "1"})
+            return
+        if behaviour.error_rate and self.state.roll() < behaviour.error_rate:
+            status = 200 if provider == "019sms" else 500
+            self._reply(provider, status, self._error_shape(provider, "Injected failure"))
+            return
+        {"gupshup": self._ok_gupshup, "019sms": self._ok_sms, "cloudinary": self._ok_cloudinary}[provider](body)
+
+    @staticmethod
+    def _error_shape(provider, message):
+        if provider == "019sms":
+            return {"status": 997, "message": message}
+        if provider == "cloudinary":
+            return {"error": {"message": message}}
+        return {"status": "error", "message": message}
+
+    def _ok_gupshup(self, body):
+        message_id = str(uuid.uuid4())
+        fields = urllib.parse.parse_qs(body.decode("utf-8", "replace"))
+        destination = (fields.get("destination") or [""])[0]
+        self._reply("gupshup", 202, {"status": "submitted", "messageId": message_id})
+        if self.state.receipts:
+            self.state.receipts.message_accepted(message_id, destination)
+
+    def _ok_sms(self, body):
+        try:
+            phones = json.loads(body)["sms"]["destinations"]["phone"]
+        except (ValueError, KeyError, TypeError):
+            self._reply("019sms", 200, {"status": 1, "message": "Invalid request"})
+            return
+        with self.state.lock:
+            self.state.sms_shipments += 1
+            shipment_id = self.state.sms_shipments
+        self._reply("019sms", 200, {
+            "status": 0, "message": "SMS will be sent", "shipment_id": shipment_id,
+            "phones": [{"phone": phone, "status": 0} for phone in phones],
+        })
+
+    def _ok_cloudinary(self, body):
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        host = self.headers.get("Host", "localhost")
+        self._reply("cloudinary", 200, {
+            "public_id": f"standin/{digest}", "bytes": len(body), "format": "jpg",
+            "secure_url": f"http://{host}/standin/cloudinary.com/image/upload/{digest}.jpg",
+        })
+
+
+def start(port: int = 0, latency: str = "", error_rate: float = 0.0, rate_limit: float = 0.0,
+          webhook_url: str = None, receipt_delay_ms: float = 500, read_rate: float = 0.6,
+          undeliverable_rate: float = 0.0, seed: int = 0, overrides: dict = None) -> ThreadingHTTPServer:
+    """
+    Start the stand-in on a daemon thread; port 0 picks a free port (server.server_port).
+    overrides: {"gupshup": {"latency": ..., "error_rate": ..., "rate_limit": ...}, ...}
+    """
+    behaviours = {}
+    for provider in PROVIDERS:
+        options = {"latency": latency, "error_rate": error_rate, "rate_limit": rate_limit}
+        options.update((overrides or {}).get(provider, {}))
+        behaviours[provider] = ProviderBehaviour(**options)
+    receipts = None
+    if webhook_url:
+        receipts = ReceiptSender(webhook_url, receipt_delay_ms, read_rate, undeliverable_rate, random.Random(seed + 1))
+
+    handler = type("BoundStandinHandler", (StandinHandler,), {"state": StandinState(behaviours, receipts, seed)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="provider-standin", daemon=True).start()
+    return server
+
+
+def request_counts(server: ThreadingHTTPServer) -> dict:
+    state = server.RequestHandlerClass.state
+    with state.lock:
+        return dict(state.counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gupshup / 019SMS / Cloudinary stand-in")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--latency", default="", help="fixed:MS | uniform:LO-HI | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests/sec per provider (0 = off)")
+    for provider in PROVIDERS:
+        parser.add_argument(f"--{provider}-latency")
+        parser.add_argument(f"--{provider}-error-rate", type=float)
+        parser.add_argument(f"--{provider}-rate-limit", type=float)
+    parser.add_argument("--webhook-url", help="post Gupshup delivery receipts here")
+    parser.add_argument("--receipt-delay-ms", type=float, default=500)
+    parser.add_argument("--read-rate", type=float, default=0.6)
+    parser.add_argument("--undeliverable-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    overrides = {}
+    for provider in PROVIDERS:
+        for option in ("latency", "error_rate", "rate_limit"):
+            value = getattr(args, f"{provider}_{option}")
+            if value is not None:
+                overrides.setdefault(provider, {})[option] = value
+
+    server = start(args.port, args.latency, args.error_rate, args.rate_limit, args.webhook_url,
+                   args.receipt_delay_ms, args.read_rate, args.undeliverable_rate, args.seed, overrides)
+    base = f"http://127.0.0.1:{server.server_port}"
+    print(f"🧪 Provider stand-in on {base}")
+    print(f"   GUPSHUP_API_BASE_URL={base}")
+    print(f"   SMS_019_API_URL={base}/api")
+    print(f"   CLOUDINARY_API_BASE_URL={base}")
+    if args.webhook_url:
+        print(f"   receipts -> {args.webhook_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
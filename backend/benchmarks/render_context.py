@@ -0,0 +1,152 @@
+"""
+CPU cost of rendering scheduled sends: per-guest re-derivation vs. EventRenderContext.
+
+"legacy" repeats, for every guest, what the send path did before the render
+context existed: format date/time, walk invitation_data for the image URL (incl.
+the on-disk variant check and Cloudinary transformation), fall back the location,
+clean the params and json.dumps the template + image message; SMS recomputed the
+link text and the RSVP token. "context" builds the context once and then only
+substitutes the guest. No HTTP is involved - this is the CPU spent on our side.
+
+Both paths must produce byte-identical payloads; the script checks that first.
+
+    python benchmarks/render_context.py --sends 10000
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import date, time as dtime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_render_context import EventRenderContext
+from invitation_images import whatsapp_image_url
+from whatsapp_interactive import (
+    DEFAULT_INVITATION_IMAGE,
+    WHATSAPP_REMINDER_TEMPLATE_ID,
+    WHATSAPP_TEMPLATE_ID,
+    WHATSAPP_TEMPLATE_IS_MEDIA,
+    WHATSAPP_TEMPLATE_NAME,
+)
+
+
+def scheduled_message(invitation_kb: int) -> dict:
+    # invitation_data carries the editor state; pad it to a realistic size
+    filler = [{"type": "text", "text": "שמחים להזמינכם " * 8, "x": i, "y": i * 2} for i in range(invitation_kb * 3 // 2)]
+    return {
+        'scheduled_message_id': 1,
+        'event_id': 42,
+        'message_number': 1,
+        'event_title': "החתונה של דנה ויוסי",
+        'event_date': date(2026, 6, 18),
+        'event_time': dtime(19, 30),
+        'event_location': "אולמי הגן, ראשון לציון",
+        'invitation_data': {
+            'whatsapp_image_url': "https://event-gift.onrender.com/uploads/invitations/42_missing_whatsapp.jpg",
+            'generated_image_url': "https://res.cloudinary.com/demo/image/upload/v1/invitations/42.png?_a=1",
+            'elements': filler,
+        },
+    }
+
+
+def guests(count: int):
+    return [{'id': 100000 + i, 'name': f"  אורח {i} ", 'phone': f"05{i:08d}"} for i in range(count)]
+
+
+# --- the per-guest path as it was --------------------------------------------
+
+def legacy_whatsapp(guest: dict, event_data: dict, reminder: bool) -> dict:
+    image_url = whatsapp_image_url(event_data.get('invitation_data')) or DEFAULT_INVITATION_IMAGE
+    if reminder:
+        params = [str(event_data['event_title']).strip()]
+        template_id = WHATSAPP_REMINDER_TEMPLATE_ID or WHATSAPP_TEMPLATE_ID or WHATSAPP_TEMPLATE_NAME
+    else:
+        event_date = event_data['event_date']
+        formatted_date = event_date.strftime('%d/%m/%Y') if isinstance(event_date, date) else str(event_date)
+        event_time = event_data.get('event_time')
+        formatted_time = (event_time.strftime('%H:%M') if hasattr(event_time, 'strftime') else str(event_time)) \
+            if event_time else '18:00'
+        params = [
+            str(guest['name']).strip(),
+            str(event_data['event_title']).strip(),
+            str(formatted_date).strip(),
+            str(formatted_time).strip(),
+            str(event_data.get('event_location') or "יודיע בהמשך").strip(),
+            "SaveDay Events",
+        ]
+        template_id = WHATSAPP_TEMPLATE_ID or WHATSAPP_TEMPLATE_NAME
+    clean_image_url = image_url.split('?')[0] if '?' in image_url else image_url
+    data = {'template': json.dumps({"id": template_id, "params": params})}
+    if clean_image_url and WHATSAPP_TEMPLATE_IS_MEDIA:
+        data['message'] = json.dumps({"type": "image", "image": {"link": clean_image_url}})
+    return data
+
+
+def legacy_sms(guest: dict, event_data: dict) -> str:
+    token = hashlib.sha256(f"{guest['id']}-{guest['phone']}-{event_data['event_title']}".encode()).hexdigest()[:16]
+    rsvp_link = f"https://savedayevents.com/rsvp/{guest['id']}?token={token}"
+    return f"הנכם מוזמנים ל{event_data['event_title']}, נשמח שתאשרו הגעתכם בלינק הבא: {rsvp_link}"
+
+
+# --- the render-context path -------------------------------------------------
+
+def context_whatsapp(guest: dict, ctx: EventRenderContext) -> dict:
+    data = {'template': ctx.template_json(guest['name'])}
+    if ctx.message_json:
+        data['message'] = ctx.message_json
+    return data
+
+
+def check_identical(event_data: dict, sample):
+    for reminder in (False, True):
+        ctx = EventRenderContext.build(event_data, is_reminder=reminder)
+        for guest in sample:
+            assert legacy_whatsapp(guest, event_data, reminder) == context_whatsapp(guest, ctx), (reminder, guest)
+            assert legacy_sms(guest, event_data) == ctx.sms_text(guest['id'], guest['phone']), guest
+
+
+def cpu_seconds(fn) -> float:
+    start = time.process_time()
+    fn()
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render-context CPU benchmark")
+    parser.add_argument("--sends", type=int, default=10_000)
+    parser.add_argument("--invitation-kb", type=int, default=40, help="approx. size of invitation_data")
+    parser.add_argument("--repeat", type=int, default=3, help="take the best of N runs")
+    args = parser.parse_args()
+
+    event_data = scheduled_message(args.invitation_kb)
+    guest_list = guests(args.sends)
+    check_identical(event_data, guest_list[:200])
+    print(f"✅ payloads identical (invitation_data ~{len(json.dumps(event_data['invitation_data'])) // 1024} KB)")
+
+    cases = {
+        "whatsapp invitation": (
+            lambda: [legacy_whatsapp(g, event_data, False) for g in guest_list],
+            lambda: [context_whatsapp(g, ctx) for ctx in [EventRenderContext.build(event_data)] for g in guest_list]),
+        "whatsapp reminder": (
+            lambda: [legacy_whatsapp(g, event_data, True) for g in guest_list],
+            lambda: [context_whatsapp(g, ctx) for ctx in [EventRenderContext.build(event_data, True)]
+                     for g in guest_list]),
+        "sms invitation": (
+            lambda: [legacy_sms(g, event_data) for g in guest_list],
+            lambda: [ctx.sms_text(g['id'], g['phone']) for ctx in [EventRenderContext.build(event_data)]
+                     for g in guest_list]),
+    }
+
+    print(f"\n{'CPU per ' + format(args.sends, ',') + ' sends':<24}{'per guest':>12}{'per round':>12}{'saved':>12}")
+    for name, (legacy, context) in cases.items():
+        before = min(cpu_seconds(legacy) for _ in range(args.repeat))
+        after = min(cpu_seconds(context) for _ in range(args.repeat))
+        print(f"{name:<24}{before * 1000:>10.1f}ms{after * 1000:>10.1f}ms"
+              f"{(before - after) * 1000:>10.1f}ms  ({before / after if after else float('inf'):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+RSVP write throughput load test.
+
+Seeds a scratch event with N guests, then hammers POST /api/rsvp/{guest_id} on a
+running server (the path guests hit from the invitation link) from many threads
+for a fixed duration. Reports sustained RSVP writes/sec and latency percentiles,
+and checks that event_rsvp_stats matches the guests table afterwards. Tune
+RSVP_FLUSH_WINDOW_MS / RSVP_MAX_BATCH_SIZE on the server and compare.
+
+Run against a scratch database only (the script seeds it directly):
+    DATABASE_URL=postgresql://... python benchmarks/rsvp_throughput.py \
+        --base-url http://localhost:8000 --guests 5000 --concurrency 64 --duration 30
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import get_db_connection
+
+SCRATCH_EMAIL = "rsvp-benchmark@example.invalid"
+EVENT_NAME = "RSVP Benchmark"
+
+
+def seed(guests: int):
+    """Returns (event_id, [(guest_id, token), ...])"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO users (email, password, full_name)
+        VALUES (%s, 'x', 'RSVP Benchmark')
+        RETURNING id
+    """, (SCRATCH_EMAIL,))
+    user_id = cur.fetchone()[0]
+    cur.execute("""
+        INSERT INTO events (user_id, event_type, event_name, event_title, status)
+        VALUES (%s, 'benchmark', %s, %s, 'active')
+        RETURNING id
+    """, (user_id, EVENT_NAME, EVENT_NAME))
+    event_id = cur.fetchone()[0]
+    cur.execute("""
+        INSERT INTO guests (event_id, name, full_name, phone, attendance_status, status, guests_count)
+        SELECT %s, 'Guest ' || i, 'Guest ' || i, '05' || LPAD(i::TEXT, 8, '0'), 'pending', 'pending', 1
+        FROM generate_series(1, %s) AS i
+        RETURNING id, phone
+    """, (event_id, guests))
+    targets = [
+        (guest_id, hashlib.sha256(f"{guest_id}-{phone}-{EVENT_NAME}".encode()).hexdigest()[:16])
+        for guest_id, phone in cur.fetchall()
+    ]
+    conn.commit()
+    cur.close()
+    conn.close()
+    return event_id, targets
+
+
+def cleanup():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM users WHERE email = %s", (SCRATCH_EMAIL,))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def check_stats(event_id: int) -> bool:
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT
+            COUNT(*) FILTER (WHERE attendance_status = 'confirmed'),
+            COUNT(*) FILTER (WHERE attendance_status = 'declined'),
+            COALESCE(SUM(attending_count) FILTER (WHERE attendance_status = 'confirmed'), 0)
+        FROM guests WHERE event_id = %s
+    """, (event_id,))
+    actual = cur.fetchone()
+    cur.execute("""
+        SELECT confirmed_guests, declined_guests, confirmed_people
+        FROM event_rsvp_stats WHERE event_id = %s
+    """, (event_id,))
+    stored = cur.fetchone()
+    cur.close()
+    conn.close()
+    print(f"🔎 guests table: confirmed={actual[0]} declined={actual[1]} people={actual[2]}")
+    print(f"   event_rsvp_stats: {stored}")
+    return stored is not None and tuple(stored) == tuple(actual)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test RSVP submissions")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--guests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    cleanup()
+    event_id, targets = seed(args.guests)
+    print(f"🌱 Seeded event {event_id} with {len(targets):,} guests")
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    statuses = {}
+    latencies = []
+
+    def worker(seed_value: int):
+        rng = random.Random(seed_value)
+        session = requests.Session()
+        while not stop.is_set():
+            guest_id, token = rng.choice(targets)
+            if rng.random() < 0.8:
+                body = {"status": "confirmed", "attending_count": rng.randint(1, 4)}
+            else:
+                body = {"status": "declined", "attending_count": 0}
+            start = time.perf_counter()
+            try:
+                resp = session.post(f"{args.base_url}/api/rsvp/{guest_id}",
+                                    params={"token": token}, json=body, timeout=30)
+                code = resp.status_code
+            except requests.RequestException:
+                code = "error"
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[code] = statuses.get(code, 0) + 1
+                latencies.append(elapsed)
+
+    print(f"🚀 {args.concurrency} RSVP workers for {args.duration:.0f}s against {args.base_url}")
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for i in range(args.concurrency):
+                pool.submit(worker, i)
+            time.sleep(args.duration)
+            stop.set()
+
+        total = sum(statuses.values())
+        ok = statuses.get(200, 0)
+        print(f"\n📊 RSVP writes: {ok} ok / {total} sent in {args.duration:.0f}s "
+              f"({ok / args.duration:.1f} writes/s)")
+        for code, count in sorted(statuses.items(), key=lambda kv: str(kv[0])):
+            print(f"   {code}: {count}")
+        if latencies:
+            print(f"   p50={percentile(latencies, 50) * 1000:.0f}ms "
+                  f"p95={percentile(latencies, 95) * 1000:.0f}ms "
+                  f"p99={percentile(latencies, 99) * 1000:.0f}ms")
+        print("✅ stats consistent" if check_stats(event_id) else "❌ stats mismatch")
+    finally:
+        if not args.keep:
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
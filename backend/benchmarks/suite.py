@@ -0,0 +1,508 @@
+"""
+Hot-path benchmark suite.
+
+Runs the app in-process (FastAPI TestClient, same middleware and handlers as
+production) against a scratch Postgres, with Gupshup/019SMS/Cloudinary pointed at
+benchmarks/provider_standin.py through their base-URL settings. Covered paths:
+
+    webhook_quick_reply, webhook_text_count     POST /api/whatsapp/webhook/gupshup
+    scheduler_<N>                               process_all_scheduled_messages() with N guests
+    guests_bulk, guests_excel                   create_guests_bulk / upload_guests_excel
+    user_events                                 GET /api/packages/events/user/{user_id}
+    admin_dashboard, admin_users, admin_events,
+    admin_guests                                admin dashboard and list endpoints
+    public_rsvp_event, public_rsvp_guest        public RSVP reads
+
+Each benchmark reports latency percentiles and SQL statements per operation
+(from the query tracer / metrics.count_queries). Results are written as JSON and
+compared against a stored baseline: a benchmark fails when its p50 regresses by
+more than --tolerance or when it issues more statements per op than the baseline
+(statement counts are deterministic, so that check is exact).
+
+Latency depends on the machine, so the baseline is recorded where the suite runs
+(benchmarks/baseline.json by default) - a run without one, or with a benchmark the
+baseline doesn't cover, fails unless --save-baseline is given.
+
+    # first run on this machine: record the baseline (needs initdb/pg_ctl on PATH)
+    python benchmarks/suite.py --throwaway-db --save-baseline
+    # then compare against it
+    python benchmarks/suite.py --throwaway-db --only webhook_quick_reply,user_events
+    # or a scratch database you already have
+    DATABASE_URL=postgresql://.../bench python benchmarks/suite.py --out results.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+import provider_standin
+
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+EVENT_NAME = "Benchmark Suite"
+
+
+# ============================================================================
+# Throwaway Postgres
+# ============================================================================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ThrowawayPostgres:
+    """initdb + pg_ctl in a temp dir; removed on stop()"""
+
+    def __init__(self):
+        self.data_dir = tempfile.mkdtemp(prefix="bench-pg-")
+        self.port = _free_port()
+
+    def start(self) -> str:
+        for tool in ("initdb", "pg_ctl"):
+            if not shutil.which(tool):
+                raise SystemExit(f"❌ {tool} not found on PATH - use DATABASE_URL instead of --throwaway-db")
+        pgdata = os.path.join(self.data_dir, "data")
+        subprocess.run(["initdb", "-D", pgdata, "-U", "postgres", "--auth=trust", "-E", "UTF8"],
+                       check=True, capture_output=True)
+        subprocess.run([
+            "pg_ctl", "-D", pgdata, "-w", "-l", os.path.join(self.data_dir, "postgres.log"),
+            "-o", f"-p {self.port} -k {self.data_dir} -c listen_addresses=127.0.0.1 -c fsync=off",
+            "start"
+        ], check=True, capture_output=True)
+        subprocess.run(["createdb", "-h", "127.0.0.1", "-p", str(self.port), "-U", "postgres", "bench"],
+                       check=True, capture_output=True)
+        return f"postgresql://postgres@127.0.0.1:{self.port}/bench"
+
+    def stop(self):
+        subprocess.run(["pg_ctl", "-D", os.path.join(self.data_dir, "data"), "-m", "immediate", "stop"],
+                       capture_output=True)
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+
+def create_schema():
+    """Base tables + every startup migration + default packages"""
+    from setup_database import setup_all_tables
+    from seed_packages import seed_packages
+    import main
+
+    setup_all_tables()
+    asyncio.run(main.startup_migrations())
+    seed_packages()
+
+
+# ============================================================================
+# Harness
+# ============================================================================
+
+BENCHMARKS = {}
+
+
+def benchmark(name_or_names):
+    def register(fn):
+        for name in ([name_or_names] if isinstance(name_or_names, str) else name_or_names):
+            BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(latencies, queries, extra=None):
+    result = {
+        "ops": len(latencies),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "queries_per_op": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+    result.update(extra or {})
+    return result
+
+
+class Context:
+    def __init__(self, args, client, admin_headers, providers):
+        self.args = args
+        self.client = client
+        self.admin_headers = admin_headers
+        self.providers = providers
+
+    def call(self, method, path, **kwargs):
+        """One traced request - returns (seconds, statements, response)"""
+        headers = dict(self.admin_headers, **kwargs.pop("headers", {}))
+        start = time.perf_counter()
+        response = self.client.request(method, path, headers=headers, **kwargs)
+        elapsed = time.perf_counter() - start
+        trace = response.headers.get("x-query-trace")
+        statements = json.loads(trace)["queries"] if trace else None
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} -> {response.status_code}: {response.text[:300]}")
+        return elapsed, statements, response
+
+    def repeat(self, method, path_fn, iterations, **kwargs_fn):
+        latencies, queries = [], []
+        for i in range(iterations):
+            kwargs = {key: fn(i) for key, fn in kwargs_fn.items()}
+            elapsed, statements, _ = self.call(method, path_fn(i), **kwargs)
+            latencies.append(elapsed)
+            if statements is not None:
+                queries.append(statements)
+        return summarize(latencies, queries)
+
+
+def db():
+    from db import get_db_connection
+    return get_db_connection()
+
+
+def cleanup():
+    conn = db()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM users WHERE email LIKE %s", ("bench-suite%@example.invalid",))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def seed_event(guests: int, package_id: int = 3, event_date: date = None, suffix: str = ""):
+    """Scratch user + purchase + event + N guests. Returns (user_id, event_id, [(guest_id, phone)])"""
+    from rsvp_coalescer import refresh_event_stats
+
+    conn = db()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO users (email, password, full_name)
+        VALUES (%s, 'x', 'Benchmark Suite')
+        ON CONFLICT (email) DO UPDATE SET full_name = EXCLUDED.full_name
+        RETURNING id
+    """, (f"bench-suite{suffix}@example.invalid",))
+    user_id = cur.fetchone()[0]
+    cur.execute("""
+        INSERT INTO package_purchases (user_id, package_id, package_name, status)
+        SELECT %s, id, name, 'active' FROM packages WHERE id = %s
+        RETURNING id
+    """, (user_id, package_id))
+    row = cur.fetchone()
+    purchase_id = row[0] if row else None
+    cur.execute("""
+        INSERT INTO events (user_id, package_purchase_id, event_type, event_name, event_title,
+                            event_date, event_location, status)
+        VALUES (%s, %s, 'benchmark', %s, %s, %s, 'Bench Hall', 'active')
+        RETURNING id
+    """, (user_id, purchase_id, EVENT_NAME, EVENT_NAME, event_date or date.today() + timedelta(days=30)))
+    event_id = cur.fetchone()[0]
+    cur.execute("""
+        INSERT INTO guests (event_id, name, full_name, phone, attendance_status, status, guests_count)
+        SELECT %s, 'Guest ' || i, 'Guest ' || i,
+               '97250' || LPAD((%s * 1000000 + i)::TEXT, 7, '0'), 'pending', 'pending', 1
+        FROM generate_series(1, %s) AS i
+        ORDER BY i
+        RETURNING id, phone
+    """, (event_id, event_id % 100, guests))
+    guest_rows = cur.fetchall()
+    refresh_event_stats(cur, [event_id])
+    conn.commit()
+    cur.close()
+    conn.close()
+    return user_id, event_id, guest_rows
+
+
+def rsvp_token(guest_id, phone):
+    import hashlib
+    return hashlib.sha256(f"{guest_id}-{phone}-{EVENT_NAME}".encode()).hexdigest()[:16]
+
+
+# ============================================================================
+# Benchmarks
+# ============================================================================
+
+@benchmark(["webhook_quick_reply", "webhook_text_count"])
+def bench_webhook(ctx, name):
+    iterations = ctx.args.iterations
+    _, event_id, guests = seed_event(iterations, suffix="-webhook")
+
+    # Each guest got an invitation: gs_id -> guest, like after a scheduler round
+    conn = db()
+    cur = conn.cursor()
+    from psycopg2.extras import execute_values
+    execute_values(cur, """
+        INSERT INTO whatsapp_message_events (gs_id, event_id, guest_id) VALUES %s
+    """, [(f"bench-gs-{guest_id}", event_id, guest_id) for guest_id, _ in guests])
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    def quick_reply(i):
+        guest_id, phone = guests[i]
+        return {
+            "type": "message", "timestamp": int(time.time() * 1000),
+            "payload": {
+                "id": f"bench-qr-{guest_id}-{time.time_ns()}", "type": "quick_reply",
+                "sender": {"phone": phone}, "context": {"gsId": f"bench-gs-{guest_id}"},
+                "payload": {"postbackText": "מאשר הגעה"},
+            },
+        }
+
+    def text_count(i):
+        guest_id, phone = guests[i]
+        return {
+            "type": "message", "timestamp": int(time.time() * 1000),
+            "payload": {
+                "id": f"bench-txt-{guest_id}-{time.time_ns()}", "type": "text",
+                "sender": {"phone": phone}, "payload": {"text": str(1 + i % 4)},
+            },
+        }
+
+    path = lambda i: "/api/whatsapp/webhook/gupshup"
+    if name == "webhook_quick_reply":
+        return ctx.repeat("POST", path, iterations, json=quick_reply)
+    # The count reply follows a "yes" - put every guest in that state first (not timed)
+    ctx.repeat("POST", path, iterations, json=quick_reply)
+    return ctx.repeat("POST", path, iterations, json=text_count)
+
+
+def bench_scheduler(ctx, name):
+    import scheduler_service
+    from metrics import count_queries
+
+    guests = int(name.split("_", 1)[1])
+    # Deterministic regardless of the weekday the suite runs on
+    scheduler_service.is_shabbat_or_holiday = lambda day: False
+
+    _, event_id, _ = seed_event(guests, package_id=3, suffix=f"-sched{guests}")
+    conn = db()
+    cur = conn.cursor()
+    cur.execute("UPDATE scheduled_messages SET status = 'skipped' WHERE status = 'pending'")
+    cur.execute("""
+        INSERT INTO scheduled_messages (event_id, message_number, scheduled_date, status)
+        VALUES (%s, 1, CURRENT_DATE, 'pending')
+    """, (event_id,))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    before = sum(provider_standin.request_counts(ctx.providers).values())
+    with count_queries() as stats:
+        start = time.perf_counter()
+        result = scheduler_service.process_all_scheduled_messages()
+        elapsed = time.perf_counter() - start
+    sent = sum(provider_standin.request_counts(ctx.providers).values()) - before
+    return summarize([elapsed], [stats.queries], {
+        "guests": guests,
+        "sent": result.get("total_sent", 0),
+        "failed": result.get("total_failed", 0),
+        "provider_calls": sent,
+        "messages_per_sec": round(result.get("total_sent", 0) / elapsed, 2) if elapsed else 0.0,
+    })
+
+
+@benchmark("guests_bulk")
+def bench_guests_bulk(ctx, name):
+    _, event_id, _ = seed_event(0, suffix="-bulk")
+    batch = ctx.args.batch
+    body = lambda i: {
+        "event_id": event_id,
+        "guests": [{"name": f"Bulk {i}-{j}", "phone": f"05{i:03d}{j:05d}", "quantity": 1} for j in range(batch)],
+    }
+    result = ctx.repeat("POST", lambda i: f"/api/packages/events/{event_id}/guests/bulk",
+                        max(1, ctx.args.iterations // 20), json=body)
+    result["guests_per_op"] = batch
+    return result
+
+
+@benchmark("guests_excel")
+def bench_guests_excel(ctx, name):
+    from openpyxl import Workbook
+
+    _, event_id, _ = seed_event(0, suffix="-excel")
+    batch = ctx.args.batch
+
+    def workbook(i):
+        wb = Workbook()
+        ws = wb.active
+        ws.append(["name", "phone", "email", "quantity"])
+        for j in range(batch):
+            ws.append([f"Excel {i}-{j}", f"05{i:03d}{j:05d}", f"g{i}-{j}@example.invalid", 1 + j % 3])
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return buffer.getvalue()
+
+    files = lambda i: {"file": (f"guests-{i}.xlsx", workbook(i),
+                                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+    result = ctx.repeat("POST", lambda i: f"/api/packages/events/{event_id}/guests/upload-excel",
+                        max(1, ctx.args.iterations // 20), files=files)
+    result["guests_per_op"] = batch
+    return result
+
+
+@benchmark("user_events")
+def bench_user_events(ctx, name):
+    user_id, _, _ = seed_event(ctx.args.batch // 5, suffix="-events")
+    for _ in range(19):
+        seed_event(ctx.args.batch // 5, suffix="-events")
+    return ctx.repeat("GET", lambda i: f"/api/packages/events/user/{user_id}", ctx.args.iterations)
+
+
+ADMIN_PATHS = {
+    "admin_dashboard": "/api/admin/dashboard/stats",
+    "admin_users": "/api/admin/users",
+    "admin_events": "/api/admin/events",
+    "admin_guests": "/api/admin/guests",
+}
+
+
+@benchmark(list(ADMIN_PATHS))
+def bench_admin(ctx, name):
+    return ctx.repeat("GET", lambda i: ADMIN_PATHS[name], ctx.args.iterations)
+
+
+@benchmark(["public_rsvp_event", "public_rsvp_guest"])
+def bench_public_rsvp(ctx, name):
+    _, event_id, guests = seed_event(ctx.args.iterations, suffix="-rsvp")
+    if name == "public_rsvp_event":
+        return ctx.repeat("GET", lambda i: f"/api/rsvp/event/{event_id}", ctx.args.iterations)
+    return ctx.repeat("GET", lambda i: f"/api/rsvp/{guests[i][0]}", ctx.args.iterations,
+                      params=lambda i: {"token": rsvp_token(*guests[i])})
+
+
+# ============================================================================
+# Baseline comparison
+# ============================================================================
+
+def compare(results, baseline, tolerance):
+    """Returns a list of regression messages"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if "error" in current:
+            continue
+        if not previous:
+            regressions.append(f"{name}: not in the baseline (re-run with --save-baseline)")
+            continue
+        if previous.get("p50_ms") and current["p50_ms"] > previous["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {current['p50_ms']:.1f}ms vs baseline {previous['p50_ms']:.1f}ms")
+        if (previous.get("queries_per_op") is not None and current.get("queries_per_op") is not None
+                and current["queries_per_op"] > previous["queries_per_op"]):
+            regressions.append(f"{name}: {current['queries_per_op']} statements/op vs baseline "
+                               f"{previous['queries_per_op']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-path benchmark suite")
+    parser.add_argument("--throwaway-db", action="store_true", help="initdb a temporary cluster")
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=500, help="guests per bulk/Excel upload")
+    parser.add_argument("--scheduler-sizes", default="1000,10000")
+    parser.add_argument("--provider-latency", default="", help="stand-in latency, e.g. lognormal:80,0.5")
+    parser.add_argument("--out", default="benchmark-results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 regression (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        raise SystemExit(f"❌ no baseline at {args.baseline} - record one with --save-baseline first")
+
+    for size in args.scheduler_sizes.split(","):
+        if size.strip():
+            BENCHMARKS[f"scheduler_{int(size)}"] = bench_scheduler
+
+    # Settings are read at import - configure the environment before importing the app
+    postgres = None
+    if args.throwaway_db:
+        postgres = ThrowawayPostgres()
+        os.environ["DATABASE_URL"] = postgres.start()
+        os.environ["DB_SSLMODE"] = "disable"
+        print(f"🐘 Throwaway Postgres on port {postgres.port}")
+    os.environ.setdefault("SLOW_REQUEST_MS", "60000")
+    os.environ["DOTENV_OVERRIDE"] = "false"
+
+    providers = provider_standin.start(latency=args.provider_latency)
+    standin_url = f"http://127.0.0.1:{providers.server_port}"
+    os.environ["GUPSHUP_API_BASE_URL"] = standin_url
+    os.environ["SMS_019_API_URL"] = f"{standin_url}/api"
+    os.environ["CLOUDINARY_API_BASE_URL"] = standin_url
+
+    try:
+        if args.throwaway_db:
+            create_schema()
+
+        from fastapi.testclient import TestClient
+        import main as app_main
+        from admin_auth import create_admin_token
+
+        client = TestClient(app_main.app, raise_server_exceptions=False)
+        admin_headers = {
+            "Authorization": f"Bearer {create_admin_token(0, 'bench@example.invalid', 'admin')}",
+            "X-Debug-Trace": "1",
+        }
+        ctx = Context(args, client, admin_headers, providers)
+
+        names = [n.strip() for n in args.only.split(",")] if args.only else list(BENCHMARKS)
+        results = {}
+        cleanup()
+        for name in names:
+            if name not in BENCHMARKS:
+                raise SystemExit(f"❌ unknown benchmark {name} (have: {', '.join(BENCHMARKS)})")
+            print(f"▶️  {name}")
+            try:
+                results[name] = BENCHMARKS[name](ctx, name)
+                r = results[name]
+                print(f"   p50={r['p50_ms']:.1f}ms p95={r['p95_ms']:.1f}ms "
+                      f"statements/op={r['queries_per_op']} ops={r['ops']}")
+            except Exception as e:
+                results[name] = {"error": str(e)}
+                print(f"   ❌ {e}")
+            finally:
+                cleanup()
+    finally:
+        providers.shutdown()
+        if postgres:
+            postgres.stop()
+
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args), "results": results}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n📄 Results written to {args.out}")
+
+    failed = [name for name, r in results.items() if "error" in r]
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"💾 Baseline saved to {args.baseline}")
+    else:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"❌ regression - {message}")
+        if regressions:
+            sys.exit(1)
+        print("✅ no regressions against baseline")
+
+    if failed:
+        print(f"❌ failed: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Replay captured Gupshup webhooks against a running server.
+
+Reads a capture file written by webhook_capture.py (WEBHOOK_CAPTURE_PATH) and
+POSTs each payload to /api/whatsapp/webhook/gupshup, keeping the original
+inter-arrival gaps divided by --speed (--speed 0 fires as fast as the worker
+pool allows). Reports latency percentiles, errors, schedule lag (how far
+dispatch fell behind the capture timeline - the pool was saturated) and the
+duplicate-processing rate: of the message ids delivered more than once (retries
+in the capture, or injected with --duplicate-rate), how many the server acted
+on more than once instead of answering "duplicate".
+
+Message ids are suffixed with a per-run tag so repeated replays against the
+same server are not swallowed by its dedup cache; payload timestamps are moved
+to send time so webhook_lag_seconds stays meaningful.
+
+Captured phones are pseudonyms. To make RSVPs land on guests of a scratch
+database, pass --phones with one phone per line (e.g. generate_dataset.py
+output); pseudonyms are assigned to them in order of first appearance.
+
+    python benchmarks/webhook_replay.py capture.jsonl --base-url http://localhost:8000 \
+        --speed 10 --concurrency 32 --duplicate-rate 0.05
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+WEBHOOK_PATH = "/api/whatsapp/webhook/gupshup"
+PHONE_KEYS = {"phone", "source", "destination", "dial_code", "mobile", "waId"}
+
+
+def load_capture(path: str, source: str = "gupshup"):
+    """Returns [(offset_seconds, payload), ...] relative to the first captured webhook"""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                print(f"⚠️ Skipping malformed line {line_no}")
+                continue
+            if entry.get("src", source) == source:
+                entries.append((entry["t"], entry["p"]))
+    entries.sort(key=lambda e: e[0])
+    if not entries:
+        return []
+    first = entries[0][0]
+    return [((t - first) / 1000.0, payload) for t, payload in entries]
+
+
+def message_id(payload) -> str:
+    """Id the server dedups on - only inbound messages are deduped, status events are not"""
+    if payload.get("type") != "message":
+        return None
+    inner = payload.get("payload") or {}
+    return inner.get("id") or inner.get("gsId")
+
+
+class PhoneMap:
+    """Maps pseudonymized subscriber numbers (last 9 digits) onto real phones, in order"""
+
+    def __init__(self, phones):
+        self.phones = phones
+        self.assigned = {}
+
+    def rewrite(self, value: str) -> str:
+        digits = "".join(c for c in value if c.isdigit())
+        if len(digits) < 7 or not self.phones:
+            return value
+        key = digits[-9:]
+        if key not in self.assigned:
+            self.assigned[key] = self.phones[len(self.assigned) % len(self.phones)]
+        target = "".join(c for c in self.assigned[key] if c.isdigit())
+        target = "972" + target[1:] if target.startswith("0") else target
+        # dial_code-style values carry only the subscriber part
+        return target[-len(digits):] if len(digits) < len(target) else target
+
+
+def prepare(payload, run_tag: str, phone_map: PhoneMap, keep_timestamps: bool):
+    """Returns a copy of the payload ready to send (dedup id tagged, phones remapped)"""
+    def walk(value, key=None):
+        if isinstance(value, dict):
+            return {k: walk(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [walk(v, key) for v in value]
+        if isinstance(value, str) and key in PHONE_KEYS and phone_map:
+            return phone_map.rewrite(value)
+        return value
+
+    prepared = walk(payload)
+    # Only the id the server dedups on - context.gsId must still match whatsapp_message_events
+    if run_tag and prepared.get("type") == "message":
+        inner = prepared.get("payload") or {}
+        for key in ("id", "gsId"):
+            if inner.get(key):
+                inner[key] = f"{inner[key]}-{run_tag}"
+    if not keep_timestamps and "timestamp" in prepared:
+        prepared["timestamp"] = int(time.time() * 1000)
+    return prepared
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured Gupshup webhooks")
+    parser.add_argument("capture", help="JSONL file written with WEBHOOK_CAPTURE_PATH")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="timeline speedup (0 = no pacing)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N webhooks")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0,
+                        help="re-send this fraction of inbound messages, like a Gupshup retry")
+    parser.add_argument("--duplicate-delay-ms", type=float, default=50.0)
+    parser.add_argument("--phones", help="file with one target phone per line")
+    parser.add_argument("--keep-ids", action="store_true", help="do not tag message ids with a run id")
+    parser.add_argument("--keep-timestamps", action="store_true")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    entries = load_capture(args.capture)
+    if args.limit:
+        entries = entries[:args.limit]
+    if not entries:
+        print("❌ Nothing to replay")
+        sys.exit(1)
+
+    phone_map = None
+    if args.phones:
+        with open(args.phones, encoding="utf-8") as f:
+            phone_map = PhoneMap([line.strip() for line in f if line.strip()])
+
+    rng = random.Random(args.seed)
+    run_tag = "" if args.keep_ids else uuid.uuid4().hex[:8]
+    schedule = []  # (offset, payload)
+    for offset, payload in entries:
+        offset = offset / args.speed if args.speed > 0 else 0.0
+        schedule.append((offset, payload))
+        if args.duplicate_rate and message_id(payload) and rng.random() < args.duplicate_rate:
+            schedule.append((offset + args.duplicate_delay_ms / 1000.0, payload))
+    schedule.sort(key=lambda e: e[0])
+
+    url = args.base_url.rstrip("/") + WEBHOOK_PATH
+    local = threading.local()
+    lock = threading.Lock()
+    latencies = []
+    reasons = Counter()
+    errors = Counter()
+    deliveries = Counter()          # message id -> times sent
+    processed = defaultdict(int)    # message id -> times the server acted on it
+    max_lag = [0.0]
+
+    def fire(payload):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        body = prepare(payload, run_tag, phone_map, args.keep_timestamps)
+        msg_id = message_id(body)
+        start = time.perf_counter()
+        try:
+            response = session.post(url, json=body, timeout=args.timeout)
+            elapsed = time.perf_counter() - start
+            try:
+                result = response.json()
+            except ValueError:
+                result = {}
+        except requests.RequestException as e:
+            with lock:
+                errors[type(e).__name__] += 1
+            return
+        status = result.get("status")
+        reason = result.get("reason") or result.get("message") or ""
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code != 200:
+                errors[f"http_{response.status_code}"] += 1
+            elif status == "error":
+                errors["webhook_error"] += 1
+            reasons[f"{status}:{reason}"[:80]] += 1
+            if msg_id:
+                deliveries[msg_id] += 1
+                if reason != "duplicate":
+                    processed[msg_id] += 1
+
+    print(f"▶️ Replaying {len(schedule)} webhooks ({len(entries)} captured) -> {url} "
+          f"speed={args.speed:g}x concurrency={args.concurrency}")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        slots = threading.BoundedSemaphore(args.concurrency)
+
+        def run(payload):
+            try:
+                fire(payload)
+            finally:
+                slots.release()
+
+        for offset, payload in schedule:
+            wait = offset - (time.perf_counter() - started)
+            if wait > 0:
+                time.sleep(wait)
+            # Blocks when every worker is busy - that delay shows up as schedule lag
+            slots.acquire()
+            max_lag[0] = max(max_lag[0], (time.perf_counter() - started) - offset)
+            pool.submit(run, payload)
+    wall = time.perf_counter() - started
+
+    retried = [mid for mid, sent in deliveries.items() if sent > 1]
+    double_processed = [mid for mid in retried if processed[mid] > 1]
+    report = {
+        "sent": len(schedule),
+        "completed": len(latencies),
+        "wall_s": round(wall, 2),
+        "rate_per_s": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1) if latencies else 0.0,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        "errors": sum(errors.values()),
+        "error_breakdown": dict(errors),
+        "max_schedule_lag_ms": round(max_lag[0] * 1000, 1),
+        "messages_delivered_more_than_once": len(retried),
+        "duplicate_processing": len(double_processed),
+        "duplicate_processing_rate": round(len(double_processed) / len(retried), 4) if retried else 0.0,
+        "responses": dict(reasons.most_common(15)),
+    }
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"\n{'completed':<28}{report['completed']}/{report['sent']} in {report['wall_s']}s "
+          f"({report['rate_per_s']}/s)")
+    print(f"{'latency p50/p95/p99':<28}{report['p50_ms']} / {report['p95_ms']} / {report['p99_ms']} ms "
+          f"(max {report['max_ms']} ms)")
+    print(f"{'errors':<28}{report['errors']} {report['error_breakdown'] or ''}")
+    print(f"{'max schedule lag':<28}{report['max_schedule_lag_ms']} ms")
+    print(f"{'duplicate processing':<28}{report['duplicate_processing']}/"
+          f"{report['messages_delivered_more_than_once']} ({report['duplicate_processing_rate']:.2%})")
+    print("responses:")
+    for reason, count in reasons.most_common(15):
+        print(f"  {count:>7}  {reason}")
+    if report["errors"] or report["duplicate_processing"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Shared Cloudinary helpers (invitation image upload + migration tool).
+
+Images are uploaded as multipart file bytes (no base64 round-trip) under a
+content-addressed public_id, so the same image is stored once however many
+times - or for however many events - it is uploaded.
+"""
+from typing import Optional
+
+from metrics import provider_call
+from settings import settings
+
+CLOUDINARY_CLOUD_NAME = settings.cloudinary_cloud_name
+CLOUDINARY_API_KEY    = settings.cloudinary_api_key
+CLOUDINARY_API_SECRET = settings.cloudinary_api_secret
+CLOUDINARY_UPLOAD_TIMEOUT = 30
+
+_session = None
+
+
+def _get_session():
+    # requests is imported on first upload, not at boot
+    global _session
+    if _session is None:
+        import requests
+        _session = requests.Session()
+    return _session
+
+
+def cloudinary_upload_url() -> str:
+    return f"{settings.cloudinary_api_base_url}/v1_1/{CLOUDINARY_CLOUD_NAME}/image/upload"
+
+
+def upload_image(image_bytes: bytes, public_id: str, upload_url: Optional[str] = None) -> str:
+    """Upload image bytes and return the secure URL. Blocking - call off the event loop."""
+    with provider_call("cloudinary") as call:
+        response = _get_session().post(
+            upload_url or cloudinary_upload_url(),
+            data={
+                "public_id": public_id,
+                "overwrite": "false",
+                "resource_type": "image",
+            },
+            files={"file": (public_id.rsplit("/", 1)[-1], image_bytes)},
+            auth=(CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET),
+            timeout=CLOUDINARY_UPLOAD_TIMEOUT,
+        )
+        call.status = response.status_code
+
+    if response.status_code == 200:
+        url = response.json().get("secure_url", "")
+        print(f"✅ Uploaded to Cloudinary: {url}")
+        return url
+    print(f"❌ Cloudinary upload failed: {response.status_code} - {response.text}")
+    raise Exception(f"Cloudinary error {response.status_code}: {response.text}")
+
+
+def content_public_id(sha256_hex: str) -> str:
+    """Content-addressed public_id for an invitation image"""
+    return f"invitations/{sha256_hex}"
+
+
+def optimize_cloudinary_url(url: str) -> str:
+    """
+    Add Cloudinary transformation params for WhatsApp delivery.
+    Reduces file size without visible quality loss on mobile screens.
+    Original image in DB is untouched.
+    """
+    if not url or 'cloudinary.com' not in url:
+        return url
+    # Insert transformation after /upload/
+    return url.replace('/upload/', '/upload/q_auto:best,f_jpg,w_1200/', 1)
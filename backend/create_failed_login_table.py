@@ -26,6 +26,12 @@ def create_failed_login_attempts_table():
             ON failed_login_attempts(email, attempt_time)
         """)
 
+        # Index for the periodic purge (login_limiter)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_failed_login_attempt_time
+            ON failed_login_attempts(attempt_time)
+        """)
+
         # Create account_locks table
         cur.execute("""
             CREATE TABLE IF NOT EXISTS account_locks (
@@ -43,6 +49,15 @@ def create_failed_login_attempts_table():
             ON account_locks(email, locked_until)
         """)
 
+        # Failure counters shared by all workers (login_limiter), key = "email:..." / "ip:..."
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS login_failure_counters (
+                key VARCHAR(320) PRIMARY KEY,
+                window_start TIMESTAMP NOT NULL,
+                failures INTEGER NOT NULL
+            )
+        """)
+
         conn.commit()
         print("Failed login attempts and account locks tables created successfully!")
 
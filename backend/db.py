@@ -1,18 +1,28 @@
-import os
 import psycopg2
-from dotenv import load_dotenv
 
-load_dotenv(override=True)
+from metrics import InstrumentedConnection, timed_connect
+from settings import settings
+
 
 def get_db_connection():
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
+    if not settings.database_url:
         raise RuntimeError("DATABASE_URL לא מוגדר ב-.env")
 
     # אם כבר הוספת ?sslmode=require ל-URL זה מספיק,
-    # אבל גם ככה לא מזיק להשאיר כאן require.
-    return psycopg2.connect(
-        db_url,
-        sslmode="require",
-        connect_timeout=10
-    )
+    # אבל גם ככה לא מזיק להשאיר כאן require (ניתן לשנות עם DB_SSLMODE).
+    with timed_connect():
+        return psycopg2.connect(
+            settings.database_url,
+            sslmode=settings.db_sslmode,
+            connect_timeout=settings.db_connect_timeout,
+            connection_factory=InstrumentedConnection
+        )
+
+
+def json_keys_sql(column: str, keys) -> str:
+    """
+    SQL expression projecting only `keys` of a JSONB column, as a (smaller) JSONB object.
+    Absent/null keys are dropped, so callers' dict.get(key, default) behaves as on the full blob.
+    """
+    pairs = ", ".join(f"'{key}', {column}->'{key}'" for key in keys)
+    return f"jsonb_strip_nulls(jsonb_build_object({pairs}))"
@@ -0,0 +1,150 @@
+"""
+Email outbox - enqueue now, send in the background.
+
+enqueue_email() inserts a row into email_outbox and returns; a daemon thread in
+each worker drains pending rows in Gmail batch requests (GMAIL_BATCH_SIZE per
+HTTP call). Rows are claimed with FOR UPDATE SKIP LOCKED, so several workers can
+drain concurrently without sending twice. Failed sends are retried with
+exponential backoff up to MAX_ATTEMPTS.
+
+Senders wake immediately on NOTIFY (channel OUTBOX_CHANNEL), and otherwise poll
+every POLL_INTERVAL_SECONDS to pick up retries.
+"""
+import threading
+from typing import Optional
+
+from db import get_db_connection
+from gmail_api_service import GMAIL_BATCH_SIZE, build_raw_message, send_batch_gmail_api
+from pg_events import hub, notify
+
+OUTBOX_CHANNEL = "email_outbox"
+POLL_INTERVAL_SECONDS = 5.0
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+
+_wakeup = threading.Event()
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def enqueue_email(to_email: str, subject: str, html_content: str,
+                  logo_path: Optional[str] = None, from_email: Optional[str] = None) -> bool:
+    """Queue an email for background sending. Returns True once it is stored."""
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO email_outbox (to_email, subject, html_content, logo_path, from_email)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (to_email, subject, html_content, logo_path, from_email))
+        notify(cur, OUTBOX_CHANNEL, {})
+        conn.commit()
+        _wakeup.set()
+        return True
+    except Exception as e:
+        print(f"Failed to enqueue email to {to_email}: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def _drain_batch() -> int:
+    """Claim and send one batch. Returns the number of rows handled."""
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, to_email, subject, html_content, logo_path, from_email, attempts
+            FROM email_outbox
+            WHERE status = 'pending' AND next_attempt_at <= NOW()
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (GMAIL_BATCH_SIZE,))
+        rows = cur.fetchall()
+        if not rows:
+            conn.commit()
+            return 0
+
+        raw_messages = {}
+        errors = {}
+        for row_id, to_email, subject, html_content, logo_path, from_email, _ in rows:
+            try:
+                raw_messages[str(row_id)] = build_raw_message(to_email, subject, html_content, logo_path, from_email)
+            except Exception as e:
+                errors[str(row_id)] = f"build failed: {e}"
+
+        if raw_messages:
+            try:
+                errors.update(send_batch_gmail_api(raw_messages))
+            except Exception as e:
+                # Whole batch failed (auth / network) - retry every row later
+                errors.update({request_id: str(e) for request_id in raw_messages})
+
+        sent = 0
+        for row_id, to_email, _, _, _, _, attempts in rows:
+            error = errors.get(str(row_id))
+            if error is None:
+                sent += 1
+                cur.execute("""
+                    UPDATE email_outbox
+                    SET status = 'sent', sent_at = NOW(), attempts = attempts + 1, last_error = NULL
+                    WHERE id = %s
+                """, (row_id,))
+            elif attempts + 1 >= MAX_ATTEMPTS:
+                print(f"❌ Email to {to_email} failed permanently: {error}")
+                cur.execute("""
+                    UPDATE email_outbox
+                    SET status = 'failed', attempts = attempts + 1, last_error = %s
+                    WHERE id = %s
+                """, (error, row_id))
+            else:
+                cur.execute("""
+                    UPDATE email_outbox
+                    SET attempts = attempts + 1, last_error = %s,
+                        next_attempt_at = NOW() + make_interval(secs => %s)
+                    WHERE id = %s
+                """, (error, RETRY_BASE_SECONDS * (2 ** attempts), row_id))
+
+        conn.commit()
+        print(f"📧 Outbox batch: {sent}/{len(rows)} sent")
+        return len(rows)
+
+    except Exception as e:
+        print(f"Error draining email outbox: {e}")
+        if conn:
+            conn.rollback()
+        return 0
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def _run():
+    while True:
+        _wakeup.wait(POLL_INTERVAL_SECONDS)
+        _wakeup.clear()
+        # Keep going while full batches come back
+        while _drain_batch() >= GMAIL_BATCH_SIZE:
+            pass
+
+
+def start_sender():
+    """Start this worker's outbox sender (idempotent)."""
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            hub.add_callback(OUTBOX_CHANNEL, lambda _: _wakeup.set())
+            _thread = threading.Thread(target=_run, name="email-outbox", daemon=True)
+            _thread.start()
@@ -1,16 +1,14 @@
-import os
 from pathlib import Path
 from typing import Optional
-from dotenv import load_dotenv
 from datetime import datetime
+from functools import lru_cache
 
-# Import Gmail API service
-from gmail_api_service import send_email_gmail_api
-
-load_dotenv()
+# מיילים נשלחים ברקע דרך תור email_outbox (Gmail API)
+from email_outbox import enqueue_email
+from settings import settings
 
 # פרטי חשבון Gmail
-SENDER_EMAIL = os.getenv("SENDER_EMAIL", "savedayevents@gmail.com")
+SENDER_EMAIL = settings.sender_email
 
 # צבעי העיצוב של האתר - גוון חום וכחול יוקרתי
 PRIMARY_COLOR = "#8B6F47"  # חום זהב יוקרתי
@@ -19,10 +17,15 @@ ACCENT_COLOR = "#B8986E"  # חום בהיר
 TEXT_COLOR = "#2D2D2D"
 BACKGROUND_COLOR = "#FAF8F5"  # רקע שמנת
 
+# נתיב ללוגו (נבדק פעם אחת; המיילים נשלחים גם אם אין לוגו)
+_logo_file = Path(__file__).parent.parent / "frontend" / "public" / "images" / "logo.png"
+LOGO_PATH = str(_logo_file) if _logo_file.exists() else None
 
-def get_email_template(title: str, content: str, logo_cid: str = "logo") -> str:
+
+@lru_cache(maxsize=1)
+def _email_template_head() -> str:
     """
-    תבנית HTML מעוצבת לאימיילים
+    ה-<head> והעיצוב של התבנית - זהים לכל המיילים, נבנים פעם אחת
     """
     return f"""
     <!DOCTYPE html>
@@ -139,6 +142,14 @@ def get_email_template(title: str, content: str, logo_cid: str = "logo") -> str:
             }}
         </style>
     </head>
+    """
+
+
+def get_email_template(title: str, content: str, logo_cid: str = "logo") -> str:
+    """
+    תבנית HTML מעוצבת לאימיילים
+    """
+    return _email_template_head() + f"""
     <body>
         <div class="container">
             <div class="header">
@@ -170,23 +181,15 @@ def get_email_template(title: str, content: str, logo_cid: str = "logo") -> str:
 
 def send_email_with_logo(to_email: str, subject: str, html_content: str, logo_path: Optional[str] = None):
     """
-    שולח אימייל עם לוגו מוטמע באמצעות Gmail API
+    מכניס אימייל עם לוגו מוטמע לתור השליחה (email_outbox) - נשלח ברקע דרך Gmail API
     """
-    try:
-        # Use Gmail API to send email
-        return send_email_gmail_api(
-            to_email=to_email,
-            subject=subject,
-            html_content=html_content,
-            logo_path=logo_path,
-            from_email=SENDER_EMAIL
-        )
-
-    except Exception as e:
-        print(f"Failed to send email to {to_email}: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+    return enqueue_email(
+        to_email=to_email,
+        subject=subject,
+        html_content=html_content,
+        logo_path=logo_path,
+        from_email=SENDER_EMAIL
+    )
 
 
 def send_welcome_email(to_email: str, full_name: Optional[str] = None):
@@ -225,14 +228,7 @@ def send_welcome_email(to_email: str, full_name: Optional[str] = None):
     subject = "ברוכים הבאים ל-SaveDay Events"
     html = get_email_template(subject, content)
 
-    # נתיב ללוגו
-    logo_path = Path(__file__).parent.parent / "frontend" / "public" / "images" / "logo.png"
-
-    # שלח את המייל (גם אם אין לוגו)
-    if not logo_path.exists():
-        logo_path = None
-
-    return send_email_with_logo(to_email, subject, html, str(logo_path) if logo_path else None)
+    return send_email_with_logo(to_email, subject, html, LOGO_PATH)
 
 
 def send_reset_code_email(to_email: str, reset_code: str):
@@ -267,13 +263,7 @@ def send_reset_code_email(to_email: str, reset_code: str):
     subject = "קוד איפוס סיסמה - SaveDay Events"
     html = get_email_template(subject, content)
 
-    logo_path = Path(__file__).parent.parent / "frontend" / "public" / "images" / "logo.png"
-
-    # שלח את המייל (גם אם אין לוגו)
-    if not logo_path.exists():
-        logo_path = None
-
-    return send_email_with_logo(to_email, subject, html, str(logo_path) if logo_path else None)
+    return send_email_with_logo(to_email, subject, html, LOGO_PATH)
 
 
 def send_password_reset_success_email(to_email: str, full_name: Optional[str] = None):
@@ -321,13 +311,7 @@ def send_password_reset_success_email(to_email: str, full_name: Optional[str] =
     subject = "הסיסמה שלך אופסה בהצלחה - SaveDay Events"
     html = get_email_template(subject, content)
 
-    logo_path = Path(__file__).parent.parent / "frontend" / "public" / "images" / "logo.png"
-
-    # שלח את המייל (גם אם אין לוגו)
-    if not logo_path.exists():
-        logo_path = None
-
-    return send_email_with_logo(to_email, subject, html, str(logo_path) if logo_path else None)
+    return send_email_with_logo(to_email, subject, html, LOGO_PATH)
 
 
 def send_verification_code_email(to_email: str, verification_code: str) -> bool:
@@ -379,13 +363,7 @@ def send_verification_code_email(to_email: str, verification_code: str) -> bool:
     subject = "אמת את כתובת המייל שלך - SaveDay Events"
     html = get_email_template(subject, content)
 
-    logo_path = Path(__file__).parent.parent / "frontend" / "public" / "images" / "logo.png"
-
-    # שלח את המייל (גם אם אין לוגו)
-    if not logo_path.exists():
-        logo_path = None
-
-    return send_email_with_logo(to_email, subject, html, str(logo_path) if logo_path else None)
+    return send_email_with_logo(to_email, subject, html, LOGO_PATH)
 
 
 def send_admin_verification_code_email(to_email: str, admin_name: str, verification_code: str) -> bool:
@@ -448,10 +426,4 @@ def send_admin_verification_code_email(to_email: str, admin_name: str, verificat
     subject = "🔐 קוד אימות להתחברות מנהל - SaveDay Events"
     html = get_email_template(subject, content)
 
-    logo_path = Path(__file__).parent.parent / "frontend" / "public" / "images" / "logo.png"
-
-    # שלח את המייל (גם אם אין לוגו)
-    if not logo_path.exists():
-        logo_path = None
-
-    return send_email_with_logo(to_email, subject, html, str(logo_path) if logo_path else None)
+    return send_email_with_logo(to_email, subject, html, LOGO_PATH)
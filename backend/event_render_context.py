@@ -0,0 +1,137 @@
+"""
+Per-round render context for scheduled invitation / reminder sends.
+
+Everything about a send that depends only on the event is resolved once per
+scheduled message, instead of once per guest:
+- formatted date / time and the location fallback
+- the WhatsApp image URL (walks invitation_data, checks the pre-sized variant on
+  disk, applies the Cloudinary transformation, strips the query string)
+- template id and the serialized template / image-message JSON: everything but
+  the guest name is pre-encoded, so a guest costs one json.dumps of their name
+  (reminders have no per-guest params at all)
+- the SMS text around the RSVP link, and the encoded event part of the RSVP token
+
+Callers select only the image keys of invitation_data (invitation_images.image_keys_sql),
+and nothing of it is carried through the guest loop once the image URL is resolved.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from invitation_images import whatsapp_image_url
+from whatsapp_interactive import (
+    DEFAULT_INVITATION_IMAGE,
+    WHATSAPP_REMINDER_TEMPLATE_ID,
+    WHATSAPP_REMINDER_TEMPLATE_NAME,
+    WHATSAPP_TEMPLATE_ID,
+    WHATSAPP_TEMPLATE_IS_MEDIA,
+    WHATSAPP_TEMPLATE_NAME,
+)
+
+DEFAULT_LOCATION = "יודיע בהמשך"
+TEMPLATE_SIGNATURE = "SaveDay Events"
+RSVP_URL_BASE = "https://savedayevents.com/rsvp/"
+SMS_INVITATION_TEXT = "הנכם מוזמנים ל{event_name}, נשמח שתאשרו הגעתכם בלינק הבא: "
+
+
+def _format_date(event_date) -> str:
+    if isinstance(event_date, date):
+        return event_date.strftime('%d/%m/%Y')
+    return str(event_date)
+
+
+def _format_time(event_time) -> str:
+    if not event_time:
+        return '18:00'
+    if hasattr(event_time, 'strftime'):
+        return event_time.strftime('%H:%M')
+    return str(event_time)
+
+
+def _dumps(value) -> str:
+    # Same encoding json.dumps() gave the per-guest path (ASCII-escaped Hebrew)
+    return json.dumps(value)
+
+
+@dataclass(frozen=True)
+class EventRenderContext:
+    event_id: int
+    scheduled_message_id: Optional[int]
+    message_number: int
+    event_title: str
+    formatted_date: str
+    formatted_time: str
+    location: str
+    image_url: str
+    is_reminder: bool
+    template_name: str
+    template_id: str
+    # Pre-encoded pieces of the Gupshup template payload
+    template_head: str           # '{"id": "<uuid>", "params": ['
+    template_tail: str           # ', "<event>", ... ]}' (invitation) or the full JSON (reminder)
+    message_json: Optional[str]  # image message for Media templates
+    # SMS
+    sms_text_prefix: str
+    token_suffix: bytes          # b"-<event title>" - the RSVP token is sha256(f"{id}-{phone}-{title}")
+
+    @classmethod
+    def build(cls, scheduled_msg: dict, is_reminder: bool = False) -> "EventRenderContext":
+        """Resolve everything that does not depend on the guest"""
+        event_title = scheduled_msg['event_title']
+        image_url = whatsapp_image_url(scheduled_msg.get('invitation_data')) or DEFAULT_INVITATION_IMAGE
+        # Query parameters are rejected by WhatsApp
+        image_url = image_url.split('?')[0]
+        message_json = None
+        if WHATSAPP_TEMPLATE_IS_MEDIA and image_url:
+            message_json = _dumps({"type": "image", "image": {"link": image_url}})
+
+        formatted_date = _format_date(scheduled_msg['event_date'])
+        formatted_time = _format_time(scheduled_msg.get('event_time'))
+        location = scheduled_msg.get('event_location') or DEFAULT_LOCATION
+
+        if is_reminder:
+            template_name = WHATSAPP_REMINDER_TEMPLATE_NAME
+            template_id = WHATSAPP_REMINDER_TEMPLATE_ID or WHATSAPP_TEMPLATE_ID or template_name
+            template_head = ''
+            template_tail = _dumps({"id": template_id, "params": [str(event_title).strip()]})
+        else:
+            template_name = WHATSAPP_TEMPLATE_NAME
+            template_id = WHATSAPP_TEMPLATE_ID or template_name
+            template_head = '{"id": ' + _dumps(template_id) + ', "params": ['
+            rest = [str(event_title).strip(), str(formatted_date).strip(), str(formatted_time).strip(),
+                    str(location).strip(), TEMPLATE_SIGNATURE]
+            template_tail = ', ' + _dumps(rest)[1:] + '}'
+
+        return cls(
+            event_id=scheduled_msg['event_id'],
+            scheduled_message_id=scheduled_msg.get('scheduled_message_id'),
+            message_number=scheduled_msg.get('message_number', 1),
+            event_title=event_title,
+            formatted_date=formatted_date,
+            formatted_time=formatted_time,
+            location=location,
+            image_url=image_url,
+            is_reminder=is_reminder,
+            template_name=template_name,
+            template_id=template_id,
+            template_head=template_head,
+            template_tail=template_tail,
+            message_json=message_json,
+            sms_text_prefix=SMS_INVITATION_TEXT.format(event_name=event_title),
+            token_suffix=f"-{event_title}".encode(),
+        )
+
+    def template_json(self, guest_name: str) -> str:
+        """Gupshup template object for one guest - identical to json.dumps({"id", "params"})"""
+        if self.is_reminder:
+            return self.template_tail
+        return self.template_head + _dumps(str(guest_name).strip()) + self.template_tail
+
+    def rsvp_link(self, guest_id: int, phone: str) -> str:
+        token = hashlib.sha256(f"{guest_id}-{phone}".encode() + self.token_suffix).hexdigest()[:16]
+        return f"{RSVP_URL_BASE}{guest_id}?token={token}"
+
+    def sms_text(self, guest_id: int, phone: str) -> str:
+        return self.sms_text_prefix + self.rsvp_link(guest_id, phone)
@@ -0,0 +1,579 @@
+"""
+מחולל נתונים סינתטי בהיקף פרודקשן - משתמשים, אירועים, מוזמנים והיסטוריית הודעות.
+
+Deterministic: the same --seed, --size and --anchor-date always produce the same
+rows (ids are offset by whatever already exists in the target tables). Rows are
+streamed into Postgres with COPY in chunks, so a "large" dataset loads in minutes.
+
+Generated per run:
+- users (Hebrew names), package_purchases (real package prices/tiers)
+- events with 50-1500 guests (long-tailed), dates spread around --anchor-date
+- guests with Israeli phone numbers in the inconsistent formats users actually type
+  (050-1234567, +972..., 972..., spaces, missing), RSVP statuses for past rounds
+- gifts, scheduled_messages history (3 rounds per event), whatsapp_sessions,
+  whatsapp_message_events, event_rsvp_stats
+
+Reusable fixture: --dump DIR also writes every table as CSV plus manifest.json
+(counts and sample event ids by size); --from-dump DIR loads such a fixture
+instead of generating. --no-load with --dump writes the fixture without a DB.
+
+Usage (scratch database only):
+    python generate_dataset.py --size medium --seed 42
+    python generate_dataset.py --size small --dump fixtures/small --no-load
+    python generate_dataset.py --from-dump fixtures/small
+    python generate_dataset.py --purge
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+from package_catalog import PACKAGES_PRICING
+
+EMAIL_DOMAIN = "dataset.invalid"
+COPY_CHUNK_ROWS = 50000
+# Not a valid password hash - generated users can't log in
+PASSWORD_PLACEHOLDER = "!generated"
+
+SIZES = {
+    # users, share of users with events
+    "tiny": (50, 0.6),
+    "small": (2000, 0.6),
+    "medium": (20000, 0.55),
+    "large": (60000, 0.5),
+}
+
+# Load order (foreign keys) - also the dump/manifest order
+TABLES = [
+    "users", "package_purchases", "events", "guests", "gifts",
+    "scheduled_messages", "whatsapp_sessions", "whatsapp_message_events",
+]
+
+# Columns that may not exist in older schemas - dropped if missing
+OPTIONAL_COLUMNS = {
+    "users": {"phone", "email_verified"},
+    "package_purchases": {"guest_count", "payment_amount", "event_id", "purchased_at"},
+    "events": {"package_purchase_id", "event_name", "invitation_data", "message_schedule",
+               "message_settings", "bit_payment_link", "groom_name", "bride_name"},
+    "guests": {"name", "full_name", "contact_method", "table_number", "status",
+               "attending_count", "updated_at"},
+    "gifts": {"payment_method", "currency"},
+    "scheduled_messages": {"sent_at", "guests_sent_count", "guests_failed_count"},
+    "whatsapp_sessions": {"count_question_sent_at"},
+    "whatsapp_message_events": set(),
+}
+
+FIRST_NAMES = [
+    "נועה", "תמר", "מאיה", "שירה", "יעל", "אביגיל", "מיכל", "רוני", "הדר", "ליאור",
+    "איתי", "יונתן", "אורי", "דניאל", "עומר", "נדב", "אריאל", "יוסף", "משה", "דוד",
+    "שרה", "רחל", "לאה", "אסתר", "חנה", "עדי", "גל", "טל", "שחר", "עידו",
+    "מוחמד", "אחמד", "לילא", "סמיר", "ניקול", "אלכסנדר", "אנה", "יבגני", "ברק", "אליה",
+]
+LAST_NAMES = [
+    "כהן", "לוי", "מזרחי", "פרץ", "ביטון", "דהן", "אברהם", "פרידמן", "אזולאי", "מלכה",
+    "חדד", "עמר", "אוחיון", "גבאי", "יוסף", "שפירא", "רוזנברג", "קפלן", "ברגר", "נחום",
+    "חביב", "סלאמה", "אבו חמד", "איבנוב", "שטרן", "גולדברג", "וקנין", "אלון", "שלום", "טל",
+]
+CITIES = ["תל אביב", "ירושלים", "חיפה", "ראשון לציון", "פתח תקווה", "אשדוד", "נתניה",
+          "באר שבע", "חולון", "רמת גן", "מודיעין", "הרצליה", "כפר סבא", "רחובות"]
+VENUE_PREFIXES = ["אולמי", "גני", "אחוזת", "טרקלין", "בית"]
+VENUE_NAMES = ["הדקל", "אורנים", "הגפן", "ויולה", "השקמה", "לה בל", "הכרמל", "רויאל"]
+EVENT_TYPES = [("wedding", 0.55), ("bar_mitzvah", 0.15), ("bat_mitzvah", 0.12),
+               ("brit", 0.08), ("birthday", 0.06), ("other", 0.04)]
+MOBILE_PREFIXES = ["050", "052", "053", "054", "055", "058"]
+PACKAGE_WEIGHTS = [(1, 0.10), (2, 0.20), (3, 0.35), (4, 0.25), (5, 0.10)]
+SCHEDULE_DAYS_BEFORE = [21, 14, 7]
+
+
+def weighted(rng: random.Random, choices):
+    roll = rng.random()
+    acc = 0.0
+    for value, weight in choices:
+        acc += weight
+        if roll < acc:
+            return value
+    return choices[-1][0]
+
+
+def person_name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def israeli_phone(rng: random.Random):
+    """A mobile number in one of the formats guests actually type (None ~3%)"""
+    roll = rng.random()
+    if roll < 0.03:
+        return None
+    prefix = rng.choice(MOBILE_PREFIXES)
+    number = f"{rng.randrange(10 ** 7):07d}"
+    if roll < 0.55:
+        return f"{prefix}{number}"
+    if roll < 0.75:
+        return f"{prefix}-{number}"
+    if roll < 0.85:
+        return f"+972{prefix[1:]}{number}"
+    if roll < 0.93:
+        return f"972{prefix[1:]}{number}"
+    return f"{prefix} {number[:3]} {number[3:]}"
+
+
+def normalized_phone(phone: str) -> str:
+    """Digits in 972 form - how the webhook sees the sender"""
+    digits = "".join(ch for ch in phone if ch.isdigit())
+    return "972" + digits[1:] if digits.startswith("0") else digits
+
+
+def guest_count_for_event(rng: random.Random) -> int:
+    """Long-tailed 50-1500: most events 100-400, a few very large"""
+    return max(50, min(1500, int(rng.lognormvariate(5.5, 0.6))))
+
+
+def package_tier(package_id: int, guests: int):
+    """(guest_count tier label, price) for a package big enough for the event"""
+    pricing = PACKAGES_PRICING[package_id]
+    if "price" in pricing:
+        return None, pricing["price"]
+    tiers = list(pricing["prices"].items())
+    for label, price in tiers:
+        digits = "".join(ch for ch in label if ch.isdigit())
+        if digits and int(digits) >= guests:
+            return label, price
+    return tiers[-1]
+
+
+# ============================================================================
+# COPY sink
+# ============================================================================
+
+class TableSink:
+    """
+    Buffers rows for one table and COPYs them in chunks (and/or appends them to a CSV dump).
+    on_full flushes every table in FK order, so a chunk never references rows still buffered.
+    """
+
+    def __init__(self, table, columns, cur=None, dump_dir=None):
+        self.on_full = None
+        self.table = table
+        self.columns = columns
+        self.cur = cur
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.pending = 0
+        self.count = 0
+        self.dump_file = None
+        if dump_dir:
+            self.dump_file = open(os.path.join(dump_dir, f"{table}.csv"), "w", encoding="utf-8", newline="")
+            csv.writer(self.dump_file).writerow(columns)
+
+    def add(self, row: dict):
+        self.writer.writerow([row.get(column) for column in self.columns])
+        self.pending += 1
+        self.count += 1
+        if self.pending >= COPY_CHUNK_ROWS:
+            (self.on_full or self.flush)()
+
+    def flush(self):
+        if not self.pending:
+            return
+        data = self.buffer.getvalue()
+        if self.dump_file:
+            self.dump_file.write(data)
+        if self.cur is not None:
+            self.cur.copy_expert(
+                f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN WITH (FORMAT csv)",
+                io.StringIO(data)
+            )
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        if self.dump_file:
+            self.dump_file.close()
+
+
+def existing_columns(cur, table: str) -> set:
+    cur.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+    """, (table,))
+    return {row[0] for row in cur.fetchall()}
+
+
+# ============================================================================
+# Generator
+# ============================================================================
+
+class DatasetGenerator:
+    def __init__(self, seed: int, users: int, event_share: float, anchor: date):
+        self.seed = seed
+        self.users = users
+        self.event_share = event_share
+        self.anchor = anchor
+        self.rng = random.Random(seed)
+        self.manifest = {
+            "seed": seed, "users": users, "anchor_date": anchor.isoformat(),
+            "counts": {}, "sample_events": {"small": [], "medium": [], "large": []},
+        }
+
+    def columns(self):
+        return {
+            "users": ["id", "email", "password", "full_name", "created_at", "phone", "email_verified"],
+            "package_purchases": ["id", "user_id", "package_id", "package_name", "status", "purchase_date",
+                                  "purchased_at", "guest_count", "payment_amount", "event_id"],
+            "events": ["id", "user_id", "package_purchase_id", "event_type", "event_title", "event_name",
+                       "event_date", "event_time", "event_location", "status", "created_at",
+                       "invitation_data", "message_schedule", "message_settings", "groom_name", "bride_name"],
+            "guests": ["id", "event_id", "name", "full_name", "phone", "email", "guests_count",
+                       "contact_method", "attendance_status", "status", "attending_count", "table_number",
+                       "created_at", "updated_at"],
+            "gifts": ["event_id", "guest_id", "amount", "currency", "gift_date", "payment_method", "created_at"],
+            "scheduled_messages": ["event_id", "message_number", "scheduled_date", "status", "sent_at",
+                                   "guests_sent_count", "guests_failed_count", "created_at", "updated_at"],
+            "whatsapp_sessions": ["phone", "event_id", "guest_id", "updated_at", "count_question_sent_at"],
+            "whatsapp_message_events": ["gs_id", "event_id", "guest_id", "created_at"],
+        }
+
+    def generate(self, sinks, offsets):
+        rng = self.rng
+        user_id = offsets["users"]
+        purchase_id = offsets["package_purchases"]
+        event_id = offsets["events"]
+        guest_id = offsets["guests"]
+        session_phones = set()
+        anchor_dt = datetime.combine(self.anchor, dt_time(12, 0))
+
+        for n in range(self.users):
+            user_id += 1
+            created = anchor_dt - timedelta(days=rng.randint(1, 900), minutes=rng.randint(0, 1440))
+            sinks["users"].add({
+                "id": user_id,
+                "email": f"gen-{self.seed}-{n}@{EMAIL_DOMAIN}",
+                "password": PASSWORD_PLACEHOLDER,
+                "full_name": person_name(rng),
+                "created_at": created,
+                "phone": israeli_phone(rng),
+                "email_verified": rng.random() < 0.8,
+            })
+            if rng.random() >= self.event_share:
+                # Some users buy and never create an event
+                if rng.random() < 0.1:
+                    purchase_id += 1
+                    package_id = weighted(rng, PACKAGE_WEIGHTS)
+                    tier, price = package_tier(package_id, 100)
+                    sinks["package_purchases"].add({
+                        "id": purchase_id, "user_id": user_id, "package_id": package_id,
+                        "package_name": PACKAGES_PRICING[package_id]["name"], "status": "active",
+                        "purchase_date": created, "purchased_at": created,
+                        "guest_count": tier, "payment_amount": price,
+                    })
+                continue
+
+            for _ in range(1 if rng.random() < 0.85 else rng.randint(2, 3)):
+                event_id += 1
+                purchase_id += 1
+                guests = guest_count_for_event(rng)
+                event_date = self.anchor + timedelta(days=rng.randint(-240, 240))
+                package_id = weighted(rng, PACKAGE_WEIGHTS)
+                tier, price = package_tier(package_id, guests)
+                purchased = datetime.combine(event_date, dt_time(10, 0)) - timedelta(days=rng.randint(30, 120))
+                sinks["package_purchases"].add({
+                    "id": purchase_id, "user_id": user_id, "package_id": package_id,
+                    "package_name": PACKAGES_PRICING[package_id]["name"], "status": "active",
+                    "purchase_date": purchased, "purchased_at": purchased,
+                    "guest_count": tier, "payment_amount": price, "event_id": event_id,
+                })
+                guest_id = self._event(sinks, user_id, event_id, purchase_id, package_id,
+                                       event_date, purchased, guests, guest_id, session_phones)
+
+        self.manifest["id_ranges"] = {
+            "users": [offsets["users"] + 1, user_id],
+            "events": [offsets["events"] + 1, event_id],
+            "guests": [offsets["guests"] + 1, guest_id],
+        }
+
+    def _event(self, sinks, user_id, event_id, purchase_id, package_id, event_date, created,
+               guest_total, guest_id, session_phones):
+        rng = self.rng
+        event_type = weighted(rng, EVENT_TYPES)
+        groom, bride = rng.choice(FIRST_NAMES), rng.choice(FIRST_NAMES)
+        if event_type == "wedding":
+            title = f"החתונה של {groom} ו{bride}"
+        else:
+            title = f"האירוע של {person_name(rng)}"
+        has_image = rng.random() < 0.7
+        invitation = {}
+        if has_image:
+            sha = hashlib.sha256(f"{self.seed}-{event_id}".encode()).hexdigest()
+            invitation = {
+                "generated_image_url": f"https://res.cloudinary.com/demo/image/upload/invitations/{sha}.jpg",
+                "image_sha256": sha,
+            }
+        sinks["events"].add({
+            "id": event_id, "user_id": user_id, "package_purchase_id": purchase_id,
+            "event_type": event_type, "event_title": title, "event_name": title,
+            "event_date": event_date, "event_time": dt_time(rng.choice([18, 19, 19, 20]), rng.choice([0, 30])),
+            "event_location": f"{rng.choice(VENUE_PREFIXES)} {rng.choice(VENUE_NAMES)}, {rng.choice(CITIES)}",
+            "status": "active", "created_at": created,
+            "invitation_data": json.dumps(invitation, ensure_ascii=False) if invitation else None,
+            "message_schedule": json.dumps({"schedule_type": "default", "days_before": SCHEDULE_DAYS_BEFORE}),
+            "message_settings": json.dumps({}),
+            "groom_name": groom if event_type == "wedding" else None,
+            "bride_name": bride if event_type == "wedding" else None,
+        })
+
+        size = "small" if guest_total < 150 else "medium" if guest_total < 600 else "large"
+        if len(self.manifest["sample_events"][size]) < 10:
+            self.manifest["sample_events"][size].append({"event_id": event_id, "guests": guest_total})
+
+        # Messaging rounds: before the anchor they ran, after it they're pending
+        rounds_done = []
+        for number, days in enumerate(SCHEDULE_DAYS_BEFORE, start=1):
+            scheduled = event_date - timedelta(days=days)
+            done = scheduled < self.anchor
+            rounds_done.append(done)
+            sinks["scheduled_messages"].add({
+                "event_id": event_id, "message_number": number, "scheduled_date": scheduled,
+                "status": "completed" if done else "pending",
+                "sent_at": datetime.combine(scheduled, dt_time(10, rng.randint(0, 59))) if done else None,
+                "guests_sent_count": 0, "guests_failed_count": 0,
+                "created_at": created, "updated_at": created,
+            })
+        invited = rounds_done[0]
+        event_over = event_date < self.anchor
+        manual = package_id == 1
+
+        for _ in range(guest_total):
+            guest_id += 1
+            name = person_name(rng)
+            phone = israeli_phone(rng)
+            quantity = rng.choice([1, 1, 2, 2, 2, 3, 4, 5])
+            status = "pending"
+            if invited:
+                roll = rng.random()
+                status = ("confirmed" if roll < 0.55 else "declined" if roll < 0.70
+                          else "maybe" if roll < 0.75 else "pending")
+            attending = rng.randint(1, quantity) if status == "confirmed" else 0
+            sinks["guests"].add({
+                "id": guest_id, "event_id": event_id, "name": name, "full_name": name,
+                "phone": phone, "email": None if rng.random() < 0.8 else f"guest{guest_id}@{EMAIL_DOMAIN}",
+                "guests_count": quantity,
+                "contact_method": "SMS" if package_id == 2 else "WhatsApp",
+                "attendance_status": status, "status": status, "attending_count": attending,
+                "table_number": rng.randint(1, max(1, guest_total // 10)) if event_over and status == "confirmed" else None,
+                "created_at": created, "updated_at": created,
+            })
+
+            if invited and phone and not manual and package_id != 2:
+                sent = datetime.combine(event_date - timedelta(days=SCHEDULE_DAYS_BEFORE[0]), dt_time(10, 0))
+                sinks["whatsapp_message_events"].add({
+                    "gs_id": hashlib.md5(f"{self.seed}-{guest_id}-1".encode()).hexdigest(),
+                    "event_id": event_id, "guest_id": guest_id, "created_at": sent,
+                })
+                session_phone = normalized_phone(phone)
+                if status != "pending" and session_phone not in session_phones:
+                    session_phones.add(session_phone)
+                    sinks["whatsapp_sessions"].add({
+                        "phone": session_phone, "event_id": event_id, "guest_id": guest_id,
+                        "updated_at": sent + timedelta(hours=rng.randint(1, 72)),
+                        "count_question_sent_at": sent if status == "confirmed" else None,
+                    })
+
+            if event_over and status == "confirmed" and rng.random() < 0.3:
+                sinks["gifts"].add({
+                    "event_id": event_id, "guest_id": guest_id,
+                    "amount": rng.randrange(100, 1501, 50), "currency": "ILS",
+                    "gift_date": datetime.combine(event_date, dt_time(21, 0)),
+                    "payment_method": rng.choice(["bit", "paybox", "cash", "check"]),
+                    "created_at": datetime.combine(event_date, dt_time(21, 0)),
+                })
+        return guest_id
+
+
+# ============================================================================
+# Load
+# ============================================================================
+
+def _connect():
+    from db import get_db_connection
+    return get_db_connection()
+
+
+def _lock_and_offsets(cur):
+    cur.execute(f"LOCK TABLE {', '.join(TABLES)} IN SHARE ROW EXCLUSIVE MODE")
+    offsets = {}
+    for table in ("users", "package_purchases", "events", "guests"):
+        cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+        offsets[table] = cur.fetchone()[0]
+    return offsets
+
+
+def _finish(cur, generated_event_range):
+    for table in ("users", "package_purchases", "events", "guests", "gifts", "scheduled_messages"):
+        cur.execute(f"""
+            SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST(COALESCE(MAX(id), 0), 1))
+            FROM {table}
+        """)
+    if generated_event_range:
+        cur.execute("SELECT to_regclass('event_rsvp_stats')")
+        if cur.fetchone()[0]:
+            from rsvp_coalescer import refresh_event_stats
+            first, last = generated_event_range
+            refresh_event_stats(cur, range(first, last + 1))
+        # Round counters from the generated guests
+        cur.execute("""
+            UPDATE scheduled_messages sm
+            SET guests_sent_count = c.sent
+            FROM (
+                SELECT event_id, COUNT(*) FILTER (WHERE phone IS NOT NULL) AS sent
+                FROM guests WHERE event_id BETWEEN %s AND %s
+                GROUP BY event_id
+            ) c
+            WHERE sm.event_id = c.event_id AND sm.status = 'completed'
+        """, generated_event_range)
+
+
+def generate(args):
+    users, event_share = SIZES[args.size]
+    if args.users:
+        users = args.users
+    anchor = date.fromisoformat(args.anchor_date) if args.anchor_date else date.today()
+    generator = DatasetGenerator(args.seed, users, event_share, anchor)
+
+    if args.dump:
+        os.makedirs(args.dump, exist_ok=True)
+
+    conn = cur = None
+    if args.no_load:
+        offsets = {table: 0 for table in ("users", "package_purchases", "events", "guests")}
+        columns = generator.columns()
+    else:
+        conn = _connect()
+        cur = conn.cursor()
+        offsets = _lock_and_offsets(cur)
+        columns = {}
+        for table, wanted in generator.columns().items():
+            present = existing_columns(cur, table)
+            missing = [c for c in wanted if c not in present and c not in OPTIONAL_COLUMNS[table]]
+            if missing:
+                raise RuntimeError(f"{table} is missing required columns {missing} - run the migrations first")
+            columns[table] = [c for c in wanted if c in present]
+
+    sinks = {table: TableSink(table, columns[table], cur, args.dump) for table in TABLES}
+
+    def flush_all():
+        for table in TABLES:
+            sinks[table].flush()
+
+    for sink in sinks.values():
+        sink.on_full = flush_all
+    start = time.perf_counter()
+    try:
+        generator.generate(sinks, offsets)
+        for table in TABLES:
+            sinks[table].close()
+            generator.manifest["counts"][table] = sinks[table].count
+        if cur is not None:
+            print("🔧 Updating sequences and stats...")
+            _finish(cur, generator.manifest["id_ranges"]["events"])
+            conn.commit()
+            for table in TABLES:
+                cur.execute(f"ANALYZE {table}")
+            conn.commit()
+    except Exception:
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+    elapsed = time.perf_counter() - start
+    generator.manifest["columns"] = columns
+    if args.dump:
+        with open(os.path.join(args.dump, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(generator.manifest, f, indent=2, ensure_ascii=False)
+    total = sum(generator.manifest["counts"].values())
+    print(f"✅ {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+    for table, count in generator.manifest["counts"].items():
+        print(f"   {table}: {count:,}")
+
+
+def load_dump(path: str):
+    """Load a fixture written with --dump (ids as dumped - target tables must not overlap)"""
+    with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    conn = _connect()
+    cur = conn.cursor()
+    start = time.perf_counter()
+    try:
+        _lock_and_offsets(cur)
+        for table in TABLES:
+            with open(os.path.join(path, f"{table}.csv"), encoding="utf-8", newline="") as f:
+                header = next(csv.reader([f.readline()]))
+                cur.copy_expert(
+                    f"COPY {table} ({', '.join(header)}) FROM STDIN WITH (FORMAT csv)", f
+                )
+            print(f"   {table}: {manifest['counts'].get(table, 0):,}")
+        _finish(cur, manifest.get("id_ranges", {}).get("events"))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    print(f"✅ Fixture {path} loaded in {time.perf_counter() - start:.1f}s")
+
+
+def purge():
+    """Delete every generated user (events, guests, messages cascade)"""
+    conn = _connect()
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM users WHERE email LIKE %s", (f"gen-%@{EMAIL_DOMAIN}",))
+        deleted = cur.rowcount
+        conn.commit()
+        print(f"🗑️ Deleted {deleted:,} generated users (and their data)")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic production-scale dataset")
+    parser.add_argument("--size", choices=list(SIZES), default="small")
+    parser.add_argument("--users", type=int, help="override the number of users for --size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor-date", help="YYYY-MM-DD the history is relative to (default: today)")
+    parser.add_argument("--dump", help="also write the dataset as CSV fixture files to this directory")
+    parser.add_argument("--no-load", action="store_true", help="with --dump: write files only, no DB")
+    parser.add_argument("--from-dump", help="load a fixture directory written with --dump")
+    parser.add_argument("--purge", action="store_true", help="delete previously generated data")
+    args = parser.parse_args()
+
+    if args.no_load and not args.dump:
+        parser.error("--no-load requires --dump")
+    if args.purge:
+        purge()
+    elif args.from_dump:
+        load_dump(args.from_dump)
+    else:
+        generate(args)
+
+
+if __name__ == "__main__":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    main()
@@ -2,53 +2,119 @@
 Gmail API Service - Sends emails using Gmail API with OAuth2 Refresh Token
 This bypasses SMTP port restrictions on platforms like Render
 """
-import os
 import base64
+import threading
+from functools import lru_cache
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
-from typing import Optional
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from typing import Dict, Optional
+
+from metrics import provider_call
+from settings import settings
+
+
+# Gmail batch requests accept up to 100 calls; Google recommends <= 50 for Gmail
+GMAIL_BATCH_SIZE = 50
+
+# Process-wide client - the access token is reused until it expires
+_service = None
+_credentials = None
+# googleapiclient/httplib2 objects are not thread-safe
+_service_lock = threading.RLock()
 
 
 def get_gmail_service():
     """
-    Creates and returns a Gmail API service using Refresh Token authentication
+    Returns the process-wide Gmail API service (Refresh Token authentication).
+    The discovery client is built once; the access token is refreshed only when expired.
     """
+    global _service, _credentials
+    # Google client libraries are heavy - import them on first use, not at boot
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+
+    with _service_lock:
+        try:
+            if _service is None:
+                # Get credentials from environment variables
+                client_id = settings.google_client_id
+                client_secret = settings.google_client_secret
+                refresh_token = settings.google_refresh_token
+
+                if not all([client_id, client_secret, refresh_token]):
+                    raise ValueError(
+                        "Missing required environment variables: "
+                        "GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REFRESH_TOKEN"
+                    )
+
+                # Create credentials object
+                _credentials = Credentials(
+                    None,  # No access token yet
+                    refresh_token=refresh_token,
+                    token_uri="https://oauth2.googleapis.com/token",
+                    client_id=client_id,
+                    client_secret=client_secret
+                )
+                _credentials.refresh(Request())
+
+                # Build once - cache_discovery=False avoids the file cache lookup/warning
+                _service = build('gmail', 'v1', credentials=_credentials, cache_discovery=False)
+
+            elif not _credentials.valid:
+                # Token expired (or about to) - refresh in place, the service keeps using _credentials
+                _credentials.refresh(Request())
+
+            return _service
+
+        except Exception as e:
+            print(f"Error creating Gmail service: {e}")
+            raise
+
+
+@lru_cache(maxsize=8)
+def load_logo(logo_path: str) -> Optional[bytes]:
+    """Logo bytes, read from disk once per path"""
     try:
-        # Get credentials from environment variables
-        client_id = os.getenv("GOOGLE_CLIENT_ID")
-        client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
-        refresh_token = os.getenv("GOOGLE_REFRESH_TOKEN")
-
-        if not all([client_id, client_secret, refresh_token]):
-            raise ValueError(
-                "Missing required environment variables: "
-                "GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REFRESH_TOKEN"
-            )
+        with open(logo_path, 'rb') as f:
+            return f.read()
+    except OSError as e:
+        print(f"Warning: Could not read logo {logo_path}: {e}")
+        return None
 
-        # Create credentials object
-        creds = Credentials(
-            None,  # No access token yet
-            refresh_token=refresh_token,
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=client_id,
-            client_secret=client_secret
-        )
 
-        # Refresh to get a valid access token
-        creds.refresh(Request())
+def build_raw_message(
+    to_email: str,
+    subject: str,
+    html_content: str,
+    logo_path: Optional[str] = None,
+    from_email: Optional[str] = None
+) -> str:
+    """Builds the MIME message and returns it base64url-encoded for the Gmail API"""
+    message = MIMEMultipart('related')
+    message['To'] = to_email
+    message['Subject'] = subject
 
-        # Build and return the Gmail service
-        service = build('gmail', 'v1', credentials=creds)
-        return service
+    if from_email:
+        message['From'] = from_email
 
-    except Exception as e:
-        print(f"Error creating Gmail service: {e}")
-        raise
+    # Add HTML content
+    msg_alternative = MIMEMultipart('alternative')
+    message.attach(msg_alternative)
+
+    html_part = MIMEText(html_content, 'html', 'utf-8')
+    msg_alternative.attach(html_part)
+
+    # Add logo if provided
+    logo_data = load_logo(logo_path) if logo_path else None
+    if logo_data:
+        logo = MIMEImage(logo_data)
+        logo.add_header('Content-ID', '<logo>')
+        logo.add_header('Content-Disposition', 'inline', filename='logo.png')
+        message.attach(logo)
+
+    return base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
 
 
 def send_email_gmail_api(
@@ -71,45 +137,20 @@ def send_email_gmail_api(
     Returns:
         bool: True if email sent successfully, False otherwise
     """
-    try:
-        # Get Gmail service
-        service = get_gmail_service()
-
-        # Create message
-        message = MIMEMultipart('related')
-        message['To'] = to_email
-        message['Subject'] = subject
+    from googleapiclient.errors import HttpError
 
-        if from_email:
-            message['From'] = from_email
-
-        # Add HTML content
-        msg_alternative = MIMEMultipart('alternative')
-        message.attach(msg_alternative)
-
-        html_part = MIMEText(html_content, 'html', 'utf-8')
-        msg_alternative.attach(html_part)
-
-        # Add logo if provided
-        if logo_path and os.path.exists(logo_path):
-            try:
-                with open(logo_path, 'rb') as f:
-                    logo_data = f.read()
-                    logo = MIMEImage(logo_data)
-                    logo.add_header('Content-ID', '<logo>')
-                    logo.add_header('Content-Disposition', 'inline', filename='logo.png')
-                    message.attach(logo)
-            except Exception as e:
-                print(f"Warning: Could not attach logo: {e}")
-
-        # Encode message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+    try:
+        raw_message = build_raw_message(to_email, subject, html_content, logo_path, from_email)
 
         # Send email
-        send_result = service.users().messages().send(
-            userId='me',
-            body={'raw': raw_message}
-        ).execute()
+        with _service_lock:
+            service = get_gmail_service()
+            with provider_call("gmail") as call:
+                send_result = service.users().messages().send(
+                    userId='me',
+                    body={'raw': raw_message}
+                ).execute()
+                call.status = 200
 
         print(f"Email sent successfully to {to_email}. Message ID: {send_result['id']}")
         return True
@@ -124,6 +165,39 @@ def send_email_gmail_api(
         return False
 
 
+def send_batch_gmail_api(raw_messages: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """
+    Sends several pre-built messages in one Gmail batch HTTP request.
+
+    Args:
+        raw_messages: request_id -> raw message (from build_raw_message), at most GMAIL_BATCH_SIZE
+
+    Returns:
+        request_id -> None on success, or the error text
+    """
+    results: Dict[str, Optional[str]] = {}
+
+    def _callback(request_id, response, exception):
+        results[request_id] = str(exception) if exception else None
+
+    with _service_lock:
+        service = get_gmail_service()
+        batch = service.new_batch_http_request(callback=_callback)
+        for request_id, raw in raw_messages.items():
+            batch.add(
+                service.users().messages().send(userId='me', body={'raw': raw}),
+                request_id=request_id
+            )
+        with provider_call("gmail_batch") as call:
+            batch.execute()
+            call.status = 200
+
+    # Anything the callback never reported counts as failed
+    for request_id in raw_messages:
+        results.setdefault(request_id, "no response in batch")
+    return results
+
+
 def test_gmail_connection() -> bool:
     """
     Tests the Gmail API connection
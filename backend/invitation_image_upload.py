@@ -1,56 +1,201 @@
 """
 Invitation Image Upload Endpoint
 Uploads invitation images to Cloudinary (reliable CDN, no external failures).
+
+Images are content-addressed (sha256): re-saving an unchanged invitation skips
+the upload. WhatsApp / thumbnail variants are pre-generated under /uploads.
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import json
-import os
 import base64
-import requests
+import hashlib
 from db import get_db_connection
+import public_event_cache
+from cloudinary_client import upload_image, content_public_id
+from invitation_images import generate_variants, variants_present, remove_stale_variants
 
 router = APIRouter(prefix="/api/packages/events", tags=["invitation"])
 
-CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME", "")
-CLOUDINARY_API_KEY    = os.getenv("CLOUDINARY_API_KEY", "")
-CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET", "")
+MAX_IMAGE_BYTES = 15 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
 
 
 class InvitationImageUpload(BaseModel):
     image_data: str  # Base64 data URI or direct URL
 
 
-def upload_to_cloudinary(image_data: str, event_id: int) -> str:
-    """Upload base64 image to Cloudinary and return the secure URL."""
+def _load_invitation_data(cur, event_id: int) -> dict:
+    cur.execute("""
+        SELECT id, invitation_data FROM events WHERE id = %s
+    """, (event_id,))
+
+    event = cur.fetchone()
+    if not event:
+        raise HTTPException(status_code=404, detail="אירוע לא נמצא")
+    return event[1] if event[1] else {}
+
+
+def _save_invitation_data(conn, cur, event_id: int, invitation_data: dict):
+    cur.execute("""
+        UPDATE events
+        SET invitation_data = %s, updated_at = NOW()
+        WHERE id = %s
+    """, (json.dumps(invitation_data), event_id))
+    public_event_cache.invalidate(event_id, cur)
+    conn.commit()
+
+
+def store_invitation_image(event_id: int, image_bytes: bytes, sha256_hex: str) -> dict:
+    """
+    Upload (unless unchanged), build the variants and save the URLs on the event.
+    Blocking - run in the threadpool.
+    """
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        invitation_data = _load_invitation_data(cur, event_id)
+
+        unchanged = (
+            invitation_data.get('image_sha256') == sha256_hex and
+            invitation_data.get('generated_image_url')
+        )
+        if unchanged and variants_present(invitation_data):
+            print(f"⏭️ Invitation image for event {event_id} unchanged, skipping upload")
+            return invitation_data
+
+        if not unchanged:
+            invitation_data['generated_image_url'] = upload_image(image_bytes, content_public_id(sha256_hex))
+            invitation_data['image_sha256'] = sha256_hex
+
+        # Variants are an optimization - formats Pillow can't read (e.g. HEIC) are still
+        # stored; senders fall back to the Cloudinary transformation
+        keep_variants = sha256_hex
+        try:
+            invitation_data.update(generate_variants(image_bytes, event_id, sha256_hex))
+        except Exception as e:
+            print(f"⚠️ Could not generate image variants for event {event_id}, saving without them: {e}")
+            for key in ('whatsapp_image_url', 'thumbnail_url'):
+                invitation_data.pop(key, None)
+            keep_variants = None
+
+        _save_invitation_data(conn, cur, event_id, invitation_data)
+        # Only now is nothing pointing at the previous variants
+        remove_stale_variants(event_id, keep_variants)
+        return invitation_data
+
+    except Exception:
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def _image_response(invitation_data: dict) -> dict:
+    return {
+        "success": True,
+        "message": "תמונת ההזמנה נשמרה בהצלחה",
+        "image_url": invitation_data.get('generated_image_url'),
+        "whatsapp_image_url": invitation_data.get('whatsapp_image_url'),
+        "thumbnail_url": invitation_data.get('thumbnail_url')
+    }
+
+
+@router.post("/{event_id}/invitation-image")
+async def upload_invitation_image_file(event_id: int, file: UploadFile = File(...)):
+    """
+    Upload invitation image for an event as multipart file.
+    The body is read in chunks and hashed on the way; an unchanged image is not re-uploaded.
+    """
+    try:
+        if file.content_type and not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail="הקובץ אינו תמונה")
+
+        digest = hashlib.sha256()
+        buffer = bytearray()
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            buffer.extend(chunk)
+            if len(buffer) > MAX_IMAGE_BYTES:
+                raise HTTPException(status_code=413, detail="התמונה גדולה מדי")
+            digest.update(chunk)
+
+        if not buffer:
+            raise HTTPException(status_code=400, detail="הקובץ ריק")
+
+        invitation_data = await run_in_threadpool(
+            store_invitation_image, event_id, bytes(buffer), digest.hexdigest()
+        )
+        return _image_response(invitation_data)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Upload invitation image error: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=500,
+            detail=f"שגיאה בשמירת תמונת ההזמנה: {str(e)}"
+        )
+
+
+def _store_data_uri(event_id: int, image_data: str) -> dict:
     # Strip data URI prefix
-    if ',' in image_data:
-        _, b64_content = image_data.split(',', 1)
-    else:
-        b64_content = image_data
-
-    upload_url = f"https://api.cloudinary.com/v1_1/{CLOUDINARY_CLOUD_NAME}/image/upload"
-
-    response = requests.post(
-        upload_url,
-        data={
-            "file": f"data:image/png;base64,{b64_content}",
-            "public_id": f"invitations/event_{event_id}",
-            "overwrite": "true",
-            "resource_type": "image",
-        },
-        auth=(CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET),
-        timeout=30,
-    )
-
-    if response.status_code == 200:
-        result = response.json()
-        url = result.get("secure_url", "")
-        print(f"✅ Uploaded to Cloudinary: {url}")
-        return url
-    else:
-        print(f"❌ Cloudinary upload failed: {response.status_code} - {response.text}")
-        raise Exception(f"Cloudinary error {response.status_code}: {response.text}")
+    b64_content = image_data.split(',', 1)[1] if ',' in image_data else image_data
+    image_bytes = base64.b64decode(b64_content)
+    return store_invitation_image(event_id, image_bytes, hashlib.sha256(image_bytes).hexdigest())
+
+
+def _store_url(event_id: int, image_data: str) -> dict:
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        invitation_data = _load_invitation_data(cur, event_id)
+
+        # Already a Cloudinary URL — keep it
+        if 'cloudinary.com' in image_data:
+            image_url = image_data
+            print(f"✅ Keeping existing Cloudinary URL: {image_url}")
+        else:
+            # Old ImgBB or other URL — skip update, don't regress
+            existing = invitation_data.get('generated_image_url', '')
+            if existing and 'cloudinary.com' in existing:
+                image_url = existing
+                print(f"✅ Keeping existing Cloudinary URL from DB: {image_url}")
+            else:
+                image_url = image_data
+                print(f"⚠️ Using non-Cloudinary URL as fallback: {image_url}")
+
+        if image_url != invitation_data.get('generated_image_url'):
+            # Variants belong to the previous image
+            for key in ('image_sha256', 'whatsapp_image_url', 'thumbnail_url'):
+                invitation_data.pop(key, None)
+            invitation_data['generated_image_url'] = image_url
+            _save_invitation_data(conn, cur, event_id, invitation_data)
+            remove_stale_variants(event_id)
+        return invitation_data
+
+    except Exception:
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
 
 
 @router.post("/{event_id}/upload-invitation-image")
@@ -61,64 +206,20 @@ async def upload_invitation_image(
     """
     Upload invitation image for an event to Cloudinary.
     Returns a stable CDN URL stored in invitation_data.generated_image_url.
+    Prefer the multipart /invitation-image endpoint for new clients.
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute("""
-            SELECT id, invitation_data FROM events WHERE id = %s
-        """, (event_id,))
-
-        event = cur.fetchone()
-        if not event:
-            cur.close()
-            conn.close()
-            raise HTTPException(status_code=404, detail="אירוע לא נמצא")
-
-        invitation_data = event[1] if event[1] else {}
         image_data = payload.image_data
-        image_url = None
+        invitation_data = {}
 
         if image_data:
             if image_data.startswith('data:image'):
                 # Base64 → Cloudinary
-                image_url = upload_to_cloudinary(image_data, event_id)
-
+                invitation_data = await run_in_threadpool(_store_data_uri, event_id, image_data)
             elif image_data.startswith('http'):
-                # Already a Cloudinary URL — keep it
-                if 'cloudinary.com' in image_data:
-                    image_url = image_data
-                    print(f"✅ Keeping existing Cloudinary URL: {image_url}")
-                else:
-                    # Old ImgBB or other URL — skip update, don't regress
-                    existing = invitation_data.get('generated_image_url', '')
-                    if existing and 'cloudinary.com' in existing:
-                        image_url = existing
-                        print(f"✅ Keeping existing Cloudinary URL from DB: {image_url}")
-                    else:
-                        image_url = image_data
-                        print(f"⚠️ Using non-Cloudinary URL as fallback: {image_url}")
-
-        if image_url:
-            invitation_data['generated_image_url'] = image_url
-
-            cur.execute("""
-                UPDATE events
-                SET invitation_data = %s, updated_at = NOW()
-                WHERE id = %s
-            """, (json.dumps(invitation_data), event_id))
-
-            conn.commit()
-
-        cur.close()
-        conn.close()
+                invitation_data = await run_in_threadpool(_store_url, event_id, image_data)
 
-        return {
-            "success": True,
-            "message": "תמונת ההזמנה נשמרה בהצלחה",
-            "image_url": image_url
-        }
+        return _image_response(invitation_data)
 
     except HTTPException:
         raise
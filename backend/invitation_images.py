@@ -0,0 +1,134 @@
+"""
+Pre-sized invitation image variants.
+
+When an invitation image is stored, a WhatsApp-optimized JPEG and a thumbnail
+are generated once with Pillow under uploads/invitations and their URLs are
+kept in invitation_data (whatsapp_image_url / thumbnail_url). Senders call
+whatsapp_image_url() instead of rewriting the Cloudinary URL on every send.
+"""
+import io
+import os
+from typing import Dict, Optional
+
+from cloudinary_client import optimize_cloudinary_url
+from db import json_keys_sql
+from settings import settings
+
+INVITATIONS_DIR = os.path.join(os.path.dirname(__file__), "uploads", "invitations")
+BACKEND_URL = settings.backend_url
+
+# Same target as the Cloudinary transformation (w_1200)
+WHATSAPP_MAX_WIDTH = 1200
+WHATSAPP_JPEG_QUALITY = 85
+THUMBNAIL_MAX_WIDTH = 400
+THUMBNAIL_JPEG_QUALITY = 80
+
+# The only invitation_data keys senders and public pages read. invitation_data also
+# holds the editor state (and for custom uploads a base64 data: URI), so queries
+# project these instead of fetching the document.
+SOURCE_IMAGE_KEYS = ("generated_image_url", "image_url", "imageUrl")
+IMAGE_KEYS = ("whatsapp_image_url", "thumbnail_url") + SOURCE_IMAGE_KEYS
+
+
+def image_keys_sql(column: str = "e.invitation_data") -> str:
+    """SELECT expression: invitation_data cut down to IMAGE_KEYS (works with whatsapp_image_url())"""
+    return json_keys_sql(column, IMAGE_KEYS)
+
+
+def source_image_url_sql(column: str = "e.invitation_data") -> str:
+    """SELECT expression: the stored invitation image URL (generated_image_url, then the legacy keys)"""
+    return "COALESCE(" + ", ".join(f"NULLIF({column}->>'{key}', '')" for key in SOURCE_IMAGE_KEYS) + ")"
+
+
+def _public_url(filename: str) -> str:
+    return f"{BACKEND_URL}/uploads/invitations/{filename}"
+
+
+def _local_path(url: str) -> str:
+    return os.path.join(INVITATIONS_DIR, url.rsplit("/", 1)[-1])
+
+
+def _save_jpeg(image, max_width: int, quality: int, path: str):
+    from PIL import Image
+
+    variant = image.copy()
+    if variant.width > max_width:
+        variant.thumbnail((max_width, max_width * 10), Image.LANCZOS)
+    tmp_path = f"{path}.tmp"
+    variant.save(tmp_path, "JPEG", quality=quality, optimize=True, progressive=True)
+    os.replace(tmp_path, path)
+
+
+def _variant_prefix(event_id: int, sha256_hex: Optional[str]) -> Optional[str]:
+    return f"event_{event_id}_{sha256_hex[:12]}" if sha256_hex else None
+
+
+def generate_variants(image_bytes: bytes, event_id: int, sha256_hex: str) -> Dict[str, str]:
+    """
+    Write the WhatsApp and thumbnail JPEGs for this image. Returns their public URLs.
+    Raises if Pillow can't decode the image (e.g. HEIC) - callers treat variants as optional.
+    """
+    os.makedirs(INVITATIONS_DIR, exist_ok=True)
+    prefix = _variant_prefix(event_id, sha256_hex)
+    whatsapp_name = f"{prefix}_whatsapp.jpg"
+    thumbnail_name = f"{prefix}_thumb.jpg"
+
+    # Pillow is only needed when an image is uploaded
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as source:
+        image = source.convert("RGB")
+    _save_jpeg(image, WHATSAPP_MAX_WIDTH, WHATSAPP_JPEG_QUALITY, os.path.join(INVITATIONS_DIR, whatsapp_name))
+    _save_jpeg(image, THUMBNAIL_MAX_WIDTH, THUMBNAIL_JPEG_QUALITY, os.path.join(INVITATIONS_DIR, thumbnail_name))
+
+    return {
+        "whatsapp_image_url": _public_url(whatsapp_name),
+        "thumbnail_url": _public_url(thumbnail_name),
+    }
+
+
+def remove_stale_variants(event_id: int, keep_sha256_hex: Optional[str] = None):
+    """
+    Delete variant files of the event that are no longer referenced (all but keep_sha256_hex's).
+    Call only after the new invitation_data is committed.
+    """
+    keep = _variant_prefix(event_id, keep_sha256_hex)
+    try:
+        filenames = os.listdir(INVITATIONS_DIR)
+    except OSError:
+        return
+    for filename in filenames:
+        if filename.startswith(f"event_{event_id}_") and not (keep and filename.startswith(keep)):
+            try:
+                os.remove(os.path.join(INVITATIONS_DIR, filename))
+            except OSError:
+                pass
+
+
+def variants_present(invitation_data: Optional[dict]) -> bool:
+    if not invitation_data or not isinstance(invitation_data, dict):
+        return False
+    return all(
+        invitation_data.get(key) and os.path.exists(_local_path(invitation_data[key]))
+        for key in ("whatsapp_image_url", "thumbnail_url")
+    )
+
+
+def whatsapp_image_url(invitation_data: Optional[dict]) -> Optional[str]:
+    """
+    Image URL to send over WhatsApp for this invitation, or None if it has no image.
+
+    Prefers the pre-sized variant; falls back to the Cloudinary transformation when
+    the variant isn't on this instance's disk (older events, fresh deploy).
+    """
+    if not invitation_data or not isinstance(invitation_data, dict):
+        return None
+    variant = invitation_data.get('whatsapp_image_url')
+    if variant and os.path.exists(_local_path(variant)):
+        return variant
+    image_url = (
+        invitation_data.get('generated_image_url') or
+        invitation_data.get('image_url') or
+        invitation_data.get('imageUrl')
+    )
+    return optimize_cloudinary_url(image_url) if image_url else None
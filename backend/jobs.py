@@ -0,0 +1,284 @@
+"""
+Job registry for long-running admin work (bulk invitation / reminder / SMS sends).
+
+Jobs run on a dedicated worker pool (MAX_CONCURRENT_JOBS threads), not on
+FastAPI's request threadpool, so web requests keep their latency while a blast
+is running. Extra jobs wait in the 'queued' state.
+
+A job function receives the Job as its first argument and reports progress
+with job.advance(success) - it should check job.cancelled between items.
+State is kept in memory and persisted (throttled) to the jobs table so any
+worker process can answer /api/admin/jobs/{id}; a cancel issued on another
+process is flagged in the table and picked up on the owner's next persist.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from db import get_db_connection
+from settings import settings
+
+MAX_CONCURRENT_JOBS = settings.max_concurrent_jobs
+# Min seconds between progress writes to the jobs table
+PERSIST_INTERVAL_SECONDS = 2.0
+# Finished jobs kept in memory (older ones are still readable from the DB)
+MAX_FINISHED_IN_MEMORY = 200
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class Job:
+    """A single unit of background work with progress counters"""
+
+    def __init__(self, job_type: str, total: int, event_id: Optional[int] = None):
+        self.id = uuid.uuid4().hex
+        self.job_type = job_type
+        self.event_id = event_id
+        self.total = total
+        self.status = QUEUED
+        self.processed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.error_message: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._last_persist = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def advance(self, success: bool):
+        """Record one processed item"""
+        with self._lock:
+            self.processed += 1
+            if success:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+        if time.monotonic() - self._last_persist >= PERSIST_INTERVAL_SECONDS:
+            _persist(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            processed = self.processed
+            data = {
+                "id": self.id,
+                "job_type": self.job_type,
+                "event_id": self.event_id,
+                "status": self.status,
+                "total": self.total,
+                "processed": processed,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "error_message": self.error_message,
+                "created_at": _iso(self.created_at),
+                "started_at": _iso(self.started_at),
+                "finished_at": _iso(self.finished_at),
+            }
+
+        end = self.finished_at or datetime.now()
+        elapsed = (end - self.started_at).total_seconds() if self.started_at else 0
+        throughput = processed / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - processed, 0)
+        data["throughput_per_sec"] = round(throughput, 2)
+        data["eta_seconds"] = (
+            round(remaining / throughput) if self.status == RUNNING and throughput > 0 else None
+        )
+        return data
+
+
+def _persist(job: Job):
+    """Upsert the job row. Failures are logged - progress reporting must not kill a send."""
+    job._last_persist = time.monotonic()
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO jobs (id, job_type, event_id, status, total, processed, succeeded, failed,
+                              error_message, created_at, started_at, finished_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+            ON CONFLICT (id) DO UPDATE SET
+                status = EXCLUDED.status,
+                processed = EXCLUDED.processed,
+                succeeded = EXCLUDED.succeeded,
+                failed = EXCLUDED.failed,
+                error_message = EXCLUDED.error_message,
+                started_at = EXCLUDED.started_at,
+                finished_at = EXCLUDED.finished_at,
+                updated_at = NOW()
+            RETURNING cancel_requested
+        """, (
+            job.id, job.job_type, job.event_id, job.status, job.total, job.processed,
+            job.succeeded, job.failed, job.error_message, job.created_at,
+            job.started_at, job.finished_at
+        ))
+        # Cancellation requested through another worker process
+        if cur.fetchone()[0]:
+            job.cancel()
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ Failed to persist job {job.id}: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def _load(job_id: str) -> Optional[Dict[str, Any]]:
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, job_type, event_id, status, total, processed, succeeded, failed,
+                   error_message, created_at, started_at, finished_at
+            FROM jobs WHERE id = %s
+        """, (job_id,))
+        row = cur.fetchone()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+    if not row:
+        return None
+    started_at, finished_at = row[10], row[11]
+    elapsed = ((finished_at or datetime.now()) - started_at).total_seconds() if started_at else 0
+    throughput = row[5] / elapsed if elapsed > 0 else 0.0
+    return {
+        "id": row[0],
+        "job_type": row[1],
+        "event_id": row[2],
+        "status": row[3],
+        "total": row[4],
+        "processed": row[5],
+        "succeeded": row[6],
+        "failed": row[7],
+        "error_message": row[8],
+        "created_at": _iso(row[9]),
+        "started_at": _iso(started_at),
+        "finished_at": _iso(finished_at),
+        "throughput_per_sec": round(throughput, 2),
+        "eta_seconds": (
+            round((row[4] - row[5]) / throughput) if row[3] == RUNNING and throughput > 0 else None
+        ),
+    }
+
+
+def _request_cancel(job_id: str):
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE jobs SET cancel_requested = TRUE, updated_at = NOW()
+            WHERE id = %s AND status IN (%s, %s)
+        """, (job_id, QUEUED, RUNNING))
+        conn.commit()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+class JobRegistry:
+    """Submits jobs to a bounded worker pool and tracks them by id"""
+
+    def __init__(self, max_workers: int = MAX_CONCURRENT_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-worker")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_type: str, total: int, fn: Callable[..., Any], *args,
+               event_id: Optional[int] = None) -> Job:
+        """Queue fn(job, *args) and return the Job immediately"""
+        job = Job(job_type, total, event_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        _persist(job)
+        self._executor.submit(self._run, job, fn, args)
+        print(f"🧵 Job {job.id} queued: {job_type} event={event_id} total={total}")
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple):
+        if job.cancelled:
+            job.status = CANCELLED
+            job.finished_at = datetime.now()
+            _persist(job)
+            return
+
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        _persist(job)
+        try:
+            fn(job, *args)
+            job.status = CANCELLED if job.cancelled else COMPLETED
+        except Exception as e:
+            job.status = FAILED
+            job.error_message = str(e)
+            print(f"❌ Job {job.id} failed: {e}")
+        finally:
+            job.finished_at = datetime.now()
+            _persist(job)
+            print(f"🧵 Job {job.id} {job.status}: {job.succeeded} ok, {job.failed} failed / {job.total}")
+
+    def _trim(self):
+        finished = [j for j in self._jobs.values() if j.status in FINISHED_STATES]
+        if len(finished) > MAX_FINISHED_IN_MEMORY:
+            finished.sort(key=lambda j: j.finished_at or j.created_at)
+            for j in finished[:len(finished) - MAX_FINISHED_IN_MEMORY]:
+                del self._jobs[j.id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status - from memory if this process runs it, otherwise from the jobs table"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job:
+            return job.to_dict()
+        return _load(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Request cancellation. Queued jobs never start; running jobs stop after the current item."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job:
+            if job.status not in FINISHED_STATES:
+                job.cancel()
+            return job.to_dict()
+
+        # Job owned by another worker process - flag it; the owner picks it up on its next persist
+        _request_cancel(job_id)
+        return _load(job_id)
+
+
+# Global instance
+job_registry = JobRegistry()
@@ -0,0 +1,301 @@
+"""
+Failed-login limiter.
+
+- Failure counts are shared by every worker: each failure bumps a per-email and a
+  per-IP row in login_failure_counters with one UPSERT (fixed window of `window`),
+  and the returned counts decide the lock. With N workers an attacker still gets
+  MAX_FAILED_ATTEMPTS guesses per window, not N x that, and a restart keeps them.
+- The last shared counts are cached per key, so the IP check before bcrypt reads
+  memory; a worker that hasn't seen the latest failures lets at most one more
+  attempt through before its cache catches up.
+- If the counter UPSERT fails, the in-process sliding windows (deque of timestamps
+  per email / IP) are used instead, so the limiter degrades to per-worker limits.
+- Account locks are cached in memory and shared across workers through the
+  account_locks table: new locks are written through immediately, and every
+  LOCK_REFRESH_SECONDS the cache is reloaded so locks set by other workers apply.
+- failed_login_attempts rows are written behind, in batches, by a background
+  thread - a bad password no longer costs four or five DB connections.
+- The same thread periodically purges attempts older than the retention period,
+  and sweeps in-memory windows whose attempts all expired (keys that are never
+  queried again, e.g. rotated IPs / emails, would otherwise stay forever).
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from db import get_db_connection
+from settings import settings
+
+FLUSH_INTERVAL_SECONDS = 1.0
+FLUSH_BATCH_SIZE = 500
+LOCK_REFRESH_SECONDS = 5.0
+PURGE_INTERVAL_SECONDS = 600
+SWEEP_INTERVAL_SECONDS = 60
+RETENTION_DAYS = settings.failed_login_retention_days
+
+
+class FailedLoginLimiter:
+    def __init__(self, window_minutes: int):
+        self.window = timedelta(minutes=window_minutes)
+        self._lock = threading.Lock()
+        self._by_email: Dict[str, Deque[datetime]] = {}
+        self._by_ip: Dict[str, Deque[datetime]] = {}
+        # key -> (failures, window end) as last returned by login_failure_counters
+        self._shared: Dict[str, Tuple[int, datetime]] = {}
+        self._locks: Dict[str, datetime] = {}
+        self._locks_loaded_at = 0.0
+        # Pending DB writes, applied in order: ("insert", row) / ("clear", email)
+        self._pending: List[Tuple[str, tuple]] = []
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    # --- Sliding windows ---
+
+    def _count(self, buckets: Dict[str, Deque[datetime]], key: str, now: datetime) -> int:
+        bucket = buckets.get(key)
+        if not bucket:
+            return 0
+        threshold = now - self.window
+        while bucket and bucket[0] <= threshold:
+            bucket.popleft()
+        if not bucket:
+            del buckets[key]
+            return 0
+        return len(bucket)
+
+    def _shared_count(self, key: str, now: datetime) -> int:
+        cached = self._shared.get(key)
+        if not cached:
+            return 0
+        failures, window_end = cached
+        if window_end <= now:
+            del self._shared[key]
+            return 0
+        return failures
+
+    def _bump_shared(self, keys: List[str]) -> Optional[Dict[str, Tuple[int, datetime]]]:
+        """Count a failure for each key in login_failure_counters. None if the DB is unavailable."""
+        conn = None
+        cur = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            # execute_values takes no extra parameters - the window is an int literal
+            window_secs = int(self.window.total_seconds())
+            rows = execute_values(cur, f"""
+                INSERT INTO login_failure_counters AS c (key, window_start, failures)
+                VALUES %s
+                ON CONFLICT (key) DO UPDATE SET
+                    failures = CASE WHEN c.window_start <= NOW() - make_interval(secs => {window_secs})
+                                    THEN 1 ELSE c.failures + 1 END,
+                    window_start = CASE WHEN c.window_start <= NOW() - make_interval(secs => {window_secs})
+                                        THEN NOW() ELSE c.window_start END
+                RETURNING key, failures, window_start + make_interval(secs => {window_secs})
+            """, [(key,) for key in sorted(keys)], template="(%s, NOW(), 1)", fetch=True)
+            conn.commit()
+            return {key: (failures, window_end) for key, failures, window_end in rows}
+        except Exception as e:
+            print(f"Error counting failed login (falling back to per-worker counts): {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+
+    def record_failure(self, email: str, ip_address: Optional[str] = None,
+                       user_agent: Optional[str] = None) -> int:
+        """Count a failed attempt and queue it for persistence. Returns failures for this email in the window."""
+        now = datetime.now()
+        with self._lock:
+            self._by_email.setdefault(email, deque()).append(now)
+            if ip_address:
+                self._by_ip.setdefault(ip_address, deque()).append(now)
+            self._pending.append(("insert", (email, ip_address, user_agent, now)))
+        self._ensure_worker()
+        if len(self._pending) >= FLUSH_BATCH_SIZE:
+            self._wakeup.set()
+
+        keys = [f"email:{email}"] + ([f"ip:{ip_address}"] if ip_address else [])
+        shared = self._bump_shared(keys)
+        with self._lock:
+            if shared:
+                self._shared.update(shared)
+            return max(self._count(self._by_email, email, now), self._shared_count(f"email:{email}", now))
+
+    def failures_for_email(self, email: str) -> int:
+        now = datetime.now()
+        with self._lock:
+            return max(self._count(self._by_email, email, now), self._shared_count(f"email:{email}", now))
+
+    def failures_for_ip(self, ip_address: Optional[str]) -> int:
+        if not ip_address:
+            return 0
+        now = datetime.now()
+        with self._lock:
+            return max(self._count(self._by_ip, ip_address, now), self._shared_count(f"ip:{ip_address}", now))
+
+    def clear(self, email: str):
+        """Successful login - forget failures and lock locally, and in the DB (write-behind)."""
+        with self._lock:
+            self._by_email.pop(email, None)
+            self._shared.pop(f"email:{email}", None)
+            self._locks.pop(email, None)
+            # The lock may have been set by another worker and not be cached here yet
+            self._pending.append(("clear", (email,)))
+        self._ensure_worker()
+
+    def _sweep(self):
+        """Drop windows with no attempt left in them"""
+        now = datetime.now()
+        with self._lock:
+            for buckets in (self._by_email, self._by_ip):
+                for key in list(buckets):
+                    self._count(buckets, key, now)
+            for key in list(self._shared):
+                self._shared_count(key, now)
+
+    # --- Locks ---
+
+    def locked_until(self, email: str) -> Optional[datetime]:
+        if time.monotonic() - self._locks_loaded_at > LOCK_REFRESH_SECONDS * 2:
+            # Worker thread not running (yet) or stalled - refresh inline
+            self._refresh_locks()
+        with self._lock:
+            until = self._locks.get(email)
+        if until and until > datetime.now():
+            return until
+        return None
+
+    def set_lock(self, email: str, locked_until: datetime):
+        with self._lock:
+            self._locks[email] = locked_until
+
+    def _refresh_locks(self):
+        conn = None
+        cur = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            cur.execute("SELECT email, locked_until FROM account_locks WHERE locked_until > NOW()")
+            locks = dict(cur.fetchall())
+            with self._lock:
+                self._locks = locks
+            self._locks_loaded_at = time.monotonic()
+        except Exception as e:
+            print(f"Error refreshing account locks: {e}")
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+
+    # --- Background worker ---
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="login-limiter", daemon=True)
+                    self._thread.start()
+
+    def start(self):
+        self._ensure_worker()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        conn = None
+        cur = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            batch = []
+            for op, args in pending:
+                if op == "insert":
+                    batch.append(args)
+                    continue
+                # Keep ordering: inserts queued before a clear must land first
+                if batch:
+                    execute_values(cur, """
+                        INSERT INTO failed_login_attempts (email, ip_address, user_agent, attempt_time)
+                        VALUES %s
+                    """, batch)
+                    batch = []
+                email, = args
+                cur.execute("DELETE FROM failed_login_attempts WHERE email = %s", (email,))
+                cur.execute("DELETE FROM account_locks WHERE email = %s", (email,))
+                cur.execute("DELETE FROM login_failure_counters WHERE key = %s", (f"email:{email}",))
+            if batch:
+                execute_values(cur, """
+                    INSERT INTO failed_login_attempts (email, ip_address, user_agent, attempt_time)
+                    VALUES %s
+                """, batch)
+            conn.commit()
+        except Exception as e:
+            print(f"Error flushing failed login attempts ({len(pending)} ops dropped): {e}")
+            if conn:
+                conn.rollback()
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+
+    def _purge(self):
+        conn = None
+        cur = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            cur.execute("""
+                DELETE FROM failed_login_attempts
+                WHERE attempt_time < NOW() - make_interval(days => %s)
+            """, (RETENTION_DAYS,))
+            purged = cur.rowcount
+            cur.execute("DELETE FROM account_locks WHERE locked_until < NOW()")
+            cur.execute("""
+                DELETE FROM login_failure_counters
+                WHERE window_start < NOW() - make_interval(secs => %s)
+            """, (self.window.total_seconds(),))
+            conn.commit()
+            if purged:
+                print(f"🧹 Purged {purged} old failed login attempts")
+        except Exception as e:
+            print(f"Error purging failed login attempts: {e}")
+            if conn:
+                conn.rollback()
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+
+    def _run(self):
+        last_purge = 0.0
+        last_refresh = 0.0
+        last_sweep = time.monotonic()
+        while True:
+            self._wakeup.wait(FLUSH_INTERVAL_SECONDS)
+            self._wakeup.clear()
+            self._flush()
+
+            now = time.monotonic()
+            if now - last_refresh >= LOCK_REFRESH_SECONDS:
+                self._refresh_locks()
+                last_refresh = now
+            if now - last_sweep >= SWEEP_INTERVAL_SECONDS:
+                self._sweep()
+                last_sweep = now
+            if now - last_purge >= PURGE_INTERVAL_SECONDS:
+                self._purge()
+                last_purge = now
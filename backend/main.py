@@ -1,15 +1,20 @@
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
 from db import get_db_connection
+from metrics import MetricsMiddleware, registry as metrics_registry
+from query_trace import QueryTraceMiddleware
+from settings import settings
 from auth import router as auth_router
 from auth_google import router as auth_google_router
 from packages import router as packages_router
 from notifications import router as notifications_router
 from admin_auth import router as admin_auth_router
 from admin_api import router as admin_api_router
+from admin_export import router as admin_export_router
 from whatsapp_api import router as whatsapp_router
 from invitation_image_upload import router as invitation_router
 from sms_router import router as sms_router
@@ -70,6 +75,72 @@ async def startup_migrations():
     except Exception as e:
         print(f"⚠️ Migration warning (whatsapp_message_events): {str(e)}")
 
+    try:
+        from add_activity_log_table import create_activity_log_table
+        create_activity_log_table()
+    except Exception as e:
+        print(f"⚠️ Migration warning (activity_log): {str(e)}")
+
+    try:
+        from add_jobs_table import create_jobs_table
+        create_jobs_table()
+    except Exception as e:
+        print(f"⚠️ Migration warning (jobs): {str(e)}")
+
+    try:
+        from create_failed_login_table import create_failed_login_attempts_table
+        create_failed_login_attempts_table()
+    except Exception as e:
+        print(f"⚠️ Migration warning (failed_login_attempts): {str(e)}")
+
+    try:
+        from add_email_outbox_table import create_email_outbox_table
+        create_email_outbox_table()
+    except Exception as e:
+        print(f"⚠️ Migration warning (email_outbox): {str(e)}")
+
+    try:
+        from add_notification_counters_table import create_notification_counters_table
+        create_notification_counters_table()
+    except Exception as e:
+        print(f"⚠️ Migration warning (notification_counters): {str(e)}")
+
+    try:
+        from add_event_rsvp_stats_table import create_event_rsvp_stats_table
+        create_event_rsvp_stats_table()
+    except Exception as e:
+        print(f"⚠️ Migration warning (event_rsvp_stats): {str(e)}")
+
+    try:
+        from add_payment_order_index import add_payment_order_index
+        add_payment_order_index()
+    except Exception as e:
+        print(f"⚠️ Migration warning (payment_order_index): {str(e)}")
+
+    try:
+        from add_package_catalog_trigger import add_package_catalog_trigger
+        add_package_catalog_trigger()
+    except Exception as e:
+        print(f"⚠️ Migration warning (package_catalog_trigger): {str(e)}")
+
+    try:
+        from add_message_retry_queue_table import create_message_retry_queue_table
+        create_message_retry_queue_table()
+    except Exception as e:
+        print(f"⚠️ Migration warning (message_retry_queue): {str(e)}")
+
+    # Failed-login write-behind / lock refresh / purge worker
+    from auth import login_limiter
+    login_limiter.start()
+
+    # Background sender for queued emails
+    from email_outbox import start_sender
+    start_sender()
+
+    # Background re-drive of transiently failed scheduled sends
+    from message_retry_queue import start_worker as start_retry_worker
+    start_retry_worker()
+
 # CORS Configuration - נאפשר לפרונט לגשת ל-API
 origins = [
     "http://localhost:5173",
@@ -84,8 +155,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Query-Trace", "Server-Timing"],
 )
 
+# מדדי ביצועים (latency לכל ראוט, שאילתות DB לבקשה) - נחשף ב-/metrics
+app.add_middleware(MetricsMiddleware)
+
+# מעקב שאילתות לכל בקשה: זיהוי N+1, לוג בקשות איטיות, X-Debug-Trace למנהלים
+app.add_middleware(QueryTraceMiddleware)
+
 @app.get("/")
 def root():
     return {"message": "giftWeb API is running", "version": "1.0", "docs": "/docs", "health": "/api/health"}
@@ -95,6 +173,16 @@ def health():
     return {"ok": True}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """
+    מדדים בפורמט Prometheus. אם METRICS_TOKEN מוגדר - נדרש Authorization: Bearer
+    """
+    if settings.metrics_token and request.headers.get("authorization") != f"Bearer {settings.metrics_token}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/db-test")
 def db_test():
     """
@@ -130,6 +218,9 @@ app.include_router(admin_auth_router)
 # חיבור ראוט Admin API
 app.include_router(admin_api_router)
 
+# חיבור ראוט ייצוא נתונים (CSV/XLSX)
+app.include_router(admin_export_router)
+
 # חיבור ראוט WhatsApp Interactive Messages
 app.include_router(whatsapp_router)
 
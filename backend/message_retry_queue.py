@@ -0,0 +1,296 @@
+"""
+Retry queue for scheduled-message sends that failed transiently.
+
+process_scheduled_message() hands guests whose send came back `retryable`
+(timeout, 5xx, rate limit, or rejected by an open circuit breaker - see
+outbound_resilience.py) to enqueue_retries(). A daemon thread in each worker
+re-drives due rows every POLL_INTERVAL_SECONDS:
+- rows are leased with FOR UPDATE SKIP LOCKED (next_attempt_at pushed forward
+  and committed), so no transaction is held open across provider calls and
+  several workers can drain concurrently. Unlike email_outbox, which keeps its
+  claim transaction open across the Gmail call, the lease can run out: the
+  batch lease covers a whole batch of worst-case sends, and each row's lease is
+  renewed right before its send, conditional on still holding it (next_attempt_at
+  unchanged) - a row another worker took over is skipped, not sent twice
+- kinds whose provider breaker is open are not claimed at all; rows rejected by
+  a breaker mid-batch are pushed back without spending an attempt
+- transient failures back off exponentially with jitter (retry_delay), up to
+  MAX_ATTEMPTS; anything else fails the row
+- a successful retry moves the guest from guests_failed_count to
+  guests_sent_count on the scheduled message (completed once nothing failed)
+"""
+import threading
+import time
+from typing import Iterable
+
+from psycopg2.extras import execute_values
+
+from db import get_db_connection
+from invitation_images import image_keys_sql
+from metrics import outbound_retries, outbound_retry_queue_depth
+from outbound_resilience import get_breaker, retry_delay
+from settings import settings
+
+POLL_INTERVAL_SECONDS = 10.0
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 6
+SEND_INTERVAL_SECONDS = 0.1  # same pacing as the scheduler round
+# Worst case for one send: slowest provider timeout plus pacing
+WORST_SEND_SECONDS = max(settings.gupshup_connect_timeout + settings.gupshup_read_timeout,
+                         settings.sms_019_timeout) + SEND_INTERVAL_SECONDS
+LEASE_SECONDS = BATCH_SIZE * WORST_SEND_SECONDS   # claim: long enough for the whole batch
+SEND_LEASE_SECONDS = 2 * WORST_SEND_SECONDS       # renewed before each send, with margin
+
+KIND_INVITATION = "invitation"
+KIND_REMINDER = "reminder"
+KIND_SMS = "sms"
+# Which breaker guards each kind of send
+KIND_ENDPOINTS = {
+    KIND_INVITATION: ("gupshup", "template"),
+    KIND_REMINDER: ("gupshup", "template"),
+    KIND_SMS: ("019sms", "send"),
+}
+
+_wakeup = threading.Event()
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def enqueue_retries(scheduled_message_id: int, kind: str, failures: Iterable[dict]) -> int:
+    """Queue failed guests of a scheduled message for retry. `failures` are send results."""
+    rows = [(scheduled_message_id, f['guest_id'], kind, (f.get('error') or '')[:500], retry_delay(0))
+            for f in failures]
+    if not rows:
+        return 0
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        execute_values(cur, """
+            INSERT INTO message_retry_queue (scheduled_message_id, guest_id, kind, last_error, next_attempt_at)
+            SELECT v.scheduled_message_id, v.guest_id, v.kind, v.last_error, NOW() + make_interval(secs => v.delay)
+            FROM (VALUES %s) AS v (scheduled_message_id, guest_id, kind, last_error, delay)
+            ON CONFLICT (scheduled_message_id, guest_id) DO UPDATE SET
+                status = 'pending', kind = EXCLUDED.kind, attempts = 0,
+                last_error = EXCLUDED.last_error, next_attempt_at = EXCLUDED.next_attempt_at
+        """, rows)
+        conn.commit()
+        outbound_retries.inc(kind, "queued", amount=len(rows))
+        print(f"🔁 Queued {len(rows)} {kind} send(s) of scheduled message {scheduled_message_id} for retry")
+        return len(rows)
+    except Exception as e:
+        print(f"Failed to queue retries for scheduled message {scheduled_message_id}: {e}")
+        if conn:
+            conn.rollback()
+        return 0
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def _claim(cur, kinds):
+    cur.execute("""
+        WITH due AS (
+            SELECT id FROM message_retry_queue
+            WHERE status = 'pending' AND next_attempt_at <= NOW() AND kind = ANY(%s)
+            ORDER BY next_attempt_at, id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE message_retry_queue q
+        SET next_attempt_at = NOW() + make_interval(secs => %s)
+        FROM due
+        WHERE q.id = due.id
+        RETURNING q.id
+    """, (list(kinds), BATCH_SIZE, LEASE_SECONDS))
+    ids = [row[0] for row in cur.fetchall()]
+    if not ids:
+        return []
+    cur.execute(f"""
+        SELECT
+            q.id, q.kind, q.attempts,
+            sm.id, sm.event_id, sm.message_number,
+            e.event_title, e.event_date, e.event_time, e.event_location, {image_keys_sql()}, e.status,
+            g.id, g.name, g.phone, g.contact_method, g.status,
+            q.next_attempt_at
+        FROM message_retry_queue q
+        JOIN scheduled_messages sm ON sm.id = q.scheduled_message_id
+        JOIN events e ON e.id = sm.event_id
+        JOIN guests g ON g.id = q.guest_id
+        WHERE q.id = ANY(%s)
+        ORDER BY q.id
+    """, (ids,))
+    return cur.fetchall()
+
+
+def _renew_lease(cur, row_id: int, leased_until) -> bool:
+    """Extend the lease of a row we still hold to cover one send. False if it was taken over."""
+    cur.execute("""
+        UPDATE message_retry_queue
+        SET next_attempt_at = NOW() + make_interval(secs => %s)
+        WHERE id = %s AND status = 'pending' AND next_attempt_at = %s
+    """, (SEND_LEASE_SECONDS, row_id, leased_until))
+    return cur.rowcount == 1
+
+
+def _send(row, contexts: dict) -> dict:
+    from event_render_context import EventRenderContext
+    from scheduler_service import send_sms_invitation, send_whatsapp_invitation, send_whatsapp_reminder
+
+    (_, kind, _, scheduled_message_id, event_id, message_number,
+     event_title, event_date, event_time, event_location, invitation_data, _,
+     guest_id, guest_name, guest_phone, contact_method, _, _) = row
+    # One render context per scheduled message and kind within a batch
+    ctx = contexts.get((scheduled_message_id, kind))
+    if ctx is None:
+        ctx = contexts[(scheduled_message_id, kind)] = EventRenderContext.build({
+            'scheduled_message_id': scheduled_message_id,
+            'event_id': event_id,
+            'message_number': message_number,
+            'event_title': event_title,
+            'event_date': event_date,
+            'event_time': event_time,
+            'event_location': event_location,
+            'invitation_data': invitation_data,
+        }, is_reminder=kind == KIND_REMINDER)
+    guest = {'id': guest_id, 'name': guest_name, 'phone': guest_phone,
+             'contact_method': contact_method or 'WhatsApp'}
+    if kind == KIND_SMS:
+        return send_sms_invitation(guest, ctx)
+    if kind == KIND_REMINDER:
+        return send_whatsapp_reminder(guest, ctx)
+    return send_whatsapp_invitation(guest, ctx)
+
+
+def _drain_batch() -> int:
+    """Claim and re-drive one batch. Returns the number of rows claimed."""
+    kinds = [kind for kind, (provider, endpoint) in KIND_ENDPOINTS.items()
+             if get_breaker(provider, endpoint).seconds_until_retry() == 0]
+    if not kinds:
+        return 0
+
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        rows = _claim(cur, kinds)
+        conn.commit()
+        if not rows:
+            return 0
+
+        contexts = {}
+        for row in rows:
+            row_id, kind, attempts = row[0], row[1], row[2]
+            event_status, guest_status = row[11], row[16]
+            if event_status != 'active' or (kind == KIND_REMINDER and guest_status in ('confirmed', 'declined')):
+                # Event cancelled / guest already answered since the round - nothing to resend
+                cur.execute("""
+                    UPDATE message_retry_queue SET status = 'skipped' WHERE id = %s
+                """, (row_id,))
+                outbound_retries.inc(kind, "skipped")
+                conn.commit()
+                continue
+
+            if not _renew_lease(cur, row_id, row[17]):
+                # Our batch lease ran out and another worker re-claimed the row
+                conn.commit()
+                continue
+            conn.commit()
+
+            result = _send(row, contexts)
+            if result.get('success'):
+                cur.execute("""
+                    UPDATE message_retry_queue
+                    SET status = 'sent', sent_at = NOW(), attempts = attempts + 1, last_error = NULL
+                    WHERE id = %s
+                """, (row_id,))
+                cur.execute("""
+                    UPDATE scheduled_messages
+                    SET guests_sent_count = COALESCE(guests_sent_count, 0) + 1,
+                        guests_failed_count = GREATEST(COALESCE(guests_failed_count, 0) - 1, 0),
+                        status = CASE WHEN COALESCE(guests_failed_count, 0) <= 1 THEN 'completed' ELSE status END,
+                        updated_at = NOW()
+                    WHERE id = %s
+                """, (row[3],))
+                outbound_retries.inc(kind, "sent")
+            elif result.get('circuit_open'):
+                # Rejected without reaching the provider - wait for the breaker, keep the attempt
+                provider, endpoint = KIND_ENDPOINTS[kind]
+                wait = get_breaker(provider, endpoint).seconds_until_retry() + retry_delay(0) / 10
+                cur.execute("""
+                    UPDATE message_retry_queue
+                    SET next_attempt_at = NOW() + make_interval(secs => %s)
+                    WHERE id = %s
+                """, (wait, row_id))
+                outbound_retries.inc(kind, "deferred")
+            elif result.get('retryable') and attempts + 1 < MAX_ATTEMPTS:
+                cur.execute("""
+                    UPDATE message_retry_queue
+                    SET attempts = attempts + 1, last_error = %s,
+                        next_attempt_at = NOW() + make_interval(secs => %s)
+                    WHERE id = %s
+                """, (result.get('error'), retry_delay(attempts + 1), row_id))
+                outbound_retries.inc(kind, "retry_later")
+            else:
+                cur.execute("""
+                    UPDATE message_retry_queue
+                    SET status = 'failed', attempts = attempts + 1, last_error = %s
+                    WHERE id = %s
+                """, (result.get('error'), row_id))
+                outbound_retries.inc(kind, "gave_up")
+            conn.commit()
+            time.sleep(SEND_INTERVAL_SECONDS)
+
+        print(f"🔁 Retry batch: {len(rows)} row(s) re-driven")
+        return len(rows)
+
+    except Exception as e:
+        print(f"Error draining message retry queue: {e}")
+        if conn:
+            conn.rollback()
+        return 0
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def _update_depth():
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM message_retry_queue WHERE status = 'pending'")
+        outbound_retry_queue_depth.set(value=cur.fetchone()[0])
+    except Exception as e:
+        print(f"Error reading message retry queue depth: {e}")
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def _run():
+    while True:
+        _wakeup.wait(POLL_INTERVAL_SECONDS)
+        _wakeup.clear()
+        # Keep going while full batches come back
+        while _drain_batch() >= BATCH_SIZE:
+            pass
+        _update_depth()
+
+
+def start_worker():
+    """Start this worker's retry drainer (idempotent)."""
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="message-retry", daemon=True)
+            _thread.start()
@@ -0,0 +1,423 @@
+"""
+In-process metrics registry, exposed in Prometheus text format at /metrics.
+
+Covers:
+- HTTP latency per route template (not per raw path, so ids don't blow up cardinality)
+- DB statements per request and DB time per request, statement latency by verb
+- DB connections opened / currently open and connect latency (there is no pool -
+  every get_db_connection() is a new connection, which is exactly what to watch)
+- outbound provider calls (Gupshup, 019SMS, Cloudinary, Gmail) by status code,
+  circuit breaker state and message retry volume
+- scheduler run duration / throughput and Gupshup webhook lag
+- successful sends counted by app_logging (instead of one log line each)
+
+Everything is plain counters and fixed-bucket histograms behind one lock per
+metric - a few dict lookups per observation - so it stays on in production.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import psycopg2.extensions
+
+from query_trace import record as trace_statement
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+LAG_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def snapshot(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_number(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *label_values, value: float):
+        with self._lock:
+            self._values[label_values] = value
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple, List[float]] = {}
+
+    def observe(self, *label_values, value: float):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_number(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status")))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled"))
+
+# Database
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request", "SQL statements issued per HTTP request", ("route",), COUNT_BUCKETS))
+db_time_per_request = registry.register(Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL statements per HTTP request", ("route",)))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement latency by verb", ("verb",), QUERY_BUCKETS))
+db_query_errors = registry.register(Counter(
+    "db_query_errors_total", "SQL statements that raised", ("verb",)))
+db_connections_opened = registry.register(Counter(
+    "db_connections_opened_total", "Database connections opened"))
+db_connections_open = registry.register(Gauge(
+    "db_connections_open", "Database connections currently open in this process"))
+db_connect_duration = registry.register(Histogram(
+    "db_connect_duration_seconds", "Time to open a database connection"))
+
+# Outbound providers
+provider_request_duration = registry.register(Histogram(
+    "provider_request_duration_seconds", "Outbound provider call latency by status code",
+    ("provider", "status")))
+
+# Scheduler / webhooks
+scheduler_run_duration = registry.register(Histogram(
+    "scheduler_run_duration_seconds", "Duration of a scheduled-message processing run",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800)))
+scheduler_messages = registry.register(Counter(
+    "scheduler_messages_total", "Guest messages sent by scheduler runs", ("result",)))
+scheduler_last_run_throughput = registry.register(Gauge(
+    "scheduler_last_run_messages_per_second", "Messages per second in the last scheduler run"))
+webhook_lag = registry.register(Histogram(
+    "webhook_lag_seconds", "Delay between the provider event timestamp and our receipt",
+    ("provider", "type"), LAG_BUCKETS))
+
+# Outbound resilience (see outbound_resilience / message_retry_queue)
+breaker_state = registry.register(Gauge(
+    "circuit_breaker_state", "Provider circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ("provider", "endpoint")))
+breaker_transitions = registry.register(Counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes", ("provider", "endpoint", "state")))
+breaker_rejections = registry.register(Counter(
+    "circuit_breaker_rejections_total", "Calls failed fast because the breaker was open",
+    ("provider", "endpoint")))
+outbound_retries = registry.register(Counter(
+    "outbound_retries_total", "Message retry queue activity", ("kind", "result")))
+outbound_retry_queue_depth = registry.register(Gauge(
+    "outbound_retry_queue_depth", "Pending rows in the message retry queue (as of the last drain)"))
+
+# Logging (see app_logging)
+log_events = registry.register(Counter(
+    "log_events_total", "Routine successful operations reported through log.success()",
+    ("category", "event")))
+log_records_dropped = registry.register(Counter(
+    "log_records_dropped_total", "Log records dropped because the writer queue was full"))
+
+
+# ============================================================================
+# Per-request DB accounting
+# ============================================================================
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Starlette copies the context into the threadpool, so sync handlers update the same object
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "request_stats", default=None)
+
+
+@contextmanager
+def count_queries():
+    """Count statements run in this context outside a request (jobs, benchmarks)"""
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+
+def _statement_verb(query) -> str:
+    if isinstance(query, bytes):
+        query = query[:32].decode("utf-8", "ignore")
+    elif not isinstance(query, str):
+        return "OTHER"
+    head = query.lstrip()[:16].split(None, 1)
+    return head[0].upper() if head else "OTHER"
+
+
+def observe_query(query, seconds: float, failed: bool = False):
+    verb = _statement_verb(query)
+    db_query_duration.observe(verb, value=seconds)
+    if failed:
+        db_query_errors.inc(verb)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+
+
+class _TimedCursorMixin:
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = super().execute(query, vars)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            observe_query(query, elapsed, failed)
+            trace_statement(query, elapsed, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = super().executemany(query, vars_list)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            observe_query(query, elapsed, failed)
+            trace_statement(query, elapsed, self.rowcount)
+
+
+_cursor_classes: Dict[type, type] = {}
+
+
+def _timed_cursor_class(base: type) -> type:
+    cls = _cursor_classes.get(base)
+    if cls is None:
+        cls = _cursor_classes[base] = type(f"Timed{base.__name__}", (_TimedCursorMixin, base), {})
+    return cls
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose cursors (any cursor_factory) report to the registry and query_trace"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counted_open = True
+        db_connections_opened.inc()
+        db_connections_open.inc()
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _timed_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+    def close(self):
+        if getattr(self, "_counted_open", False):
+            self._counted_open = False
+            db_connections_open.dec()
+        return super().close()
+
+
+@contextmanager
+def timed_connect():
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        db_connect_duration.observe(value=time.perf_counter() - start)
+
+
+# ============================================================================
+# Outbound providers / scheduler / webhooks
+# ============================================================================
+
+class ProviderCall:
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status = None
+
+
+def _status_from_exception(error: Exception):
+    response = getattr(error, "response", None)  # requests.HTTPError
+    if response is not None and getattr(response, "status_code", None):
+        return response.status_code
+    resp = getattr(error, "resp", None)  # googleapiclient HttpError
+    if resp is not None and getattr(resp, "status", None):
+        return resp.status
+    return type(error).__name__
+
+
+@contextmanager
+def provider_call(provider: str):
+    """
+    Time one outbound call. Set `call.status = response.status_code` inside the block;
+    exceptions are recorded by their HTTP status when they carry one, else by type.
+    """
+    call = ProviderCall()
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        if call.status is None:
+            call.status = _status_from_exception(e)
+        raise
+    finally:
+        provider_request_duration.observe(provider, call.status or "ok", value=time.perf_counter() - start)
+
+
+def observe_scheduler_run(seconds: float, sent: int, failed: int):
+    scheduler_run_duration.observe(value=seconds)
+    scheduler_messages.inc("sent", amount=sent)
+    scheduler_messages.inc("failed", amount=failed)
+    scheduler_last_run_throughput.set(value=(sent + failed) / seconds if seconds > 0 else 0)
+
+
+def observe_webhook_lag(provider: str, event_type: Optional[str], timestamp_ms) -> None:
+    """Record lag from the provider's event timestamp (epoch ms), ignoring missing/garbage values"""
+    try:
+        lag = time.time() - float(timestamp_ms) / 1000
+    except (TypeError, ValueError):
+        return
+    if lag >= 0:
+        webhook_lag.observe(provider, event_type or "unknown", value=lag)
+
+
+# ============================================================================
+# ASGI middleware
+# ============================================================================
+
+class MetricsMiddleware:
+    """Pure ASGI middleware - cheaper than BaseHTTPMiddleware and doesn't buffer streams"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_holder = [500]
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            _request_stats.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(scope["method"], route_path, str(status_holder[0]), value=elapsed)
+            db_queries_per_request.observe(route_path, value=stats.queries)
+            db_time_per_request.observe(route_path, value=stats.db_seconds)
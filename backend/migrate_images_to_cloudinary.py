@@ -1,110 +1,272 @@
 """
-One-time migration script: re-upload all existing ImgBB invitation images to Cloudinary.
+Batch migration: re-upload invitation images that are not on Cloudinary yet (ImgBB etc.).
 
 Run manually on the server after setting CLOUDINARY_* env vars:
-    python migrate_images_to_cloudinary.py
+    python migrate_images_to_cloudinary.py --workers 8
+    python migrate_images_to_cloudinary.py --dry-run
 
 What it does:
-- Finds all events whose generated_image_url points to ImgBB (or is missing)
-- Downloads the image from ImgBB (while it's still accessible)
-- Uploads it to Cloudinary under invitations/event_{id}
-- Updates the DB with the new stable Cloudinary URL
+- Finds all events whose generated_image_url is set but does not point to Cloudinary
+- Downloads and uploads the images on a bounded worker pool (--workers)
+- Dedups by content hash: the same image (across events, and across runs) is
+  uploaded once under a content-addressed public_id
+- Records each event in the image_migration_checkpoints table, so an interrupted
+  run resumes where it stopped (--retry-failed also retries failed events)
+- Updates the event only if its image URL has not changed meanwhile
+
+For a local test run use a scratch database and benchmarks/provider_standin.py,
+which answers Cloudinary uploads and serves source images under /images/<name>:
+    python benchmarks/provider_standin.py --port 8098 --cloudinary-latency fixed:150
+    python migrate_images_to_cloudinary.py --upload-url http://127.0.0.1:8098/v1_1/demo/image/upload
 """
 
-import os
-import json
-import base64
+import argparse
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, Optional
+
 import requests
+
 from db import get_db_connection
+from cloudinary_client import CLOUDINARY_CLOUD_NAME, content_public_id, upload_image
+import public_event_cache
 
-CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME", "")
-CLOUDINARY_API_KEY    = os.getenv("CLOUDINARY_API_KEY", "")
-CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET", "")
-
-
-def upload_to_cloudinary(image_bytes: bytes, event_id: int) -> str:
-    b64 = base64.b64encode(image_bytes).decode("utf-8")
-    upload_url = f"https://api.cloudinary.com/v1_1/{CLOUDINARY_CLOUD_NAME}/image/upload"
-    response = requests.post(
-        upload_url,
-        data={
-            "file": f"data:image/png;base64,{b64}",
-            "public_id": f"invitations/event_{event_id}",
-            "overwrite": "true",
-            "resource_type": "image",
-        },
-        auth=(CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET),
-        timeout=30,
-    )
-    if response.status_code == 200:
-        return response.json().get("secure_url", "")
-    else:
-        raise Exception(f"Cloudinary {response.status_code}: {response.text}")
+DOWNLOAD_TIMEOUT = 15
 
 
-def migrate():
-    if not CLOUDINARY_CLOUD_NAME:
-        print("❌ CLOUDINARY_CLOUD_NAME not set. Aborting.")
-        return
+def ensure_checkpoint_table():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS image_migration_checkpoints (
+                event_id INTEGER PRIMARY KEY,
+                source_url TEXT NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                image_sha256 VARCHAR(64),
+                new_url TEXT,
+                error_message TEXT,
+                updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+            );
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_image_migration_sha
+            ON image_migration_checkpoints (image_sha256) WHERE status = 'done';
+        """)
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def load_pending(retry_failed: bool, limit: Optional[int]):
+    """[(event_id, source_url)] still to migrate, skipping checkpointed events"""
+    skip_statuses = ['done'] if retry_failed else ['done', 'failed']
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT e.id, e.invitation_data->>'generated_image_url'
+            FROM events e
+            LEFT JOIN image_migration_checkpoints c
+                   ON c.event_id = e.id
+                  AND c.source_url = e.invitation_data->>'generated_image_url'
+            WHERE COALESCE(e.invitation_data->>'generated_image_url', '') <> ''
+              AND e.invitation_data->>'generated_image_url' NOT LIKE '%%cloudinary.com%%'
+              AND (c.status IS NULL OR c.status <> ALL(%s))
+            ORDER BY e.id
+            LIMIT %s
+        """, (skip_statuses, limit))
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
 
+
+def load_known_hashes() -> Dict[str, str]:
+    """sha256 -> Cloudinary URL for images uploaded by previous runs"""
     conn = get_db_connection()
     cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT DISTINCT ON (image_sha256) image_sha256, new_url
+            FROM image_migration_checkpoints
+            WHERE status = 'done' AND image_sha256 IS NOT NULL
+        """)
+        return dict(cur.fetchall())
+    finally:
+        cur.close()
+        conn.close()
 
-    # Get all events that have invitation_data with a generated_image_url
-    cur.execute("SELECT id, invitation_data FROM events WHERE invitation_data IS NOT NULL")
-    rows = cur.fetchall()
 
-    migrated = 0
-    skipped = 0
-    failed = 0
+def record(event_id: int, source_url: str, status: str, sha256_hex: Optional[str] = None,
+           new_url: Optional[str] = None, error: Optional[str] = None):
+    """Save the checkpoint, and for 'done' point the event at the new URL - one transaction."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        if status == 'done':
+            cur.execute("""
+                UPDATE events
+                SET invitation_data = invitation_data || jsonb_build_object(
+                        'generated_image_url', %s::text, 'image_sha256', %s::text),
+                    updated_at = NOW()
+                WHERE id = %s AND invitation_data->>'generated_image_url' = %s
+            """, (new_url, sha256_hex, event_id, source_url))
+            if cur.rowcount == 0:
+                status, error = 'skipped', 'image changed during migration'
+            else:
+                public_event_cache.invalidate(event_id, cur)
+        cur.execute("""
+            INSERT INTO image_migration_checkpoints
+                (event_id, source_url, status, image_sha256, new_url, error_message, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, NOW())
+            ON CONFLICT (event_id) DO UPDATE SET
+                source_url = EXCLUDED.source_url,
+                status = EXCLUDED.status,
+                image_sha256 = EXCLUDED.image_sha256,
+                new_url = EXCLUDED.new_url,
+                error_message = EXCLUDED.error_message,
+                updated_at = NOW()
+        """, (event_id, source_url, status, sha256_hex, new_url, error))
+        conn.commit()
+        return status
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
 
-    for event_id, invitation_data in rows:
-        if not invitation_data:
-            continue
 
-        url = invitation_data.get("generated_image_url", "")
+class ImageMigrator:
+    def __init__(self, workers: int, dry_run: bool = False, upload_url: Optional[str] = None):
+        self.workers = workers
+        self.dry_run = dry_run
+        self.upload_url = upload_url
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # sha256 -> Future[url]; the first worker to see a hash uploads it, the rest wait
+        self._uploads: Dict[str, Future] = {}
+        self.counts = {"done": 0, "would_migrate": 0, "skipped": 0, "failed": 0, "deduped": 0}
+        self.bytes_downloaded = 0
 
-        # Skip if already on Cloudinary
-        if url and "cloudinary.com" in url:
-            print(f"  ⏭️  Event {event_id}: already on Cloudinary, skipping")
-            skipped += 1
-            continue
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
 
-        # Skip if no URL at all
-        if not url:
-            print(f"  ⚠️  Event {event_id}: no image URL, skipping")
-            skipped += 1
-            continue
+    def seed_hashes(self, known: Dict[str, str]):
+        for sha256_hex, url in known.items():
+            future: Future = Future()
+            future.set_result(url)
+            self._uploads[sha256_hex] = future
 
-        print(f"  📥 Event {event_id}: downloading from {url[:60]}...")
+    def _upload_once(self, sha256_hex: str, image_bytes: bytes):
+        """Returns (url, deduped)"""
+        with self._lock:
+            future = self._uploads.get(sha256_hex)
+            owner = future is None
+            if owner:
+                future = self._uploads[sha256_hex] = Future()
+        if not owner:
+            return future.result(), True
+        try:
+            url = upload_image(image_bytes, content_public_id(sha256_hex), upload_url=self.upload_url)
+            future.set_result(url)
+            return url, False
+        except Exception as e:
+            # Let a later event with the same image try again
+            with self._lock:
+                self._uploads.pop(sha256_hex, None)
+            future.set_exception(e)
+            raise
 
+    def migrate_one(self, event_id: int, source_url: str) -> str:
+        sha256_hex = None
         try:
-            dl = requests.get(url, timeout=15)
+            dl = self._session().get(source_url, timeout=DOWNLOAD_TIMEOUT)
             if dl.status_code != 200:
-                print(f"  ❌ Event {event_id}: download failed ({dl.status_code})")
-                failed += 1
-                continue
+                raise Exception(f"download failed ({dl.status_code})")
+            image_bytes = dl.content
+            sha256_hex = hashlib.sha256(image_bytes).hexdigest()
+            with self._lock:
+                self.bytes_downloaded += len(image_bytes)
 
-            new_url = upload_to_cloudinary(dl.content, event_id)
-            invitation_data["generated_image_url"] = new_url
+            if self.dry_run:
+                print(f"  🔍 Event {event_id}: would migrate {len(image_bytes) / 1024:.0f} KB ({sha256_hex[:12]})")
+                return 'would_migrate'
 
-            cur.execute(
-                "UPDATE events SET invitation_data = %s, updated_at = NOW() WHERE id = %s",
-                (json.dumps(invitation_data), event_id)
-            )
-            conn.commit()
-            print(f"  ✅ Event {event_id}: migrated → {new_url}")
-            migrated += 1
+            new_url, deduped = self._upload_once(sha256_hex, image_bytes)
+            if deduped:
+                with self._lock:
+                    self.counts["deduped"] += 1
+            status = record(event_id, source_url, 'done', sha256_hex, new_url)
+            if status == 'done':
+                print(f"  ✅ Event {event_id}: migrated → {new_url}{' (dedup)' if deduped else ''}")
+            else:
+                print(f"  ⏭️  Event {event_id}: image changed meanwhile, skipping")
+            return status
 
         except Exception as e:
             print(f"  ❌ Event {event_id}: error — {e}")
-            failed += 1
+            if not self.dry_run:
+                try:
+                    record(event_id, source_url, 'failed', sha256_hex, error=str(e)[:500])
+                except Exception as record_error:
+                    print(f"  ⚠️  Event {event_id}: could not save checkpoint — {record_error}")
+            return 'failed'
+
+    def run(self, pending) -> dict:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self.migrate_one, event_id, url) for event_id, url in pending]
+            for i, future in enumerate(as_completed(futures), 1):
+                status = future.result()
+                self.counts[status] = self.counts.get(status, 0) + 1
+                if i % 50 == 0 or i == len(futures):
+                    elapsed = time.perf_counter() - start
+                    print(f"📈 {i}/{len(futures)} events, {i / elapsed:.1f} events/s, "
+                          f"{self.bytes_downloaded / 1024 / 1024 / elapsed:.1f} MB/s")
+        self.counts["elapsed_seconds"] = round(time.perf_counter() - start, 1)
+        return self.counts
 
-    cur.close()
-    conn.close()
 
-    print(f"\n🏁 Done. Migrated: {migrated} | Skipped: {skipped} | Failed: {failed}")
+def migrate(workers: int = 8, dry_run: bool = False, upload_url: Optional[str] = None,
+            retry_failed: bool = False, limit: Optional[int] = None) -> dict:
+    if not CLOUDINARY_CLOUD_NAME and not upload_url:
+        print("❌ CLOUDINARY_CLOUD_NAME not set. Aborting.")
+        return {}
+
+    ensure_checkpoint_table()
+    pending = load_pending(retry_failed, limit)
+    print(f"🚚 {len(pending)} events to migrate with {workers} workers{' (dry run)' if dry_run else ''}")
+    if not pending:
+        return {}
+
+    migrator = ImageMigrator(workers, dry_run=dry_run, upload_url=upload_url)
+    if not dry_run:
+        migrator.seed_hashes(load_known_hashes())
+    counts = migrator.run(pending)
+
+    if dry_run:
+        print(f"\n🏁 Dry run done. Would migrate: {counts['would_migrate']} | "
+              f"Failed: {counts['failed']} | {counts['elapsed_seconds']}s")
+    else:
+        print(f"\n🏁 Done. Migrated: {counts['done']} (dedup {counts['deduped']}) | "
+              f"Skipped: {counts['skipped']} | Failed: {counts['failed']} | "
+              f"{counts['elapsed_seconds']}s")
+    return counts
 
 
 if __name__ == "__main__":
-    migrate()
+    parser = argparse.ArgumentParser(description="Migrate invitation images to Cloudinary")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--dry-run", action="store_true", help="download and hash only, write nothing")
+    parser.add_argument("--upload-url", help="override the Cloudinary upload endpoint (local fake for tests)")
+    parser.add_argument("--retry-failed", action="store_true", help="also retry events that failed before")
+    parser.add_argument("--limit", type=int, help="migrate at most N events")
+    args = parser.parse_args()
+    migrate(args.workers, args.dry_run, args.upload_url, args.retry_failed, args.limit)
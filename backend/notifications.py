@@ -1,9 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List, Set, Tuple
 from datetime import datetime
+import asyncio
+import json
+import threading
+import time
 import psycopg2
 from db import get_db_connection
+from pg_events import hub, notify, offer, SUBSCRIBER_QUEUE_SIZE
 
 router = APIRouter(
     prefix="/api/notifications",
@@ -19,6 +26,13 @@ class NotificationCreate(BaseModel):
     title: str
     message: str
 
+class NotificationBulkCreate(BaseModel):
+    user_ids: List[int]
+    event_id: Optional[int] = None
+    notification_type: str
+    title: str
+    message: str
+
 class NotificationResponse(BaseModel):
     id: int
     user_id: int
@@ -29,12 +43,97 @@ class NotificationResponse(BaseModel):
     is_read: bool
     created_at: str
 
+# ========== Unread counters ==========
+
+# ערוץ LISTEN/NOTIFY - כל שינוי בהתראות/מונה של משתמש
+NOTIFICATIONS_CHANNEL = "notifications"
+
+# מטמון מונים בזיכרון, מתעדכן מ-NOTIFY (גם של workers אחרים)
+UNREAD_CACHE_TTL_SECONDS = 60
+_unread_cache: Dict[int, Tuple[int, float]] = {}
+_unread_cache_lock = threading.Lock()
+
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def _cache_unread(user_id: int, count: int):
+    with _unread_cache_lock:
+        _unread_cache[user_id] = (count, time.monotonic())
+
+
+def _cached_unread(user_id: int) -> Optional[int]:
+    with _unread_cache_lock:
+        entry = _unread_cache.get(user_id)
+    if entry and time.monotonic() - entry[1] < UNREAD_CACHE_TTL_SECONDS:
+        return entry[0]
+    return None
+
+
+# זרמי SSE פתוחים לפי משתמש - כל NOTIFY נמסר רק לזרמים של המשתמש שלו
+# (ולא לכל הזרמים, שאחרת תור של 100 מתמלא בהתראות של משתמשים אחרים בשליחה מרובה)
+_streams: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+_streams_lock = threading.Lock()
+
+
+def _open_stream(user_id: int) -> Tuple[asyncio.AbstractEventLoop, asyncio.Queue]:
+    entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+    with _streams_lock:
+        _streams.setdefault(user_id, set()).add(entry)
+    return entry
+
+
+def _close_stream(user_id: int, entry: Tuple[asyncio.AbstractEventLoop, asyncio.Queue]):
+    with _streams_lock:
+        streams = _streams.get(user_id)
+        if streams is not None:
+            streams.discard(entry)
+            if not streams:
+                del _streams[user_id]
+
+
+def _on_notification_change(payload: dict):
+    user_id = payload.get("user_id")
+    if user_id is None:
+        return
+    if payload.get("unread_count") is not None:
+        _cache_unread(user_id, payload["unread_count"])
+    with _streams_lock:
+        streams = list(_streams.get(user_id, ()))
+    for loop, queue in streams:
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(offer, queue, payload)
+
+
+hub.add_callback(NOTIFICATIONS_CHANNEL, _on_notification_change)
+
+
+def _publish_count(cur, user_id: int, unread_count: int):
+    notify(cur, NOTIFICATIONS_CHANNEL, {"user_id": user_id, "unread_count": unread_count})
+
+
+def _serialize(row) -> dict:
+    return {
+        "id": row[0],
+        "user_id": row[1],
+        "event_id": row[2],
+        "notification_type": row[3],
+        "title": row[4],
+        "message": row[5],
+        "is_read": row[6],
+        "created_at": row[7].isoformat() if row[7] else None
+    }
+
 # ========== Helper Functions ==========
 
-def create_notification(user_id: int, event_id: Optional[int], notification_type: str, title: str, message: str):
+def create_notifications(user_ids: List[int], event_id: Optional[int], notification_type: str, title: str, message: str) -> List[int]:
     """
-    פונקציית עזר ליצירת התראה
+    יצירת התראה זהה לרשימת משתמשים במשפט SQL אחד:
+    הכנסת ההתראות, עדכון מוני "לא נקרא" ו-NOTIFY לכל משתמש
+    מחזיר את מזהי ההתראות שנוצרו
     """
+    if not user_ids:
+        return []
+
     conn = None
     cur = None
 
@@ -43,14 +142,39 @@ def create_notification(user_id: int, event_id: Optional[int], notification_type
         cur = conn.cursor()
 
         cur.execute("""
-            INSERT INTO notifications (user_id, event_id, notification_type, title, message)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING id
-        """, (user_id, event_id, notification_type, title, message))
-
-        notification_id = cur.fetchone()[0]
+            WITH ins AS (
+                INSERT INTO notifications (user_id, event_id, notification_type, title, message)
+                SELECT u, %s, %s, %s, %s FROM unnest(%s::INTEGER[]) AS u
+                RETURNING id, user_id, event_id, notification_type, title, message, is_read, created_at
+            ),
+            counters AS (
+                INSERT INTO notification_counters (user_id, unread_count)
+                SELECT user_id, COUNT(*) FROM ins GROUP BY user_id
+                ON CONFLICT (user_id) DO UPDATE SET
+                    unread_count = notification_counters.unread_count + EXCLUDED.unread_count,
+                    updated_at = NOW()
+                RETURNING user_id, unread_count
+            ),
+            pushed AS (
+                SELECT pg_notify(%s, json_build_object(
+                    'user_id', ins.user_id,
+                    'unread_count', counters.unread_count,
+                    'notification', json_build_object(
+                        'id', ins.id, 'user_id', ins.user_id, 'event_id', ins.event_id,
+                        -- NOTIFY payloads are capped at 8000 bytes
+                        'notification_type', ins.notification_type, 'title', left(ins.title, 200),
+                        'message', left(ins.message, 1000),
+                        'is_read', ins.is_read, 'created_at', ins.created_at
+                    )
+                )::text)
+                FROM ins JOIN counters ON counters.user_id = ins.user_id
+            )
+            SELECT ins.id, (SELECT COUNT(*) FROM pushed) FROM ins
+        """, (event_id, notification_type, title, message, list(user_ids), NOTIFICATIONS_CHANNEL))
+
+        notification_ids = [row[0] for row in cur.fetchall()]
         conn.commit()
-        return notification_id
+        return notification_ids
 
     except Exception as e:
         if conn:
@@ -62,6 +186,48 @@ def create_notification(user_id: int, event_id: Optional[int], notification_type
         if conn:
             conn.close()
 
+
+def create_notification(user_id: int, event_id: Optional[int], notification_type: str, title: str, message: str):
+    """
+    פונקציית עזר ליצירת התראה
+    """
+    return create_notifications([user_id], event_id, notification_type, title, message)[0]
+
+
+def _load_unread_count(user_id: int) -> int:
+    """
+    מונה "לא נקרא" מהטבלה; אם אין שורה למשתמש - ספירה חד פעמית ושמירה
+    """
+    conn = None
+    cur = None
+
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        cur.execute("SELECT unread_count FROM notification_counters WHERE user_id = %s", (user_id,))
+        row = cur.fetchone()
+        if row:
+            count = row[0]
+        else:
+            cur.execute("""
+                INSERT INTO notification_counters (user_id, unread_count)
+                SELECT %s, COUNT(*) FROM notifications WHERE user_id = %s AND is_read = FALSE
+                ON CONFLICT (user_id) DO UPDATE SET unread_count = EXCLUDED.unread_count
+                RETURNING unread_count
+            """, (user_id, user_id))
+            count = cur.fetchone()[0]
+            conn.commit()
+
+        _cache_unread(user_id, count)
+        return count
+
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
 # ========== Endpoints ==========
 
 @router.get("/user/{user_id}")
@@ -94,20 +260,7 @@ def get_user_notifications(user_id: int, unread_only: bool = False):
 
         rows = cur.fetchall()
 
-        notifications = []
-        for row in rows:
-            notifications.append({
-                "id": row[0],
-                "user_id": row[1],
-                "event_id": row[2],
-                "notification_type": row[3],
-                "title": row[4],
-                "message": row[5],
-                "is_read": row[6],
-                "created_at": row[7].isoformat() if row[7] else None
-            })
-
-        return notifications
+        return [_serialize(row) for row in rows]
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching notifications: {str(e)}")
@@ -120,31 +273,51 @@ def get_user_notifications(user_id: int, unread_only: bool = False):
 @router.get("/user/{user_id}/unread-count")
 def get_unread_count(user_id: int):
     """
-    מחזיר את מספר ההתראות שלא נקראו
+    מחזיר את מספר ההתראות שלא נקראו (ממטמון / notification_counters)
     """
-    conn = None
-    cur = None
+    cached = _cached_unread(user_id)
+    if cached is not None:
+        return {"unread_count": cached}
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute("""
-            SELECT COUNT(*)
-            FROM notifications
-            WHERE user_id = %s AND is_read = FALSE
-        """, (user_id,))
-
-        count = cur.fetchone()[0]
-        return {"unread_count": count}
-
+        return {"unread_count": _load_unread_count(user_id)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching unread count: {str(e)}")
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+
+@router.get("/user/{user_id}/stream")
+async def stream_notifications(user_id: int, request: Request):
+    """
+    זרם התראות בזמן אמת (Server-Sent Events) - מחליף polling של unread-count ורשימת ההתראות.
+    שולח את המונה הנוכחי בהתחברות, ואחר כך כל התראה חדשה / שינוי במונה של המשתמש.
+    """
+    async def event_stream():
+        stream = _open_stream(user_id)
+        queue = stream[1]
+        try:
+            count = _cached_unread(user_id)
+            if count is None:
+                count = await run_in_threadpool(_load_unread_count, user_id)
+            yield f"event: unread_count\ndata: {json.dumps({'unread_count': count})}\n\n"
+
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if payload.get("notification"):
+                    yield f"event: notification\ndata: {json.dumps(payload['notification'], ensure_ascii=False, default=str)}\n\n"
+                yield f"event: unread_count\ndata: {json.dumps({'unread_count': payload.get('unread_count')})}\n\n"
+        finally:
+            _close_stream(user_id, stream)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.put("/{notification_id}/mark-read")
 def mark_notification_as_read(notification_id: int):
@@ -158,17 +331,37 @@ def mark_notification_as_read(notification_id: int):
         conn = get_db_connection()
         cur = conn.cursor()
 
+        # changed = האם ההתראה עברה עכשיו מ"לא נקרא" ל"נקרא"
         cur.execute("""
-            UPDATE notifications
-            SET is_read = TRUE
-            WHERE id = %s
-            RETURNING id
+            WITH target AS (
+                SELECT id, user_id, is_read FROM notifications WHERE id = %s FOR UPDATE
+            ),
+            upd AS (
+                UPDATE notifications n
+                SET is_read = TRUE
+                FROM target t
+                WHERE n.id = t.id AND t.is_read = FALSE
+                RETURNING n.id
+            )
+            SELECT t.user_id, EXISTS (SELECT 1 FROM upd) FROM target t
         """, (notification_id,))
 
         result = cur.fetchone()
         if not result:
             raise HTTPException(status_code=404, detail="Notification not found")
 
+        user_id, changed = result
+        if changed:
+            cur.execute("""
+                UPDATE notification_counters
+                SET unread_count = GREATEST(unread_count - 1, 0), updated_at = NOW()
+                WHERE user_id = %s
+                RETURNING unread_count
+            """, (user_id,))
+            counter = cur.fetchone()
+            if counter:
+                _publish_count(cur, user_id, counter[0])
+
         conn.commit()
         return {"success": True, "message": "Notification marked as read"}
 
@@ -196,11 +389,23 @@ def mark_all_notifications_as_read(user_id: int):
         conn = get_db_connection()
         cur = conn.cursor()
 
+        # מפחיתים את מספר השורות שסומנו (לא מאפסים): התראה שנוצרה במקביל ועוד לא
+        # נראתה ל-UPDATE כבר הוסיפה 1 למונה, ואיפוס היה מוחק אותו
         cur.execute("""
-            UPDATE notifications
-            SET is_read = TRUE
-            WHERE user_id = %s AND is_read = FALSE
-        """, (user_id,))
+            WITH upd AS (
+                UPDATE notifications
+                SET is_read = TRUE
+                WHERE user_id = %s AND is_read = FALSE
+                RETURNING id
+            )
+            INSERT INTO notification_counters (user_id, unread_count)
+            VALUES (%s, 0)
+            ON CONFLICT (user_id) DO UPDATE SET
+                unread_count = GREATEST(notification_counters.unread_count - (SELECT COUNT(*) FROM upd), 0),
+                updated_at = NOW()
+            RETURNING unread_count
+        """, (user_id, user_id))
+        _publish_count(cur, user_id, cur.fetchone()[0])
 
         conn.commit()
         return {"success": True, "message": "All notifications marked as read"}
@@ -231,3 +436,20 @@ def create_notification_endpoint(notification: NotificationCreate):
         return {"success": True, "notification_id": notification_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating notification: {str(e)}")
+
+@router.post("/create-bulk")
+def create_notifications_endpoint(notifications: NotificationBulkCreate):
+    """
+    יוצר אותה התראה לרשימת משתמשים (למשל לכל בעלי אירוע) במשפט אחד
+    """
+    try:
+        notification_ids = create_notifications(
+            notifications.user_ids,
+            notifications.event_id,
+            notifications.notification_type,
+            notifications.title,
+            notifications.message
+        )
+        return {"success": True, "notification_ids": notification_ids, "count": len(notification_ids)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating notifications: {str(e)}")
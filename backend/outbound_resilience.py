@@ -0,0 +1,189 @@
+"""
+Circuit breakers and retry backoff for outbound provider calls (Gupshup, 019SMS).
+
+One breaker per (provider, endpoint). A breaker opens after BREAKER_FAILURE_THRESHOLD
+consecutive transient failures (timeouts, connection errors, 5xx, 429) and then
+rejects calls immediately for BREAKER_RESET_SECONDS, so a send round against a
+degraded provider fails fast instead of waiting out a timeout per guest. After
+the cooldown one probe call is let through (half-open): success closes the
+breaker, failure re-opens it.
+
+Non-transient failures (invalid number, template mismatch...) mean the provider
+is up and answering, so they count as healthy for the breaker. Clients wrap the
+HTTP call in guarded_call(), which settles the breaker on every path.
+
+Rejected and transient failures are marked `retryable` in the client result
+dicts; scheduler sends with that flag go to the message retry queue
+(message_retry_queue.py), which re-drives them with retry_delay() backoff.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from metrics import breaker_rejections, breaker_state, breaker_transitions, provider_call
+from settings import settings
+
+BREAKER_FAILURE_THRESHOLD = settings.breaker_failure_threshold
+BREAKER_RESET_SECONDS = settings.breaker_reset_seconds
+RETRY_BASE_SECONDS = settings.outbound_retry_base_seconds
+RETRY_MAX_SECONDS = settings.outbound_retry_max_seconds
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+TRANSIENT_STATUS_CODES = {408, 425, 429}
+
+
+def is_transient_status(status_code: Optional[int]) -> bool:
+    """HTTP statuses worth retrying - rate limits and server-side errors"""
+    if status_code is None:
+        return False
+    return status_code in TRANSIENT_STATUS_CODES or status_code >= 500
+
+
+def is_transient_exception(error: Exception) -> bool:
+    """Timeouts / connection failures, or an HTTPError carrying a transient status"""
+    import requests
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    response = getattr(error, "response", None)
+    return is_transient_status(getattr(response, "status_code", None))
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter: a random delay in [d/2, d], d = base * 2^attempt (capped)"""
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
+
+
+class CircuitBreaker:
+    def __init__(self, provider: str, endpoint: str,
+                 failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.provider = provider
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        breaker_state.set(provider, endpoint, value=0)
+
+    def _transition(self, state: str):
+        self.state = state
+        breaker_state.set(self.provider, self.endpoint, value=_STATE_VALUES[state])
+        breaker_transitions.inc(self.provider, self.endpoint, state)
+        print(f"🔌 Circuit {self.provider}/{self.endpoint} -> {state}")
+
+    def allow(self) -> bool:
+        """True if a call may go out now; counts a rejection otherwise"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+        breaker_rejections.inc(self.provider, self.endpoint)
+        return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        """Record a transient failure (only those - see module docstring)"""
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def record(self, success: bool, transient: bool):
+        if success or not transient:
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def seconds_until_retry(self) -> float:
+        """How long until an open breaker lets a probe through (0 when closed)"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def rejected_result(self) -> Dict:
+        return {
+            'success': False,
+            'error': f'{self.provider} circuit open - not sent',
+            'retryable': True,
+            'circuit_open': True,
+        }
+
+
+class GuardedCall:
+    """Handle yielded by guarded_call(); report the response with record()"""
+
+    def __init__(self, breaker: CircuitBreaker, call):
+        self.breaker = breaker
+        self.call = call
+        self.recorded = False
+
+    def record(self, success: bool, status_code: int):
+        self.call.status = status_code
+        self.breaker.record(success, is_transient_status(status_code))
+        self.recorded = True
+
+
+@contextmanager
+def guarded_call(breaker: CircuitBreaker, provider: str):
+    """
+    Time one outbound call (metrics.provider_call) and settle `breaker` with its outcome.
+
+    Call `guarded.record(success, status_code)` once the response is in. An exception
+    leaving the block unrecorded counts as a failure when transient, as a success
+    otherwise - every call has to settle the breaker, or a half-open probe stays in
+    flight and the breaker never closes.
+    """
+    with provider_call(provider) as call:
+        guarded = GuardedCall(breaker, call)
+        try:
+            yield guarded
+        except Exception as e:
+            if not guarded.recorded and is_transient_exception(e):
+                breaker.record_failure()
+                guarded.recorded = True
+            raise
+        finally:
+            if not guarded.recorded:
+                breaker.record_success()
+
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider: str, endpoint: str) -> CircuitBreaker:
+    key = (provider, endpoint)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(key)
+            if breaker is None:
+                breaker = _breakers[key] = CircuitBreaker(provider, endpoint)
+    return breaker
+
+
+def breaker_states() -> Dict[str, str]:
+    return {f"{p}/{e}": b.state for (p, e), b in sorted(_breakers.items())}
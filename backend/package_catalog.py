@@ -0,0 +1,230 @@
+"""
+Process-wide package catalog.
+
+The packages table (display data for the pricing page) and the price tiers used
+for payments are loaded once into a dict keyed by package id, with the send
+method precomputed per package (PACKAGE_SEND_METHODS; the name is only a fallback
+for unknown ids). Lookups are O(1) and don't touch the database.
+
+The catalog is reloaded lazily after a change: a statement trigger on packages
+(add_package_catalog_trigger.py) NOTIFYs CATALOG_CHANNEL, which marks it stale in
+every worker. CATALOG_TTL_SECONDS bounds staleness if a notification is missed.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from db import get_db_connection
+from pg_events import hub
+
+CATALOG_CHANNEL = "package_catalog"
+CATALOG_TTL_SECONDS = 600
+
+SEND_METHOD_MANUAL = "ידני"
+SEND_METHOD_SMS = "SMS"
+SEND_METHOD_WHATSAPP = "WhatsApp"
+
+# הגדרת מחירי חבילות - מכיוון שאין טבלת מחירים ב-DB
+PACKAGES_PRICING = {
+    1: {"name": "חבילת בסיס – ידני", "price": 39},  # מחיר קבוע
+    2: {  # SMS - לפי כמות רשומות
+        "name": "אוטומטי SMS",
+        "prices": {
+            "150 רשומות": 59,
+            "300 רשומות": 79,
+            "500 רשומות": 109,
+            "800 רשומות": 159,
+            "1,000 רשומות": 189,
+            "2,000 רשומות": 319
+        }
+    },
+    3: {  # WhatsApp - לפי כמות
+        "name": "אוטומטי WhatsApp",
+        "prices": {
+            "עד 50": 69,
+            "עד 100": 109,
+            "עד 150": 169,
+            "עד 200": 229,
+            "עד 300": 329,
+            "עד 400": 419,
+            "עד 500": 509,
+            "עד 600": 589,
+            "עד 700": 649,
+            "עד 800": 709
+        }
+    },
+    4: {  # הכל כלול
+        "name": "אוטומטי הכל כלול",
+        "prices": {
+            "עד 100": 239,
+            "עד 200": 469,
+            "עד 300": 679,
+            "עד 400": 869,
+            "עד 500": 1039,
+            "עד 600": 1189,
+            "עד 700": 1389,
+            "עד 800": 1589
+        }
+    },
+    5: {  # ראש שקט פלוס
+        "name": "אוטומטי \"ראש שקט פלוס\"",
+        "prices": {
+            "עד 100": 339,
+            "עד 200": 569,
+            "עד 300": 779,
+            "עד 400": 969,
+            "עד 500": 1139,
+            "עד 600": 1289,
+            "עד 700": 1489,
+            "עד 800": 1689
+        }
+    }
+}
+
+
+# שיטת השליחה לפי מזהה חבילה - כלל מפורש, לא נגזר מהשם (שינוי שם לא משנה את השליחה)
+PACKAGE_SEND_METHODS = {
+    1: SEND_METHOD_MANUAL,    # חבילת בסיס - ידני
+    2: SEND_METHOD_SMS,       # SMS בלבד
+    3: SEND_METHOD_WHATSAPP,  # WhatsApp בלבד
+    4: SEND_METHOD_WHATSAPP,  # הכל כלול
+    5: SEND_METHOD_WHATSAPP,  # ראש שקט פלוס
+}
+
+
+def send_method_from_name(package_name: Optional[str]) -> str:
+    """Send method by package name - fallback for package ids without an entry in PACKAGE_SEND_METHODS"""
+    if not package_name:
+        return SEND_METHOD_WHATSAPP
+    name_lower = package_name.lower()
+    if "בסיס" in name_lower or "ידני" in name_lower:
+        return SEND_METHOD_MANUAL
+    if "sms" in name_lower:
+        return SEND_METHOD_SMS
+    return SEND_METHOD_WHATSAPP
+
+
+@dataclass(frozen=True)
+class Package:
+    id: int
+    name: str
+    send_method: str
+    fixed_price: Optional[int] = None
+    price_tiers: Dict[str, int] = field(default_factory=dict)
+    # Row as served by /api/packages/list (None when the package has no packages row)
+    public: Optional[dict] = None
+
+    @property
+    def is_manual(self) -> bool:
+        return self.send_method == SEND_METHOD_MANUAL
+
+    def price_for(self, guest_count: Optional[str]) -> Optional[int]:
+        if self.fixed_price is not None:
+            return self.fixed_price
+        return self.price_tiers.get(guest_count) if guest_count else None
+
+
+class PackageCatalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._packages: Dict[int, Package] = {}
+        self._public_list: List[dict] = []
+        self._loaded_at = 0.0
+        self._stale = True
+        self._listening = False
+
+    def _load(self):
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT id, name, tagline, price, price_unit, color, popular, features, note
+                FROM packages
+                ORDER BY id;
+            """)
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+            conn.close()
+
+        public_rows = {
+            row[0]: {
+                "id": row[0],
+                "name": row[1],
+                "tagline": row[2],
+                "price": row[3],
+                "price_unit": row[4],
+                "color": row[5],
+                "popular": row[6],
+                "features": row[7],
+                "note": row[8]
+            }
+            for row in rows
+        }
+
+        packages = {}
+        for package_id in sorted(set(public_rows) | set(PACKAGES_PRICING)):
+            pricing = PACKAGES_PRICING.get(package_id, {})
+            public = public_rows.get(package_id)
+            name = public["name"] if public else pricing.get("name", "")
+            packages[package_id] = Package(
+                id=package_id,
+                name=name,
+                send_method=PACKAGE_SEND_METHODS.get(package_id) or send_method_from_name(name),
+                fixed_price=pricing.get("price"),
+                price_tiers=dict(pricing.get("prices", {})),
+                public=public
+            )
+        return packages, list(public_rows.values())
+
+    def _ensure_loaded(self):
+        if not self._listening:
+            hub.add_callback(CATALOG_CHANNEL, lambda _: self.invalidate())
+            self._listening = True
+        if not self._stale and time.monotonic() - self._loaded_at < CATALOG_TTL_SECONDS:
+            return
+        with self._lock:
+            if not self._stale and time.monotonic() - self._loaded_at < CATALOG_TTL_SECONDS:
+                return
+            # Clear the flag first: a NOTIFY arriving mid-load marks it stale again
+            self._stale = False
+            try:
+                self._packages, self._public_list = self._load()
+                self._loaded_at = time.monotonic()
+            except Exception:
+                self._stale = True
+                if not self._packages:
+                    raise
+                print("⚠️ Package catalog reload failed, serving the previous copy")
+
+    def invalidate(self):
+        self._stale = True
+
+    def get(self, package_id: Optional[int]) -> Optional[Package]:
+        if package_id is None:
+            return None
+        self._ensure_loaded()
+        return self._packages.get(package_id)
+
+    def public_list(self) -> List[dict]:
+        """Packages as served by /api/packages/list"""
+        self._ensure_loaded()
+        return self._public_list
+
+    def name_for(self, package_id: Optional[int]) -> Optional[str]:
+        package = self.get(package_id)
+        return package.name if package else None
+
+    def send_method_for(self, package_id: Optional[int], package_name: Optional[str] = None) -> str:
+        """Send method by package id, falling back to the purchase's package name"""
+        package = self.get(package_id)
+        if package:
+            return package.send_method
+        return PACKAGE_SEND_METHODS.get(package_id) or send_method_from_name(package_name)
+
+    def is_manual(self, package_id: Optional[int], package_name: Optional[str] = None) -> bool:
+        return self.send_method_for(package_id, package_name) == SEND_METHOD_MANUAL
+
+
+package_catalog = PackageCatalog()
@@ -3,12 +3,16 @@ from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
 import json
-import openpyxl
 from io import BytesIO
 import traceback
 
 import psycopg2
 from db import get_db_connection
+from activity_log import log_activity, EVENT_CREATED
+import public_event_cache
+from package_catalog import package_catalog
+from invitation_images import image_keys_sql
+from rsvp_coalescer import refresh_event_stats
 
 router = APIRouter(
     prefix="/api/packages",
@@ -94,34 +98,8 @@ def get_packages():
     """
     מחזיר את רשימת כל החבילות הזמינות
     """
-    conn = None
-    cur = None
-
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute("""
-            SELECT id, name, tagline, price, price_unit, color, popular, features, note
-            FROM packages
-            ORDER BY id;
-        """)
-
-        packages = []
-        for row in cur.fetchall():
-            packages.append({
-                "id": row[0],
-                "name": row[1],
-                "tagline": row[2],
-                "price": row[3],
-                "price_unit": row[4],
-                "color": row[5],
-                "popular": row[6],
-                "features": row[7],
-                "note": row[8]
-            })
-
-        return {"packages": packages}
+        return {"packages": package_catalog.public_list()}
 
     except Exception as e:
         print(f"Get packages error: {e}")
@@ -129,11 +107,6 @@ def get_packages():
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="שגיאה בשרת"
         )
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
 
 @router.post("/purchase", status_code=status.HTTP_201_CREATED)
@@ -319,6 +292,7 @@ def create_event(event: EventCreate):
             WHERE id = %s
         """, (event_id, event.package_purchase_id))
 
+        log_activity(EVENT_CREATED, event.event_title, user_id=event.user_id, event_id=event_id, cur=cur)
         conn.commit()
 
         return {
@@ -363,18 +337,22 @@ def get_user_events(user_id: int):
             SELECT
                 e.id, e.event_type, e.event_title, e.event_date,
                 e.event_location, e.status, e.created_at, e.package_purchase_id,
-                COUNT(DISTINCT g.id) as total_guests,
-                COUNT(DISTINCT CASE WHEN g.attendance_status = 'confirmed' THEN g.id END) as confirmed_guests,
-                COUNT(DISTINCT CASE WHEN gift.id IS NOT NULL THEN gift.id END) as total_gifts,
-                COALESCE(SUM(gift.amount), 0) as total_gift_amount,
-                COALESCE(SUM(g.guests_count), 0) as total_people,
-                COUNT(DISTINCT CASE WHEN g.attendance_status = 'pending' THEN g.id END) as pending_guests,
-                COALESCE(SUM(CASE WHEN g.attendance_status = 'confirmed' THEN g.guests_count ELSE 0 END), 0) as confirmed_quantity
+                COALESCE(s.total_guests, 0) as total_guests,
+                COALESCE(s.confirmed_guests, 0) as confirmed_guests,
+                COALESCE(gift.total_gifts, 0) as total_gifts,
+                COALESCE(gift.total_gift_amount, 0) as total_gift_amount,
+                COALESCE(s.total_people, 0) as total_people,
+                COALESCE(s.pending_guests, 0) as pending_guests,
+                COALESCE(s.confirmed_quantity, 0) as confirmed_quantity
             FROM events e
-            LEFT JOIN guests g ON e.id = g.event_id
-            LEFT JOIN gifts gift ON e.id = gift.event_id
+            -- מונים מוחזקים ב-event_rsvp_stats (מתעדכנים בכל כתיבה לאורחים)
+            LEFT JOIN event_rsvp_stats s ON s.event_id = e.id
+            LEFT JOIN (
+                SELECT event_id, COUNT(*) as total_gifts, SUM(amount) as total_gift_amount
+                FROM gifts
+                GROUP BY event_id
+            ) gift ON gift.event_id = e.id
             WHERE e.user_id = %s
-            GROUP BY e.id
             ORDER BY e.created_at DESC;
         """, (user_id,))
 
@@ -441,9 +419,11 @@ def get_user_events(user_id: int):
 
 
 @router.get("/events/{event_id}")
-def get_event(event_id: int):
+def get_event(event_id: int, include_invitation_data: bool = True):
     """
     מחזיר פרטי אירוע ספציפי
+    include_invitation_data=false - invitation_data מכיל רק את כתובות התמונה (בלי מצב העורך),
+    את המסמך המלא אפשר לטעון בנפרד מ-/events/{event_id}/invitation-data
     """
     conn = None
     cur = None
@@ -452,10 +432,11 @@ def get_event(event_id: int):
         conn = get_db_connection()
         cur = conn.cursor()
 
-        cur.execute("""
+        invitation_column = "e.invitation_data" if include_invitation_data else image_keys_sql()
+        cur.execute(f"""
             SELECT
                 e.id, e.user_id, e.package_purchase_id, e.event_type, e.event_title,
-                e.event_date, e.event_time, e.event_location, e.invitation_data, e.status, e.created_at,
+                e.event_date, e.event_time, e.event_location, {invitation_column}, e.status, e.created_at,
                 e.bit_payment_link, pp.package_name, pp.package_id, e.message_settings
             FROM events e
             LEFT JOIN package_purchases pp ON e.package_purchase_id = pp.id
@@ -502,6 +483,43 @@ def get_event(event_id: int):
             conn.close()
 
 
+@router.get("/events/{event_id}/invitation-data")
+def get_event_invitation_data(event_id: int):
+    """
+    מחזיר את invitation_data המלא של האירוע (מצב עורך ההזמנה)
+    """
+    conn = None
+    cur = None
+
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        cur.execute("SELECT invitation_data FROM events WHERE id = %s;", (event_id,))
+        row = cur.fetchone()
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="האירוע לא נמצא"
+            )
+
+        return {"event_id": event_id, "invitation_data": row[0]}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Get invitation data error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="שגיאה בשרת"
+        )
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
 @router.put("/events/{event_id}")
 def update_event(event_id: int, event: EventUpdate):
     """
@@ -574,6 +592,7 @@ def update_event(event_id: int, event: EventUpdate):
                 detail="האירוע לא נמצא"
             )
 
+        public_event_cache.invalidate(event_id, cur)
         conn.commit()
 
         # אם עודכן תאריך האירוע, נעדכן את ההודעות המתוזמנות
@@ -641,32 +660,23 @@ def update_message_settings(event_id: int, settings: MessageSettingsUpdate):
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # קריאה לנתונים הקיימים
-        cur.execute("""
-            SELECT message_settings FROM events WHERE id = %s
-        """, (event_id,))
-
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="האירוע לא נמצא"
-            )
-
-        # מיזוג ההגדרות החדשות עם הקיימות
-        current_settings = row[0] if row[0] else {}
+        # מיזוג ההגדרות החדשות עם הקיימות - בתוך ה-UPDATE, בלי לקרוא את ה-JSON קודם
         new_settings = {k: v for k, v in settings.dict().items() if v is not None}
-        merged_settings = {**current_settings, **new_settings}
-
-        # עדכון הנתונים
         cur.execute("""
             UPDATE events
-            SET message_settings = %s, updated_at = NOW()
+            SET message_settings = COALESCE(message_settings, '{}'::jsonb) || %s::jsonb, updated_at = NOW()
             WHERE id = %s
-            RETURNING id;
-        """, (json.dumps(merged_settings), event_id))
+            RETURNING id, message_settings;
+        """, (json.dumps(new_settings), event_id))
 
         result = cur.fetchone()
+        if not result:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="האירוע לא נמצא"
+            )
+        merged_settings = result[1]
+        public_event_cache.invalidate(event_id, cur)
         conn.commit()
 
         return {
@@ -771,6 +781,8 @@ def assign_package_to_event(event_id: int, package_purchase_id: int):
                 detail="האירוע לא נמצא"
             )
 
+        # שינוי חבילה משפיע על זמינות דף ה-RSVP הציבורי
+        public_event_cache.invalidate(event_id, cur)
         conn.commit()
 
         return {"message": "החבילה שוייכה לאירוע בהצלחה", "event_id": result[0]}
@@ -848,6 +860,7 @@ def create_guest(event_id: int, guest: GuestCreate):
         ))
 
         guest_id, created_at = cur.fetchone()
+        refresh_event_stats(cur, [event_id])
         conn.commit()
 
         return {
@@ -920,6 +933,7 @@ def create_guests_bulk(event_id: int, data: GuestBulkCreate):
                 "created_at": created_at.isoformat()
             })
 
+        refresh_event_stats(cur, [event_id])
         conn.commit()
 
         return {
@@ -1064,7 +1078,7 @@ def update_guest(guest_id: int, guest: GuestUpdate):
             UPDATE guests
             SET {', '.join(updates)}
             WHERE id = %s
-            RETURNING id;
+            RETURNING id, event_id;
         """
 
         cur.execute(query, params)
@@ -1076,6 +1090,7 @@ def update_guest(guest_id: int, guest: GuestUpdate):
                 detail="המוזמן לא נמצא"
             )
 
+        refresh_event_stats(cur, [result[1]])
         conn.commit()
 
         return {"message": "המוזמן עודכן בהצלחה", "id": result[0]}
@@ -1114,7 +1129,7 @@ def delete_guest(guest_id: int):
         cur.execute("""
             DELETE FROM guests
             WHERE id = %s
-            RETURNING id;
+            RETURNING id, event_id;
         """, (guest_id,))
 
         result = cur.fetchone()
@@ -1125,6 +1140,7 @@ def delete_guest(guest_id: int):
                 detail="המוזמן לא נמצא"
             )
 
+        refresh_event_stats(cur, [result[1]])
         conn.commit()
 
         return {"message": "המוזמן נמחק בהצלחה", "id": result[0]}
@@ -1167,6 +1183,7 @@ async def upload_guests_excel(event_id: int, file: UploadFile = File(...)):
     try:
         # קריאת הקובץ
         contents = await file.read()
+        import openpyxl  # נטען רק בהעלאת אקסל
         workbook = openpyxl.load_workbook(BytesIO(contents))
         sheet = workbook.active
 
@@ -1277,6 +1294,7 @@ async def upload_guests_excel(event_id: int, file: UploadFile = File(...)):
                     "error": str(e)
                 })
 
+        refresh_event_stats(cur, [event_id])
         conn.commit()
 
         return {
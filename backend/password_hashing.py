@@ -0,0 +1,112 @@
+"""
+bcrypt hashing on a dedicated, bounded process pool.
+
+bcrypt costs ~250ms of CPU per call at the default work factor. Running it inline
+ties up a Starlette threadpool slot (and the GIL) for the whole call, so a login
+burst starves every other sync endpoint. Here the CPU work runs in worker
+processes, and at most HASH_QUEUE_LIMIT calls may be in flight at once - beyond
+that callers get an immediate 503 with Retry-After instead of queueing, which
+caps how many request threads hashing can ever hold. Sync endpoints (auth.login)
+block a threadpool thread while they wait on the pool, and Starlette's threadpool
+has 40 threads, so the default limit stays well below that on any core count.
+
+Settings (env):
+- BCRYPT_ROUNDS       work factor for new hashes (stored hashes with a different
+                      factor are re-hashed on the next successful login)
+- HASH_POOL_SIZE      worker processes (default: CPU count)
+- HASH_QUEUE_LIMIT    max hashing calls in flight (default: 4 x pool size, at most 16)
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException, status
+
+from settings import settings
+
+BCRYPT_ROUNDS = settings.bcrypt_rounds
+HASH_POOL_SIZE = settings.hash_pool_size
+DEFAULT_QUEUE_LIMIT_CAP = 16  # leaves 24 of the 40 threadpool threads to other sync endpoints
+HASH_QUEUE_LIMIT = settings.hash_queue_limit or min(HASH_POOL_SIZE * 4, DEFAULT_QUEUE_LIMIT_CAP)
+RETRY_AFTER_SECONDS = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
+
+# --- Worker-side functions (run in the pool processes) ---
+
+def _hash(password: str, rounds: int) -> str:
+    import bcrypt
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    import bcrypt
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+# --- Pool management ---
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: the web process runs threads (LISTEN hub, job workers) - never fork it
+                _executor = ProcessPoolExecutor(
+                    max_workers=HASH_POOL_SIZE,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _executor
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="השרת עמוס כרגע, נסה שוב בעוד מספר שניות",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+
+def _submit(fn, *args):
+    """Submit to the pool if a slot is free, otherwise reject immediately (503)."""
+    if not _slots.acquire(blocking=False):
+        raise _busy()
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+# --- Public API ---
+
+def hash_password(password: str) -> str:
+    return _submit(_hash, password, BCRYPT_ROUNDS).result()
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _submit(_verify, plain_password, hashed_password).result()
+
+
+async def hash_password_async(password: str) -> str:
+    """For async handlers - awaits the pool without blocking the event loop."""
+    return await asyncio.wrap_future(_submit(_hash, password, BCRYPT_ROUNDS))
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.wrap_future(_submit(_verify, plain_password, hashed_password))
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True when a stored hash was made with a different work factor than BCRYPT_ROUNDS."""
+    try:
+        # $2b$12$<salt+hash>
+        return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
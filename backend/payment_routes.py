@@ -5,69 +5,34 @@ from fastapi import APIRouter, HTTPException, status, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional
+from collections import OrderedDict
+import asyncio
 import json
+import time
 import uuid
-import os
 
 from db import get_db_connection
 from tranzila_integration import tranzila
+from activity_log import log_activity, PACKAGE_PURCHASED
+from package_catalog import package_catalog
+from settings import settings
+from pg_events import hub, notify, POLL_TIMEOUT_SECONDS
+from fastapi.concurrency import run_in_threadpool
 
-# הגדרת מחירי חבילות - מכיוון שאין טבלת מחירים ב-DB
-PACKAGES_PRICING = {
-    1: {"name": "חבילת בסיס – ידני", "price": 39},  # מחיר קבוע
-    2: {  # SMS - לפי כמות רשומות
-        "name": "אוטומטי SMS",
-        "prices": {
-            "150 רשומות": 59,
-            "300 רשומות": 79,
-            "500 רשומות": 109,
-            "800 רשומות": 159,
-            "1,000 רשומות": 189,
-            "2,000 רשומות": 319
-        }
-    },
-    3: {  # WhatsApp - לפי כמות
-        "name": "אוטומטי WhatsApp",
-        "prices": {
-            "עד 50": 69,
-            "עד 100": 109,
-            "עד 150": 169,
-            "עד 200": 229,
-            "עד 300": 329,
-            "עד 400": 419,
-            "עד 500": 509,
-            "עד 600": 589,
-            "עד 700": 649,
-            "עד 800": 709
-        }
-    },
-    4: {  # הכל כלול
-        "name": "אוטומטי הכל כלול",
-        "prices": {
-            "עד 100": 239,
-            "עד 200": 469,
-            "עד 300": 679,
-            "עד 400": 869,
-            "עד 500": 1039,
-            "עד 600": 1189,
-            "עד 700": 1389,
-            "עד 800": 1589
-        }
-    },
-    5: {  # ראש שקט פלוס
-        "name": "אוטומטי \"ראש שקט פלוס\"",
-        "prices": {
-            "עד 100": 339,
-            "עד 200": 569,
-            "עד 300": 779,
-            "עד 400": 969,
-            "עד 500": 1139,
-            "עד 600": 1289,
-            "עד 700": 1489,
-            "עד 800": 1689
-        }
-    }
-}
+PAYMENT_CHANNEL = "payment_status"
+# זמן המתנה מקסימלי ל-long-poll של סטטוס תשלום
+PAYMENT_WAIT_MAX_SECONDS = 25
+
+# הזמנות שכבר הושלמו - callback חוזר מטרנזילה נענה בלי לגשת ל-DB
+_completed_orders: OrderedDict = OrderedDict()
+_MAX_COMPLETED_ORDERS = 5000
+
+
+def _remember_completed(order_id: str):
+    _completed_orders[order_id] = True
+    _completed_orders.move_to_end(order_id)
+    if len(_completed_orders) > _MAX_COMPLETED_ORDERS:
+        _completed_orders.popitem(last=False)
 
 router = APIRouter(
     prefix="/api/payments",
@@ -100,33 +65,29 @@ async def initiate_payment(payment: PaymentInitRequest):
     cur = None
 
     try:
-        # חישוב מחיר מתוך ההגדרות
-        package_config = PACKAGES_PRICING.get(payment.package_id)
+        # חישוב מחיר מתוך קטלוג החבילות
+        package = package_catalog.get(payment.package_id)
 
-        if not package_config:
+        if not package or (package.fixed_price is None and not package.price_tiers):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"חבילה {payment.package_id} לא נמצאה"
             )
 
         # חישוב המחיר
-        if "price" in package_config:
-            # חבילה עם מחיר קבוע
-            amount = package_config["price"]
-        elif "prices" in package_config and payment.guest_count:
-            # חבילה עם מחירים משתנים לפי כמות
-            amount = package_config["prices"].get(payment.guest_count)
-            if amount is None:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"כמות אורחים '{payment.guest_count}' לא תקינה לחבילה זו"
-                )
-        else:
+        if package.fixed_price is None and not payment.guest_count:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="חסרה כמות אורחים לחבילה זו"
             )
 
+        amount = package.price_for(payment.guest_count)
+        if amount is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"כמות אורחים '{payment.guest_count}' לא תקינה לחבילה זו"
+            )
+
         print(f"[Payment Init] Package {payment.package_id}, Guest Count: {payment.guest_count}, Amount: ₪{amount}")
 
         conn = get_db_connection()
@@ -160,8 +121,8 @@ async def initiate_payment(payment: PaymentInitRequest):
         conn.commit()
 
         # בניית URLs - הסרת לוכסן כפול
-        frontend_url = os.getenv("FRONTEND_URL", "https://savedayevents.com").rstrip('/')
-        backend_url = os.getenv("BACKEND_URL", "https://event-gift.onrender.com").rstrip('/')
+        frontend_url = settings.frontend_url
+        backend_url = settings.backend_url
 
         success_url = f"{frontend_url}/payment/success?order_id={order_id}&purchase_id={purchase_id}"
         fail_url = f"{frontend_url}/payment/failure?order_id={order_id}&purchase_id={purchase_id}"
@@ -257,41 +218,68 @@ async def payment_callback(request: Request):
                 detail="מזהה הזמנה חסר"
             )
 
+        # callback חוזר על הזמנה שכבר הושלמה - אין מה לעדכן
+        if order_id in _completed_orders:
+            return JSONResponse(content={
+                "status": "ok",
+                "message": "Callback already processed"
+            })
+
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # עדכון פרטי התשלום ב-DB
+        # עדכון פרטי התשלום ב-DB - רק אם הסטטוס באמת משתנה (callback עלול להגיע שוב)
         if payment_info["success"]:
             # תשלום הצליח - Response = "000" או "00"
             cur.execute("""
-                UPDATE package_purchases
-                SET
-                    payment_status = 'completed',
-                    payment_date = NOW(),
-                    tranzila_reference = %s,
-                    payment_response = %s,
-                    status = 'active'
-                WHERE tranzila_transaction_id = %s
-                RETURNING id;
+                WITH prev AS (
+                    SELECT id, payment_status
+                    FROM package_purchases
+                    WHERE tranzila_transaction_id = %s
+                    FOR UPDATE
+                ), upd AS (
+                    UPDATE package_purchases pp
+                    SET
+                        payment_status = 'completed',
+                        payment_date = NOW(),
+                        tranzila_reference = %s,
+                        payment_response = %s,
+                        status = 'active'
+                    FROM prev
+                    WHERE pp.id = prev.id AND prev.payment_status IS DISTINCT FROM 'completed'
+                    RETURNING pp.id, pp.user_id, pp.event_id, pp.package_name
+                )
+                SELECT prev.id, upd.id IS NOT NULL, upd.user_id, upd.event_id, upd.package_name
+                FROM prev LEFT JOIN upd ON upd.id = prev.id;
             """, (
+                order_id,
                 payment_info["transaction_id"],
-                json.dumps(payment_info["raw_data"]),
-                order_id
+                json.dumps(payment_info["raw_data"])
             ))
         else:
-            # תשלום נכשל
+            # תשלום נכשל - לא דורסים תשלום שכבר הושלם
             cur.execute("""
-                UPDATE package_purchases
-                SET
-                    payment_status = 'failed',
-                    payment_date = NOW(),
-                    payment_response = %s,
-                    status = 'failed'
-                WHERE tranzila_transaction_id = %s
-                RETURNING id;
+                WITH prev AS (
+                    SELECT id, payment_status
+                    FROM package_purchases
+                    WHERE tranzila_transaction_id = %s
+                    FOR UPDATE
+                ), upd AS (
+                    UPDATE package_purchases pp
+                    SET
+                        payment_status = 'failed',
+                        payment_date = NOW(),
+                        payment_response = %s,
+                        status = 'failed'
+                    FROM prev
+                    WHERE pp.id = prev.id AND prev.payment_status = 'pending'
+                    RETURNING pp.id
+                )
+                SELECT prev.id, upd.id IS NOT NULL
+                FROM prev LEFT JOIN upd ON upd.id = prev.id;
             """, (
-                json.dumps(payment_info["raw_data"]),
-                order_id
+                order_id,
+                json.dumps(payment_info["raw_data"])
             ))
 
         result = cur.fetchone()
@@ -302,7 +290,16 @@ async def payment_callback(request: Request):
                 detail="ההזמנה לא נמצאה"
             )
 
+        changed = result[1]
+        new_status = 'completed' if payment_info["success"] else 'failed'
+        if changed:
+            if payment_info["success"]:
+                log_activity(PACKAGE_PURCHASED, result[4], user_id=result[2], event_id=result[3], cur=cur)
+            notify(cur, PAYMENT_CHANNEL, {"order_id": order_id, "payment_status": new_status})
+
         conn.commit()
+        if payment_info["success"]:
+            _remember_completed(order_id)
 
         return JSONResponse(content={
             "status": "ok",
@@ -324,14 +321,9 @@ async def payment_callback(request: Request):
             conn.close()
 
 
-@router.get("/status/{order_id}")
-async def get_payment_status(order_id: str):
-    """
-    בדיקת סטטוס תשלום לפי מזהה הזמנה
-    """
+def _fetch_payment_status(order_id: str) -> Optional[dict]:
     conn = None
     cur = None
-
     try:
         conn = get_db_connection()
         cur = conn.cursor()
@@ -346,12 +338,8 @@ async def get_payment_status(order_id: str):
         """, (order_id,))
 
         row = cur.fetchone()
-
         if not row:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="התשלום לא נמצא"
-            )
+            return None
 
         return {
             "purchase_id": row[0],
@@ -366,6 +354,28 @@ async def get_payment_status(order_id: str):
             "order_id": order_id,
             "status": row[9]  # Adding the status field for frontend check
         }
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+@router.get("/status/{order_id}")
+async def get_payment_status(order_id: str):
+    """
+    בדיקת סטטוס תשלום לפי מזהה הזמנה
+    """
+    try:
+        payment = _fetch_payment_status(order_id)
+
+        if not payment:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="התשלום לא נמצא"
+            )
+
+        return payment
 
     except HTTPException:
         raise
@@ -375,11 +385,60 @@ async def get_payment_status(order_id: str):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="שגיאה בשליפת סטטוס התשלום"
         )
+
+
+@router.get("/status/{order_id}/wait")
+async def wait_for_payment_status(order_id: str, timeout: int = PAYMENT_WAIT_MAX_SECONDS):
+    """
+    Long-poll לסטטוס תשלום - מחזיר מיד אם התשלום כבר לא pending,
+    אחרת ממתין ל-NOTIFY מה-callback (עד timeout שניות) ומחזיר את הסטטוס העדכני.
+    הפרונט קורא שוב אם חזר pending.
+    """
+    timeout = max(1, min(timeout, PAYMENT_WAIT_MAX_SECONDS))
+    # The hub thread issues LISTEN up to POLL_TIMEOUT_SECONDS after subscribe(), so a
+    # callback committing in that gap sends no NOTIFY we'd see - the status is read
+    # again once LISTEN is surely active
+    queue = hub.subscribe(PAYMENT_CHANNEL)
+    try:
+        payment = await run_in_threadpool(_fetch_payment_status, order_id)
+        if not payment:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="התשלום לא נמצא"
+            )
+        if payment["payment_status"] != 'pending':
+            return payment
+
+        deadline = time.monotonic() + timeout
+        recheck_at = time.monotonic() + POLL_TIMEOUT_SECONDS * 2
+        while True:
+            now = time.monotonic()
+            remaining = deadline - now
+            if remaining <= 0:
+                return payment
+            wait = min(remaining, recheck_at - now) if recheck_at else remaining
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=max(wait, 0))
+            except asyncio.TimeoutError:
+                if recheck_at and time.monotonic() >= recheck_at:
+                    recheck_at = None
+                    payment = await run_in_threadpool(_fetch_payment_status, order_id) or payment
+                    if payment["payment_status"] != 'pending':
+                        return payment
+                continue
+            if event.get("order_id") == order_id:
+                return await run_in_threadpool(_fetch_payment_status, order_id)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Wait payment status error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="שגיאה בשליפת סטטוס התשלום"
+        )
     finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+        hub.unsubscribe(PAYMENT_CHANNEL, queue)
 
 
 @router.post("/confirm-success/{order_id}")
@@ -426,10 +485,13 @@ async def confirm_payment_success(order_id: str):
                 payment_date = NOW(),
                 status = 'active'
             WHERE tranzila_transaction_id = %s AND payment_status = 'pending'
-            RETURNING id;
+            RETURNING id, user_id, event_id, package_name;
         """, (order_id,))
 
         result = cur.fetchone()
+        if result:
+            log_activity(PACKAGE_PURCHASED, result[3], user_id=result[1], event_id=result[2], cur=cur)
+            notify(cur, PAYMENT_CHANNEL, {"order_id": order_id, "payment_status": "completed"})
         conn.commit()
 
         if result:
@@ -0,0 +1,136 @@
+"""
+Postgres LISTEN/NOTIFY hub.
+
+One daemon thread per process holds a single LISTEN connection and fans
+incoming notifications out to:
+- asyncio subscribers (SSE streams, long-polls) via subscribe()/unsubscribe()
+- plain callbacks (e.g. cache invalidation across workers) via add_callback()
+
+Writers publish with notify(cur, channel, payload) inside their own
+transaction, so the notification is delivered only after COMMIT.
+"""
+import asyncio
+import json
+import select
+import threading
+import time
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from db import get_db_connection
+
+# Max buffered notifications per subscriber before new ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+RECONNECT_DELAY_SECONDS = 5
+POLL_TIMEOUT_SECONDS = 1.0
+
+
+def notify(cur, channel: str, payload: Dict[str, Any]):
+    """Queue a NOTIFY on the caller's transaction (delivered on commit)."""
+    cur.execute("SELECT pg_notify(%s, %s)", (channel, json.dumps(payload, default=str)))
+
+
+def offer(queue: asyncio.Queue, item: Any):
+    """put_nowait that drops the item when a slow subscriber's queue is full (call on the queue's loop)."""
+    try:
+        queue.put_nowait(item)
+    except asyncio.QueueFull:
+        pass
+
+
+class PgNotificationHub:
+    """Single LISTEN connection shared by every subscriber in the process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels: Set[str] = set()
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._callbacks: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+        self._thread = None
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        """Subscribe the running event loop to a channel. Returns a queue of payload dicts."""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add((loop, queue))
+        self._listen(channel)
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, set())
+            for entry in [s for s in subscribers if s[1] is queue]:
+                subscribers.discard(entry)
+
+    def add_callback(self, channel: str, callback: Callable[[Dict[str, Any]], None]):
+        """Register a callback invoked (on the hub thread) for every notification on a channel."""
+        with self._lock:
+            self._callbacks.setdefault(channel, []).append(callback)
+        self._listen(channel)
+
+    def _listen(self, channel: str):
+        with self._lock:
+            self._channels.add(channel)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="pg-notify-hub", daemon=True)
+                self._thread.start()
+
+    def _dispatch(self, channel: str, raw_payload: str):
+        try:
+            payload = json.loads(raw_payload) if raw_payload else {}
+        except ValueError:
+            payload = {"raw": raw_payload}
+
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+            callbacks = list(self._callbacks.get(channel, ()))
+
+        for loop, queue in subscribers:
+            if loop.is_closed():
+                continue
+            loop.call_soon_threadsafe(offer, queue, payload)
+
+        for callback in callbacks:
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"⚠️ pg_events callback error on '{channel}': {e}")
+
+    def _run(self):
+        while True:
+            conn = None
+            try:
+                conn = get_db_connection()
+                conn.autocommit = True
+                cur = conn.cursor()
+                listening: Set[str] = set()
+
+                while True:
+                    # New channels are picked up within one poll timeout
+                    with self._lock:
+                        wanted = set(self._channels)
+                    for channel in wanted - listening:
+                        cur.execute(f'LISTEN "{channel}"')
+                        listening.add(channel)
+
+                    if select.select([conn], [], [], POLL_TIMEOUT_SECONDS) == ([], [], []):
+                        continue
+
+                    conn.poll()
+                    while conn.notifies:
+                        n = conn.notifies.pop(0)
+                        self._dispatch(n.channel, n.payload)
+
+            except Exception as e:
+                print(f"⚠️ pg_events listener error, reconnecting in {RECONNECT_DELAY_SECONDS}s: {e}")
+                time.sleep(RECONNECT_DELAY_SECONDS)
+            finally:
+                if conn:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+# Global instance
+hub = PgNotificationHub()
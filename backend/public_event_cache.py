@@ -0,0 +1,130 @@
+"""
+In-process cache for the public RSVP event payload (rsvp_router.get_public_event_details).
+
+Entries are keyed by event id and carry the event version (events.updated_at),
+which goes into the ETag together with a hash of the payload. Responses get
+Cache-Control headers so a CDN can serve them, and If-None-Match gets a 304.
+
+Writers that change what the public page shows call invalidate(event_id, cur)
+inside their transaction: the entry is dropped locally and a NOTIFY drops it
+in every other worker once the transaction commits. CACHE_TTL_SECONDS bounds
+staleness if a notification is ever missed (e.g. while the listener reconnects).
+
+Unknown event ids are cached too (as a 404 entry) for MISS_TTL_SECONDS, so probing
+ids does not cost a query per request. At MAX_ENTRIES the least recently used
+entry is evicted.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+
+from pg_events import hub, notify
+
+PUBLIC_EVENT_CHANNEL = "public_event_changed"
+CACHE_TTL_SECONDS = 300
+# Event creation doesn't invalidate, so a cached 404 must expire quickly
+MISS_TTL_SECONDS = 10
+# Kept short: the CDN can't be purged from here, only the in-process cache
+CDN_MAX_AGE_SECONDS = 30
+CDN_STALE_WHILE_REVALIDATE_SECONDS = 60
+MAX_ENTRIES = 5000
+
+
+class CachedPublicEvent:
+    __slots__ = ("event_id", "version", "status_code", "payload", "etag", "cached_at", "ttl")
+
+    def __init__(self, event_id: int, version: Any, status_code: int, payload: Dict[str, Any]):
+        self.event_id = event_id
+        self.version = version
+        self.status_code = status_code
+        self.payload = payload
+        body = json.dumps(payload, sort_keys=True, default=str).encode()
+        self.etag = f'"{event_id}-{hashlib.sha1(str(version).encode() + body).hexdigest()[:16]}"'
+        self.cached_at = time.monotonic()
+        self.ttl = MISS_TTL_SECONDS if status_code == 404 else CACHE_TTL_SECONDS
+
+
+_entries: "OrderedDict[int, CachedPublicEvent]" = OrderedDict()  # least recently used first
+_lock = threading.Lock()
+_build_locks: Dict[int, threading.Lock] = {}
+
+
+def get(event_id: int) -> Optional[CachedPublicEvent]:
+    with _lock:
+        entry = _entries.get(event_id)
+        if entry:
+            _entries.move_to_end(event_id)
+    if entry and time.monotonic() - entry.cached_at < entry.ttl:
+        return entry
+    return None
+
+
+def get_or_build(event_id: int, build: Callable[[int], CachedPublicEvent]) -> CachedPublicEvent:
+    """Cached entry, or build it - one build per event at a time (no stampede after a blast)."""
+    entry = get(event_id)
+    if entry:
+        return entry
+
+    with _lock:
+        build_lock = _build_locks.setdefault(event_id, threading.Lock())
+    try:
+        with build_lock:
+            entry = get(event_id)
+            if entry:
+                return entry
+            entry = build(event_id)
+            with _lock:
+                _entries[event_id] = entry
+                _entries.move_to_end(event_id)
+                while len(_entries) > MAX_ENTRIES:
+                    _entries.popitem(last=False)
+            return entry
+    finally:
+        # Also when build() raises - otherwise every failed event id leaks a lock
+        with _lock:
+            if _build_locks.get(event_id) is build_lock:
+                del _build_locks[event_id]
+
+
+def _drop(event_id: int):
+    with _lock:
+        _entries.pop(event_id, None)
+
+
+def invalidate(event_id: int, cur=None):
+    """Drop the cached payload here, and (via NOTIFY on cur's transaction) in all workers."""
+    _drop(event_id)
+    if cur is not None:
+        notify(cur, PUBLIC_EVENT_CHANNEL, {"event_id": event_id})
+
+
+def _on_change(payload: dict):
+    if payload.get("event_id") is not None:
+        _drop(int(payload["event_id"]))
+
+
+hub.add_callback(PUBLIC_EVENT_CHANNEL, _on_change)
+
+
+def respond(entry: CachedPublicEvent, request: Request) -> Response:
+    """JSON response with ETag / Cache-Control, or 304 when the client already has it."""
+    if entry.status_code != 200:
+        raise HTTPException(status_code=entry.status_code, detail=entry.payload.get("detail"))
+
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": (
+            f"public, max-age={CDN_MAX_AGE_SECONDS}, "
+            f"stale-while-revalidate={CDN_STALE_WHILE_REVALIDATE_SECONDS}"
+        ),
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and entry.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=entry.payload, headers=headers)
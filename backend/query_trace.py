@@ -0,0 +1,193 @@
+"""
+Per-request SQL tracer.
+
+Every statement run through an instrumented cursor (see metrics.InstrumentedConnection)
+is recorded for the current request: normalized text, duration and row count.
+At the end of the request the trace is grouped by statement shape:
+
+- a shape executed REPEAT_THRESHOLD+ times in one request is flagged as N+1
+- requests slower than SLOW_REQUEST_MS, or with an N+1 shape, are logged with the
+  per-shape breakdown through app_logging (category `slow_request`, written by the
+  queued writer thread - to SLOW_LOG_PATH as JSON lines when set)
+- an admin sending `X-Debug-Trace: 1` (with their admin bearer token) gets the
+  breakdown back in the `X-Query-Trace` response header, plus `Server-Timing`
+
+Elapsed time is taken at `http.response.start`, so a streamed body does not count
+against the request, and event streams (SSE) are not slow-logged at all - they stay
+open by design and poll the DB for as long as the client is connected.
+
+Statements are recorded as the parameterized template (`%s` placeholders), so the
+same query with different ids collapses into one shape without parsing SQL.
+"""
+import contextvars
+import json
+import re
+import time
+from typing import Dict, List, Optional
+
+from settings import settings
+
+TRACE_ENABLED = settings.query_trace_enabled
+SLOW_REQUEST_MS = settings.slow_request_ms
+REPEAT_THRESHOLD = settings.query_trace_repeat_threshold
+DEBUG_HEADER = "x-debug-trace"
+TRACE_HEADER = b"x-query-trace"
+MAX_STATEMENTS = 2000
+MAX_SHAPE_CHARS = 300
+MAX_HEADER_SHAPES = 15
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+
+
+def normalize(query) -> str:
+    """Collapse whitespace and inline literals so one query shape maps to one string"""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    elif not isinstance(query, str):
+        query = str(query)
+    shape = _WHITESPACE.sub(" ", query).strip()
+    shape = _STRING_LITERAL.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(...)", shape)
+    return shape[:MAX_SHAPE_CHARS]
+
+
+class RequestTrace:
+    __slots__ = ("statements", "dropped")
+
+    def __init__(self):
+        # (raw query, seconds, rowcount) - normalized only when the trace is reported
+        self.statements: List[tuple] = []
+        self.dropped = 0
+
+    def shapes(self) -> List[Dict]:
+        grouped: Dict[str, Dict] = {}
+        for query, seconds, rowcount in self.statements:
+            shape = normalize(query)
+            entry = grouped.get(shape)
+            if entry is None:
+                entry = grouped[shape] = {"sql": shape, "count": 0, "ms": 0.0, "rows": 0}
+            entry["count"] += 1
+            entry["ms"] += seconds * 1000
+            if rowcount and rowcount > 0:
+                entry["rows"] += rowcount
+        result = sorted(grouped.values(), key=lambda e: e["ms"], reverse=True)
+        for entry in result:
+            entry["ms"] = round(entry["ms"], 2)
+            entry["n_plus_one"] = entry["count"] >= REPEAT_THRESHOLD
+        return result
+
+    def summary(self, method: str, path: str, route: str, status: int, elapsed_ms: float) -> Dict:
+        shapes = self.shapes()
+        return {
+            "method": method,
+            "path": path,
+            "route": route,
+            "status": status,
+            "ms": round(elapsed_ms, 2),
+            "queries": len(self.statements) + self.dropped,
+            "db_ms": round(sum(s["ms"] for s in shapes), 2),
+            "n_plus_one": [s["sql"] for s in shapes if s["n_plus_one"]],
+            "shapes": shapes,
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar(
+    "query_trace", default=None)
+
+
+def record(query, seconds: float, rowcount: int):
+    """Called by the instrumented cursor for every statement"""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    if len(trace.statements) < MAX_STATEMENTS:
+        trace.statements.append((query, seconds, rowcount))
+    else:
+        trace.dropped += 1
+
+
+def _write_slow_log(summary: Dict):
+    # Imported here: app_logging imports metrics, which imports this module.
+    # The record is queued - formatting and the write happen on the writer thread
+    from app_logging import SLOW_LOG_CATEGORY, get_logger
+    get_logger(SLOW_LOG_CATEGORY).warning("🐢 slow request", **summary)
+
+
+def _is_admin_request(headers: Dict[bytes, bytes]) -> bool:
+    """Debug traces are for admins only - checks the admin JWT claims (no DB round-trip)"""
+    if headers.get(DEBUG_HEADER.encode()) not in (b"1", b"true"):
+        return False
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if not authorization.lower().startswith("bearer "):
+        return False
+    try:
+        from jose import jwt
+        from admin_auth import SECRET_KEY, ALGORITHM
+        payload = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM])
+        return bool(payload.get("is_admin"))
+    except Exception:
+        return False
+
+
+def _header_value(summary: Dict) -> bytes:
+    compact = dict(summary, shapes=summary["shapes"][:MAX_HEADER_SHAPES])
+    # Header values must be latin-1; escape the (Hebrew) rest
+    return json.dumps(compact, ensure_ascii=True, default=str).encode("latin-1")
+
+
+class QueryTraceMiddleware:
+    """Pure ASGI middleware that opens a RequestTrace for each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACE_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        headers = dict(scope.get("headers") or [])
+        debug = _is_admin_request(headers) if DEBUG_HEADER.encode() in headers else False
+        start = time.perf_counter()
+        status_holder = [500]
+        started_at: List[float] = []
+        streaming = [False]
+
+        def elapsed_ms() -> float:
+            end = started_at[0] if started_at else time.perf_counter()
+            return (end - start) * 1000
+
+        def build_summary():
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            return trace.summary(scope["method"], scope["path"], route, status_holder[0], elapsed_ms())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                started_at.append(time.perf_counter())
+                status_holder[0] = message["status"]
+                content_type = dict(message.get("headers") or []).get(b"content-type", b"")
+                streaming[0] = content_type.startswith(b"text/event-stream")
+                if debug:
+                    summary = build_summary()
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers") or []) + [
+                        (TRACE_HEADER, _header_value(summary)),
+                        (b"server-timing", f'db;dur={summary["db_ms"]};desc="{summary["queries"]} queries"'.encode()),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            elapsed = elapsed_ms()
+            if not streaming[0] and (elapsed >= SLOW_REQUEST_MS or len(trace.statements) >= REPEAT_THRESHOLD):
+                summary = build_summary()
+                if elapsed >= SLOW_REQUEST_MS or summary["n_plus_one"]:
+                    _write_slow_log(summary)
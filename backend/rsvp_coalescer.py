@@ -0,0 +1,229 @@
+"""
+Write-coalescing path for RSVP responses.
+
+After an invitation round hundreds of guests answer within minutes, and each
+answer used to be its own connection + UPDATE + COMMIT. Writers now hand their
+update to the coalescer and wait: a background thread collects everything that
+arrives within FLUSH_WINDOW_MS (or MAX_BATCH_SIZE updates) and applies it in a
+single transaction -
+  - one UPDATE guests ... FROM (VALUES ...) for the whole batch
+  - event_rsvp_stats recomputed for the touched events
+  - the RSVP_RECEIVED activity rows
+Callers are released only after COMMIT, so a success response means the answer
+is durable. If the flush fails every caller in the batch gets the exception.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional
+
+from psycopg2.extras import execute_values
+
+from activity_log import log_activities, RSVP_RECEIVED
+from db import get_db_connection
+from settings import settings
+
+FLUSH_WINDOW_MS = settings.rsvp_flush_window_ms
+MAX_BATCH_SIZE = settings.rsvp_max_batch_size
+
+
+def refresh_event_stats(cur, event_ids: Iterable[int]):
+    """
+    Recompute event_rsvp_stats rows for the given events (inside the caller's transaction).
+    Every path that inserts, updates or deletes guests calls this before committing.
+
+    The stats rows are locked (in event_id order) before counting: under READ COMMITTED
+    the count statement then starts after any concurrent writer of the same event has
+    committed, so a slower transaction can't write an older count over a newer one.
+    """
+    event_ids = sorted(set(event_ids))
+    if not event_ids:
+        return
+    cur.execute("""
+        INSERT INTO event_rsvp_stats (event_id)
+        SELECT id FROM events WHERE id = ANY(%s)
+        ORDER BY id
+        ON CONFLICT (event_id) DO NOTHING
+    """, (event_ids,))
+    cur.execute("""
+        SELECT event_id FROM event_rsvp_stats
+        WHERE event_id = ANY(%s)
+        ORDER BY event_id
+        FOR UPDATE
+    """, (event_ids,))
+    cur.execute("""
+        INSERT INTO event_rsvp_stats (
+            event_id, total_guests, confirmed_guests, declined_guests,
+            maybe_guests, pending_guests, confirmed_people,
+            total_people, confirmed_quantity, updated_at
+        )
+        SELECT
+            e.id,
+            COUNT(g.id),
+            COUNT(g.id) FILTER (WHERE g.attendance_status = 'confirmed'),
+            COUNT(g.id) FILTER (WHERE g.attendance_status = 'declined'),
+            COUNT(g.id) FILTER (WHERE g.attendance_status = 'maybe'),
+            COUNT(g.id) FILTER (WHERE g.attendance_status = 'pending' OR g.attendance_status IS NULL),
+            COALESCE(SUM(g.attending_count) FILTER (WHERE g.attendance_status = 'confirmed'), 0),
+            COALESCE(SUM(g.guests_count), 0),
+            COALESCE(SUM(g.guests_count) FILTER (WHERE g.attendance_status = 'confirmed'), 0),
+            NOW()
+        FROM events e
+        LEFT JOIN guests g ON g.event_id = e.id
+        WHERE e.id = ANY(%s)
+        GROUP BY e.id
+        ON CONFLICT (event_id) DO UPDATE SET
+            total_guests = EXCLUDED.total_guests,
+            confirmed_guests = EXCLUDED.confirmed_guests,
+            declined_guests = EXCLUDED.declined_guests,
+            maybe_guests = EXCLUDED.maybe_guests,
+            pending_guests = EXCLUDED.pending_guests,
+            confirmed_people = EXCLUDED.confirmed_people,
+            total_people = EXCLUDED.total_people,
+            confirmed_quantity = EXCLUDED.confirmed_quantity,
+            updated_at = EXCLUDED.updated_at
+    """, (event_ids,))
+
+
+class _PendingWrite:
+    __slots__ = ("guest_id", "status", "attending_count", "full_name", "future")
+
+    def __init__(self, guest_id: int, status: str, attending_count: Optional[int], full_name: Optional[str]):
+        self.guest_id = guest_id
+        self.status = status
+        self.attending_count = attending_count
+        self.full_name = full_name
+        self.future: Future = Future()
+
+
+class RSVPCoalescer:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending: List[_PendingWrite] = []
+        self._thread = None
+
+    def submit(self, guest_id: int, status: str, attending_count: Optional[int] = None,
+               full_name: Optional[str] = None) -> Future:
+        """
+        Queue an RSVP update. attending_count / full_name of None keep the current value.
+
+        The future resolves after commit to the updated guest as a dict
+        (id, event_id, name, phone, status, attending_count), or None if the guest doesn't exist.
+        """
+        write = _PendingWrite(guest_id, status, attending_count, full_name)
+        self._ensure_worker()
+        with self._cond:
+            self._pending.append(write)
+            if len(self._pending) == 1 or len(self._pending) >= MAX_BATCH_SIZE:
+                self._cond.notify()
+        return write.future
+
+    async def write(self, guest_id: int, status: str, attending_count: Optional[int] = None,
+                    full_name: Optional[str] = None) -> Optional[dict]:
+        """Async wrapper around submit() for route handlers."""
+        return await asyncio.wrap_future(self.submit(guest_id, status, attending_count, full_name))
+
+    def write_sync(self, guest_id: int, status: str, attending_count: Optional[int] = None,
+                   full_name: Optional[str] = None) -> Optional[dict]:
+        return self.submit(guest_id, status, attending_count, full_name).result()
+
+    # --- Background flusher ---
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._cond:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="rsvp-coalescer", daemon=True)
+                    self._thread.start()
+
+    def _take_batch(self) -> List[_PendingWrite]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # Let the window fill up, unless the batch is already full
+            deadline = time.monotonic() + FLUSH_WINDOW_MS / 1000
+            while len(self._pending) < MAX_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:MAX_BATCH_SIZE]
+            self._pending = self._pending[MAX_BATCH_SIZE:]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                results = self._flush(batch)
+            except Exception as e:
+                print(f"❌ RSVP flush failed ({len(batch)} updates): {e}")
+                for write in batch:
+                    write.future.set_exception(e)
+                continue
+            for write in batch:
+                write.future.set_result(results.get(write.guest_id))
+
+    def _flush(self, batch: List[_PendingWrite]) -> Dict[int, dict]:
+        # Several answers from the same guest in one window: the last one wins
+        latest: Dict[int, _PendingWrite] = {}
+        for write in batch:
+            latest[write.guest_id] = write
+
+        conn = None
+        cur = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            rows = execute_values(cur, """
+                UPDATE guests g
+                SET status = v.status,
+                    attendance_status = v.status,
+                    attending_count = COALESCE(v.attending_count, g.attending_count),
+                    guests_count = COALESCE(v.attending_count, g.guests_count),
+                    name = COALESCE(v.full_name, g.name),
+                    full_name = COALESCE(v.full_name, g.full_name),
+                    updated_at = NOW()
+                FROM (VALUES %s) AS v(guest_id, status, attending_count, full_name)
+                WHERE g.id = v.guest_id
+                RETURNING g.id, g.event_id, COALESCE(g.full_name, g.name), g.phone, g.status, g.attending_count
+            """, [(w.guest_id, w.status, w.attending_count, w.full_name)
+               for _, w in sorted(latest.items())],
+                template="(%s::int, %s::varchar, %s::int, %s::varchar)", page_size=MAX_BATCH_SIZE, fetch=True)
+
+            results = {
+                row[0]: {
+                    "id": row[0],
+                    "event_id": row[1],
+                    "name": row[2],
+                    "phone": row[3],
+                    "status": row[4],
+                    "attending_count": row[5]
+                }
+                for row in rows
+            }
+
+            refresh_event_stats(cur, (r["event_id"] for r in results.values()))
+            log_activities([
+                (RSVP_RECEIVED, f"{r['name'] or r['id']}: {r['status']}"
+                 + (f" ({r['attending_count']})" if r["status"] == "confirmed" else ""),
+                 None, r["event_id"])
+                for r in results.values()
+            ], cur)
+
+            conn.commit()
+            return results
+
+        except Exception:
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                conn.close()
+
+
+rsvp_coalescer = RSVPCoalescer()
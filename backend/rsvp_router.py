@@ -1,12 +1,18 @@
 """
 RSVP API Endpoints for handling guest responses
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional
 import hashlib
 import psycopg2
 from db import get_db_connection
+from activity_log import log_activity, RSVP_RECEIVED
+import public_event_cache
+from rsvp_coalescer import rsvp_coalescer, refresh_event_stats
+from package_catalog import package_catalog
+from invitation_images import source_image_url_sql
 
 router = APIRouter(prefix="/api/rsvp", tags=["RSVP"])
 
@@ -18,63 +24,59 @@ class PublicRSVPRegister(BaseModel):
     status: str = "confirmed"  # confirmed / declined
 
 
-@router.get("/event/{event_id}")
-async def get_public_event_details(event_id: int):
-    """Get event details for public RSVP registration page (manual package)"""
+def _build_public_event(event_id: int) -> public_event_cache.CachedPublicEvent:
+    """Load the event and derive the public payload (cacheable, incl. the 403 / 404 cases)"""
+    conn = get_db_connection()
+    cur = conn.cursor()
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute("""
+        cur.execute(f"""
             SELECT
                 e.id, e.event_name, e.event_title, e.event_date, e.event_time,
-                e.event_location, e.invitation_data, e.message_settings,
-                pp.package_name
+                e.event_location, {source_image_url_sql()}, e.message_settings->>'rsvp_custom_text',
+                pp.package_id, pp.package_name, e.updated_at
             FROM events e
             LEFT JOIN package_purchases pp ON e.package_purchase_id = pp.id
             WHERE e.id = %s
         """, (event_id,))
-
         row = cur.fetchone()
+    finally:
         cur.close()
         conn.close()
 
-        if not row:
-            raise HTTPException(status_code=404, detail="האירוע לא נמצא")
-
-        event_id, event_name, event_title, event_date, event_time, \
-            event_location, invitation_data, message_settings, package_name = row
-
-        # Verify this is a manual package
-        pkg = (package_name or "").lower()
-        if "ידני" not in pkg and "בסיס" not in pkg:
-            raise HTTPException(status_code=403, detail="קישור זה אינו זמין לחבילה זו")
-
-        # Extract invitation image URL
-        invitation_image_url = None
-        if invitation_data and isinstance(invitation_data, dict):
-            invitation_image_url = (
-                invitation_data.get('generated_image_url') or
-                invitation_data.get('image_url') or
-                invitation_data.get('imageUrl')
-            )
+    if not row:
+        # Cached briefly as well, so unknown ids don't hit the DB on every request
+        return public_event_cache.CachedPublicEvent(event_id, None, 404, {"detail": "האירוע לא נמצא"})
+
+    event_id, event_name, event_title, event_date, event_time, \
+        event_location, invitation_image_url, rsvp_custom_text, package_id, package_name, updated_at = row
+
+    # Verify this is a manual package
+    if not package_catalog.is_manual(package_id, package_name):
+        return public_event_cache.CachedPublicEvent(
+            event_id, updated_at, 403, {"detail": "קישור זה אינו זמין לחבילה זו"}
+        )
+
+    return public_event_cache.CachedPublicEvent(event_id, updated_at, 200, {
+        "event": {
+            "id": event_id,
+            "event_name": event_name or event_title,
+            "event_date": event_date.isoformat() if event_date else None,
+            "event_time": str(event_time) if event_time else None,
+            "event_location": event_location,
+            "invitation_image_url": invitation_image_url,
+            "rsvp_custom_text": rsvp_custom_text
+        }
+    })
 
-        # Get custom RSVP text
-        rsvp_custom_text = None
-        if message_settings and isinstance(message_settings, dict):
-            rsvp_custom_text = message_settings.get('rsvp_custom_text')
 
-        return {
-            "event": {
-                "id": event_id,
-                "event_name": event_name or event_title,
-                "event_date": event_date.isoformat() if event_date else None,
-                "event_time": str(event_time) if event_time else None,
-                "event_location": event_location,
-                "invitation_image_url": invitation_image_url,
-                "rsvp_custom_text": rsvp_custom_text
-            }
-        }
+@router.get("/event/{event_id}")
+async def get_public_event_details(event_id: int, request: Request):
+    """Get event details for public RSVP registration page (manual package)"""
+    try:
+        entry = public_event_cache.get(event_id)
+        if entry is None:
+            entry = await run_in_threadpool(public_event_cache.get_or_build, event_id, _build_public_event)
+        return public_event_cache.respond(entry, request)
 
     except HTTPException:
         raise
@@ -101,7 +103,7 @@ async def register_public_rsvp(event_id: int, data: PublicRSVPRegister):
 
         # Verify event exists and is manual package
         cur.execute("""
-            SELECT e.id, pp.package_name
+            SELECT e.id, pp.package_id, pp.package_name
             FROM events e
             LEFT JOIN package_purchases pp ON e.package_purchase_id = pp.id
             WHERE e.id = %s
@@ -113,9 +115,8 @@ async def register_public_rsvp(event_id: int, data: PublicRSVPRegister):
             conn.close()
             raise HTTPException(status_code=404, detail="האירוע לא נמצא")
 
-        _, package_name = row
-        pkg = (package_name or "").lower()
-        if "ידני" not in pkg and "בסיס" not in pkg:
+        _, package_id, package_name = row
+        if not package_catalog.is_manual(package_id, package_name):
             cur.close()
             conn.close()
             raise HTTPException(status_code=403, detail="קישור זה אינו זמין לחבילה זו")
@@ -127,24 +128,14 @@ async def register_public_rsvp(event_id: int, data: PublicRSVPRegister):
         """, (event_id, data.phone.strip()))
 
         existing = cur.fetchone()
+        attending_count = data.attending_count if data.status == 'confirmed' else 0
 
         if existing:
-            # Update existing guest
-            cur.execute("""
-                UPDATE guests
-                SET name = %s, full_name = %s, attendance_status = %s, status = %s,
-                    guests_count = %s, attending_count = %s, updated_at = NOW()
-                WHERE id = %s
-            """, (
-                data.full_name.strip(),
-                data.full_name.strip(),
-                data.status,
-                data.status,
-                data.attending_count if data.status == 'confirmed' else 0,
-                data.attending_count if data.status == 'confirmed' else 0,
-                existing[0]
-            ))
+            # Update existing guest - batched with other responses
+            cur.close()
+            conn.close()
             guest_id = existing[0]
+            await rsvp_coalescer.write(guest_id, data.status, attending_count, full_name=data.full_name.strip())
         else:
             # Insert new guest
             cur.execute("""
@@ -158,14 +149,17 @@ async def register_public_rsvp(event_id: int, data: PublicRSVPRegister):
                 data.phone.strip(),
                 data.status,
                 data.status,
-                data.attending_count if data.status == 'confirmed' else 0,
-                data.attending_count if data.status == 'confirmed' else 0
+                attending_count,
+                attending_count
             ))
             guest_id = cur.fetchone()[0]
 
-        conn.commit()
-        cur.close()
-        conn.close()
+            refresh_event_stats(cur, [event_id])
+            log_activity(RSVP_RECEIVED, f"{data.full_name.strip()}: {data.status}",
+                         event_id=event_id, cur=cur)
+            conn.commit()
+            cur.close()
+            conn.close()
 
         print(f"✅ Public RSVP registered for event {event_id}: {data.full_name}, {data.status}")
 
@@ -173,7 +167,7 @@ async def register_public_rsvp(event_id: int, data: PublicRSVPRegister):
             "success": True,
             "guest_id": guest_id,
             "status": data.status,
-            "attending_count": data.attending_count if data.status == 'confirmed' else 0
+            "attending_count": attending_count
         }
 
     except HTTPException:
@@ -202,10 +196,10 @@ async def get_rsvp_details(guest_id: int, token: str):
         cur = conn.cursor()
 
         # Get guest and event details including invitation image
-        cur.execute("""
+        cur.execute(f"""
             SELECT
                 g.id, g.name, g.phone, g.status, g.attending_count,
-                e.id, e.event_name, e.event_date, e.event_time, e.event_location, e.invitation_data
+                e.id, e.event_name, e.event_date, e.event_time, e.event_location, {source_image_url_sql()}
             FROM guests g
             JOIN events e ON g.event_id = e.id
             WHERE g.id = %s
@@ -218,16 +212,7 @@ async def get_rsvp_details(guest_id: int, token: str):
             raise HTTPException(status_code=404, detail="Guest not found")
 
         guest_id, guest_name, phone, status, attending_count, \
-            event_id, event_name, event_date, event_time, event_location, invitation_data = result
-
-        # Extract invitation image URL
-        invitation_image_url = None
-        if invitation_data and isinstance(invitation_data, dict):
-            invitation_image_url = (
-                invitation_data.get('generated_image_url') or
-                invitation_data.get('image_url') or
-                invitation_data.get('imageUrl')
-            )
+            event_id, event_name, event_date, event_time, event_location, invitation_image_url = result
 
         # Verify token
         if not verify_token(guest_id, phone or "", event_name or "", token):
@@ -300,21 +285,14 @@ async def submit_rsvp(guest_id: int, token: str, response: RSVPResponse):
         if response.status == 'confirmed' and response.attending_count <= 0:
             raise HTTPException(status_code=400, detail="Attending count must be greater than 0 for confirmed status")
 
-        # Update guest status and attending count
-        cur.execute("""
-            UPDATE guests
-            SET status = %s, attendance_status = %s,
-                attending_count = %s, guests_count = %s,
-                updated_at = NOW()
-            WHERE id = %s
-        """, (response.status, response.status,
-              response.attending_count, response.attending_count,
-              guest_id))
-
-        conn.commit()
         cur.close()
         conn.close()
 
+        # Update guest status and attending count - batched with other responses
+        updated = await rsvp_coalescer.write(guest_id, response.status, response.attending_count)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Guest not found")
+
         print(f"✅ RSVP updated for guest {guest_id}: {response.status}, {response.attending_count} attendees")
 
         return {
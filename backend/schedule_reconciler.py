@@ -0,0 +1,206 @@
+"""
+Schedule reconciler - brings scheduled_messages in line with the events' schedules.
+
+The desired rounds of an event are computed in Python (days_before, pushed off
+Shabbat/holidays, past dates dropped) and applied with a single statement that
+diffs them against the existing rows:
+- pending rows that are no longer wanted are deleted
+- pending rows whose date changed are moved (same id, so nothing keyed on it breaks)
+- missing rounds are inserted
+Rows that were already processed (completed / failed / ...) are never touched, and
+unchanged rows are not written at all.
+
+Many events are reconciled per statement (BATCH_SIZE), so a holiday-calendar change
+can be applied to every upcoming event at once:
+    python schedule_reconciler.py --dry-run
+    python schedule_reconciler.py --event-id 12 --event-id 13
+"""
+import argparse
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from db import get_db_connection
+
+DEFAULT_MESSAGE_SCHEDULE = {"schedule_type": "default", "days_before": [21, 14, 7]}
+BATCH_SIZE = 500
+
+# A plan is (event_id, [(message_number, scheduled_date, days_before), ...])
+Round = Tuple[int, date, int]
+
+_RECONCILE_SQL = """
+    WITH desired AS (
+        SELECT *
+        FROM unnest(%(event_ids)s::int[], %(numbers)s::int[], %(dates)s::date[])
+            AS d (event_id, message_number, scheduled_date)
+    ),
+    removed AS (
+        DELETE FROM scheduled_messages sm
+        WHERE %(prune)s
+          AND sm.event_id = ANY(%(scope)s::int[])
+          AND sm.status = 'pending'
+          AND NOT EXISTS (
+              SELECT 1 FROM desired d
+              WHERE d.event_id = sm.event_id AND d.message_number = sm.message_number
+          )
+        RETURNING sm.id, sm.event_id, sm.message_number, sm.scheduled_date
+    ),
+    moved AS (
+        UPDATE scheduled_messages sm
+        SET scheduled_date = d.scheduled_date, updated_at = NOW()
+        FROM desired d
+        WHERE %(prune)s
+          AND sm.event_id = d.event_id
+          AND sm.message_number = d.message_number
+          AND sm.status = 'pending'
+          AND sm.scheduled_date <> d.scheduled_date
+        RETURNING sm.id, sm.event_id, sm.message_number, sm.scheduled_date
+    ),
+    added AS (
+        INSERT INTO scheduled_messages (event_id, message_number, scheduled_date, status)
+        SELECT d.event_id, d.message_number, d.scheduled_date, 'pending'
+        FROM desired d
+        WHERE NOT EXISTS (
+            SELECT 1 FROM scheduled_messages sm
+            WHERE sm.event_id = d.event_id AND sm.message_number = d.message_number
+        )
+        ON CONFLICT (event_id, message_number) DO NOTHING
+        RETURNING id, event_id, message_number, scheduled_date
+    )
+    SELECT 'added', id, event_id, message_number, scheduled_date FROM added
+    UNION ALL
+    SELECT 'moved', id, event_id, message_number, scheduled_date FROM moved
+    UNION ALL
+    SELECT 'removed', id, event_id, message_number, scheduled_date FROM removed
+"""
+
+
+def desired_rounds(event_date: date, message_schedule: Optional[dict], today: Optional[date] = None) -> List[Round]:
+    """Rounds an event should have: (message_number, send date, days_before), past dates dropped"""
+    from scheduler_service import get_next_valid_send_date
+
+    today = today or date.today()
+    days_before = (message_schedule or DEFAULT_MESSAGE_SCHEDULE).get('days_before', [21, 14, 7])
+    rounds = []
+    for number, days in enumerate(days_before, start=1):
+        # If it falls on Shabbat/holiday, push to the next valid day
+        scheduled_date = get_next_valid_send_date(event_date - timedelta(days=days))
+        if scheduled_date >= today:
+            rounds.append((number, scheduled_date, days))
+    return rounds
+
+
+def apply_plans(cur, plans: Iterable[Tuple[int, List[Round]]], prune: bool = True) -> List[dict]:
+    """
+    Diff and apply the plans with one statement on `cur` (caller commits).
+    prune=False only inserts missing rounds (existing rows, pending or not, are kept as they are).
+    Returns the changed rows: {'action': added|moved|removed, 'id', 'event_id', 'message_number', 'scheduled_date'}.
+    """
+    scope, event_ids, numbers, dates = [], [], [], []
+    for event_id, rounds in plans:
+        scope.append(event_id)
+        for number, scheduled_date, _ in rounds:
+            event_ids.append(event_id)
+            numbers.append(number)
+            dates.append(scheduled_date)
+    if not scope:
+        return []
+
+    cur.execute(_RECONCILE_SQL, {
+        'event_ids': event_ids, 'numbers': numbers, 'dates': dates, 'scope': scope, 'prune': prune,
+    })
+    return [
+        {'action': action, 'id': row_id, 'event_id': event_id, 'message_number': number, 'scheduled_date': sched}
+        for action, row_id, event_id, number, sched in cur.fetchall()
+    ]
+
+
+def summarize(changes: List[dict]) -> Dict[str, int]:
+    summary = {'added': 0, 'moved': 0, 'removed': 0}
+    for change in changes:
+        summary[change['action']] += 1
+    return summary
+
+
+def _load_events(cur, event_ids: Optional[List[int]]):
+    """Events to reconcile in batch mode: the given ones, or every upcoming active event with a schedule"""
+    if event_ids:
+        cur.execute("""
+            SELECT id, event_date, message_schedule FROM events
+            WHERE id = ANY(%s) AND event_date IS NOT NULL
+            ORDER BY id
+        """, (list(event_ids),))
+    else:
+        # Only events that were scheduled before - reconciling must not start sending for others
+        cur.execute("""
+            SELECT e.id, e.event_date, e.message_schedule FROM events e
+            WHERE e.status = 'active'
+              AND e.event_date >= CURRENT_DATE
+              AND EXISTS (SELECT 1 FROM scheduled_messages sm WHERE sm.event_id = e.id)
+            ORDER BY e.id
+        """)
+    return cur.fetchall()
+
+
+def reconcile_events(event_ids: Optional[List[int]] = None, dry_run: bool = False) -> dict:
+    """
+    Batch mode: recompute and apply the schedules of many events, BATCH_SIZE events per statement.
+    dry_run applies inside the transaction and rolls back, so the counts are exact.
+    """
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        events = _load_events(cur, event_ids)
+        today = date.today()
+
+        changes = []
+        for start in range(0, len(events), BATCH_SIZE):
+            batch = events[start:start + BATCH_SIZE]
+            plans = [
+                (event_id, desired_rounds(event_date, message_schedule, today))
+                for event_id, event_date, message_schedule in batch
+            ]
+            changes.extend(apply_plans(cur, plans))
+            if not dry_run:
+                conn.commit()
+
+        if dry_run:
+            conn.rollback()
+
+        summary = summarize(changes)
+        print(f"{'🧪 [dry run] ' if dry_run else ''}Reconciled schedules of {len(events)} event(s): "
+              f"{summary['added']} added, {summary['moved']} moved, {summary['removed']} removed")
+        return {
+            'events': len(events),
+            'dry_run': dry_run,
+            **summary,
+            'changes': [{**c, 'scheduled_date': c['scheduled_date'].isoformat()} for c in changes],
+        }
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Error reconciling schedules: {e}")
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile scheduled_messages with the events' schedules")
+    parser.add_argument("--event-id", type=int, action="append", help="only these events (default: all upcoming)")
+    parser.add_argument("--dry-run", action="store_true", help="report the changes without applying them")
+    args = parser.parse_args()
+
+    result = reconcile_events(args.event_id, dry_run=args.dry_run)
+    for change in result['changes']:
+        print(f"  {change['action']:<8} event {change['event_id']} message {change['message_number']} "
+              f"-> {change['scheduled_date']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,14 @@ Endpoints:
 2. POST /api/scheduler/create-schedules/{event_id} - Create schedules for an event
 3. GET /api/scheduler/event/{event_id} - Get scheduled messages for an event
 4. GET /api/scheduler/pending - Get all pending scheduled messages
+5. POST /api/scheduler/reconcile - Re-apply the schedules of many events (e.g. after a holiday-calendar change)
 """
 
 from fastapi import APIRouter, HTTPException, Header, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date, datetime
-import os
 import json
 
 from scheduler_service import (
@@ -21,12 +22,14 @@ from scheduler_service import (
     get_messages_to_send_today,
     update_event_schedules_on_date_change
 )
+from schedule_reconciler import reconcile_events
 from db import get_db_connection
+from settings import settings
 
 router = APIRouter(prefix="/api/scheduler", tags=["Scheduler"])
 
 # Secret key for cron job authentication (set in environment)
-CRON_SECRET = os.getenv('CRON_SECRET', 'your-secret-key-change-in-production')
+CRON_SECRET = settings.cron_secret
 
 
 class CreateScheduleRequest(BaseModel):
@@ -34,6 +37,11 @@ class CreateScheduleRequest(BaseModel):
     message_schedule: Optional[dict] = None
 
 
+class ReconcileRequest(BaseModel):
+    event_ids: Optional[List[int]] = None  # default: every upcoming event that has a schedule
+    dry_run: bool = False
+
+
 @router.post("/process")
 async def process_scheduled_messages(
     background_tasks: BackgroundTasks,
@@ -96,7 +104,7 @@ async def create_schedules_for_event(event_id: int, request: CreateScheduleReque
 async def update_schedules_for_event(event_id: int, request: CreateScheduleRequest):
     """
     Update scheduled messages when event date changes.
-    Deletes pending messages and creates new ones.
+    Diffs the pending messages against the new schedule (delete / move / add).
     """
     try:
         event_date = datetime.fromisoformat(request.event_date).date()
@@ -111,7 +119,8 @@ async def update_schedules_for_event(event_id: int, request: CreateScheduleReque
             "success": True,
             "event_id": event_id,
             "deleted": result['deleted'],
-            "created": result['created']
+            "created": result['created'],
+            "moved": result['moved']
         }
 
     except ValueError as e:
@@ -121,6 +130,27 @@ async def update_schedules_for_event(event_id: int, request: CreateScheduleReque
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/reconcile")
+async def reconcile_schedules(
+    request: Optional[ReconcileRequest] = None,
+    x_cron_secret: Optional[str] = Header(None, alias="X-Cron-Secret")
+):
+    """
+    Batch reconcile: recompute the schedules of many events and apply the diff.
+    Use dry_run to see what would change first.
+    """
+    if x_cron_secret != CRON_SECRET:
+        raise HTTPException(status_code=401, detail="Invalid cron secret")
+
+    request = request or ReconcileRequest()
+    try:
+        result = await run_in_threadpool(reconcile_events, request.event_ids, request.dry_run)
+        return {"success": True, **result}
+    except Exception as e:
+        print(f"Error reconciling schedules: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/event/{event_id}")
 async def get_event_schedules(event_id: int):
     """Get all scheduled messages for an event"""
@@ -185,9 +215,11 @@ async def get_pending_schedules():
 @router.get("/health")
 async def scheduler_health():
     """Health check for scheduler service"""
+    from outbound_resilience import breaker_states
     return {
         "status": "healthy",
         "service": "scheduler",
+        "provider_circuits": breaker_states(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -8,19 +8,29 @@ This service handles:
 """
 
 from datetime import datetime, date, timedelta
+from functools import lru_cache
 from typing import Optional, List, Dict, Any
 import json
 import time
 import psycopg2
-from db import get_db_connection
-from whatsapp_interactive import whatsapp_service, DEFAULT_INVITATION_IMAGE
+from db import get_db_connection, json_keys_sql
+from whatsapp_interactive import whatsapp_service
 from sms_service import sms_service
-import hashlib
+from activity_log import log_activity, MESSAGES_SENT
+from package_catalog import package_catalog, SEND_METHOD_SMS
+from metrics import observe_scheduler_run
+from app_logging import get_logger
+from event_render_context import EventRenderContext
+from invitation_images import image_keys_sql
+from message_retry_queue import enqueue_retries, KIND_INVITATION, KIND_REMINDER, KIND_SMS
+
+log = get_logger("scheduler")
 
 
 # Israeli holidays (fixed dates in Hebrew calendar, mapped to Gregorian for relevant years)
 # We check dynamically using a helper function
-def get_israeli_holidays(year: int) -> set:
+@lru_cache(maxsize=None)
+def get_israeli_holidays(year: int) -> frozenset:
     """
     Get set of Israeli holiday dates for a given year.
     Includes Shabbat (Friday sunset to Saturday sunset) and major Jewish holidays.
@@ -65,7 +75,8 @@ def get_israeli_holidays(year: int) -> set:
             date(2027, 10, 23), date(2027, 10, 24),# שמחת תורה
         ])
 
-    return holidays
+    # Cached per year - reconciling many events checks the same days over and over
+    return frozenset(holidays)
 
 
 def is_shabbat_or_holiday(check_date: date) -> bool:
@@ -120,6 +131,7 @@ def format_israeli_phone(phone: str) -> str:
 def create_scheduled_messages_for_event(event_id: int, event_date: date, message_schedule: dict) -> List[dict]:
     """
     Create scheduled message entries for an event based on its message_schedule.
+    Rounds that already exist are left alone (see schedule_reconciler for moving them).
 
     Args:
         event_id: The event ID
@@ -129,57 +141,30 @@ def create_scheduled_messages_for_event(event_id: int, event_date: date, message
     Returns:
         List of created scheduled message records
     """
+    from schedule_reconciler import desired_rounds, apply_plans
+
     conn = None
     cur = None
-    created_messages = []
 
     try:
         conn = get_db_connection()
         cur = conn.cursor()
 
-        days_before = message_schedule.get('days_before', [21, 14, 7])
-
-        for idx, days in enumerate(days_before, start=1):
-            scheduled_date = event_date - timedelta(days=days)
-
-            # If falls on Shabbat/holiday, push to next valid day
-            scheduled_date = get_next_valid_send_date(scheduled_date)
-
-            # Skip if scheduled date is in the past
-            if scheduled_date < date.today():
-                print(f"Skipping message {idx} for event {event_id} - scheduled date {scheduled_date} is in the past")
-                continue
-
-            # Check if already exists
-            cur.execute("""
-                SELECT id FROM scheduled_messages
-                WHERE event_id = %s AND message_number = %s
-            """, (event_id, idx))
-
-            existing = cur.fetchone()
-            if existing:
-                print(f"Message {idx} for event {event_id} already scheduled")
-                continue
-
-            # Create new scheduled message
-            cur.execute("""
-                INSERT INTO scheduled_messages (event_id, message_number, scheduled_date, status)
-                VALUES (%s, %s, %s, 'pending')
-                RETURNING id, scheduled_date;
-            """, (event_id, idx, scheduled_date))
-
-            msg_id, sched_date = cur.fetchone()
-            created_messages.append({
-                'id': msg_id,
-                'event_id': event_id,
-                'message_number': idx,
-                'scheduled_date': sched_date.isoformat(),
-                'days_before': days
-            })
+        rounds = desired_rounds(event_date, message_schedule)
+        days_by_number = {number: days for number, _, days in rounds}
+        # One INSERT for all rounds - missing ones only
+        added = apply_plans(cur, [(event_id, rounds)], prune=False)
+        conn.commit()
 
-            print(f"Created scheduled message {idx} for event {event_id}: {days} days before ({scheduled_date})")
+        created_messages = [{
+            'id': row['id'],
+            'event_id': event_id,
+            'message_number': row['message_number'],
+            'scheduled_date': row['scheduled_date'].isoformat(),
+            'days_before': days_by_number[row['message_number']]
+        } for row in sorted(added, key=lambda row: row['message_number'])]
 
-        conn.commit()
+        print(f"Created {len(created_messages)} of {len(rounds)} upcoming scheduled message(s) for event {event_id}")
         return created_messages
 
     except Exception as e:
@@ -210,11 +195,12 @@ def get_messages_to_send_today() -> List[dict]:
 
         today = date.today()
 
-        cur.execute("""
+        # Only the image keys of invitation_data are needed to render the round
+        cur.execute(f"""
             SELECT
                 sm.id, sm.event_id, sm.message_number, sm.scheduled_date,
                 e.event_title, e.event_date, e.event_time, e.event_location,
-                e.invitation_data, pp.package_id
+                {image_keys_sql()}, pp.package_id
             FROM scheduled_messages sm
             JOIN events e ON sm.event_id = e.id
             LEFT JOIN package_purchases pp ON e.package_purchase_id = pp.id
@@ -307,47 +293,38 @@ def get_guests_for_event(event_id: int, exclude_responded: bool = False) -> List
             conn.close()
 
 
-def send_whatsapp_invitation(guest: dict, event_data: dict) -> dict:
-    """Send WhatsApp invitation to a guest"""
+def _send_result(guest: dict, phone: str, result: dict) -> dict:
+    return {
+        'success': result.get('success', False),
+        'guest_id': guest['id'],
+        'guest_name': guest['name'],
+        'phone': phone,
+        'error': result.get('error') if not result.get('success') else None,
+        'retryable': result.get('retryable', False),
+        'circuit_open': result.get('circuit_open', False)
+    }
+
+
+def _send_error(guest: dict, error: Exception) -> dict:
+    return {
+        'success': False,
+        'guest_id': guest['id'],
+        'guest_name': guest['name'],
+        'phone': guest['phone'],
+        'error': str(error)
+    }
+
+
+def send_whatsapp_invitation(guest: dict, ctx: EventRenderContext) -> dict:
+    """Send WhatsApp invitation to a guest (ctx is built once per round)"""
     try:
         formatted_phone = format_israeli_phone(guest['phone'])
 
-        # Format date and time
-        event_date = event_data['event_date']
-        if isinstance(event_date, date):
-            formatted_date = event_date.strftime('%d/%m/%Y')
-        else:
-            formatted_date = str(event_date)
-
-        event_time = event_data.get('event_time')
-        if event_time:
-            if hasattr(event_time, 'strftime'):
-                formatted_time = event_time.strftime('%H:%M')
-            else:
-                formatted_time = str(event_time)
-        else:
-            formatted_time = '18:00'
-
-        # Get image URL from invitation_data
-        invitation_data = event_data.get('invitation_data')
-        image_url = None
-        if invitation_data and isinstance(invitation_data, dict):
-            image_url = (
-                invitation_data.get('generated_image_url') or
-                invitation_data.get('image_url') or
-                invitation_data.get('imageUrl')
-            )
-        if not image_url:
-            image_url = DEFAULT_INVITATION_IMAGE
-
-        result = whatsapp_service.send_event_invitation_template(
+        result = whatsapp_service.send_prepared_template(
             destination=formatted_phone,
-            guest_name=guest['name'],
-            event_name=event_data['event_title'],
-            event_date=formatted_date,
-            event_time=formatted_time,
-            event_location=event_data.get('event_location') or "יודיע בהמשך",
-            image_url=image_url
+            template_json=ctx.template_json(guest['name']),
+            message_json=ctx.message_json,
+            template_name=ctx.template_name
         )
 
         if result.get('success'):
@@ -359,60 +336,37 @@ def send_whatsapp_invitation(guest: dict, event_data: dict) -> dict:
                     INSERT INTO whatsapp_sessions (phone, event_id, guest_id, updated_at)
                     VALUES (%s, %s, %s, NOW())
                     ON CONFLICT (phone) DO UPDATE SET event_id = EXCLUDED.event_id, guest_id = EXCLUDED.guest_id, updated_at = NOW()
-                """, (formatted_phone, event_data['event_id'], guest['id']))
+                """, (formatted_phone, ctx.event_id, guest['id']))
                 if gs_id:
                     cur.execute("""
                         INSERT INTO whatsapp_message_events (gs_id, event_id, guest_id)
                         VALUES (%s, %s, %s)
                         ON CONFLICT (gs_id) DO NOTHING
-                    """, (gs_id, event_data['event_id'], guest['id']))
-                    print(f"💾 Saved message event: gs_id={gs_id} -> event_id={event_data['event_id']}, guest_id={guest['id']}")
+                    """, (gs_id, ctx.event_id, guest['id']))
+                    log.debug("💾 Saved message event", gs_id=gs_id, event_id=ctx.event_id, guest_id=guest['id'])
                 conn.commit()
                 cur.close()
                 conn.close()
-                print(f"💾 Saved WhatsApp session: phone={formatted_phone} -> event_id={event_data['event_id']}, guest_id={guest['id']}")
+                log.debug("💾 Saved WhatsApp session", phone=formatted_phone, event_id=ctx.event_id, guest_id=guest['id'])
             except Exception as se:
-                print(f"⚠️ Failed to save WhatsApp session: {se}")
+                log.warning("⚠️ Failed to save WhatsApp session", guest_id=guest['id'], error=str(se))
 
-        return {
-            'success': result.get('success', False),
-            'guest_id': guest['id'],
-            'guest_name': guest['name'],
-            'phone': formatted_phone,
-            'error': result.get('error') if not result.get('success') else None
-        }
+        return _send_result(guest, formatted_phone, result)
 
     except Exception as e:
-        return {
-            'success': False,
-            'guest_id': guest['id'],
-            'guest_name': guest['name'],
-            'phone': guest['phone'],
-            'error': str(e)
-        }
+        return _send_error(guest, e)
 
 
-def send_whatsapp_reminder(guest: dict, event_data: dict) -> dict:
-    """Send WhatsApp reminder to a guest (uses reminder template)"""
+def send_whatsapp_reminder(guest: dict, ctx: EventRenderContext) -> dict:
+    """Send WhatsApp reminder to a guest (uses reminder template; ctx is built once per round)"""
     try:
         formatted_phone = format_israeli_phone(guest['phone'])
 
-        # Get image URL from invitation_data
-        invitation_data = event_data.get('invitation_data')
-        image_url = None
-        if invitation_data and isinstance(invitation_data, dict):
-            image_url = (
-                invitation_data.get('generated_image_url') or
-                invitation_data.get('image_url') or
-                invitation_data.get('imageUrl')
-            )
-        if not image_url:
-            image_url = DEFAULT_INVITATION_IMAGE
-
-        result = whatsapp_service.send_event_reminder_template(
+        result = whatsapp_service.send_prepared_template(
             destination=formatted_phone,
-            event_name=event_data['event_title'],
-            image_url=image_url
+            template_json=ctx.template_json(guest['name']),
+            message_json=ctx.message_json,
+            template_name=ctx.template_name
         )
 
         if result.get('success'):
@@ -425,69 +379,40 @@ def send_whatsapp_reminder(guest: dict, event_data: dict) -> dict:
                         INSERT INTO whatsapp_message_events (gs_id, event_id, guest_id)
                         VALUES (%s, %s, %s)
                         ON CONFLICT (gs_id) DO NOTHING
-                    """, (gs_id, event_data['event_id'], guest['id']))
+                    """, (gs_id, ctx.event_id, guest['id']))
                     conn.commit()
                     cur.close()
                     conn.close()
-                    print(f"💾 Saved reminder message event: gs_id={gs_id} -> event_id={event_data['event_id']}, guest_id={guest['id']}")
+                    log.debug("💾 Saved reminder message event", gs_id=gs_id, event_id=ctx.event_id, guest_id=guest['id'])
                 except Exception as se:
-                    print(f"⚠️ Failed to save reminder message event: {se}")
+                    log.warning("⚠️ Failed to save reminder message event", guest_id=guest['id'], error=str(se))
 
-        return {
-            'success': result.get('success', False),
-            'guest_id': guest['id'],
-            'guest_name': guest['name'],
-            'phone': formatted_phone,
-            'error': result.get('error') if not result.get('success') else None
-        }
+        return _send_result(guest, formatted_phone, result)
 
     except Exception as e:
-        return {
-            'success': False,
-            'guest_id': guest['id'],
-            'guest_name': guest['name'],
-            'phone': guest['phone'],
-            'error': str(e)
-        }
+        return _send_error(guest, e)
 
 
-def send_sms_invitation(guest: dict, event_data: dict) -> dict:
-    """Send SMS invitation to a guest"""
+def send_sms_invitation(guest: dict, ctx: EventRenderContext) -> dict:
+    """Send SMS invitation with the guest's RSVP link (ctx is built once per round)"""
     try:
-        # Generate RSVP link
-        token = hashlib.sha256(
-            f"{guest['id']}-{guest['phone']}-{event_data['event_title']}".encode()
-        ).hexdigest()[:16]
-        rsvp_link = f"https://savedayevents.com/rsvp/{guest['id']}?token={token}"
-
-        result = sms_service.send_event_invitation_sms(
+        result = sms_service.send_template_sms(
             destination=guest['phone'],
-            event_name=event_data['event_title'],
-            rsvp_link=rsvp_link
+            message_text=ctx.sms_text(guest['id'], guest['phone'])
         )
-
-        return {
-            'success': result.get('success', False),
-            'guest_id': guest['id'],
-            'guest_name': guest['name'],
-            'phone': guest['phone'],
-            'error': result.get('error') if not result.get('success') else None
-        }
+        return _send_result(guest, guest['phone'], result)
 
     except Exception as e:
-        return {
-            'success': False,
-            'guest_id': guest['id'],
-            'guest_name': guest['name'],
-            'phone': guest['phone'],
-            'error': str(e)
-        }
+        return _send_error(guest, e)
 
 
 DEFAULT_DAY_OF_EVENT_SMS = "אורחים יקרים,\n\nנרגשים להזכיר כי היום נחגוג יחד את החתונה של X!\n\nלנוחיותכם,\nמספר השולחן שלכם הוא: {table_number}\n\nקישור וויז להגעה לאירוע: {waze_link}\n\nנשמח לראותכם ולחגוג יחד. 🎉"
 
 DEFAULT_DAY_OF_EVENT_SMS_NO_TABLE = "אורחים יקרים,\n\nנרגשים להזכיר כי היום נחגוג יחד את החתונה של X!\n\nקישור וויז להגעה לאירוע: {waze_link}\n\nנשמח לראותכם ולחגוג יחד. 🎉"
 
+# message_settings keys the day-of-event SMS reads
+DAY_OF_EVENT_SETTINGS_KEYS = ('day_of_event_sms_template', 'day_of_event_sms_no_table_template')
+
 
 def get_events_with_today_as_event_date() -> list:
     """Get all active events where today is the event date"""
@@ -497,9 +422,10 @@ def get_events_with_today_as_event_date() -> list:
         conn = get_db_connection()
         cur = conn.cursor()
         today = date.today()
-        cur.execute("""
+        cur.execute(f"""
             SELECT
-                e.id, e.event_title, e.message_settings, e.bit_payment_link
+                e.id, e.event_title, {json_keys_sql('e.message_settings', DAY_OF_EVENT_SETTINGS_KEYS)},
+                e.bit_payment_link
             FROM events e
             WHERE DATE(e.event_date) = %s
               AND e.status IN ('active', 'completed')
@@ -576,7 +502,9 @@ def send_day_of_event_sms(guest: dict, event_title: str, template: str, waze_lin
             'guest_id': guest['id'],
             'guest_name': guest['name'],
             'phone': formatted_phone,
-            'error': result.get('error') if not result.get('success') else None
+            'error': result.get('error') if not result.get('success') else None,
+            'retryable': result.get('retryable', False),
+            'circuit_open': result.get('circuit_open', False)
         }
     except Exception as e:
         return {
@@ -623,10 +551,10 @@ def process_day_of_event_sms() -> dict:
             if result['success']:
                 total_sent += 1
                 table_info = f"שולחן {guest['table_number']}" if guest.get('table_number') else "ללא שולחן"
-                print(f"    ✓ {guest['name']} ({table_info})")
+                log.success("day_of_event_sms", f"    ✓ {guest['name']} ({table_info})")
             else:
                 total_failed += 1
-                print(f"    ✗ {guest['name']}: {result.get('error')}")
+                log.warning(f"    ✗ {guest['name']}: {result.get('error')}", guest_id=guest.get('id'))
 
     return {
         'processed_events': len(events),
@@ -651,7 +579,7 @@ def process_scheduled_message(scheduled_msg: dict) -> dict:
     message_number = scheduled_msg['message_number']
 
     # Determine send method based on package
-    use_sms = package_id == 2
+    use_sms = package_catalog.send_method_for(package_id) == SEND_METHOD_SMS
 
     # For message_number >= 2, use reminder template and skip guests who already responded
     is_reminder = message_number >= 2
@@ -685,22 +613,31 @@ def process_scheduled_message(scheduled_msg: dict) -> dict:
     sent_count = 0
     failed_count = 0
     errors = []
+    retryable = []
+
+    # Event-level formatting / image / template JSON resolved once for the whole round
+    ctx = EventRenderContext.build(scheduled_msg, is_reminder=is_reminder)
+    if use_sms:
+        send_one = send_sms_invitation
+    elif is_reminder:
+        send_one = send_whatsapp_reminder
+    else:
+        send_one = send_whatsapp_invitation
 
     for guest in guests:
-        if use_sms:
-            result = send_sms_invitation(guest, scheduled_msg)
-        elif is_reminder:
-            result = send_whatsapp_reminder(guest, scheduled_msg)
-        else:
-            result = send_whatsapp_invitation(guest, scheduled_msg)
+        result = send_one(guest, ctx)
 
         if result['success']:
             sent_count += 1
-            print(f"  ✓ Sent to {guest['name']} ({guest['phone']})")
+            log.success("guest_sent", f"  ✓ Sent to {guest['name']}", phone=guest['phone'])
         else:
             failed_count += 1
             errors.append(f"{guest['name']}: {result.get('error', 'Unknown error')}")
-            print(f"  ✗ Failed for {guest['name']}: {result.get('error')}")
+            log.warning(f"  ✗ Failed for {guest['name']}: {result.get('error')}", guest_id=guest.get('id'))
+            if result.get('retryable'):
+                retryable.append(result)
+            if result.get('circuit_open'):
+                continue  # nothing went out - no need to pace
 
         time.sleep(0.1)  # 100ms between sends to avoid overloading the server
 
@@ -710,7 +647,13 @@ def process_scheduled_message(scheduled_msg: dict) -> dict:
 
     update_scheduled_message_status(scheduled_message_id, status, sent_count, failed_count, error_message)
 
-    print(f"\nResults: {sent_count} sent, {failed_count} failed")
+    # Transient failures are re-driven in the background (message_retry_queue)
+    queued_for_retry = 0
+    if retryable:
+        kind = KIND_SMS if use_sms else (KIND_REMINDER if is_reminder else KIND_INVITATION)
+        queued_for_retry = enqueue_retries(scheduled_message_id, kind, retryable)
+
+    print(f"\nResults: {sent_count} sent, {failed_count} failed ({queued_for_retry} queued for retry)")
 
     return {
         'scheduled_message_id': scheduled_message_id,
@@ -719,6 +662,7 @@ def process_scheduled_message(scheduled_msg: dict) -> dict:
         'status': status,
         'sent': sent_count,
         'failed': failed_count,
+        'queued_for_retry': queued_for_retry,
         'errors': errors if errors else None
     }
 
@@ -747,8 +691,14 @@ def update_scheduled_message_status(
                 error_message = %s,
                 updated_at = NOW()
             WHERE id = %s
+            RETURNING event_id, message_number
         """, (status, sent_count, failed_count, error_message, scheduled_message_id))
 
+        row = cur.fetchone()
+        if row and sent_count:
+            log_activity(MESSAGES_SENT, f"Message #{row[1]}: {sent_count} sent, {failed_count} failed",
+                         event_id=row[0], cur=cur)
+
         conn.commit()
 
     except Exception as e:
@@ -784,6 +734,7 @@ def process_all_scheduled_messages() -> dict:
             'message': f'Skipped - Shabbat/holiday ({today})'
         }
 
+    run_started = time.perf_counter()
     messages = get_messages_to_send_today()
 
     results = []
@@ -796,6 +747,7 @@ def process_all_scheduled_messages() -> dict:
 
     total_sent = sum(r['sent'] for r in results) + day_of_result['total_sent']
     total_failed = sum(r['failed'] for r in results) + day_of_result['total_failed']
+    observe_scheduler_run(time.perf_counter() - run_started, total_sent, total_failed)
 
     print("\n" + "="*60)
     print("PROCESSING COMPLETE")
@@ -817,9 +769,12 @@ def process_all_scheduled_messages() -> dict:
 
 def update_event_schedules_on_date_change(event_id: int, new_event_date: date, message_schedule: dict):
     """
-    When event date changes, update or recreate scheduled messages.
-    Deletes pending messages and creates new ones based on new date.
+    When event date / schedule changes, bring the pending scheduled messages in line.
+    Diffs the desired rounds against the existing rows in one statement: pending rounds
+    that are no longer wanted are deleted, moved ones updated in place, missing ones added.
     """
+    from schedule_reconciler import desired_rounds, apply_plans, summarize
+
     conn = None
     cur = None
 
@@ -827,23 +782,17 @@ def update_event_schedules_on_date_change(event_id: int, new_event_date: date, m
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # Delete pending (not yet sent) scheduled messages
-        cur.execute("""
-            DELETE FROM scheduled_messages
-            WHERE event_id = %s AND status = 'pending'
-        """, (event_id,))
-
-        deleted = cur.rowcount
-        print(f"Deleted {deleted} pending scheduled messages for event {event_id}")
-
+        changes = apply_plans(cur, [(event_id, desired_rounds(new_event_date, message_schedule))])
         conn.commit()
 
-        # Create new scheduled messages
-        created = create_scheduled_messages_for_event(event_id, new_event_date, message_schedule)
+        summary = summarize(changes)
+        print(f"Reconciled scheduled messages for event {event_id}: "
+              f"{summary['added']} added, {summary['moved']} moved, {summary['removed']} removed")
 
         return {
-            'deleted': deleted,
-            'created': len(created)
+            'deleted': summary['removed'],
+            'created': summary['added'],
+            'moved': summary['moved']
         }
 
     except Exception as e:
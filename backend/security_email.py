@@ -1,13 +1,10 @@
 from datetime import datetime
-import os
-from dotenv import load_dotenv
 
-# Import Gmail API service
-from gmail_api_service import send_email_gmail_api
+# מיילים נשלחים ברקע דרך תור email_outbox (Gmail API)
+from email_outbox import enqueue_email
+from settings import settings
 
-load_dotenv()
-
-FROM_EMAIL = os.getenv("SENDER_EMAIL", "savedayevents@gmail.com")
+FROM_EMAIL = settings.sender_email
 
 def send_security_alert_email(user_email, user_name, locked_until, ip_address=None):
     """
@@ -166,8 +163,8 @@ def send_security_alert_email(user_email, user_name, locked_until, ip_address=No
         Save the Day Team
         """
 
-        # Send email using Gmail API
-        return send_email_gmail_api(
+        # Enqueue for background sending (Gmail API)
+        return enqueue_email(
             to_email=user_email,
             subject=subject,
             html_content=html_content,
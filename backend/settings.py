@@ -0,0 +1,119 @@
+"""
+Application settings - read from the environment (and .env) once, at import.
+
+App modules import `settings` instead of calling load_dotenv()/os.getenv() on their
+own, so .env is parsed a single time per process and applies no matter which module
+is imported first. (The standalone admin/migration scripts still read DATABASE_URL
+themselves.)
+"""
+import os
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+# .env wins over the process environment (as before); DOTENV_OVERRIDE=false flips that,
+# e.g. for benchmarks that point the app at a scratch DB / provider stand-in
+load_dotenv(override=os.getenv("DOTENV_OVERRIDE", "true").lower() == "true")
+
+
+def _env(name: str, default: str = None) -> str:
+    return os.getenv(name, default)
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() == "true"
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Database
+    database_url: str = _env("DATABASE_URL")
+    db_sslmode: str = _env("DB_SSLMODE", "require")
+    db_connect_timeout: int = int(_env("DB_CONNECT_TIMEOUT", "10"))
+
+    # Public URLs
+    frontend_url: str = _env("FRONTEND_URL", "https://savedayevents.com").rstrip('/')
+    backend_url: str = _env("BACKEND_URL", "https://event-gift.onrender.com").rstrip('/')
+
+    # Auth
+    jwt_secret_key: str = _env("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
+    cron_secret: str = _env("CRON_SECRET", "your-secret-key-change-in-production")
+    metrics_token: str = _env("METRICS_TOKEN")
+
+    # Google (OAuth login + Gmail API)
+    google_client_id: str = _env("GOOGLE_CLIENT_ID")
+    google_client_secret: str = _env("GOOGLE_CLIENT_SECRET")
+    google_refresh_token: str = _env("GOOGLE_REFRESH_TOKEN")
+    google_redirect_uri: str = _env("GOOGLE_REDIRECT_URI", "http://localhost:5173/login-success")
+    sender_email: str = _env("SENDER_EMAIL", "savedayevents@gmail.com")
+
+    # 019SMS
+    sms_019_username: str = _env("SMS_019_USERNAME")
+    sms_019_api_token: str = _env("SMS_019_API_TOKEN")
+    sms_019_template_name: str = _env("SMS_019_TEMPLATE_NAME", "SAVEDAY_INVITE")
+    sms_019_api_url: str = _env("SMS_019_API_URL", "https://019sms.co.il/api")
+    sms_019_timeout: float = float(_env("SMS_019_TIMEOUT", "10"))
+
+    # Gupshup / WhatsApp
+    gupshup_api_key: str = _env("GUPSHUP_API_KEY", "sk_7c99c2f11f284370af9248ce40a4a7d9")
+    gupshup_app_name: str = _env("GUPSHUP_APP_NAME", "saveday")
+    # Point at benchmarks/provider_standin.py for offline load tests
+    gupshup_api_base_url: str = _env("GUPSHUP_API_BASE_URL", "https://api.gupshup.io").rstrip('/')
+    gupshup_connect_timeout: float = float(_env("GUPSHUP_CONNECT_TIMEOUT", "3.05"))
+    gupshup_read_timeout: float = float(_env("GUPSHUP_READ_TIMEOUT", "15"))
+    whatsapp_sender_number: str = _env("WHATSAPP_SENDER_NUMBER", "972525869312")
+    whatsapp_template_name: str = _env("WHATSAPP_TEMPLATE_NAME", "event_invitation_new")
+    whatsapp_template_id: str = _env("WHATSAPP_TEMPLATE_ID", "99198662-73ee-43f2-bc1b-fe48e4a33656")
+    whatsapp_template_is_media: bool = _env_bool("WHATSAPP_TEMPLATE_IS_MEDIA", "true")
+    whatsapp_reminder_template_name: str = _env("WHATSAPP_REMINDER_TEMPLATE_NAME", "event_invation_new")
+    whatsapp_reminder_template_id: str = _env("WHATSAPP_REMINDER_TEMPLATE_ID", "461dba61-3508-4ddc-aa93-19a7a50b80c5")
+    default_invitation_image: str = _env("DEFAULT_INVITATION_IMAGE", "https://i.ibb.co/pKDqkh5/default-invitation.jpg")
+
+    # Cloudinary
+    cloudinary_cloud_name: str = _env("CLOUDINARY_CLOUD_NAME", "")
+    cloudinary_api_key: str = _env("CLOUDINARY_API_KEY", "")
+    cloudinary_api_secret: str = _env("CLOUDINARY_API_SECRET", "")
+    cloudinary_api_base_url: str = _env("CLOUDINARY_API_BASE_URL", "https://api.cloudinary.com").rstrip('/')
+
+    # Tranzila
+    tranzila_terminal_name: str = _env("TRANZILA_TERMINAL_NAME", "saveday1")
+
+    # Outbound resilience (circuit breakers + retry queue)
+    breaker_failure_threshold: int = int(_env("BREAKER_FAILURE_THRESHOLD", "5"))
+    breaker_reset_seconds: float = float(_env("BREAKER_RESET_SECONDS", "30"))
+    outbound_retry_base_seconds: float = float(_env("OUTBOUND_RETRY_BASE_SECONDS", "30"))
+    outbound_retry_max_seconds: float = float(_env("OUTBOUND_RETRY_MAX_SECONDS", "1800"))
+
+    # Background work
+    max_concurrent_jobs: int = int(_env("MAX_CONCURRENT_JOBS", "2"))
+    rsvp_flush_window_ms: int = int(_env("RSVP_FLUSH_WINDOW_MS", "20"))
+    rsvp_max_batch_size: int = int(_env("RSVP_MAX_BATCH_SIZE", "500"))
+
+    # Auth hardening
+    bcrypt_rounds: int = int(_env("BCRYPT_ROUNDS", "12"))
+    hash_pool_size: int = int(_env("HASH_POOL_SIZE", str(os.cpu_count() or 2)))
+    hash_queue_limit: int = int(_env("HASH_QUEUE_LIMIT", "0"))  # 0 = 4 x pool size, capped at 16
+    failed_login_retention_days: int = int(_env("FAILED_LOGIN_RETENTION_DAYS", "30"))
+
+    # Logging
+    log_level: str = _env("LOG_LEVEL", "INFO").upper()
+    log_format: str = _env("LOG_FORMAT", "text").lower()
+    log_success_mode: str = _env("LOG_SUCCESS_MODE", "log").lower()
+    log_queue_size: int = int(_env("LOG_QUEUE_SIZE", "10000"))
+    log_summary_interval: float = float(_env("LOG_SUMMARY_INTERVAL", "60"))
+    log_levels: str = _env("LOG_LEVELS", "")
+    log_sample: str = _env("LOG_SAMPLE", "")
+
+    # SQL tracing / slow request log
+    query_trace_enabled: bool = _env_bool("QUERY_TRACE_ENABLED", "true")
+    slow_request_ms: float = float(_env("SLOW_REQUEST_MS", "500"))
+    query_trace_repeat_threshold: int = int(_env("QUERY_TRACE_REPEAT_THRESHOLD", "5"))
+    slow_log_path: str = _env("SLOW_LOG_PATH")
+
+    # Webhook capture (benchmarks/webhook_replay.py)
+    webhook_capture_path: str = _env("WEBHOOK_CAPTURE_PATH")
+    webhook_capture_salt: str = _env("WEBHOOK_CAPTURE_SALT", "saveday-capture")
+    webhook_capture_max_mb: float = float(_env("WEBHOOK_CAPTURE_MAX_MB", "200"))
+
+
+settings = Settings()
@@ -2,20 +2,25 @@
 019SMS API Service for sending SMS messages
 Documentation: https://docs.019sms.co.il/guide/
 """
-import os
 import requests
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from app_logging import get_logger
+from outbound_resilience import get_breaker, guarded_call, is_transient_status
+from settings import settings
+
+log = get_logger("sms")
+
 
 class SMS019Service:
     """Service for sending SMS messages via 019SMS API"""
 
     def __init__(self):
-        self.username = os.getenv('SMS_019_USERNAME')
-        self.api_token = os.getenv('SMS_019_API_TOKEN')
-        self.template_name = os.getenv('SMS_019_TEMPLATE_NAME', 'SAVEDAY_INVITE')
-        self.api_url = "https://019sms.co.il/api"
+        self.username = settings.sms_019_username
+        self.api_token = settings.sms_019_api_token
+        self.template_name = settings.sms_019_template_name
+        self.api_url = settings.sms_019_api_url
 
         if not self.username or not self.api_token:
             print("⚠️ WARNING: 019SMS credentials not configured in environment variables")
@@ -30,25 +35,28 @@ class SMS019Service:
         Returns:
             Dict with 'success' boolean and 'data' or 'error'
         """
+        breaker = get_breaker("019sms", "send")
+        if not breaker.allow():
+            return breaker.rejected_result()
+
         try:
             headers = {
                 'Content-Type': 'application/json',
                 'Authorization': f'Bearer {self.api_token}'
             }
 
-            print(f"📤 Sending SMS API request to: {self.api_url}")
-            print(f"📊 Request data: {data}")
-            print(f"🔑 Auth header: Bearer {self.api_token[:20]}...")
+            log.debug("📤 Sending SMS API request", url=self.api_url, data=data)
 
-            response = requests.post(
-                self.api_url,
-                json=data,
-                headers=headers,
-                timeout=30
-            )
+            with guarded_call(breaker, "019sms") as guarded:
+                response = requests.post(
+                    self.api_url,
+                    json=data,
+                    headers=headers,
+                    timeout=settings.sms_019_timeout
+                )
+                guarded.record(response.status_code == 200, response.status_code)
 
-            print(f"📥 Response status: {response.status_code}")
-            print(f"📥 Response body: {response.text}")
+            log.debug("📥 SMS API response", status_code=response.status_code, body=response.text[:500])
 
             if response.status_code == 200:
                 try:
@@ -57,6 +65,7 @@ class SMS019Service:
                     # Check if API returned success status (status == 0 means success)
                     api_status = response_data.get('status')
                     if api_status == 0:
+                        log.success("sent", "✅ SMS accepted by 019SMS", shipment_id=response_data.get('shipment_id'))
                         return {
                             'success': True,
                             'data': response_data,
@@ -65,6 +74,7 @@ class SMS019Service:
                     else:
                         # API returned error status
                         error_message = response_data.get('message', 'Unknown API error')
+                        log.warning("❌ 019SMS API error", api_status=api_status, error=error_message)
                         return {
                             'success': False,
                             'error': f'API error (status {api_status}): {error_message}',
@@ -80,17 +90,26 @@ class SMS019Service:
                         'status_code': response.status_code
                     }
             else:
+                log.warning("❌ 019SMS HTTP error", status_code=response.status_code, body=response.text[:500])
                 return {
                     'success': False,
                     'error': f'API returned HTTP status {response.status_code}',
                     'response_text': response.text,
-                    'status_code': response.status_code
+                    'status_code': response.status_code,
+                    'retryable': is_transient_status(response.status_code)
                 }
 
         except requests.exceptions.Timeout:
             return {
                 'success': False,
-                'error': 'Request timed out after 30 seconds'
+                'error': f'Request timed out after {settings.sms_019_timeout:g} seconds',
+                'retryable': True
+            }
+        except requests.exceptions.ConnectionError as e:
+            return {
+                'success': False,
+                'error': f'Request failed: {str(e)}',
+                'retryable': True
             }
         except requests.exceptions.RequestException as e:
             return {
@@ -178,9 +197,7 @@ class SMS019Service:
         # Build the message text with link
         message_text = f"הנכם מוזמנים ל{event_name}, נשמח שתאשרו הגעתכם בלינק הבא: {rsvp_link}"
 
-        print(f"📱 Preparing SMS invitation:")
-        print(f"   To: {destination}")
-        print(f"   Message: {message_text}")
+        log.debug("📱 Preparing SMS invitation", to=destination, message=message_text)
 
         return self.send_template_sms(
             destination=destination,
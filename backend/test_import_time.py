@@ -0,0 +1,35 @@
+"""
+בדיקת זמן עליית ה-API - מייבא את main באינטרפרטר נקי (python -X importtime)
+ובודק שהייבוא בתוך התקציב ושאף מודול מ-LAZY_MODULES לא נטען בעלייה.
+לא דורש DB זמין.
+
+python test_import_time.py   /   python -m pytest test_import_time.py
+"""
+import sys
+import io
+
+from benchmarks.import_time import DEFAULT_BUDGET_MS, LAZY_MODULES, check, measure
+
+
+def test_import_time():
+    total_us, modules = measure()
+    imported = {name for _, _, name in modules}
+    assert "main" in imported, "import main not found in -X importtime output"
+
+    failures = check(total_us / 1000, modules, DEFAULT_BUDGET_MS)
+    assert not failures, failures
+    print(f"✅ import main: {total_us / 1000:.0f} ms (budget {DEFAULT_BUDGET_MS:.0f} ms), "
+          f"lazy: {', '.join(LAZY_MODULES)}")
+
+
+def test_lazy_check_flags_eager_imports():
+    # check() עצמו צריך לתפוס מודול כבד שנטען בעלייה (כולל תת-מודול)
+    modules = [(1000, 1000, "main"), (500, 500, "openpyxl.workbook")]
+    assert check(1.0, modules) == ["imported at boot but should be lazy: openpyxl"]
+    assert check(DEFAULT_BUDGET_MS + 1, [(1000, 1000, "main")]) != []
+
+
+if __name__ == "__main__":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    test_lazy_check_flags_eager_imports()
+    test_import_time()
@@ -0,0 +1,62 @@
+"""
+בדיקת /metrics - מריץ בקשות על הראוטרים הראשיים ובודק שהמדדים נרשמים
+לפי תבנית הראוט (ולא לפי הנתיב עם ה-id), כולל webhook lag.
+לא דורש DB זמין - ראוטים שנופלים על DB נמדדים עם סטטוס 500.
+
+python test_metrics.py
+"""
+import sys
+import io
+import time
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+# בלי `with` - כדי לא להריץ את ה-startup migrations
+client = TestClient(app, raise_server_exceptions=False)
+
+REQUESTS = [
+    ("GET", "/", None),
+    ("GET", "/api/health", None),
+    ("GET", "/api/scheduler/health", None),
+    ("GET", "/api/packages/list", None),
+    ("GET", "/api/packages/events/123", None),
+    ("GET", "/api/rsvp/event/123", None),
+    ("GET", "/api/payments/status/ORDER-123", None),
+    ("POST", "/api/whatsapp/webhook/gupshup",
+     {"type": "message-event", "timestamp": int(time.time() * 1000) - 1500,
+      "payload": {"type": "delivered", "id": "gs-test"}}),
+    ("GET", "/no-such-route", None),
+]
+
+EXPECTED_SERIES = [
+    'http_request_duration_seconds_count{method="GET",route="/api/health",status="200"}',
+    'route="/api/packages/events/{event_id}"',
+    'route="/api/rsvp/event/{event_id}"',
+    'route="/api/payments/status/{order_id}"',
+    'route="unmatched"',
+    'db_queries_per_request_count{route="/api/health"}',
+    'webhook_lag_seconds_count{provider="gupshup",type="message-event"}',
+]
+
+
+def test_metrics():
+    for method, path, body in REQUESTS:
+        response = client.request(method, path, json=body)
+        print(f"{method} {path} -> {response.status_code}")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200, response.status_code
+    text = response.text
+
+    missing = [series for series in EXPECTED_SERIES if series not in text]
+    assert not missing, f"missing series: {missing}"
+    # נתיבים עם id לא אמורים להפוך ל-label
+    assert 'route="/api/rsvp/event/123"' not in text
+    print(f"✅ /metrics OK ({len(text.splitlines())} lines)")
+
+
+if __name__ == "__main__":
+    test_metrics()
@@ -2,15 +2,16 @@
 אינטגרציה עם מערכת התשלומים של טרנזילה
 מבוסס על שליחת POST form ישירות לטרנזילה
 """
-import os
 from typing import Dict
 
+from settings import settings
+
 
 class TranzilaPayment:
     """מחלקה לניהול תשלומים דרך טרנזילה"""
 
     def __init__(self):
-        self.terminal_name = os.getenv("TRANZILA_TERMINAL_NAME", "saveday1")
+        self.terminal_name = settings.tranzila_terminal_name
         # כתובת היעד לשליחת הטופס - Redirect/iframe payment page
         self.payment_url = f"https://direct.tranzila.com/{self.terminal_name}/iframenew.php"
 
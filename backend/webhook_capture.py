@@ -0,0 +1,147 @@
+"""
+Capture of incoming provider webhooks for load-test replay.
+
+With WEBHOOK_CAPTURE_PATH set, every Gupshup webhook payload is appended to that
+file as one compact JSON line: {"t": <receive time, epoch ms>, "src": "gupshup", "p": <payload>}.
+benchmarks/webhook_replay.py fires the file back at a running server with the
+original timing (or faster), so an RSVP surge can be reproduced offline.
+
+Payloads are sanitized before they touch the disk:
+- phone numbers are replaced by stable pseudonyms (same phone -> same pseudonym,
+  keyed by WEBHOOK_CAPTURE_SALT), so per-guest ordering and retries are preserved
+- names, free text, locations and address forms are dropped; digit-only text
+  (guest count replies) and template button text are kept, the webhook acts on them
+- message ids / gsIds are kept - dedup and context lookups depend on them
+
+Writes go through a background thread, the webhook itself only enqueues.
+"""
+import hashlib
+import json
+import queue
+import threading
+import time
+from typing import Any, Optional
+
+from settings import settings
+
+CAPTURE_PATH = settings.webhook_capture_path  # unset = capture off
+CAPTURE_SALT = settings.webhook_capture_salt
+CAPTURE_MAX_MB = settings.webhook_capture_max_mb
+
+PHONE_KEYS = {"phone", "source", "destination", "dial_code", "mobile", "waId"}
+NAME_KEYS = {"name", "full_name", "first_name", "last_name"}
+TEXT_KEYS = {"text", "caption", "body"}
+# Free-form payloads of these message types carry nothing the webhook acts on
+DROP_PAYLOAD_TYPES = {"location", "nfm_reply", "image", "video", "audio", "file", "contact"}
+REDACTED = "[redacted]"
+
+
+def pseudonymize_phone(value: str) -> str:
+    """Replace the subscriber part (last 9 digits) with digits derived from its hash.
+
+    The country / trunk prefix and formatting characters are kept, and the same
+    subscriber number always maps to the same pseudonym, so `972501234567`,
+    `+972501234567` and `501234567` stay consistent with each other.
+    """
+    digits = [c for c in value if c.isdigit()]
+    if len(digits) < 7:
+        return value
+    subscriber = "".join(digits[-9:])
+    digest = hashlib.sha256(f"{CAPTURE_SALT}:{subscriber}".encode()).hexdigest()
+    fake = str(int(digest[:15], 16)).zfill(9)[-len(subscriber):]
+    out = list(value)
+    replaced = 0
+    for i in range(len(out) - 1, -1, -1):
+        if replaced == len(fake):
+            break
+        if out[i].isdigit():
+            out[i] = fake[len(fake) - 1 - replaced]
+            replaced += 1
+    return "".join(out)
+
+
+def sanitize(value: Any, key: Optional[str] = None, message_type: Optional[str] = None) -> Any:
+    """Returns a sanitized deep copy of a webhook payload (see module docstring)"""
+    if isinstance(value, dict):
+        inner_type = value.get("type") if isinstance(value.get("type"), str) else message_type
+        result = {}
+        for k, v in value.items():
+            if k == "payload" and inner_type in DROP_PAYLOAD_TYPES and isinstance(v, dict):
+                result[k] = {"redacted": True}
+            else:
+                result[k] = sanitize(v, k, inner_type)
+        return result
+    if isinstance(value, list):
+        return [sanitize(v, key, message_type) for v in value]
+    if not isinstance(value, str):
+        return value
+    if key in PHONE_KEYS:
+        return pseudonymize_phone(value)
+    if key in NAME_KEYS:
+        return REDACTED
+    if key in TEXT_KEYS:
+        return value if value.strip().isdigit() else REDACTED
+    return value
+
+
+class WebhookCapture:
+    """Appends sanitized payloads to a JSONL file from a daemon writer thread"""
+
+    def __init__(self, path: Optional[str], max_mb: float = CAPTURE_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._full = False
+        self.captured = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and not self._full
+
+    def capture(self, source: str, payload: Any):
+        """Called from the webhook - only enqueues, never blocks on disk"""
+        if not self.enabled:
+            return
+        if self._thread is None:
+            self._start()
+        self._queue.put((int(time.time() * 1000), source, payload))
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="webhook-capture", daemon=True)
+                self._thread.start()
+                print(f"🎥 Webhook capture on -> {self.path}")
+
+    def _run(self):
+        try:
+            f = open(self.path, "a", encoding="utf-8")
+        except OSError as e:
+            print(f"⚠️ Webhook capture disabled, cannot open {self.path}: {e}")
+            self._full = True
+            return
+        with f:
+            size = f.tell()
+            while True:
+                received_ms, source, payload = self._queue.get()
+                try:
+                    line = json.dumps({"t": received_ms, "src": source, "p": sanitize(payload)},
+                                      ensure_ascii=False, separators=(",", ":"), default=str)
+                except Exception as e:
+                    print(f"⚠️ Webhook capture skipped a payload: {e}")
+                    continue
+                size += len(line.encode("utf-8")) + 1
+                if size > self.max_bytes:
+                    print(f"⚠️ Webhook capture stopped - {self.path} reached {CAPTURE_MAX_MB:g} MB")
+                    self._full = True
+                    return
+                f.write(line + "\n")
+                # Flush whenever the queue drains, so a capture file is usable while the server runs
+                if self._queue.empty():
+                    f.flush()
+                self.captured += 1
+
+
+webhook_capture = WebhookCapture(CAPTURE_PATH)
@@ -1,7 +1,7 @@
 """
 WhatsApp Interactive Messages API Endpoints
 """
-from fastapi import APIRouter, HTTPException, Depends, Body, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Body
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime
@@ -11,9 +11,14 @@ import time
 from collections import OrderedDict
 from db import get_db_connection
 from whatsapp_interactive import whatsapp_service, DEFAULT_INVITATION_IMAGE
-from sms_service import SMS019Service
-
-sms_service = SMS019Service()
+from sms_service import sms_service
+from activity_log import log_activity, MESSAGES_SENT
+from jobs import job_registry
+from rsvp_coalescer import rsvp_coalescer
+from invitation_images import whatsapp_image_url, image_keys_sql
+from metrics import observe_webhook_lag
+from webhook_capture import webhook_capture
+from app_logging import get_logger
 
 # In-memory deduplication cache for webhook message IDs
 # Keeps last 2000 processed message IDs to prevent double-processing on Gupshup retries
@@ -32,6 +37,7 @@ def _is_duplicate_webhook(message_id: str) -> bool:
     return False
 
 router = APIRouter(prefix="/api/whatsapp", tags=["WhatsApp"])
+log = get_logger("webhook")
 
 
 # Pydantic Models
@@ -166,18 +172,6 @@ async def send_address_request(request: SendAddressRequestRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def optimize_cloudinary_url(url: str) -> str:
-    """
-    Add Cloudinary transformation params for WhatsApp delivery.
-    Reduces file size without visible quality loss on mobile screens.
-    Original image in DB is untouched.
-    """
-    if not url or 'cloudinary.com' not in url:
-        return url
-    # Insert transformation after /upload/
-    return url.replace('/upload/', '/upload/q_auto:best,f_jpg,w_1200/', 1)
-
-
 def format_israeli_phone(phone: str) -> str:
     """
     Format Israeli phone number to international format for Gupshup.
@@ -217,9 +211,9 @@ async def send_template_invitation(guest_id: int):
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # Get guest and event details, including invitation_data which may contain image URL
-        cur.execute("""
-            SELECT g.name, g.phone, e.event_name, e.event_date, e.event_time, e.event_location, e.invitation_data, e.id
+        # Get guest and event details, plus the image keys of invitation_data
+        cur.execute(f"""
+            SELECT g.name, g.phone, e.event_name, e.event_date, e.event_time, e.event_location, {image_keys_sql()}, e.id
             FROM guests g
             JOIN events e ON g.event_id = e.id
             WHERE g.id = %s
@@ -251,40 +245,22 @@ async def send_template_invitation(guest_id: int):
         # Extract image URL from invitation_data
         # Note: invitation_data contains template info, not a direct image URL
         # The invitation is generated dynamically in the frontend
-        image_url = None
-
-        if invitation_data and isinstance(invitation_data, dict):
-            # Check if there's a generated/uploaded image URL
-            image_url = (
-                invitation_data.get('generated_image_url') or
-                invitation_data.get('image_url') or
-                invitation_data.get('imageUrl')
-            )
-
-            if image_url:
-                print(f"🖼️ Found custom image in invitation_data: {image_url}")
+        # Pre-sized WhatsApp variant when available, otherwise the optimized Cloudinary URL
+        image_url = whatsapp_image_url(invitation_data)
+        if image_url:
+            log.debug(f"🖼️ Found custom image in invitation_data: {image_url}")
 
         # Fallback to default if no image found
         if not image_url:
             image_url = DEFAULT_INVITATION_IMAGE
-            print(f"⚠️ No custom image found, using default: {image_url}")
-            print(f"💡 TIP: To use event-specific images, save 'generated_image_url' in invitation_data")
-
-        # Optimize image URL for WhatsApp delivery
-        image_url = optimize_cloudinary_url(image_url)
-        print(f"🖼️ Optimized image URL: {image_url}")
+            log.debug(f"⚠️ No custom image found, using default: {image_url}")
 
         # Prepare final location (fallback to default if empty)
         final_location = event_location or "יודיע בהמשך"
 
         # Send template message
-        print(f"📱 Sending WhatsApp to: {formatted_phone}")
-        print(f"👤 Guest: {guest_name}")
-        print(f"🎉 Event: {event_name}")
-        print(f"📅 Date: {formatted_date}, Time: {formatted_time}")
-        print(f"📍 Location: {final_location}")
-        print(f"🖼️ Image URL: {image_url}")
-        print(f"📊 Template will receive {6} parameters")
+        log.debug("📱 Sending WhatsApp invitation", to=formatted_phone, guest=guest_name, event=event_name,
+                  date=formatted_date, time=formatted_time, location=final_location, image_url=image_url)
 
         result = whatsapp_service.send_event_invitation_template(
             destination=formatted_phone,
@@ -296,7 +272,7 @@ async def send_template_invitation(guest_id: int):
             image_url=image_url
         )
 
-        print(f"✉️ Gupshup Response: {result}")
+        log.debug("✉️ Gupshup response", result=result)
 
         if result['success']:
             gs_id = result.get('data', {}).get('messageId')
@@ -312,11 +288,11 @@ async def send_template_invitation(guest_id: int):
                         VALUES (%s, %s, %s)
                         ON CONFLICT (gs_id) DO NOTHING
                     """, (gs_id, event_id, guest_id))
-                    print(f"💾 Saved message event: gs_id={gs_id} -> event_id={event_id}, guest_id={guest_id}")
+                    log.debug(f"💾 Saved message event: gs_id={gs_id} -> event_id={event_id}, guest_id={guest_id}")
                 conn.commit()
-                print(f"💾 Saved WhatsApp session: phone={formatted_phone} -> event_id={event_id}, guest_id={guest_id}")
+                log.debug(f"💾 Saved WhatsApp session: phone={formatted_phone} -> event_id={event_id}, guest_id={guest_id}")
             except Exception as se:
-                print(f"⚠️ Failed to save WhatsApp session: {se}")
+                log.warning(f"⚠️ Failed to save WhatsApp session: {se}")
 
         cur.close()
         conn.close()
@@ -325,7 +301,7 @@ async def send_template_invitation(guest_id: int):
             error_detail = result.get('error', 'Failed to send message')
             if result.get('response_text'):
                 error_detail += f" - Response: {result['response_text']}"
-            print(f"❌ Send failed: {error_detail}")
+            log.error(f"❌ Send failed: {error_detail}")
             raise HTTPException(status_code=400, detail=error_detail)
 
         return {
@@ -349,9 +325,9 @@ async def send_template_reminder(guest_id: int):
         conn = get_db_connection()
         cur = conn.cursor()
 
-        # Get guest and event details, including invitation_data which may contain image URL
-        cur.execute("""
-            SELECT g.name, g.phone, e.event_name, e.event_date, e.event_time, e.event_location, e.invitation_data
+        # Get guest and event details, plus the image keys of invitation_data
+        cur.execute(f"""
+            SELECT g.name, g.phone, e.event_name, e.event_date, e.event_time, e.event_location, {image_keys_sql()}
             FROM guests g
             JOIN events e ON g.event_id = e.id
             WHERE g.id = %s
@@ -370,30 +346,19 @@ async def send_template_reminder(guest_id: int):
         formatted_phone = format_israeli_phone(phone)
 
         # Extract image URL from invitation_data
-        image_url = None
-        if invitation_data and isinstance(invitation_data, dict):
-            image_url = (
-                invitation_data.get('generated_image_url') or
-                invitation_data.get('image_url') or
-                invitation_data.get('imageUrl')
-            )
-            if image_url:
-                print(f"🖼️ Found custom image in invitation_data: {image_url}")
+        # Pre-sized WhatsApp variant when available, otherwise the optimized Cloudinary URL
+        image_url = whatsapp_image_url(invitation_data)
+        if image_url:
+            log.debug(f"🖼️ Found custom image in invitation_data: {image_url}")
 
         # Fallback to default if no image found
         if not image_url:
             image_url = DEFAULT_INVITATION_IMAGE
-            print(f"⚠️ No custom image found, using default: {image_url}")
-
-        # Optimize image URL for WhatsApp delivery
-        image_url = optimize_cloudinary_url(image_url)
-        print(f"🖼️ Optimized image URL: {image_url}")
+            log.debug(f"⚠️ No custom image found, using default: {image_url}")
 
         # Send reminder template message
-        print(f"📱 Sending WhatsApp reminder to: {formatted_phone}")
-        print(f"👤 Guest: {guest_name}")
-        print(f"🎉 Event: {event_name}")
-        print(f"🖼️ Image URL: {image_url}")
+        log.debug("📱 Sending WhatsApp reminder", to=formatted_phone, guest=guest_name, event=event_name,
+                  image_url=image_url)
 
         result = whatsapp_service.send_event_reminder_template(
             destination=formatted_phone,
@@ -401,7 +366,7 @@ async def send_template_reminder(guest_id: int):
             image_url=image_url
         )
 
-        print(f"✉️ Gupshup Response: {result}")
+        log.debug("✉️ Gupshup response", result=result)
 
         cur.close()
         conn.close()
@@ -410,7 +375,7 @@ async def send_template_reminder(guest_id: int):
             error_detail = result.get('error', 'Failed to send reminder')
             if result.get('response_text'):
                 error_detail += f" - Response: {result['response_text']}"
-            print(f"❌ Send failed: {error_detail}")
+            log.error(f"❌ Send failed: {error_detail}")
             raise HTTPException(status_code=400, detail=error_detail)
 
         return {
@@ -482,23 +447,28 @@ async def send_event_rsvp(request: SendEventRSVPRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def _bg_send_bulk_rsvp(guests: list):
-    """Background task: שולח RSVP buttons לכל האורחים."""
+def _job_send_bulk_rsvp(job, event_id: int, guests: list):
+    """Job: שולח RSVP buttons לכל האורחים."""
     for guest_id, guest_name, phone, event_name, event_date, event_location in guests:
+        if job.cancelled:
+            break
         formatted_phone = format_israeli_phone(phone)
-        whatsapp_service.send_event_rsvp_buttons(
+        result = whatsapp_service.send_event_rsvp_buttons(
             destination=formatted_phone,
             guest_name=guest_name,
             event_name=event_name,
             event_date=event_date.strftime('%d/%m/%Y') if isinstance(event_date, datetime) else str(event_date),
             event_location=event_location or "יודיע בהמשך"
         )
+        job.advance(bool(result.get('success')))
         time.sleep(0.1)
 
+    log_activity(MESSAGES_SENT, f"WhatsApp RSVP: {job.succeeded}/{len(guests)}", event_id=event_id)
+
 
 @router.post("/send-bulk-rsvp/{event_id}")
-async def send_bulk_rsvp(event_id: int, background_tasks: BackgroundTasks):
-    """Send RSVP buttons to all guests of an event - runs in background"""
+async def send_bulk_rsvp(event_id: int):
+    """Send RSVP buttons to all guests of an event - runs as a background job (see /api/admin/jobs/{job_id})"""
     try:
         conn = get_db_connection()
         cur = conn.cursor()
@@ -516,9 +486,11 @@ async def send_bulk_rsvp(event_id: int, background_tasks: BackgroundTasks):
         if not guests:
             raise HTTPException(status_code=404, detail="No guests with phone numbers found for this event")
 
-        background_tasks.add_task(_bg_send_bulk_rsvp, guests)
+        job = job_registry.submit('send_bulk_rsvp', len(guests), _job_send_bulk_rsvp,
+                                  event_id, guests, event_id=event_id)
         return {
             'total': len(guests),
+            'job_id': job.id,
             'message': f'השליחה התחילה ברקע ל-{len(guests)} אורחים'
         }
 
@@ -549,7 +521,7 @@ async def send_sms_fallback(gs_id: str):
 
         row = cur.fetchone()
         if not row:
-            print(f"⚠️ SMS fallback: no guest found for gs_id={gs_id}")
+            log.warning(f"⚠️ SMS fallback: no guest found for gs_id={gs_id}")
             return
 
         guest_id, event_id, guest_name, phone, event_title, event_name, message_settings = row
@@ -569,16 +541,16 @@ async def send_sms_fallback(gs_id: str):
         # Format phone
         formatted_phone = format_israeli_phone(phone)
 
-        print(f"📱 Sending SMS fallback to {formatted_phone} for guest {guest_name}")
+        log.debug(f"📱 Sending SMS fallback to {formatted_phone} for guest {guest_name}")
         result = sms_service.send_simple_sms(destination=formatted_phone, message=message_text)
 
         if result.get('success'):
-            print(f"✅ SMS fallback sent successfully to {guest_name}")
+            log.info(f"✅ SMS fallback sent successfully to {guest_name}")
         else:
-            print(f"❌ SMS fallback failed: {result.get('error')}")
+            log.error(f"❌ SMS fallback failed: {result.get('error')}")
 
     except Exception as e:
-        print(f"❌ send_sms_fallback error: {e}")
+        log.error(f"❌ send_sms_fallback error: {e}")
     finally:
         if cur:
             cur.close()
@@ -592,11 +564,11 @@ async def gupshup_webhook(payload: Dict = Body(...)):
     Webhook endpoint to receive responses from Gupshup
     Handles RSVP responses, location shares, address submissions, etc.
     """
+    webhook_capture.capture("gupshup", payload)
     try:
-        print(f"📨 Received webhook: {payload}")
-
         message_type = payload.get('type')
-        print(f"🔍 [WEBHOOK DEBUG] type='{message_type}' full_payload={payload}")
+        log.debug("📨 Received webhook", type=message_type, payload=payload)
+        observe_webhook_lag("gupshup", message_type, payload.get('timestamp'))
 
         # Handle message status events (delivered, read, failed, etc.)
         if message_type == 'message-event':
@@ -605,10 +577,10 @@ async def gupshup_webhook(payload: Dict = Body(...)):
             gs_id = event_payload.get('gsId') or event_payload.get('id')
             error_code = event_payload.get('payload', {}).get('code')
 
-            print(f"📊 Message event: type={event_type}, gs_id={gs_id}, error_code={error_code}")
+            log.debug("📊 Message event", event=event_type, gs_id=gs_id, error_code=error_code)
 
             if event_type == 'failed' and error_code in {1002, 131026, 130472, 131049} and gs_id:
-                print(f"⚠️ WhatsApp failed (code={error_code}), attempting SMS fallback for gs_id={gs_id}")
+                log.warning(f"⚠️ WhatsApp failed (code={error_code}), attempting SMS fallback for gs_id={gs_id}")
                 await send_sms_fallback(gs_id)
 
             return {"status": "ok", "reason": f"message-event:{event_type}"}
@@ -623,7 +595,7 @@ async def gupshup_webhook(payload: Dict = Body(...)):
         # Deduplication: ignore retries from Gupshup for already-processed messages
         incoming_msg_id = message_payload.get('id') or message_payload.get('gsId')
         if incoming_msg_id and _is_duplicate_webhook(incoming_msg_id):
-            print(f"⚡ Duplicate webhook ignored: message_id={incoming_msg_id}")
+            log.info(f"⚡ Duplicate webhook ignored: message_id={incoming_msg_id}")
             return {"status": "ignored", "reason": "duplicate"}
 
         # Handle quick_reply (buttons from templates) OR button_reply (interactive buttons)
@@ -632,7 +604,7 @@ async def gupshup_webhook(payload: Dict = Body(...)):
             # For button_reply, button ID is in payload.id
             if msg_type == 'quick_reply':
                 button_text = message_payload.get('payload', {}).get('postbackText', '').strip()
-                print(f"📩 Received quick_reply: '{button_text}' from {sender_phone}")
+                log.debug(f"📩 Received quick_reply: '{button_text}' from {sender_phone}")
 
                 # Map Hebrew button text to our internal button IDs
                 # Includes buttons from both invitation and reminder templates
@@ -645,7 +617,7 @@ async def gupshup_webhook(payload: Dict = Body(...)):
                 button_id = button_mapping.get(button_text, None)
 
                 if not button_id:
-                    print(f"⚠️ Unknown quick_reply button: '{button_text}'")
+                    log.warning(f"⚠️ Unknown quick_reply button: '{button_text}'")
                     return {"status": "ignored", "reason": "Unknown button text"}
             else:
                 button_id = message_payload.get('payload', {}).get('id')
@@ -683,9 +655,9 @@ async def gupshup_webhook(payload: Dict = Body(...)):
                             ON CONFLICT (phone) DO UPDATE SET event_id = EXCLUDED.event_id, guest_id = EXCLUDED.guest_id, updated_at = NOW()
                         """, (clean_phone, msg_event_row[1], msg_event_row[0]))
                         conn.commit()
-                        print(f"✅ Found guest via context.gsId={context_gs_id}: guest_id={msg_event_row[0]}, event_id={msg_event_row[1]}")
+                        log.debug(f"✅ Found guest via context.gsId={context_gs_id}: guest_id={msg_event_row[0]}, event_id={msg_event_row[1]}")
                     else:
-                        print(f"⚠️ context.gsId={context_gs_id} not found in whatsapp_message_events, falling back to session")
+                        log.warning(f"⚠️ context.gsId={context_gs_id} not found in whatsapp_message_events, falling back to session")
                         row = None
                 else:
                     row = None
@@ -700,10 +672,10 @@ async def gupshup_webhook(payload: Dict = Body(...)):
                     session_row = cur.fetchone()
 
                 if row:
-                    print(f"✅ Found guest via WhatsApp session: guest_id={row[0]}")
+                    log.debug(f"✅ Found guest via WhatsApp session: guest_id={row[0]}")
                 elif session_row:
                     row = session_row
-                    print(f"✅ Found guest via WhatsApp session: guest_id={session_row[0]}")
+                    log.debug(f"✅ Found guest via WhatsApp session: guest_id={session_row[0]}")
                 else:
                     # Fallback: most recently invited guest with this phone
                     cur.execute("""
@@ -726,20 +698,20 @@ async def gupshup_webhook(payload: Dict = Body(...)):
                     row = cur.fetchone()
 
                 if not row:
-                    print(f"⚠️ No guest found for phone: {sender_phone}")
+                    log.warning(f"⚠️ No guest found for phone: {sender_phone}")
                     cur.close()
                     conn.close()
                     return {"status": "ignored", "reason": "Guest not found"}
 
                 target_guest_id = row[0]
-                print(f"🎯 Targeting guest_id={target_guest_id} for phone {sender_phone}")
+                log.debug(f"🎯 Targeting guest_id={target_guest_id} for phone {sender_phone}")
 
                 # Check if guest already has a final status (dedup for DB level)
                 cur.execute("SELECT status FROM guests WHERE id = %s", (target_guest_id,))
                 current_status_row = cur.fetchone()
                 current_status = current_status_row[0] if current_status_row else None
                 if current_status == 'declined':
-                    print(f"⚡ Guest {target_guest_id} already declined, ignoring duplicate webhook")
+                    log.info(f"⚡ Guest {target_guest_id} already declined, ignoring duplicate webhook")
                     cur.close()
                     conn.close()
                     return {"status": "ignored", "reason": "already_declined"}
@@ -753,7 +725,7 @@ async def gupshup_webhook(payload: Dict = Body(...)):
                     already_asked = cur.fetchone()
 
                     if already_asked:
-                        print(f"⚡ Already sent count question to {sender_phone} within 24h, skipping")
+                        log.info(f"⚡ Already sent count question to {sender_phone} within 24h, skipping")
                         cur.close()
                         conn.close()
                         return {"status": "ignored", "reason": "count_question_already_sent"}
@@ -771,7 +743,7 @@ async def gupshup_webhook(payload: Dict = Body(...)):
                     )
 
                     if result['success']:
-                        print(f"📩 Sent guest count question to: {sender_phone}")
+                        log.debug(f"📩 Sent guest count question to: {sender_phone}")
                         # Record that we sent the question to prevent duplicates
                         cur.execute("""
                             UPDATE whatsapp_sessions SET count_question_sent_at = NOW()
@@ -779,21 +751,13 @@ async def gupshup_webhook(payload: Dict = Body(...)):
                         """, (clean_phone,))
                         conn.commit()
                     else:
-                        print(f"❌ Failed to send guest count question: {result.get('error')}")
+                        log.error(f"❌ Failed to send guest count question: {result.get('error')}")
                 else:
-                    # For 'maybe' or 'declined', update only the targeted guest
-                    cur.execute("""
-                        UPDATE guests
-                        SET status = %s, attendance_status = %s, updated_at = NOW()
-                        WHERE id = %s
-                        RETURNING id, name, phone, status
-                    """, (new_status, new_status, target_guest_id))
-
-                    updated_guests = cur.fetchall()
-                    conn.commit()
+                    # For 'maybe' or 'declined', update only the targeted guest (batched with other responses)
+                    updated_guest = await rsvp_coalescer.write(target_guest_id, new_status)
 
-                    if updated_guests:
-                        print(f"✅ Updated guest: {updated_guests[0]}")
+                    if updated_guest:
+                        log.debug("✅ Updated guest", guest=updated_guest)
                         if new_status == 'declined':
                             whatsapp_service.send_text_message(
                                 destination=sender_phone,
@@ -805,9 +769,9 @@ async def gupshup_webhook(payload: Dict = Body(...)):
                                 text="תודה על עדכון! אשמח אם תעדכן כשתדע בוודאות 💙"
                             )
                     else:
-                        print(f"⚠️ No guest updated for id: {target_guest_id}")
+                        log.warning(f"⚠️ No guest updated for id: {target_guest_id}")
 
-                    print(f"✅ Updated guest status: guest_id={target_guest_id} -> {new_status}")
+                    log.info(f"✅ Updated guest status: guest_id={target_guest_id} -> {new_status}")
 
             cur.close()
             conn.close()
@@ -826,7 +790,7 @@ async def gupshup_webhook(payload: Dict = Body(...)):
                         clean_phone = sender_phone.replace('+', '')
 
                         # Find guest via WhatsApp session first (event-specific)
-                        print(f"🔍 Looking for guest with phone: {sender_phone} (cleaned: {clean_phone})")
+                        log.debug(f"🔍 Looking for guest with phone: {sender_phone} (cleaned: {clean_phone})")
                         cur.execute("""
                             SELECT ws.guest_id FROM whatsapp_sessions ws
                             WHERE ws.phone = %s OR ws.phone = %s OR ws.phone LIKE %s
@@ -836,7 +800,7 @@ async def gupshup_webhook(payload: Dict = Body(...)):
 
                         if session_row:
                             row = session_row
-                            print(f"✅ Found guest via WhatsApp session: guest_id={session_row[0]}")
+                            log.debug(f"✅ Found guest via WhatsApp session: guest_id={session_row[0]}")
                         else:
                             cur.execute("""
                                 SELECT id FROM guests
@@ -857,26 +821,19 @@ async def gupshup_webhook(payload: Dict = Body(...)):
                             row = cur.fetchone()
 
                         if not row:
-                            print(f"⚠️ No guest found for phone: {sender_phone}")
+                            log.warning(f"⚠️ No guest found for phone: {sender_phone}")
                             cur.close()
                             conn.close()
                             return {"status": "ignored", "reason": "Guest not found"}
 
                         target_guest_id = row[0]
-                        print(f"🎯 Targeting guest_id={target_guest_id} for count update")
-
-                        # Update only the targeted guest
-                        cur.execute("""
-                            UPDATE guests
-                            SET attending_count = %s, guests_count = %s, status = 'confirmed', attendance_status = 'confirmed', updated_at = NOW()
-                            WHERE id = %s
-                            RETURNING id, name, phone, attending_count, status
-                        """, (guest_count, guest_count, target_guest_id))
+                        log.debug(f"🎯 Targeting guest_id={target_guest_id} for count update")
 
-                        updated_guests = cur.fetchall()
-                        print(f"✅ Updated {len(updated_guests)} guests:")
-                        for guest in updated_guests:
-                            print(f"   ID: {guest[0]}, Name: {guest[1]}, Phone: {guest[2]}, Count: {guest[3]}, Status: {guest[4]}")
+                        # Update only the targeted guest (batched with other responses)
+                        guest = await rsvp_coalescer.write(target_guest_id, 'confirmed', guest_count)
+                        if guest:
+                            log.debug("✅ Updated guest", guest_id=guest['id'], phone=guest['phone'],
+                                      count=guest['attending_count'], status=guest['status'])
 
                         # Reset count_question_sent_at so future events work normally
                         cur.execute("""
@@ -888,7 +845,7 @@ async def gupshup_webhook(payload: Dict = Body(...)):
                         cur.close()
                         conn.close()
 
-                        print(f"✅ Updated guest count from text: {sender_phone} -> {guest_count} guests")
+                        log.info(f"✅ Updated guest count from text: {sender_phone} -> {guest_count} guests")
 
                         # Send confirmation
                         whatsapp_service.send_text_message(
@@ -896,24 +853,24 @@ async def gupshup_webhook(payload: Dict = Body(...)):
                             text=f"תודה רבה! רשמנו שמגיעים {guest_count} אנשים 🎉\nמחכים לראותכם! 💙"
                         )
                 except ValueError:
-                    print(f"⚠️ Could not parse number from text: {text_content}")
+                    log.warning(f"⚠️ Could not parse number from text: {text_content}")
 
         # Handle location reply
         elif msg_type == 'location':
             location_data = message_payload.get('payload', {})
-            print(f"📍 Received location: {location_data}")
+            log.debug("📍 Received location", location=location_data)
             # Store location if needed
 
         # Handle address reply (nfm_reply type)
         elif msg_type == 'nfm_reply':
             address_data = message_payload.get('payload', {})
-            print(f"🏠 Received address: {address_data}")
+            log.debug("🏠 Received address", address=address_data)
             # Store address if needed
 
         return {"status": "success", "message": "Webhook processed"}
 
     except Exception as e:
-        print(f"❌ Webhook error: {str(e)}")
+        log.exception("❌ Webhook error", error=str(e))
         return {"status": "error", "message": str(e)}
 
 
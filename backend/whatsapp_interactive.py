@@ -2,25 +2,32 @@
 WhatsApp Interactive Messages Service using Gupshup API
 Supports: List Messages, Reply Buttons, Location Requests, Address Messages
 """
-import os
 import requests
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 import json
 
+from app_logging import get_logger
+from outbound_resilience import get_breaker, guarded_call, is_transient_exception
+from settings import settings
+
+log = get_logger("gupshup")
+
 # Gupshup API Configuration
 # TODO: Move GUPSHUP_API_KEY to environment variable for better security
-GUPSHUP_API_KEY = os.getenv('GUPSHUP_API_KEY', 'sk_7c99c2f11f284370af9248ce40a4a7d9')
-GUPSHUP_APP_NAME = os.getenv('GUPSHUP_APP_NAME', 'saveday')
-WHATSAPP_SENDER_NUMBER = os.getenv('WHATSAPP_SENDER_NUMBER', '972525869312')
-WHATSAPP_TEMPLATE_NAME = os.getenv('WHATSAPP_TEMPLATE_NAME', 'event_invitation_new')
-DEFAULT_INVITATION_IMAGE = os.getenv('DEFAULT_INVITATION_IMAGE', 'https://i.ibb.co/pKDqkh5/default-invitation.jpg')
-WHATSAPP_TEMPLATE_ID = os.getenv('WHATSAPP_TEMPLATE_ID', '99198662-73ee-43f2-bc1b-fe48e4a33656')
-WHATSAPP_TEMPLATE_IS_MEDIA = os.getenv('WHATSAPP_TEMPLATE_IS_MEDIA', 'true').lower() == 'true'
-WHATSAPP_REMINDER_TEMPLATE_NAME = os.getenv('WHATSAPP_REMINDER_TEMPLATE_NAME', 'event_invation_new')
-WHATSAPP_REMINDER_TEMPLATE_ID = os.getenv('WHATSAPP_REMINDER_TEMPLATE_ID', '461dba61-3508-4ddc-aa93-19a7a50b80c5')
-GUPSHUP_API_URL = 'https://api.gupshup.io/wa/api/v1/msg'
-GUPSHUP_TEMPLATE_URL = 'https://api.gupshup.io/wa/api/v1/template/msg'
+GUPSHUP_API_KEY = settings.gupshup_api_key
+GUPSHUP_APP_NAME = settings.gupshup_app_name
+WHATSAPP_SENDER_NUMBER = settings.whatsapp_sender_number
+WHATSAPP_TEMPLATE_NAME = settings.whatsapp_template_name
+DEFAULT_INVITATION_IMAGE = settings.default_invitation_image
+WHATSAPP_TEMPLATE_ID = settings.whatsapp_template_id
+WHATSAPP_TEMPLATE_IS_MEDIA = settings.whatsapp_template_is_media
+WHATSAPP_REMINDER_TEMPLATE_NAME = settings.whatsapp_reminder_template_name
+WHATSAPP_REMINDER_TEMPLATE_ID = settings.whatsapp_reminder_template_id
+GUPSHUP_API_URL = f'{settings.gupshup_api_base_url}/wa/api/v1/msg'
+GUPSHUP_TEMPLATE_URL = f'{settings.gupshup_api_base_url}/wa/api/v1/template/msg'
+# (connect, read) - requests waits forever without one
+GUPSHUP_TIMEOUT = (settings.gupshup_connect_timeout, settings.gupshup_read_timeout)
 
 
 class WhatsAppInteractiveService:
@@ -53,23 +60,30 @@ class WhatsAppInteractiveService:
             'message': text
         }
 
+        breaker = get_breaker("gupshup", "text")
+        if not breaker.allow():
+            return breaker.rejected_result()
+
         try:
-            response = requests.post(self.api_url, headers=headers, data=data)
-            print(f"\n📤 Sent text message:")
-            print(f"   To: {destination}")
-            print(f"   Text: {text[:100]}...")
-            print(f"   Response: {response.status_code} - {response.text}")
+            with guarded_call(breaker, "gupshup") as guarded:
+                response = requests.post(self.api_url, headers=headers, data=data, timeout=GUPSHUP_TIMEOUT)
+                guarded.record(response.ok, response.status_code)
+            log.debug("📤 Sent text message", to=destination, text=text[:100],
+                      status_code=response.status_code, body=response.text[:500])
 
             response.raise_for_status()
             result = response.json()
 
             if 'messageId' in result:
+                log.success("text_sent", "✅ Text message sent", message_id=result['messageId'])
                 return {'success': True, 'data': result, 'status_code': response.status_code}
             else:
+                log.warning("⚠️ Text message not accepted", to=destination, body=response.text[:500])
                 return {'success': False, 'error': result.get('message', 'No message ID'), 'status_code': response.status_code}
         except Exception as e:
-            print(f"❌ Error sending text: {str(e)}")
-            return {'success': False, 'error': str(e)}
+            transient = is_transient_exception(e)
+            log.error("❌ Error sending text", to=destination, error=str(e))
+            return {'success': False, 'error': str(e), 'retryable': transient}
 
     def _send_message(self, destination: str, message_payload: Dict) -> Dict:
         """
@@ -95,12 +109,16 @@ class WhatsAppInteractiveService:
             'message': json.dumps(message_payload)
         }
 
+        breaker = get_breaker("gupshup", "msg")
+        if not breaker.allow():
+            return breaker.rejected_result()
+
         try:
-            response = requests.post(self.api_url, headers=headers, data=data)
+            with guarded_call(breaker, "gupshup") as guarded:
+                response = requests.post(self.api_url, headers=headers, data=data, timeout=GUPSHUP_TIMEOUT)
+                guarded.record(response.ok, response.status_code)
 
-            print(f"\n📥 Gupshup Response:")
-            print(f"   Status Code: {response.status_code}")
-            print(f"   Response Body: {response.text}")
+            log.debug("📥 Gupshup response", status_code=response.status_code, body=response.text[:500])
 
             response.raise_for_status()
 
@@ -110,7 +128,7 @@ class WhatsAppInteractiveService:
             # Gupshup can return 200 with an error in the response body
             if 'status' in result and result['status'] == 'error':
                 error_msg = result.get('message', 'Unknown error from Gupshup')
-                print(f"❌ Gupshup API Error: {error_msg}")
+                log.warning("❌ Gupshup API error", to=destination, error=error_msg)
                 return {
                     'success': False,
                     'error': error_msg,
@@ -121,7 +139,7 @@ class WhatsAppInteractiveService:
             # Check if we have a message ID
             if 'messageId' not in result:
                 error_msg = result.get('message', 'No message ID returned')
-                print(f"⚠️ Gupshup Warning: {error_msg}")
+                log.warning("⚠️ Gupshup returned no message id", to=destination, error=error_msg)
                 return {
                     'success': False,
                     'error': error_msg,
@@ -129,7 +147,7 @@ class WhatsAppInteractiveService:
                     'response_text': response.text
                 }
 
-            print(f"✅ Message sent successfully, ID: {result.get('messageId')}")
+            log.success("message_sent", "✅ Message sent", message_id=result.get('messageId'))
 
             return {
                 'success': True,
@@ -140,16 +158,17 @@ class WhatsAppInteractiveService:
             error_msg = str(e)
             status_code = getattr(e.response, 'status_code', None) if hasattr(e, 'response') else None
             response_text = getattr(e.response, 'text', '') if hasattr(e, 'response') else ''
+            transient = is_transient_exception(e)
 
-            print(f"❌ Gupshup Error: {error_msg}")
-            print(f"   Status Code: {status_code}")
-            print(f"   Response: {response_text}")
+            log.error("❌ Gupshup error", to=destination, error=error_msg,
+                      status_code=status_code, body=(response_text or '')[:500])
 
             return {
                 'success': False,
                 'error': error_msg,
                 'status_code': status_code,
-                'response_text': response_text
+                'response_text': response_text,
+                'retryable': transient
             }
 
     def send_list_message(
@@ -362,26 +381,20 @@ class WhatsAppInteractiveService:
                 image_url="https://example.com/invitation.jpg"
             )
         """
-        headers = {
-            'apikey': self.api_key,
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
-
         # Clean image URL - remove query parameters that WhatsApp rejects
         clean_image_url = None
         if image_url:
             clean_image_url = image_url.split('?')[0] if '?' in image_url else image_url
             if clean_image_url != image_url:
-                print(f"🧹 Cleaned image URL: {image_url} -> {clean_image_url}")
+                log.debug("🧹 Cleaned image URL", original=image_url, cleaned=clean_image_url)
 
         # Build template payload - Gupshup specific format
         # Template object MUST use template UUID (not name) and text params ONLY
         template_id = template_id_override or WHATSAPP_TEMPLATE_ID or template_name
 
         if not template_id_override and not WHATSAPP_TEMPLATE_ID:
-            print(f"⚠️ WARNING: WHATSAPP_TEMPLATE_ID not set! Using template name '{template_name}' as fallback.")
-            print(f"⚠️ This may cause error 4003 'template did not match'.")
-            print(f"⚠️ Set WHATSAPP_TEMPLATE_ID env variable to your template UUID from Gupshup.")
+            log.warning("⚠️ WHATSAPP_TEMPLATE_ID not set - using the template name as fallback, "
+                        "which may cause error 4003 'template did not match'", template=template_name)
 
         template_data = {
             "id": template_id,
@@ -409,26 +422,60 @@ class WhatsAppInteractiveService:
                 }
                 data['message'] = json.dumps(message_data)
             else:
-                print(f"⚠️ WARNING: Template is NOT a Media template (WHATSAPP_TEMPLATE_IS_MEDIA=false)")
-                print(f"⚠️ Ignoring image URL: {clean_image_url}")
-                print(f"⚠️ If your template supports images, set WHATSAPP_TEMPLATE_IS_MEDIA=true")
-
-        print(f"\n📤 Sending template message to Gupshup:")
-        print(f"   URL: {GUPSHUP_TEMPLATE_URL}")
-        print(f"   Destination: {destination}")
-        print(f"   Template: {template_name}")
-        print(f"   Text Params: {len(template_params)}")
-        print(f"   Template JSON: {data['template']}")
-        if clean_image_url:
-            print(f"   Image (separate): {data.get('message', 'N/A')}")
-        print(f"   Full Data payload keys: {list(data.keys())}")
+                log.warning("⚠️ Template is not a Media template (WHATSAPP_TEMPLATE_IS_MEDIA=false), "
+                            "ignoring image URL", image_url=clean_image_url)
+
+        log.debug("📤 Sending template message", url=GUPSHUP_TEMPLATE_URL, to=destination,
+                  template=template_name, params=len(template_params), template_json=data['template'],
+                  image=data.get('message'))
+
+        return self._post_template(destination, data, template_name)
+
+    def send_prepared_template(
+        self,
+        destination: str,
+        template_json: str,
+        message_json: Optional[str] = None,
+        template_name: str = ''
+    ) -> Dict:
+        """
+        Send a template whose JSON was already rendered (see event_render_context) -
+        per-guest sends skip the params cleanup / image URL / json.dumps work
+
+        Args:
+            destination: Recipient phone number (with country code)
+            template_json: Serialized {"id": ..., "params": [...]} template object
+            message_json: Serialized image message for Media templates, if any
+            template_name: For logging only
+        """
+        data = {
+            'channel': 'whatsapp',
+            'source': self.sender_number,
+            'destination': destination,
+            'src.name': self.app_name,
+            'template': template_json
+        }
+        if message_json:
+            data['message'] = message_json
+        return self._post_template(destination, data, template_name)
+
+    def _post_template(self, destination: str, data: Dict, template_name: str) -> Dict:
+        """POST a built template payload to Gupshup and normalize the result"""
+        headers = {
+            'apikey': self.api_key,
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+
+        breaker = get_breaker("gupshup", "template")
+        if not breaker.allow():
+            return breaker.rejected_result()
 
         try:
-            response = requests.post(GUPSHUP_TEMPLATE_URL, headers=headers, data=data)
+            with guarded_call(breaker, "gupshup") as guarded:
+                response = requests.post(GUPSHUP_TEMPLATE_URL, headers=headers, data=data, timeout=GUPSHUP_TIMEOUT)
+                guarded.record(response.ok, response.status_code)
 
-            print(f"\n📥 Gupshup Response:")
-            print(f"   Status Code: {response.status_code}")
-            print(f"   Response Body: {response.text}")
+            log.debug("📥 Gupshup response", status_code=response.status_code, body=response.text[:500])
 
             # Check if HTTP status is OK
             response.raise_for_status()
@@ -440,8 +487,7 @@ class WhatsAppInteractiveService:
             # Check for common error indicators
             if 'status' in result and result['status'] == 'error':
                 error_msg = result.get('message', 'Unknown error from Gupshup')
-                print(f"\n❌ Gupshup API Error:")
-                print(f"   Error Message: {error_msg}")
+                log.warning("❌ Gupshup API error", to=destination, template=template_name, error=error_msg)
                 return {
                     'success': False,
                     'error': error_msg,
@@ -452,9 +498,8 @@ class WhatsAppInteractiveService:
             # Check if we have a message ID (success indicator)
             if 'messageId' not in result:
                 error_msg = result.get('message', 'No message ID returned - message may not have been sent')
-                print(f"\n⚠️ Gupshup Warning:")
-                print(f"   {error_msg}")
-                print(f"   Full response: {result}")
+                log.warning("⚠️ Gupshup returned no message id", to=destination, template=template_name,
+                            error=error_msg, response=result)
                 return {
                     'success': False,
                     'error': error_msg,
@@ -462,8 +507,7 @@ class WhatsAppInteractiveService:
                     'response_text': response.text
                 }
 
-            print(f"   ✅ Message accepted by Gupshup")
-            print(f"   Message ID: {result.get('messageId', 'N/A')}")
+            log.success("template_sent", "✅ Message accepted by Gupshup", message_id=result.get('messageId'))
 
             return {
                 'success': True,
@@ -474,17 +518,17 @@ class WhatsAppInteractiveService:
             error_msg = str(e)
             status_code = getattr(e.response, 'status_code', None) if hasattr(e, 'response') else None
             response_text = getattr(e.response, 'text', '') if hasattr(e, 'response') else ''
+            transient = is_transient_exception(e)
 
-            print(f"\n❌ Gupshup Error:")
-            print(f"   Error: {error_msg}")
-            print(f"   Status Code: {status_code}")
-            print(f"   Response: {response_text}")
+            log.error("❌ Gupshup error", to=destination, template=template_name, error=error_msg,
+                      status_code=status_code, body=(response_text or '')[:500])
 
             return {
                 'success': False,
                 'error': error_msg,
                 'status_code': status_code,
-                'response_text': response_text
+                'response_text': response_text,
+                'retryable': transient
             }
 
     def send_event_invitation_template(
@@ -533,10 +577,7 @@ class WhatsAppInteractiveService:
             "SaveDay Events"                  # {{6}} - משפחת אירועי היום
         ]
 
-        print(f"🔍 Template Params Verification:")
-        print(f"   Count: {len(template_params)} (must be 6)")
-        for i, param in enumerate(template_params, 1):
-            print(f"   {{{{{{i}}}}}}: '{param}' (len={len(param)})")
+        log.debug("🔍 Template params", count=len(template_params), params=template_params)
 
         return self.send_template_message(
             destination=destination,
@@ -577,9 +618,7 @@ class WhatsAppInteractiveService:
             str(event_name).strip(),  # {{1}} - event name
         ]
 
-        print(f"🔍 Reminder Template Params Verification:")
-        print(f"   Count: {len(template_params)} (must be 1)")
-        print(f"   {{1}}: '{template_params[0]}' (len={len(template_params[0])})")
+        log.debug("🔍 Reminder template params", count=len(template_params), params=template_params)
 
         return self.send_template_message(
             destination=destination,
@@ -1,4 +1,4 @@
-import { useEffect, useState, useRef } from 'react';
+import { useEffect, useState } from 'react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
 import Navbar from '../components/Navbar';
 import './PaymentResult.css';
@@ -8,14 +8,15 @@ export default function PaymentSuccess() {
   const [searchParams] = useSearchParams();
   const [pollingStatus, setPollingStatus] = useState('checking'); // 'checking', 'timeout'
   const [attempts, setAttempts] = useState(0);
-  const intervalRef = useRef(null);
   const [isInIframe, setIsInIframe] = useState(false);
 
   const orderId = searchParams.get('order_id');
   const purchaseId = searchParams.get('purchase_id');
 
-  const MAX_ATTEMPTS = 15; // 15 ניסיונות = 30 שניות (כל 2 שניות)
-  const POLL_INTERVAL = 2000; // 2 שניות
+  // long-poll: השרת מחזיק כל בקשה עד שה-callback מעדכן את התשלום (או עד WAIT_SECONDS)
+  const MAX_ATTEMPTS = 3; // 3 ניסיונות = עד 30 שניות
+  const WAIT_SECONDS = 10;
+  const RETRY_DELAY = 2000; // המתנה אחרי שגיאת רשת
 
   // בדיקה אם אנחנו בתוך iframe ושליחת הודעה ל-parent
   useEffect(() => {
@@ -41,82 +42,75 @@ export default function PaymentSuccess() {
       return;
     }
 
-    confirmPaymentSuccess();
+    const run = { cancelled: false };
+    confirmPaymentSuccess(run);
 
     return () => {
-      if (intervalRef.current) {
-        clearInterval(intervalRef.current);
-      }
+      run.cancelled = true;
     };
   }, [orderId, isInIframe]);
 
-  const confirmPaymentSuccess = async () => {
+  const confirmPaymentSuccess = async (run) => {
     try {
       const API_URL = import.meta.env.VITE_API_URL || 'https://event-gift.onrender.com/api';
       await fetch(`${API_URL}/payments/confirm-success/${orderId}`, {
         method: 'POST'
       });
-      startPolling();
+      startPolling(run);
     } catch (error) {
       console.error('Error confirming payment:', error);
-      startPolling();
+      startPolling(run);
     }
   };
 
-  const startPolling = () => {
-    checkPaymentStatus();
-
-    intervalRef.current = setInterval(() => {
-      checkPaymentStatus();
-    }, POLL_INTERVAL);
+  const startPolling = async (run) => {
+    for (let attempt = 0; attempt < MAX_ATTEMPTS; attempt++) {
+      if (run.cancelled) return;
+      setAttempts(attempt);
+      if (await waitForPaymentStatus(run)) return;
+    }
+    if (!run.cancelled) {
+      setPollingStatus('timeout');
+    }
   };
 
-  const checkPaymentStatus = async () => {
+  // מחזיר true כשהתשלום הסתיים (והניווט בוצע)
+  const waitForPaymentStatus = async (run) => {
     try {
       const API_URL = import.meta.env.VITE_API_URL || 'https://event-gift.onrender.com/api';
-      const response = await fetch(`${API_URL}/payments/status/${orderId}`);
-
-      if (response.ok) {
-        const data = await response.json();
-        console.log('[Payment Status]', data);
-
-        setAttempts(prev => prev + 1);
-
-        if (data.payment_status === 'completed' || data.status === 'active') {
-          if (intervalRef.current) {
-            clearInterval(intervalRef.current);
-          }
-          const packageSlugMap = {
-            'חבילת בסיס – ידני': 'basic',
-            'אוטומטי SMS': 'sms',
-            'אוטומטי WhatsApp': 'whatsapp',
-            'אוטומטי הכל כלול': 'all-inclusive',
-          };
-          const params = new URLSearchParams();
-          if (data.package_name) params.set('package', packageSlugMap[data.package_name] || data.package_name);
-          if (data.amount) params.set('amount', data.amount);
-          navigate(`/payment/thank-you?${params.toString()}`);
-        } else if (data.payment_status === 'failed') {
-          navigate(`/payment/failure?order_id=${orderId}&purchase_id=${purchaseId}`);
-        } else {
-          if (attempts >= MAX_ATTEMPTS) {
-            setPollingStatus('timeout');
-            if (intervalRef.current) {
-              clearInterval(intervalRef.current);
-            }
-          }
-        }
+      const response = await fetch(`${API_URL}/payments/status/${orderId}/wait?timeout=${WAIT_SECONDS}`);
+
+      if (!response.ok) {
+        await new Promise(resolve => setTimeout(resolve, RETRY_DELAY));
+        return false;
       }
-    } catch (error) {
-      console.error('Error fetching payment details:', error);
-      setAttempts(prev => prev + 1);
 
-      if (attempts >= MAX_ATTEMPTS) {
-        setPollingStatus('timeout');
-        if (intervalRef.current) {
-          clearInterval(intervalRef.current);
-        }
+      const data = await response.json();
+      console.log('[Payment Status]', data);
+      if (run.cancelled) return true;
+
+      if (data.payment_status === 'completed' || data.status === 'active') {
+        const packageSlugMap = {
+          'חבילת בסיס – ידני': 'basic',
+          'אוטומטי SMS': 'sms',
+          'אוטומטי WhatsApp': 'whatsapp',
+          'אוטומטי הכל כלול': 'all-inclusive',
+        };
+        const params = new URLSearchParams();
+        if (data.package_name) params.set('package', packageSlugMap[data.package_name] || data.package_name);
+        if (data.amount) params.set('amount', data.amount);
+        navigate(`/payment/thank-you?${params.toString()}`);
+        return true;
+      }
+      if (data.payment_status === 'failed') {
+        navigate(`/payment/failure?order_id=${orderId}&purchase_id=${purchaseId}`);
+        return true;
       }
+      return false;
+    } catch (error) {
+      console.error('Error fetching payment details:', error);
+      await new Promise(resolve => setTimeout(resolve, RETRY_DELAY));
+      return false;
     }
   };
 